@@ -0,0 +1,224 @@
+"""
+Controle de admissão (bulkheads) por classe de rota
+
+Com pool_size=20 / max_overflow=40, algumas requisições concorrentes de
+/metrics/performance ou análise P90 ocupavam todas as conexões e a abertura
+de chamados ficava esperando pool_timeout. Agora cada requisição é
+classificada pelo caminho:
+
+- interactive: CRUD de chamados, login, notificações (padrão)
+- analytics:   métricas, análises de SLA, exportações
+- maintenance: limpeza/aquecimento de caches, manutenção, importação
+
+Cada classe tem limite próprio de execução simultânea e fila limitada
+(ADMISSION_<CLASSE>_MAX / _FILA / _ESPERA). Fila cheia ou espera esgotada
+responde 503 com Retry-After, então analytics + maintenance nunca passam de
+uma fração fixa do pool e o restante fica garantido para interactive.
+
+Consultas SELECT feitas durante uma requisição analytics/maintenance levam o
+hint /*+ MAX_EXECUTION_TIME(ms) */ (ADMISSION_<CLASSE>_TIMEOUT_MS); o MySQL
+interrompe a consulta em vez de segurar a conexão indefinidamente.
+"""
+
+from __future__ import annotations
+import asyncio
+import contextvars
+import json
+import os
+import re
+import time
+from typing import Any, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+INTERACTIVE = "interactive"
+ANALYTICS = "analytics"
+MAINTENANCE = "maintenance"
+
+
+def _env_int(nome: str, padrao: int) -> int:
+    return int(os.getenv(nome, str(padrao)))
+
+
+class RouteClass:
+    """Limites de uma classe de rota"""
+
+    def __init__(self, nome: str, max_concorrentes: int, fila: int, espera: float, timeout_ms: int, retry_after: int):
+        self.nome = nome
+        self.max_concorrentes = max_concorrentes
+        self.fila = fila
+        self.espera = espera
+        self.timeout_ms = timeout_ms
+        self.retry_after = retry_after
+        self.em_execucao = 0
+        self.aguardando = 0
+        self.rejeitadas = 0
+        self.admitidas = 0
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaforo(self) -> asyncio.Semaphore:
+        # Criado sob demanda dentro do event loop do servidor
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concorrentes)
+        return self._sem
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "max_concorrentes": self.max_concorrentes,
+            "fila": self.fila,
+            "em_execucao": self.em_execucao,
+            "aguardando": self.aguardando,
+            "admitidas": self.admitidas,
+            "rejeitadas": self.rejeitadas,
+            "timeout_ms": self.timeout_ms,
+        }
+
+
+CLASSES: dict[str, RouteClass] = {
+    INTERACTIVE: RouteClass(
+        INTERACTIVE,
+        _env_int("ADMISSION_INTERACTIVE_MAX", 200),
+        _env_int("ADMISSION_INTERACTIVE_FILA", 400),
+        float(os.getenv("ADMISSION_INTERACTIVE_ESPERA", "10")),
+        0,
+        _env_int("ADMISSION_INTERACTIVE_RETRY_AFTER", 2),
+    ),
+    ANALYTICS: RouteClass(
+        ANALYTICS,
+        _env_int("ADMISSION_ANALYTICS_MAX", 6),
+        _env_int("ADMISSION_ANALYTICS_FILA", 12),
+        float(os.getenv("ADMISSION_ANALYTICS_ESPERA", "5")),
+        _env_int("ADMISSION_ANALYTICS_TIMEOUT_MS", 15000),
+        _env_int("ADMISSION_ANALYTICS_RETRY_AFTER", 10),
+    ),
+    MAINTENANCE: RouteClass(
+        MAINTENANCE,
+        _env_int("ADMISSION_MAINTENANCE_MAX", 2),
+        _env_int("ADMISSION_MAINTENANCE_FILA", 4),
+        float(os.getenv("ADMISSION_MAINTENANCE_ESPERA", "2")),
+        _env_int("ADMISSION_MAINTENANCE_TIMEOUT_MS", 60000),
+        _env_int("ADMISSION_MAINTENANCE_RETRY_AFTER", 30),
+    ),
+}
+
+# (classe, método ou None, regex do caminho sem o prefixo /api)
+# A primeira regra que casar vence; sem regra, a rota é interactive.
+ROTAS: list[tuple[str, Optional[str], re.Pattern]] = [
+    (INTERACTIVE, None, re.compile(r"^/metrics/(realtime|chamados-hoje|chamados-abertos|health)$")),
+    (MAINTENANCE, None, re.compile(r"^/metrics/debug/")),
+    (MAINTENANCE, None, re.compile(r"^/sla/(maintenance|scheduler)/")),
+    (MAINTENANCE, "POST", re.compile(r"^/sla/cache/(warmup|cleanup|reset-all)$")),
+    (MAINTENANCE, "POST", re.compile(r"^/sla/recalcular/p90-incremental$")),
+    (MAINTENANCE, "POST", re.compile(r"^/chamados/import$")),
+    (MAINTENANCE, None, re.compile(r"^/debug/")),
+    (ANALYTICS, None, re.compile(r"^/metrics/")),
+    (ANALYTICS, "GET", re.compile(r"^/sla/(recommendations|metrics)/")),
+    (ANALYTICS, "GET", re.compile(r"^/sla/validate/all$")),
+    (ANALYTICS, "GET", re.compile(r"^/(chamados|sla)/export$")),
+]
+
+_classe_atual: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("admission_classe", default=None)
+
+
+def classificar(metodo: str, caminho: str) -> str:
+    while caminho.startswith("/api/"):
+        caminho = caminho[4:]
+    for classe, m, padrao in ROTAS:
+        if (m is None or m == metodo) and padrao.search(caminho):
+            return classe
+    return INTERACTIVE
+
+
+def classe_atual() -> Optional[str]:
+    return _classe_atual.get()
+
+
+def _resposta_503(classe: RouteClass, motivo: str) -> tuple[dict, bytes]:
+    corpo = json.dumps({
+        "detail": f"Servidor ocupado ({classe.nome}): {motivo}. Tente novamente em {classe.retry_after}s",
+        "classe": classe.nome,
+    }).encode("utf-8")
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(corpo)).encode()),
+        (b"retry-after", str(classe.retry_after).encode()),
+    ]
+    return {"type": "http.response.start", "status": 503, "headers": headers}, corpo
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI: a vaga é liberada só depois do último byte da resposta
+    (exportações em streaming seguram a conexão até o fim)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        classe = CLASSES[classificar(scope.get("method", "GET"), scope.get("path", ""))]
+
+        if classe.aguardando >= classe.fila and classe.semaforo.locked():
+            classe.rejeitadas += 1
+            await self._rejeitar(send, classe, "fila cheia")
+            return
+
+        classe.aguardando += 1
+        inicio = time.monotonic()
+        try:
+            await asyncio.wait_for(classe.semaforo.acquire(), timeout=classe.espera)
+        except asyncio.TimeoutError:
+            classe.rejeitadas += 1
+            await self._rejeitar(send, classe, f"espera maior que {classe.espera:g}s")
+            return
+        finally:
+            classe.aguardando -= 1
+
+        classe.em_execucao += 1
+        classe.admitidas += 1
+        espera = time.monotonic() - inicio
+        if espera > 1:
+            print(f"[ADMISSION] {classe.nome} {scope.get('path')} aguardou {espera:.1f}s na fila")
+        token = _classe_atual.set(classe.nome)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _classe_atual.reset(token)
+            classe.em_execucao -= 1
+            classe.semaforo.release()
+
+    @staticmethod
+    async def _rejeitar(send, classe: RouteClass, motivo: str) -> None:
+        inicio, corpo = _resposta_503(classe, motivo)
+        await send(inicio)
+        await send({"type": "http.response.body", "body": corpo})
+
+
+_SELECT_RE = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+
+def _adicionar_hint(conn, cursor, statement, parameters, context, executemany):
+    nome = _classe_atual.get()
+    if nome is None or executemany:
+        return statement, parameters
+    timeout_ms = CLASSES[nome].timeout_ms
+    if timeout_ms <= 0 or "MAX_EXECUTION_TIME" in statement:
+        return statement, parameters
+    m = _SELECT_RE.match(statement)
+    if not m:
+        return statement, parameters
+    return f"{statement[:m.end()]} /*+ MAX_EXECUTION_TIME({timeout_ms}) */{statement[m.end():]}", parameters
+
+
+def install_statement_timeouts(engine: Engine) -> None:
+    """Registra o hint MAX_EXECUTION_TIME por classe de rota no engine"""
+    if not event.contains(engine, "before_cursor_execute", _adicionar_hint):
+        event.listen(engine, "before_cursor_execute", _adicionar_hint, retval=True)
+
+
+def get_stats() -> dict[str, Any]:
+    return {nome: c.stats() for nome, c in CLASSES.items()}
@@ -0,0 +1,266 @@
+"""
+Armazenamento de conteúdo endereçado por SHA-256 (anexos, mídias, imagens)
+
+Os anexos de chamado e de ticket ficavam no MEDIUMBLOB `conteudo`; cada
+download passava até 16 MB pelo protocolo do MySQL e pelo buffer pool.
+Agora o conteúdo vai para um blob store chaveado pelo SHA-256 e a linha de
+metadados guarda apenas o hash (hash_arquivo):
+
+- Arquivos idênticos são gravados uma única vez (put de um hash existente
+  não reescreve nada)
+- BLOB_STORE=local (padrão): diretório BLOB_STORE_DIR, em
+  <dir>/ab/cd/<sha256>, gravação atômica (arquivo temporário + rename)
+- BLOB_STORE=azure: container de core/storage.get_storage(), em
+  blobs/<sha256> (com STORAGE_BACKEND=local, o emulador em disco)
+
+put_stream() grava a partir de um arquivo em blocos, calculando o hash no
+caminho (uploads em streaming, ver core/uploads.py). size()/read_range() e
+local_path() atendem downloads com Range (core/downloads.py).
+
+O store é só de acréscimo: conteúdo pode ser referenciado por várias
+linhas (inclusive tabelas *_arquivo), então não há remoção por anexo.
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+
+BLOB_STORE = os.getenv("BLOB_STORE", "local").strip().lower()
+BLOB_STORE_DIR = os.getenv(
+    "BLOB_STORE_DIR", str(Path(__file__).resolve().parent.parent / "storage" / "blobs")
+)
+BLOB_CHUNK = 1024 * 1024
+# Acima disso o spool de upload para o Azure vai para disco
+BLOB_SPOOL_MEMORIA = 4 * 1024 * 1024
+
+_SHA_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobNaoEncontrado(KeyError):
+    pass
+
+
+class ConteudoGrandeDemais(ValueError):
+    def __init__(self, limite: int):
+        super().__init__(f"Arquivo excede o limite de {limite // (1024 * 1024)} MB")
+        self.limite = limite
+
+
+def _copiar_com_hash(origem: BinaryIO, destino: BinaryIO, max_bytes: Optional[int]) -> tuple[str, int]:
+    """Copia em blocos de BLOB_CHUNK calculando SHA-256 e tamanho; aborta ao passar do limite"""
+    h = hashlib.sha256()
+    total = 0
+    while True:
+        bloco = origem.read(BLOB_CHUNK)
+        if not bloco:
+            return h.hexdigest(), total
+        total += len(bloco)
+        if max_bytes is not None and total > max_bytes:
+            raise ConteudoGrandeDemais(max_bytes)
+        h.update(bloco)
+        destino.write(bloco)
+
+
+def _validar(sha: str) -> str:
+    sha = (sha or "").lower()
+    if not _SHA_RE.match(sha):
+        raise ValueError(f"Hash inválido: {sha!r}")
+    return sha
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.valores = {"gravados": 0, "deduplicados": 0, "lidos": 0}
+
+    def inc(self, chave: str) -> None:
+        with self._lock:
+            self.valores[chave] += 1
+
+
+class LocalBlobStore:
+    """Blob store em disco local"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.stats = _Stats()
+
+    def _path(self, sha: str) -> Path:
+        sha = _validar(sha)
+        return self.root / sha[:2] / sha[2:4] / sha
+
+    def exists(self, sha: str) -> bool:
+        return self._path(sha).is_file()
+
+    def put_bytes(self, data: bytes) -> str:
+        sha = sha256_bytes(data)
+        destino = self._path(sha)
+        if destino.is_file():
+            self.stats.inc("deduplicados")
+            return sha
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=destino.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, destino)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self.stats.inc("gravados")
+        return sha
+
+    def put_stream(self, origem: BinaryIO, max_bytes: Optional[int] = None) -> tuple[str, int]:
+        """Grava a partir de um arquivo em blocos (memória constante); retorna (sha256, tamanho)"""
+        tmp_dir = self.root / ".tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                sha, tamanho = _copiar_com_hash(origem, f, max_bytes)
+            destino = self._path(sha)
+            if destino.is_file():
+                os.unlink(tmp)
+                self.stats.inc("deduplicados")
+            else:
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp, destino)
+                self.stats.inc("gravados")
+            return sha, tamanho
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def read(self, sha: str) -> bytes:
+        with self.open(sha) as f:
+            return f.read()
+
+    def open(self, sha: str) -> BinaryIO:
+        try:
+            f = open(self._path(sha), "rb")
+        except FileNotFoundError:
+            raise BlobNaoEncontrado(sha)
+        self.stats.inc("lidos")
+        return f
+
+    def local_path(self, sha: str) -> Optional[Path]:
+        p = self._path(sha)
+        return p if p.is_file() else None
+
+    def size(self, sha: str) -> int:
+        try:
+            return self._path(sha).stat().st_size
+        except FileNotFoundError:
+            raise BlobNaoEncontrado(sha)
+
+    def read_range(self, sha: str, inicio: int, tamanho: int) -> bytes:
+        with self.open(sha) as f:
+            f.seek(inicio)
+            return f.read(tamanho)
+
+
+class AzureBlobStore:
+    """Blob store no container do Azure (core/storage.get_storage())"""
+
+    PREFIXO = "blobs/"
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.stats = _Stats()
+
+    def _nome(self, sha: str) -> str:
+        return f"{self.PREFIXO}{_validar(sha)}"
+
+    def exists(self, sha: str) -> bool:
+        return self.storage.exists(self._nome(sha))
+
+    def put_bytes(self, data: bytes) -> str:
+        sha = sha256_bytes(data)
+        nome = self._nome(sha)
+        if self.storage.exists(nome):
+            self.stats.inc("deduplicados")
+            return sha
+        self.storage.upload_bytes(nome, data, "application/octet-stream")
+        self.stats.inc("gravados")
+        return sha
+
+    def put_stream(self, origem: BinaryIO, max_bytes: Optional[int] = None) -> tuple[str, int]:
+        """O nome depende do hash, então o conteúdo passa por um spool local antes do upload"""
+        with tempfile.SpooledTemporaryFile(max_size=BLOB_SPOOL_MEMORIA) as spool:
+            sha, tamanho = _copiar_com_hash(origem, spool, max_bytes)
+            nome = self._nome(sha)
+            if self.storage.exists(nome):
+                self.stats.inc("deduplicados")
+            else:
+                spool.seek(0)
+                self.storage.upload_file(nome, spool, tamanho, "application/octet-stream")
+                self.stats.inc("gravados")
+        return sha, tamanho
+
+    def read(self, sha: str) -> bytes:
+        data = self.storage.download_bytes(self._nome(sha))
+        if data is None:
+            raise BlobNaoEncontrado(sha)
+        self.stats.inc("lidos")
+        return data
+
+    def open(self, sha: str) -> BinaryIO:
+        import io
+        return io.BytesIO(self.read(sha))
+
+    def local_path(self, sha: str) -> Optional[Path]:
+        return None
+
+    def size(self, sha: str) -> int:
+        tamanho = self.storage.size(self._nome(sha))
+        if tamanho is None:
+            raise BlobNaoEncontrado(sha)
+        return tamanho
+
+    def read_range(self, sha: str, inicio: int, tamanho: int) -> bytes:
+        """Download parcial (só o intervalo pedido trafega do Azure)"""
+        data = self.storage.download_bytes(self._nome(sha), offset=inicio, length=tamanho)
+        if data is None:
+            raise BlobNaoEncontrado(sha)
+        self.stats.inc("lidos")
+        return data
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """Instância única do blob store configurado (BLOB_STORE)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if BLOB_STORE == "azure":
+                    from core.storage import get_storage
+                    _store = AzureBlobStore(get_storage())
+                else:
+                    _store = LocalBlobStore(BLOB_STORE_DIR)
+    return _store
+
+
+def get_stats() -> dict:
+    store = get_blob_store()
+    return {"backend": BLOB_STORE, **store.stats.valores}
@@ -0,0 +1,214 @@
+"""
+Pipeline de inicialização (boot) da API
+
+Antes, importar main.py executava todas as migrações e warmups de forma
+síncrona, em todos os workers. Agora:
+
+1. Migrações rodam em thread de background, serializadas entre workers por
+   um lock consultivo do MySQL (GET_LOCK). O worker que obtém o lock executa;
+   os demais esperam o lock ser liberado e seguem sem reexecutar
+2. Workers essenciais (caixa de saída de e-mails, scheduler de SLA) sobem
+   logo após a primeira tentativa de migração, dê ela certo ou não: eles
+   toleram erros de banco e não dependem dos warmups
+3. Warmups (caches, métricas, jobs de migração de blobs/miniaturas) rodam
+   depois que as migrações terminam com sucesso, fora do caminho do startup
+4. Migração que falha (ou timeout esperando o lock) deixa o boot em
+   "failed" e é tentada de novo com backoff exponencial (BOOT_RETRY_INICIAL
+   até BOOT_RETRY_MAX segundos); ao dar certo o boot segue para os warmups
+5. /api/ready só responde 200 quando as migrações terminaram com sucesso;
+   /api/health mostra o estado do boot e fica "degraded" enquanto ele está
+   em "failed"
+
+FAST_BOOT=0 restaura o comportamento antigo (tudo síncrono no import).
+"""
+
+from __future__ import annotations
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable
+from sqlalchemy import text
+from core.db import engine
+from core.utils import now_brazil_naive
+
+
+BOOT_LOCK_NAME = os.getenv("BOOT_LOCK_NAME", "evoque_boot_migrations")
+BOOT_LOCK_TIMEOUT = int(os.getenv("BOOT_LOCK_TIMEOUT", "300"))
+BOOT_RETRY_INICIAL = float(os.getenv("BOOT_RETRY_INICIAL", "5"))
+BOOT_RETRY_MAX = float(os.getenv("BOOT_RETRY_MAX", "300"))
+FAST_BOOT = os.getenv("FAST_BOOT", "1").strip().lower() not in ("0", "false", "nao", "não")
+
+Step = tuple[str, Callable[[], Any]]
+
+_lock = threading.Lock()
+_thread: threading.Thread | None = None
+_state: dict[str, Any] = {
+    "status": "pending",
+    "migrations": {},
+    "workers": {},
+    "warmups": {},
+    "started_at": None,
+    "ready_at": None,
+    "erro": None,
+    "tentativas": 0,
+    "proxima_tentativa_em": None,
+}
+
+
+def _set(**kwargs) -> None:
+    with _lock:
+        _state.update(kwargs)
+
+
+def _record(phase: str, name: str, result: dict) -> None:
+    with _lock:
+        _state[phase][name] = result
+
+
+def boot_state() -> dict[str, Any]:
+    """Estado atual do boot (para /api/ready e /api/health)"""
+    with _lock:
+        return {
+            **_state,
+            "migrations": dict(_state["migrations"]),
+            "workers": dict(_state["workers"]),
+            "warmups": dict(_state["warmups"]),
+        }
+
+
+def is_ready() -> bool:
+    with _lock:
+        return _state["status"] in ("warming", "ready")
+
+
+def is_failed() -> bool:
+    with _lock:
+        return _state["status"] == "failed"
+
+
+def _run_steps(phase: str, steps: list[Step]) -> list[str]:
+    """Executa as etapas e retorna os nomes das que falharam"""
+    falhas = []
+    for name, fn in steps:
+        inicio = time.perf_counter()
+        try:
+            fn()
+            _record(phase, name, {"ok": True, "ms": round((time.perf_counter() - inicio) * 1000, 1)})
+        except Exception as e:
+            print(f"⚠️  [BOOT] {phase}/{name} falhou: {e}")
+            _record(phase, name, {"ok": False, "erro": str(e)})
+            falhas.append(name)
+    return falhas
+
+
+class BootFalhou(RuntimeError):
+    pass
+
+
+def run_migrations_locked(steps: list[Step]) -> None:
+    """Executa as migrações sob GET_LOCK.
+
+    O worker que espera o lock de outro também executa as etapas ao obtê-lo:
+    o ledger pula o que já foi aplicado, e uma migração que falhou no outro
+    worker falha aqui também em vez de ser dada como concluída.
+    Levanta BootFalhou se alguma etapa falhar ou se o lock não vier a tempo.
+    """
+    with engine.connect() as conn:
+        got = conn.execute(text("SELECT GET_LOCK(:n, 0)"), {"n": BOOT_LOCK_NAME}).scalar()
+        if got != 1:
+            print("[BOOT] Migrações em andamento em outro worker, aguardando...")
+            got = conn.execute(
+                text("SELECT GET_LOCK(:n, :t)"), {"n": BOOT_LOCK_NAME, "t": BOOT_LOCK_TIMEOUT}
+            ).scalar()
+            if got != 1:
+                raise BootFalhou(f"Timeout ({BOOT_LOCK_TIMEOUT}s) aguardando migrações de outro worker")
+        try:
+            falhas = _run_steps("migrations", steps)
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:n)"), {"n": BOOT_LOCK_NAME})
+    if falhas:
+        raise BootFalhou(f"Migrações com falha: {', '.join(falhas)}")
+
+
+def _migrar(migrations: list[Step]) -> bool:
+    """Uma tentativa das migrações; False (com o erro no estado) se falhou"""
+    with _lock:
+        _state["tentativas"] += 1
+    try:
+        try:
+            run_migrations_locked(migrations)
+        except BootFalhou:
+            raise
+        except Exception as e:
+            # Sem lock (ex: banco indisponível no boot): tenta sem serialização
+            print(f"⚠️  [BOOT] GET_LOCK indisponível ({e}), executando migrações sem lock")
+            falhas = _run_steps("migrations", migrations)
+            if falhas:
+                raise BootFalhou(f"Migrações com falha: {', '.join(falhas)}")
+    except Exception as e:
+        _set(status="failed", erro=str(e))
+        print(f"❌ [BOOT] {e}; /api/ready permanece 503 até a próxima tentativa dar certo")
+        return False
+    _set(erro=None, proxima_tentativa_em=None)
+    print("✅ [BOOT] Migrações concluídas")
+    return True
+
+
+def _iniciar(migrations: list[Step], workers: list[Step]) -> bool:
+    """Primeira tentativa das migrações e, em seguida, os workers essenciais"""
+    _set(status="migrating", started_at=now_brazil_naive().isoformat())
+    ok = _migrar(migrations)
+    _run_steps("workers", workers)
+    return ok
+
+
+def _concluir(ok: bool, migrations: list[Step], warmups: list[Step]) -> None:
+    """Repete as migrações com backoff até darem certo; depois roda os warmups"""
+    espera = BOOT_RETRY_INICIAL
+    while not ok:
+        proxima = now_brazil_naive() + timedelta(seconds=espera)
+        _set(proxima_tentativa_em=proxima.isoformat())
+        print(f"[BOOT] Nova tentativa das migrações em {espera:.0f}s")
+        time.sleep(espera)
+        espera = min(espera * 2, BOOT_RETRY_MAX)
+        _set(status="migrating")
+        ok = _migrar(migrations)
+
+    _set(status="warming")
+    _run_steps("warmups", warmups)
+    _set(status="ready", ready_at=now_brazil_naive().isoformat())
+    print("✅ [BOOT] Aplicação pronta")
+
+
+def _boot(migrations: list[Step], warmups: list[Step], workers: list[Step]) -> None:
+    _concluir(_iniciar(migrations, workers), migrations, warmups)
+
+
+def start_boot(migrations: list[Step], warmups: list[Step], workers: list[Step] | None = None) -> None:
+    """Inicia o boot (background com FAST_BOOT, síncrono caso contrário).
+
+    Sem FAST_BOOT a primeira tentativa roda no import; se as migrações
+    falharem, as novas tentativas e os warmups seguem em background.
+    """
+    global _thread
+    workers = workers or []
+    with _lock:
+        if _thread is not None:
+            return
+        if FAST_BOOT:
+            _thread = threading.Thread(
+                target=_boot, args=(migrations, warmups, workers), daemon=True, name="BootThread"
+            )
+    if FAST_BOOT:
+        _thread.start()
+        return
+    ok = _iniciar(migrations, workers)
+    if ok:
+        _concluir(ok, migrations, warmups)
+        return
+    with _lock:
+        _thread = threading.Thread(
+            target=_concluir, args=(ok, migrations, warmups), daemon=True, name="BootThread"
+        )
+    _thread.start()
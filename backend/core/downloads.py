@@ -0,0 +1,206 @@
+"""
+Downloads condicionais e parciais de conteúdo do blob store
+
+As rotas de download devolviam o BLOB inteiro em um Response; o player de
+vídeo do login fazia Range recarregando arquivo_blob completo do MySQL a
+cada seek. responder_blob() centraliza o protocolo HTTP de cache/Range:
+
+- ETag = SHA-256 do conteúdo (imutável por definição): If-None-Match
+  responde 304 sem ler nada além da linha de metadados
+- Last-Modified / If-Modified-Since a partir da data da linha (ou mtime)
+- Range de um intervalo (bytes=a-b, bytes=a-, bytes=-n), com If-Range;
+  intervalo impossível responde 416
+- Blob em disco local: resposta completa via FileResponse e parcial lendo
+  só o trecho pedido; blob no Azure: read_range() baixa só o intervalo
+- Conteúdo legado (coluna binária ainda não migrada) é lido sob demanda
+  por carregar_legado(inicio, tamanho): o tamanho vem da linha de
+  metadados (LENGTH da coluna) e um Range lê só o trecho (SUBSTRING),
+  então 304 e trechos não carregam o BLOB inteiro
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Iterator, Optional
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from core.blobstore import BLOB_CHUNK, BlobNaoEncontrado, get_blob_store
+
+
+CACHE_ANEXO = os.getenv("DOWNLOAD_CACHE_ANEXO", "private, max-age=31536000, immutable")
+CACHE_MIDIA = os.getenv("DOWNLOAD_CACHE_MIDIA", "public, max-age=86400")
+
+
+class ConteudoIndisponivel(LookupError):
+    pass
+
+
+def _etag_confere(cabecalho: Optional[str], etag: str) -> bool:
+    if not cabecalho:
+        return False
+    for item in cabecalho.split(","):
+        item = item.strip()
+        if item == "*" or item.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _http_date(dt: datetime) -> str:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return format_datetime(dt.astimezone(timezone.utc), usegmt=True)
+
+
+def _nao_modificado(request: Request, etag: Optional[str], modificado_em: Optional[datetime]) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return etag is not None and _etag_confere(inm, etag)
+    ims = request.headers.get("if-modified-since")
+    if ims and modificado_em is not None:
+        try:
+            desde = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        atual = modificado_em if modificado_em.tzinfo else modificado_em.replace(tzinfo=timezone.utc)
+        return atual.replace(microsecond=0) <= desde
+    return False
+
+
+def parse_range(cabecalho: Optional[str], tamanho: int) -> Optional[tuple[int, int]]:
+    """(inicio, fim) inclusivos de um Range de intervalo único.
+
+    None = servir o conteúdo inteiro (sem Range, múltiplos intervalos ou
+    unidade desconhecida). ValueError = intervalo impossível (416).
+    """
+    if not cabecalho or not cabecalho.strip().lower().startswith("bytes="):
+        return None
+    valor = cabecalho.split("=", 1)[1].strip()
+    if "," in valor or "-" not in valor:
+        return None
+    ini_s, fim_s = (p.strip() for p in valor.split("-", 1))
+    if not (ini_s or fim_s) or not all(p.isdigit() for p in (ini_s, fim_s) if p):
+        return None
+    if not ini_s:
+        sufixo = int(fim_s)
+        if sufixo == 0:
+            raise ValueError("Range vazio")
+        return max(tamanho - sufixo, 0), tamanho - 1
+    inicio = int(ini_s)
+    fim = int(fim_s) if fim_s else tamanho - 1
+    if inicio >= tamanho or fim < inicio:
+        raise ValueError("Range fora do conteúdo")
+    return inicio, min(fim, tamanho - 1)
+
+
+def _iter_arquivo(caminho, inicio: int, tamanho: int) -> Iterator[bytes]:
+    with open(caminho, "rb") as f:
+        f.seek(inicio)
+        restante = tamanho
+        while restante > 0:
+            bloco = f.read(min(BLOB_CHUNK, restante))
+            if not bloco:
+                return
+            restante -= len(bloco)
+            yield bloco
+
+
+def responder_blob(
+    request: Request,
+    *,
+    sha: Optional[str],
+    nome: str,
+    mime: Optional[str],
+    modificado_em: Optional[datetime] = None,
+    carregar_legado: Optional[Callable[[int, Optional[int]], Optional[bytes]]] = None,
+    tamanho_legado: Optional[int] = None,
+    disposition: str = "inline",
+    cache_control: str = CACHE_ANEXO,
+) -> Response:
+    """Resposta de download com ETag/Last-Modified/Cache-Control e Range.
+
+    carregar_legado(inicio, tamanho) devolve o trecho da coluna legada
+    (tamanho None = até o fim); tamanho_legado é o LENGTH da coluna, lido
+    junto com os metadados. Levanta ConteudoIndisponivel quando não há
+    conteúdo (nem no blob store nem na coluna legada).
+    """
+    mime = mime or "application/octet-stream"
+    nome_ascii = (nome or "arquivo").encode("ascii", errors="ignore").decode("ascii").replace('"', "") or "arquivo"
+    etag = f'"{sha}"' if sha else None
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Cache-Control": cache_control,
+        "Content-Disposition": f'{disposition}; filename="{nome_ascii}"',
+    }
+
+    if etag and _nao_modificado(request, etag, modificado_em):
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+
+    # Legado primeiro: linhas antigas já têm hash_arquivo, mas o conteúdo
+    # só chega ao blob store quando a migração passa por elas
+    usa_legado = carregar_legado is not None
+    if not usa_legado and not sha:
+        raise ConteudoIndisponivel()
+
+    store = get_blob_store()
+    caminho = None
+    legado = None
+    if usa_legado:
+        if not sha or tamanho_legado is None:
+            # Sem hash (ETag) ou sem tamanho não há como evitar a leitura inteira
+            legado = carregar_legado(0, None)
+            if legado is None:
+                raise ConteudoIndisponivel()
+            tamanho_legado = len(legado)
+            etag = etag or f'"{hashlib.sha256(legado).hexdigest()}"'
+        tamanho = tamanho_legado
+    else:
+        try:
+            caminho = store.local_path(sha)
+            tamanho = caminho.stat().st_size if caminho else store.size(sha)
+        except (BlobNaoEncontrado, ValueError):
+            raise ConteudoIndisponivel()
+        if modificado_em is None and caminho is not None:
+            modificado_em = datetime.fromtimestamp(caminho.stat().st_mtime, tz=timezone.utc)
+
+    headers["ETag"] = etag
+    if modificado_em is not None:
+        headers["Last-Modified"] = _http_date(modificado_em)
+
+    if not sha and _nao_modificado(request, etag, modificado_em):
+        return Response(status_code=304, headers=headers)
+
+    faixa_hdr = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        faixa_hdr = None  # conteúdo mudou desde a cópia parcial do cliente: envia inteiro
+    try:
+        faixa = parse_range(faixa_hdr, tamanho)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{tamanho}"})
+
+    if faixa is None:
+        if caminho is not None:
+            return FileResponse(caminho, media_type=mime, headers=headers)
+        if not usa_legado:
+            corpo = store.read(sha)
+        elif legado is not None:
+            corpo = legado
+        elif (corpo := carregar_legado(0, None)) is None:
+            raise ConteudoIndisponivel()
+        return Response(content=corpo, media_type=mime, headers=headers)
+
+    inicio, fim = faixa
+    parcial = fim - inicio + 1
+    headers["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+    headers["Content-Length"] = str(parcial)
+    if caminho is not None:
+        return StreamingResponse(_iter_arquivo(caminho, inicio, parcial), status_code=206, media_type=mime, headers=headers)
+    if not usa_legado:
+        corpo = store.read_range(sha, inicio, parcial)
+    elif legado is not None:
+        corpo = legado[inicio:fim + 1]
+    elif (corpo := carregar_legado(inicio, parcial)) is None:
+        raise ConteudoIndisponivel()
+    return Response(content=corpo, status_code=206, media_type=mime, headers=headers)
@@ -0,0 +1,126 @@
+"""
+Anexos de e-mail carregados no envio
+
+criar_chamado_com_anexos relia o `conteudo` de cada anexo e gravava todos em
+base64 na caixa de saída: o e-mail carregava os arquivos inteiros em memória
+desde a requisição até o envio. Agora:
+
+1. Na abertura, cada anexo vira só uma referência (tabela, id, nome, mime,
+   tamanho, sha256) e planejar() aplica a política de tamanho: anexos são
+   incluídos em ordem enquanto o total cabe em EMAIL_ANEXOS_MAX_MB; os
+   demais (ou qualquer arquivo sozinho acima do limite) viram links de
+   download no corpo do e-mail
+2. No envio, o worker resolve as referências uma a uma (carregar()): lê o
+   blob em blocos e codifica cada bloco em base64. O base64 do anexo
+   inteiro ainda fica em memória (o sendMail o leva dentro do JSON), mas só
+   um anexo por vez e nunca desde a abertura do chamado
+
+O limite padrão (3 MB) mantém o sendMail abaixo do teto de 4 MB por
+requisição do Graph depois da expansão do base64.
+"""
+
+from __future__ import annotations
+import base64
+import os
+from typing import Any, Optional
+from core.email_templates import PORTAL_URL, Template
+
+
+EMAIL_ANEXOS_MAX_MB = float(os.getenv("EMAIL_ANEXOS_MAX_MB", "3"))
+EMAIL_ANEXOS_BASE_URL = os.getenv("EMAIL_ANEXOS_BASE_URL", PORTAL_URL).rstrip("/")
+
+# Tabelas cujo download é servido por /api/chamados/anexos/{origem}/{id}
+_ROTAS = {"chamado_anexo": "chamado", "ticket_anexos": "ticket"}
+
+_BLOCO = 3 * 256 * 1024  # múltiplo de 3: cada bloco vira base64 sem padding intermediário
+
+_LINKS = Template(
+    '<div style="margin-top:14px;font-family:Arial,Helvetica,sans-serif;font-size:13px;color:#222222">'
+    '<div style="font-weight:700;margin-bottom:6px">Anexos disponíveis para download</div>'
+    '<ul style="margin:0;padding-left:18px">{itens!s}</ul>'
+    '</div>'
+)
+_LINK = Template('<li style="margin:2px 0"><a href="{url}">{nome}</a> ({tamanho})</li>')
+
+
+def referencia(tabela: str, anexo_id: int, nome: str, mime: Optional[str], tamanho: Optional[int], sha256: Optional[str]) -> dict[str, Any]:
+    return {"tabela": tabela, "id": int(anexo_id), "nome": nome, "mime": mime, "tamanho": tamanho, "sha256": sha256}
+
+
+def url_download(ref: dict[str, Any]) -> str:
+    return f"{EMAIL_ANEXOS_BASE_URL}/api/chamados/anexos/{_ROTAS.get(ref['tabela'], 'chamado')}/{ref['id']}"
+
+
+def planejar(refs: list[dict[str, Any]], limite_mb: Optional[float] = None) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """(anexar, links): anexa em ordem enquanto o total cabe no limite"""
+    limite = int((EMAIL_ANEXOS_MAX_MB if limite_mb is None else limite_mb) * 1024 * 1024)
+    anexar, links, total = [], [], 0
+    for ref in refs:
+        tamanho = ref.get("tamanho")
+        if tamanho is not None and total + tamanho <= limite:
+            anexar.append(ref)
+            total += tamanho
+        else:
+            links.append(ref)
+    return anexar, links
+
+
+def _tamanho_legivel(n: Optional[int]) -> str:
+    if n is None:
+        return "-"
+    if n < 1024 * 1024:
+        return f"{max(n, 1) / 1024:.0f} KB"
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+def links_html(links: list[dict[str, Any]]) -> str:
+    if not links:
+        return ""
+    itens = "".join(
+        _LINK.render(url=url_download(r), nome=r.get("nome") or f"anexo_{r['id']}", tamanho=_tamanho_legivel(r.get("tamanho")))
+        for r in links
+    )
+    return _LINKS.render(itens=itens)
+
+
+def _base64_blob(sha: str) -> str:
+    """base64 do blob, codificado bloco a bloco num único buffer"""
+    from core.blobstore import get_blob_store
+    saida = bytearray()
+    with get_blob_store().open(sha) as f:
+        while True:
+            bloco = f.read(_BLOCO)
+            if not bloco:
+                break
+            saida += base64.b64encode(bloco)
+    return saida.decode("ascii")
+
+
+def _base64_legado(tabela: str, anexo_id: int) -> Optional[str]:
+    if tabela not in _ROTAS:
+        return None
+    from sqlalchemy import text
+    from core.db import engine
+    with engine.connect() as conn:
+        conteudo = conn.execute(text(f"SELECT conteudo FROM {tabela} WHERE id=:i"), {"i": anexo_id}).scalar()
+    return base64.b64encode(conteudo).decode("ascii") if conteudo else None
+
+
+def carregar(ref: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """fileAttachment do Graph para a referência; None se o conteúdo sumiu"""
+    from core.blobstore import BlobNaoEncontrado
+    try:
+        if ref.get("sha256"):
+            conteudo = _base64_blob(ref["sha256"])
+        else:
+            conteudo = _base64_legado(ref["tabela"], ref["id"])
+    except (BlobNaoEncontrado, ValueError) as e:
+        print(f"[EMAIL] ⚠️ Anexo {ref.get('tabela')}/{ref.get('id')} indisponível: {type(e).__name__}: {e}")
+        return None
+    if not conteudo:
+        return None
+    return {
+        "name": ref.get("nome") or f"anexo_{ref['id']}",
+        "contentType": ref.get("mime") or "application/octet-stream",
+        "contentBytes": conteudo,
+    }
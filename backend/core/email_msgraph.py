@@ -1,11 +1,7 @@
 from __future__ import annotations
 import os
-import time
-import json
-import threading
 from typing import List, Optional, Tuple, Dict, Any
-from urllib import request, parse, error
-import base64
+from types import SimpleNamespace
 
 # Try to import backend/env.py as module to support key=value configs
 try:
@@ -22,7 +18,8 @@ USER_ID = (_env.GRAPH_USER_ID if _env and getattr(_env, "GRAPH_USER_ID", None) e
 EMAIL_TI = (_env.EMAIL_TI if _env and getattr(_env, "EMAIL_TI", None) else os.getenv("EMAIL_TI"))
 EMAIL_SISTEMA = (_env.EMAIL_SISTEMA if _env and getattr(_env, "EMAIL_SISTEMA", None) else os.getenv("EMAIL_SISTEMA"))
 
-_graph_token: Optional[Tuple[str, float]] = None  # (token, expiry_epoch)
+# Janela de agrupamento dos e-mails de status (0 = um e-mail por mudança)
+EMAIL_STATUS_JANELA_SECONDS = int(os.getenv("EMAIL_STATUS_JANELA_SECONDS", "300"))
 
 
 def _have_graph_config() -> bool:
@@ -36,76 +33,32 @@ def _have_graph_config() -> bool:
     return has_config
 
 
+def _client():
+    """GraphClient compartilhado (core/msgraph_client.py): keep-alive, token sob lock e $batch"""
+    from core.msgraph_client import get_client
+    return get_client(TENANT_ID, CLIENT_ID, CLIENT_SECRET)
+
+
 def _get_graph_token() -> Optional[str]:
-    global _graph_token
     if not _have_graph_config():
         print("[EMAIL] ❌ Cannot get token: Graph config missing")
         return None
-    now = time.time()
-    if _graph_token and now < _graph_token[1] - 30:
-        print("[EMAIL] ✓ Using cached Graph token")
-        return _graph_token[0]
-    print("[EMAIL] 🔄 Requesting new Graph token...")
-    token_url = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
-    data = parse.urlencode({
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "grant_type": "client_credentials",
-        "scope": "https://graph.microsoft.com/.default",
-    }).encode("utf-8")
-    req = request.Request(token_url, data=data, method="POST")
-    req.add_header("Content-Type", "application/x-www-form-urlencoded")
-    try:
-        with request.urlopen(req, timeout=15) as resp:
-            payload = json.loads(resp.read().decode("utf-8"))
-            token = payload.get("access_token")
-            expires_in = int(payload.get("expires_in", 3600))
-            if token:
-                _graph_token = (token, now + expires_in)
-                print(f"[EMAIL] ✅ Graph token obtained successfully (expires in {expires_in}s)")
-                return token
-            else:
-                print(f"[EMAIL] ❌ Graph token response missing 'access_token': {payload}")
-    except error.HTTPError as e:
-        try:
-            msg = e.read().decode("utf-8")
-            print(f"[EMAIL] ❌ Graph token HTTP error {e.code}: {msg}")
-        except Exception:
-            print(f"[EMAIL] ❌ Graph token HTTPError: {e}")
-    except Exception as e:
-        print(f"[EMAIL] ❌ Graph token exception: {type(e).__name__}: {e}")
-    return None
+    return _client().token()
 
 
-def _post_graph(path: str, payload: dict) -> bool:
-    token = _get_graph_token()
-    if not token:
-        print(f"[EMAIL] ❌ Cannot send: no token available")
-        return False
-    url = f"https://graph.microsoft.com/v1.0{path}"
-    body = json.dumps(payload).encode("utf-8")
-    req = request.Request(url, data=body, method="POST")
-    req.add_header("Authorization", f"Bearer {token}")
-    req.add_header("Content-Type", "application/json")
+def _post_graph_result(path: str, payload: dict) -> Tuple[bool, Optional[str], bool]:
+    """POST no Graph; retorna (ok, erro, retentável)"""
     print(f"[EMAIL] 📤 Posting to Graph: {path}")
-    try:
-        with request.urlopen(req, timeout=20) as resp:
-            body = resp.read().decode("utf-8") if resp else ""
-            if 200 <= resp.status < 300 or resp.status == 202:
-                print(f"[EMAIL] ✅ Graph sendMail SUCCESS: status={resp.status}")
-                return True
-            else:
-                print(f"[EMAIL] ⚠️ Graph sendMail unexpected status: {resp.status}")
-                return False
-    except error.HTTPError as e:
-        try:
-            msg = e.read().decode("utf-8")
-            print(f"[EMAIL] ❌ Graph sendMail HTTP error {e.code}: {msg}")
-        except Exception:
-            print(f"[EMAIL] ❌ Graph sendMail HTTPError: {e}")
-    except Exception as e:
-        print(f"[EMAIL] ❌ Graph sendMail exception: {type(e).__name__}: {e}")
-    return False
+    ok, erro, retentavel = _client().post(path, payload)
+    if ok:
+        print(f"[EMAIL] ✅ Graph sendMail SUCCESS")
+    else:
+        print(f"[EMAIL] ❌ Graph sendMail failed: {erro}")
+    return ok, erro, retentavel
+
+
+def _post_graph(path: str, payload: dict) -> bool:
+    return _post_graph_result(path, payload)[0]
 
 
 def _recipients(addrs: List[str]) -> List[dict]:
@@ -117,135 +70,33 @@ def _recipients(addrs: List[str]) -> List[dict]:
     return out
 
 
-def _format_dt(dt) -> str:
-    try:
-        from core.utils import now_brazil_naive
-        if not dt:
-            return ""
-        # Ensure iso string nicely
-        return dt.strftime("%d/%m/%Y %H:%M")
-    except Exception:
-        return str(dt) if dt else ""
+def _escape(s: str) -> str:
+    from core.email_templates import escape
+    return escape(s)
 
 
-def _escape(s: str) -> str:
-    if s is None:
-        return ""
-    return str(s).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-
-
-def _build_chamado_table(ch) -> str:
-    visita = _escape(ch.data_visita.strftime("%d/%m/%Y") if getattr(ch, "data_visita", None) else "-")
-    internet = _escape(getattr(ch, "internet_item", None) or "-")
-    descricao = _escape(getattr(ch, "descricao", None) or "").replace("\n", "<br>")
-    abertura = _escape(_format_dt(getattr(ch, "data_abertura", None)))
-
-    rows = [
-        ("Código", _escape(ch.codigo)),
-        ("Protocolo", _escape(ch.protocolo)),
-        ("Status", _escape(ch.status)),
-        ("Prioridade", _escape(ch.prioridade)),
-        ("Solicitante", _escape(ch.solicitante)),
-        ("Cargo", _escape(ch.cargo)),
-        ("Telefone", _escape(ch.telefone)),
-        ("E-mail", _escape(ch.email)),
-        ("Unidade", _escape(ch.unidade)),
-        ("Problema", _escape(ch.problema)),
-        ("Item de Internet", internet),
-        ("Data de Visita", visita),
-        ("Aberto em", abertura),
-    ]
-
-    logo_url = "https://images.totalpass.com/public/1280x720/czM6Ly90cC1pbWFnZS1hZG1pbi1wcm9kL2d5bXMva2g2OHF6OWNuajloN2lkdnhzcHhhdWx4emFhbWEzYnc3MGx5cDRzZ3p5aTlpZGM0OHRvYnk0YW56azRk"
-    portal_url = os.getenv("PORTAL_URL", "https://academiaevoque.com.br")
-
-    html = []
-    # Preheader (hidden) for Gmail and others
-    preheader = f"Seu chamado {ch.codigo} foi registrado — protocolo {ch.protocolo}."
-    html.append(f'<span style="display:none!important;visibility:hidden;mso-hide:all;font-size:1px;line-height:1px;max-height:0;max-width:0;opacity:0;overflow:hidden">{_escape(preheader)}</span>')
-
-    html.append('<table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="background-color:#f3f6fb;padding:24px 0">')
-    html.append('<tr><td align="center">')
-    html.append('<table role="presentation" width="680" cellpadding="0" cellspacing="0" style="background:#ffffff;border-collapse:collapse">')
-    # Header
-    html.append('<tr><td style="background:linear-gradient(90deg,#ff7a00,#ff4500);padding:18px 24px;color:#fff;font-family:Arial,Helvetica,sans-serif">')
-    html.append('<table role="presentation" width="100%"><tr><td valign="middle" style="width:56px">')
-    html.append(f'<img src="{logo_url}" width="48" height="48" alt="Evoque" style="display:block;border:0;outline:none;text-decoration:none;border-radius:6px"/>')
-    html.append('</td><td valign="middle" style="padding-left:12px">')
-    html.append(f'<div style="font-size:16px;font-weight:700">Evoque Fitness</div>')
-    html.append(f'<div style="font-size:13px;opacity:0.95">Chamado {_escape(ch.codigo)}</div>')
-    html.append('</td></tr></table>')
-    html.append('</td></tr>')
-    # Body intro
-    html.append('<tr><td style="padding:20px 24px;font-family:Arial,Helvetica,sans-serif;color:#000000;font-size:14px;line-height:20px">')
-    html.append(f'<p style="margin:0 0 12px">Olá <strong>{_escape(ch.solicitante)}</strong>,</p>')
-    html.append('<p style="margin:0 0 14px;color:#222222">Recebemos seu chamado. Abaixo estão os detalhes registrados:</p>')
-    # Details table
-    html.append('<table role="presentation" width="100%" cellpadding="8" cellspacing="0" style="border-collapse:separate;border-spacing:8px 8px">')
-    for k, v in rows:
-        html.append('<tr>')
-        html.append(f'<td width="35%" style="background:#f8fafc;border:1px solid #eef2f7;border-radius:6px;font-weight:700;color:#000000;vertical-align:top">{k}</td>')
-        html.append(f'<td style="background:#ffffff;border:1px solid #eef2f7;border-radius:6px;color:#222222;vertical-align:top">{v or "-"}</td>')
-        html.append('</tr>')
-    html.append('</table>')
-    if descricao:
-        html.append('<div style="margin-top:12px">')
-        html.append('<div style="font-weight:700;color:#000000;margin-bottom:6px">Descrição</div>')
-        html.append(f'<div style="color:#222222;padding:12px;background:#f1f5f9;border:1px solid #e2e8f0;border-radius:6px">{descricao}</div>')
-        html.append('</div>')
-    # CTA
-    html.append('<div style="margin-top:18px;display:block">')
-    html.append(f'<a href="{portal_url}" style="display:inline-block;padding:12px 18px;background:#000000;color:#ffffff;border-radius:6px;text-decoration:none;font-weight:700">Ver chamado</a>')
-    html.append('<div style="display:inline-block;margin-left:10px;color:#555555;font-size:13px;vertical-align:middle">Se precisar, responda pelo portal ou contate ti@academiaevoque.com.br</div>')
-    html.append('</div>')
-
-    html.append('</td></tr>')
-    # Footer
-    html.append('<tr><td style="padding:14px 24px;background:#fbfdff;border-top:1px solid #eef3fb;font-family:Arial,Helvetica,sans-serif;font-size:12px;color:#94a3b8">')
-    html.append('Este é um e‑mail automático enviado pelo sistema de chamados da Evoque Fitness.')
-    html.append('</td></tr>')
-
-    html.append('</table>')
-    html.append('</td></tr>')
-    html.append('</table>')
-
-    return "".join(html)
-
-
-def build_email_chamado_aberto(ch) -> Tuple[str, str]:
-    subject = f"[Evoque TI] Chamado {ch.codigo} aberto (Protocolo {ch.protocolo})"
-    body = _build_chamado_table(ch)
-    # plain text fallback
-    text = f"Seu chamado {ch.codigo} foi criado. Protocolo: {ch.protocolo}. Status: {ch.status}."
-    return subject, body
-
-
-def build_email_status_atualizado(ch, status_anterior: str) -> Tuple[str, str]:
-    subject = f"[Evoque TI] Status do chamado {ch.codigo}: {status_anterior} → {ch.status}"
-    body = []
-    body.append('<table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="background-color:#f3f6fb;padding:24px 0">')
-    body.append('<tr><td align="center">')
-    body.append('<table role="presentation" width="680" cellpadding="0" cellspacing="0" style="background:#ffffff;border-collapse:collapse">')
-    body.append('<tr><td style="background:linear-gradient(90deg,#ff7a00,#ff4500);padding:16px;color:#fff;border-radius:8px 8px 0 0;font-weight:700;font-family:Arial,Helvetica,sans-serif">')
-    body.append(f'Atualização de status — Chamado {_escape(ch.codigo)}')
-    body.append('</td></tr>')
-    body.append('<tr><td style="background:#fff;padding:18px;border:1px solid #e6e9ef;border-top:none;color:#102a43;font-family:Arial,Helvetica,sans-serif">')
-    body.append(f'<p style="margin:0 0 10px">Olá <strong>{_escape(ch.solicitante)}</strong>,</p>')
-    body.append(f'<p style="margin:0 0 12px;color:#222222">O status do seu chamado foi atualizado de <strong>{_escape(status_anterior)}</strong> para <strong>{_escape(ch.status)}</strong>.</p>')
-    body.append(_build_chamado_table(ch))
-    body.append('<div style="margin-top:14px;color:#555555;font-size:13px">Se desejar mais detalhes, acesse o portal.</div>')
-    body.append('</td></tr>')
-    body.append('</table>')
-    body.append('</td></tr>')
-    body.append('</table>')
-    return subject, "".join(body)
+def _build_chamado_table(ch, extra: str = "") -> str:
+    from core.email_templates import tabela_chamado
+    return tabela_chamado(ch, extra)
 
 
-def send_mail(subject: str, html_body: str, to: List[str], cc: Optional[List[str]] = None, attachments: Optional[List[Dict[str, Any]]] = None) -> bool:
-    if not _have_graph_config():
-        print("[EMAIL] ❌ Graph configuration missing; skipping send.")
-        return False
-    print(f"[EMAIL] 📧 Preparing email: to={to}, subject='{subject[:50]}...'")
+def build_email_chamado_aberto(ch, extra: str = "") -> Tuple[str, str]:
+    """Templates compilados em core/email_templates.py; `extra` é HTML pronto (ex.: links de anexos)"""
+    from core.email_templates import chamado_aberto
+    return chamado_aberto(ch, extra)
+
+
+def build_email_status_atualizado(ch, status_anterior: str, transicoes: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, str]:
+    """E-mail de mudança de status.
+
+    Com `transicoes` (resumo agrupado: [{"de", "para", "em"}] em ordem), o
+    assunto mostra o primeiro status → o atual e o corpo lista cada mudança.
+    """
+    from core.email_templates import status_atualizado
+    return status_atualizado(ch, status_anterior, transicoes)
+
+
+def _build_message(subject: str, html_body: str, to: List[str], cc: Optional[List[str]] = None, attachments: Optional[List[Dict[str, Any]]] = None) -> dict:
     to_list = _recipients(to)
     cc_list = _recipients(cc or [])
     message = {
@@ -263,6 +114,10 @@ def send_mail(subject: str, html_body: str, to: List[str], cc: Optional[List[str
         # Ensure structure
         attach_list = []
         for a in attachments:
+            if "tabela" in a:
+                # Referência (core/email_anexos): conteúdo lido e codificado agora, um por vez
+                from core.email_anexos import carregar
+                a = carregar(a) or {}
             # expect dict with name, contentType, contentBytes (base64 string)
             name = a.get("name")
             contentType = a.get("contentType") or a.get("mime") or "application/octet-stream"
@@ -277,23 +132,98 @@ def send_mail(subject: str, html_body: str, to: List[str], cc: Optional[List[str
             })
         if attach_list:
             message["message"]["attachments"] = attach_list
+    return message
+
+
+def deliver_mail(subject: str, html_body: str, to: List[str], cc: Optional[List[str]] = None, attachments: Optional[List[Dict[str, Any]]] = None) -> Tuple[bool, Optional[str], bool]:
+    """Envio síncrono com diagnóstico (ok, erro, retentável); usado pela caixa de saída"""
+    if not _have_graph_config():
+        return False, "Configuração do Graph ausente", True
+    print(f"[EMAIL] 📧 Preparing email: to={to}, subject='{subject[:50]}...'")
+    message = _build_message(subject, html_body, to, cc, attachments)
+    return _post_graph_result(f"/users/{USER_ID}/sendMail", message)
+
+
+def deliver_mail_batch(mensagens: List[Dict[str, Any]]) -> List[Tuple[bool, Optional[str], bool]]:
+    """Envia várias mensagens (dicts com subject, html_body, to, cc, attachments) via $batch.
+
+    Mensagens com anexos vão individualmente: o $batch limita o tamanho total
+    da requisição. Resultados (ok, erro, retentável) na mesma ordem.
+    """
+    if not _have_graph_config():
+        return [(False, "Configuração do Graph ausente", True)] * len(mensagens)
     path = f"/users/{USER_ID}/sendMail"
-    return _post_graph(path, message)
-
-
-def send_async(func, *args, **kwargs) -> None:
-    def _runner():
-        try:
-            print(f"[EMAIL] 🧵 Async thread started for {func.__name__}")
-            func(*args, **kwargs)
-            print(f"[EMAIL] 🧵 Async thread completed for {func.__name__}")
-        except Exception as e:  # pragma: no cover
-            print(f"[EMAIL] ❌ Async thread error in {func.__name__}: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
-    thread = threading.Thread(target=_runner, daemon=True)
-    thread.start()
-    print(f"[EMAIL] 🧵 Spawned async thread for {func.__name__}")
+    resultados: List[Optional[Tuple[bool, Optional[str], bool]]] = [None] * len(mensagens)
+    em_lote = []
+    for i, m in enumerate(mensagens):
+        payload = _build_message(m["subject"], m["html_body"], m["to"], m.get("cc"), m.get("attachments"))
+        if m.get("attachments"):
+            resultados[i] = _post_graph_result(path, payload)
+        else:
+            em_lote.append((i, payload))
+    if em_lote:
+        print(f"[EMAIL] 📤 Graph $batch: {len(em_lote)} mensagem(ns)")
+        for (i, _), res in zip(em_lote, _client().send_batch([(path, p) for _, p in em_lote])):
+            resultados[i] = res
+    return resultados
+
+
+def send_mail(subject: str, html_body: str, to: List[str], cc: Optional[List[str]] = None, attachments: Optional[List[Dict[str, Any]]] = None) -> bool:
+    """Envio síncrono imediato (fora da caixa de saída)"""
+    if not _have_graph_config():
+        print("[EMAIL] ❌ Graph configuration missing; skipping send.")
+        return False
+    return deliver_mail(subject, html_body, to, cc, attachments)[0]
+
+
+def enqueue_mail(subject: str, html_body: str, to: List[str], cc: Optional[List[str]] = None, attachments: Optional[List[Dict[str, Any]]] = None, origem: Optional[str] = None, db=None) -> None:
+    """Grava o e-mail na caixa de saída (core/email_outbox); o envio é feito pelos workers"""
+    from core import email_outbox
+    email_outbox.enfileirar(subject, html_body, to, cc=cc, anexos=attachments, origem=origem, db=db)
+
+
+def _cc_ti() -> List[str]:
+    return [str(EMAIL_TI)] if EMAIL_TI else []
+
+
+def enqueue_chamado_abertura(ch, attachments: Optional[List[Dict[str, Any]]] = None, db=None) -> None:
+    """`attachments`: referências de core/email_anexos.referencia(); o que não
+    cabe em EMAIL_ANEXOS_MAX_MB vai como link de download no corpo"""
+    if not ch.email:
+        return
+    from core import email_anexos
+    anexar, links = email_anexos.planejar(attachments or [])
+    subject, html = build_email_chamado_aberto(ch, email_anexos.links_html(links))
+    enqueue_mail(subject, html, to=[str(ch.email)], cc=_cc_ti(), attachments=anexar or None, origem="chamado_abertura", db=db)
+    detalhe = f" ({len(anexar)} anexo(s), {len(links)} link(s))" if attachments else ""
+    print(f"[EMAIL] 🎫 E-mail de abertura do chamado {ch.codigo} na caixa de saída{detalhe}")
+
+
+_CAMPOS_EMAIL_CHAMADO = (
+    "id", "codigo", "protocolo", "status", "prioridade", "solicitante", "cargo", "telefone",
+    "email", "unidade", "problema", "internet_item", "data_visita", "data_abertura", "descricao",
+)
+
+
+def enqueue_chamado_status(ch, status_anterior: str, db=None) -> None:
+    """Agrupa mudanças de status do mesmo chamado/destinatário dentro de
+    EMAIL_STATUS_JANELA_SECONDS num único e-mail-resumo (core/email_outbox.agrupar)"""
+    if not ch.email:
+        return
+    from core import email_outbox
+    from core.utils import now_brazil_naive
+    evento = {"de": status_anterior, "para": ch.status, "em": now_brazil_naive().isoformat(timespec="seconds")}
+    # O resumo é renderizado depois do commit, em outra thread: usa uma cópia
+    # dos campos, não a instância ligada à sessão da requisição
+    foto = SimpleNamespace(**{c: getattr(ch, c, None) for c in _CAMPOS_EMAIL_CHAMADO})
+    email_outbox.agrupar(
+        f"status:{ch.id}:{str(ch.email).strip().lower()}",
+        evento,
+        lambda eventos: build_email_status_atualizado(foto, status_anterior, eventos),
+        to=[str(ch.email)], cc=_cc_ti(), origem="chamado_status", db=db,
+        janela=EMAIL_STATUS_JANELA_SECONDS,
+    )
+    print(f"[EMAIL] 🔄 Mudança de status do chamado {ch.codigo} na caixa de saída ({status_anterior} → {ch.status})")
 
 
 def send_chamado_abertura(ch, attachments: Optional[List[Dict[str, Any]]] = None) -> bool:
@@ -0,0 +1,431 @@
+"""
+Caixa de saída de e-mails (email_outbox) com pool fixo de workers
+
+send_async() abria uma thread por e-mail: mensagens se perdiam em restart e
+uma rajada de mudanças de status criava centenas de threads, cada uma
+conferindo token e abrindo sua própria conexão HTTPS. Agora:
+
+1. enfileirar() só grava uma linha em email_outbox — na transação da
+   requisição quando recebe a sessão (o e-mail existe se e somente se a
+   alteração foi confirmada), ou em transação própria. Anexos de chamado
+   são gravados como referências e lidos só no envio (core/email_anexos.py)
+2. EMAIL_OUTBOX_WORKERS threads reivindicam lotes de EMAIL_OUTBOX_LOTE
+   linhas com SELECT ... FOR UPDATE SKIP LOCKED (vários processos
+   dividem a fila sem bloqueio nem envio duplicado), marcam 'enviando' e
+   entregam o lote numa chamada $batch (core/msgraph_client.py)
+3. Falha retentável volta para 'pendente' com backoff exponencial
+   (EMAIL_OUTBOX_BACKOFF_BASE * 2^(tentativas-1), até EMAIL_OUTBOX_BACKOFF_MAX,
+   com jitter); depois de EMAIL_OUTBOX_MAX_TENTATIVAS, ou em erro
+   permanente (4xx), fica 'falha' com o último erro registrado
+4. Linhas 'enviando' de um processo que morreu voltam para a fila após
+   EMAIL_OUTBOX_STALE_SECONDS; enviadas são removidas após
+   EMAIL_OUTBOX_RETENCAO_DIAS
+
+agrupar() junta eventos com a mesma chave (ex.: mudanças de status de um
+chamado para um destinatário) numa única linha pendente durante uma janela:
+o primeiro evento agenda o envio para agora + janela e os seguintes só
+acrescentam ao histórico (coluna eventos) e re-renderizam assunto/corpo.
+A linha "aberta" é localizada pela chave UNIQUE chave_aberta (limpa quando
+o worker a reivindica) com INSERT ... ON DUPLICATE KEY UPDATE, sem leituras
+com gap lock, e o agrupamento roda depois do commit da requisição, em
+conexão própria: um conflito entre agrupamentos nunca desfaz a alteração.
+
+Os workers acordam na hora quando o enfileiramento acontece no mesmo
+processo e, de qualquer forma, a cada EMAIL_OUTBOX_POLL_SECONDS.
+"""
+
+from __future__ import annotations
+import json
+import os
+import random
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Optional
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from core.db import engine
+from core.utils import now_brazil_naive
+
+
+OUTBOX_TABLE = "email_outbox"
+EMAIL_OUTBOX_WORKERS = int(os.getenv("EMAIL_OUTBOX_WORKERS", "2"))
+EMAIL_OUTBOX_LOTE = int(os.getenv("EMAIL_OUTBOX_LOTE", "20"))  # = limite do Graph $batch
+EMAIL_OUTBOX_MAX_TENTATIVAS = int(os.getenv("EMAIL_OUTBOX_MAX_TENTATIVAS", "8"))
+EMAIL_OUTBOX_BACKOFF_BASE = int(os.getenv("EMAIL_OUTBOX_BACKOFF_BASE", "30"))
+EMAIL_OUTBOX_BACKOFF_MAX = int(os.getenv("EMAIL_OUTBOX_BACKOFF_MAX", "3600"))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "5"))
+EMAIL_OUTBOX_STALE_SECONDS = int(os.getenv("EMAIL_OUTBOX_STALE_SECONDS", "600"))
+EMAIL_OUTBOX_RETENCAO_DIAS = int(os.getenv("EMAIL_OUTBOX_RETENCAO_DIAS", "30"))
+
+STATUS_PENDENTE = "pendente"
+STATUS_ENVIANDO = "enviando"
+STATUS_ENVIADO = "enviado"
+STATUS_FALHA = "falha"
+
+_OUTBOX_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {OUTBOX_TABLE} (
+        id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        origem VARCHAR(50) NULL,
+        assunto VARCHAR(500) NOT NULL,
+        corpo_html MEDIUMTEXT NOT NULL,
+        destinatarios TEXT NOT NULL,
+        cc TEXT NULL,
+        anexos LONGTEXT NULL,
+        status VARCHAR(20) NOT NULL,
+        tentativas INT NOT NULL DEFAULT 0,
+        proxima_tentativa_em DATETIME NOT NULL,
+        ultimo_erro TEXT NULL,
+        criado_em DATETIME NOT NULL,
+        travado_em DATETIME NULL,
+        enviado_em DATETIME NULL,
+        chave_agrupamento VARCHAR(150) NULL,
+        chave_aberta VARCHAR(150) NULL,
+        eventos LONGTEXT NULL,
+        UNIQUE KEY uq_email_outbox_chave_aberta (chave_aberta),
+        KEY idx_email_outbox_fila (status, proxima_tentativa_em),
+        KEY idx_email_outbox_enviado (status, enviado_em),
+        KEY idx_email_outbox_agrupamento (chave_agrupamento, status)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+_INSERT = text(
+    f"INSERT INTO {OUTBOX_TABLE} (origem, assunto, corpo_html, destinatarios, cc, anexos, status, "
+    "proxima_tentativa_em, criado_em) VALUES (:origem, :assunto, :corpo, :to, :cc, :anexos, "
+    f"'{STATUS_PENDENTE}', :agora, :agora)"
+)
+
+# Cria a linha aberta da chave ou, se já existe, só a localiza (LAST_INSERT_ID = id dela)
+_UPSERT_AGRUPADO = text(
+    f"INSERT INTO {OUTBOX_TABLE} (origem, assunto, corpo_html, destinatarios, cc, status, "
+    "proxima_tentativa_em, criado_em, chave_agrupamento, chave_aberta, eventos) VALUES (:origem, '', '', "
+    f":to, :cc, '{STATUS_PENDENTE}', :envio, :agora, :chave, :chave, '[]') "
+    "ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)"
+)
+
+_lock = threading.Lock()
+_acordar = threading.Event()
+_workers: list[threading.Thread] = []
+_stats = {"enviados": 0, "retentativas": 0, "falhas": 0}
+_ultima_manutencao = 0.0
+
+
+def ensure_outbox_table() -> None:
+    """Cria a tabela email_outbox (migração 0017)"""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(_OUTBOX_DDL)
+
+
+def ensure_agrupamento_columns() -> None:
+    """Colunas chave_agrupamento/eventos em tabelas criadas antes (migração 0018)"""
+    from sqlalchemy import inspect
+    insp = inspect(engine)
+    if not insp.has_table(OUTBOX_TABLE):
+        return ensure_outbox_table()
+    existentes = {c["name"] for c in insp.get_columns(OUTBOX_TABLE)}
+    with engine.begin() as conn:
+        if "chave_agrupamento" not in existentes:
+            conn.exec_driver_sql(f"ALTER TABLE {OUTBOX_TABLE} ADD COLUMN chave_agrupamento VARCHAR(150) NULL")
+            conn.exec_driver_sql(
+                f"ALTER TABLE {OUTBOX_TABLE} ADD KEY idx_email_outbox_agrupamento (chave_agrupamento, status)"
+            )
+        if "eventos" not in existentes:
+            conn.exec_driver_sql(f"ALTER TABLE {OUTBOX_TABLE} ADD COLUMN eventos LONGTEXT NULL")
+
+
+def ensure_chave_aberta_column() -> None:
+    """Chave UNIQUE da linha de agrupamento ainda aberta (migração 0019)"""
+    from sqlalchemy import inspect
+    insp = inspect(engine)
+    if not insp.has_table(OUTBOX_TABLE):
+        return ensure_outbox_table()
+    if "chave_aberta" in {c["name"] for c in insp.get_columns(OUTBOX_TABLE)}:
+        return
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"ALTER TABLE {OUTBOX_TABLE} ADD COLUMN chave_aberta VARCHAR(150) NULL")
+        conn.exec_driver_sql(
+            f"ALTER TABLE {OUTBOX_TABLE} ADD UNIQUE KEY uq_email_outbox_chave_aberta (chave_aberta)"
+        )
+        # Linhas de agrupamento ainda não reivindicadas continuam recebendo eventos
+        abertas = [r[0] for r in conn.execute(text(
+            f"SELECT MAX(id) FROM {OUTBOX_TABLE} WHERE chave_agrupamento IS NOT NULL "
+            f"AND status = '{STATUS_PENDENTE}' AND tentativas = 0 GROUP BY chave_agrupamento"
+        ))]
+        if abertas:
+            conn.execute(
+                text(f"UPDATE {OUTBOX_TABLE} SET chave_aberta = chave_agrupamento WHERE id IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": abertas},
+            )
+
+
+def notificar() -> None:
+    """Acorda os workers deste processo"""
+    _acordar.set()
+
+
+def enfileirar(
+    assunto: str,
+    corpo_html: str,
+    to: list[str],
+    cc: Optional[list[str]] = None,
+    anexos: Optional[list[dict[str, Any]]] = None,
+    origem: Optional[str] = None,
+    db: Optional[Session] = None,
+) -> None:
+    """Grava o e-mail na caixa de saída.
+
+    Com `db`, o INSERT entra na transação da sessão e os workers são
+    acordados no commit; sem `db`, grava em transação própria.
+    """
+    to = [a.strip() for a in to if a and a.strip()]
+    if not to:
+        return
+    valores = {
+        "origem": origem,
+        "assunto": assunto[:500],
+        "corpo": corpo_html,
+        "to": json.dumps(to),
+        "cc": json.dumps([a for a in (cc or []) if a]),
+        "anexos": json.dumps(anexos) if anexos else None,
+        "agora": now_brazil_naive(),
+    }
+    if db is not None:
+        from core.post_commit import after_commit
+        # Savepoint: falha ao enfileirar não derruba a alteração da requisição
+        try:
+            with db.begin_nested():
+                db.execute(_INSERT, valores)
+        except Exception as e:
+            print(f"[EMAIL-OUTBOX] ❌ Falha ao enfileirar '{assunto[:50]}': {type(e).__name__}: {e}")
+            return
+        after_commit(db, notificar)
+    else:
+        with engine.begin() as conn:
+            conn.execute(_INSERT, valores)
+        notificar()
+
+
+def agrupar(
+    chave: str,
+    evento: dict[str, Any],
+    renderizar: Callable[[list[dict[str, Any]]], tuple[str, str]],
+    to: list[str],
+    cc: Optional[list[str]] = None,
+    origem: Optional[str] = None,
+    db: Optional[Session] = None,
+    janela: int = 0,
+) -> None:
+    """Acrescenta `evento` ao e-mail aberto com a mesma `chave` ou cria um.
+
+    `renderizar(eventos)` devolve (assunto, corpo_html) para a lista completa
+    de eventos, em ordem; roda fora da requisição, então não deve tocar na
+    sessão. O envio fica agendado para `janela` segundos após o primeiro
+    evento; eventos posteriores não adiam o envio. O que chega depois que o
+    worker reivindicou a linha vai para um novo resumo.
+    Com `db`, o agrupamento acontece só após o commit (efeito pós-commit, em
+    conexão própria). Com janela <= 0 cada evento vira um e-mail (enfileirar).
+    """
+    if janela <= 0:
+        assunto, corpo = renderizar([evento])
+        return enfileirar(assunto, corpo, to, cc=cc, origem=origem, db=db)
+    to = [a.strip() for a in to if a and a.strip()]
+    if not to:
+        return
+    args = (chave[:150], evento, renderizar, to, [a for a in (cc or []) if a], origem, janela)
+    if db is not None:
+        from core.post_commit import after_commit
+        after_commit(db, _agrupar, *args)
+        return
+    _agrupar(*args)
+
+
+def _deadlock(e: Exception) -> bool:
+    orig = getattr(e, "orig", None)
+    return bool(orig and getattr(orig, "args", None) and orig.args[0] in (1205, 1213))
+
+
+def _agrupar(chave, evento, renderizar, to, cc, origem, janela, tentativas: int = 3) -> None:
+    for tentativa in range(tentativas):
+        try:
+            with engine.begin() as conn:
+                _gravar_agrupado(conn, chave, evento, renderizar, to, cc, origem, janela)
+            return
+        except OperationalError as e:
+            if not _deadlock(e) or tentativa == tentativas - 1:
+                raise
+            time.sleep(random.uniform(0.05, 0.2))
+
+
+def _gravar_agrupado(conn, chave, evento, renderizar, to, cc, origem, janela) -> None:
+    agora = now_brazil_naive()
+    conn.execute(_UPSERT_AGRUPADO, {
+        "origem": origem,
+        "to": json.dumps(to),
+        "cc": json.dumps(cc),
+        "envio": agora + timedelta(seconds=janela),
+        "agora": agora,
+        "chave": chave,
+    })
+    msg_id = conn.execute(text("SELECT LAST_INSERT_ID()")).scalar()
+    # Linha já travada pelo upsert: leitura por chave primária, sem gap lock
+    atual = conn.execute(
+        text(f"SELECT eventos FROM {OUTBOX_TABLE} WHERE id = :id FOR UPDATE"), {"id": msg_id}
+    ).scalar()
+    eventos = json.loads(atual or "[]") + [evento]
+    assunto, corpo = renderizar(eventos)
+    conn.execute(
+        text(
+            f"UPDATE {OUTBOX_TABLE} SET assunto = :assunto, corpo_html = :corpo, eventos = :eventos, "
+            "destinatarios = :to, cc = :cc WHERE id = :id"
+        ),
+        {"assunto": assunto[:500], "corpo": corpo, "eventos": json.dumps(eventos, ensure_ascii=False),
+         "to": json.dumps(to), "cc": json.dumps(cc), "id": msg_id},
+    )
+
+
+def _backoff(tentativas: int) -> float:
+    atraso = min(EMAIL_OUTBOX_BACKOFF_MAX, EMAIL_OUTBOX_BACKOFF_BASE * 2 ** max(tentativas - 1, 0))
+    return atraso * random.uniform(0.8, 1.2)
+
+
+def _reivindicar() -> list:
+    """Trava um lote de pendentes vencidos (SKIP LOCKED) e marca como 'enviando'"""
+    agora = now_brazil_naive()
+    with engine.begin() as conn:
+        ids = [
+            r[0] for r in conn.execute(
+                text(
+                    f"SELECT id FROM {OUTBOX_TABLE} WHERE status = '{STATUS_PENDENTE}' "
+                    "AND proxima_tentativa_em <= :agora ORDER BY id LIMIT :n FOR UPDATE SKIP LOCKED"
+                ),
+                {"agora": agora, "n": EMAIL_OUTBOX_LOTE},
+            )
+        ]
+        if not ids:
+            return []
+        marcadores = ", ".join(str(int(i)) for i in ids)
+        conn.execute(
+            text(
+                f"UPDATE {OUTBOX_TABLE} SET status = '{STATUS_ENVIANDO}', travado_em = :agora, "
+                f"tentativas = tentativas + 1, chave_aberta = NULL WHERE id IN ({marcadores})"
+            ),
+            {"agora": agora},
+        )
+        return conn.execute(
+            text(
+                f"SELECT id, assunto, corpo_html, destinatarios, cc, anexos, tentativas "
+                f"FROM {OUTBOX_TABLE} WHERE id IN ({marcadores}) ORDER BY id"
+            )
+        ).fetchall()
+
+
+def _registrar(msg_id: int, tentativas: int, ok: bool, erro: Optional[str], retentavel: bool) -> None:
+    agora = now_brazil_naive()
+    if ok:
+        sql = f"UPDATE {OUTBOX_TABLE} SET status = '{STATUS_ENVIADO}', enviado_em = :agora, ultimo_erro = NULL WHERE id = :id"
+        params = {"agora": agora, "id": msg_id}
+        chave = "enviados"
+    elif retentavel and tentativas < EMAIL_OUTBOX_MAX_TENTATIVAS:
+        sql = (
+            f"UPDATE {OUTBOX_TABLE} SET status = '{STATUS_PENDENTE}', travado_em = NULL, "
+            "proxima_tentativa_em = :proxima, ultimo_erro = :erro WHERE id = :id"
+        )
+        params = {"proxima": agora + timedelta(seconds=_backoff(tentativas)), "erro": erro, "id": msg_id}
+        chave = "retentativas"
+    else:
+        sql = f"UPDATE {OUTBOX_TABLE} SET status = '{STATUS_FALHA}', travado_em = NULL, ultimo_erro = :erro WHERE id = :id"
+        params = {"erro": erro, "id": msg_id}
+        chave = "falhas"
+    with engine.begin() as conn:
+        conn.execute(text(sql), params)
+    with _lock:
+        _stats[chave] += 1
+
+
+def _entregar(lote: list) -> None:
+    """Envia o lote reivindicado (Graph $batch) e registra o resultado de cada mensagem"""
+    from core.email_msgraph import deliver_mail_batch
+
+    mensagens = [
+        {"subject": assunto, "html_body": corpo, "to": json.loads(to), "cc": json.loads(cc or "[]"),
+         "attachments": json.loads(anexos) if anexos else None}
+        for _, assunto, corpo, to, cc, anexos, _ in lote
+    ]
+    try:
+        resultados = deliver_mail_batch(mensagens)
+    except Exception as e:
+        resultados = [(False, f"{type(e).__name__}: {e}", True)] * len(lote)
+    for row, (ok, erro, retentavel) in zip(lote, resultados):
+        msg_id, tentativas = row[0], row[6]
+        if not ok:
+            print(f"[EMAIL-OUTBOX] ⚠️ Mensagem {msg_id} falhou (tentativa {tentativas}): {erro}")
+        try:
+            _registrar(msg_id, tentativas, ok, erro, retentavel)
+        except Exception as e:
+            # Fica 'enviando' até a manutenção devolvê-la à fila (EMAIL_OUTBOX_STALE_SECONDS)
+            print(f"[EMAIL-OUTBOX] Erro ao registrar a mensagem {msg_id}: {type(e).__name__}: {e}")
+
+
+def _manutencao() -> None:
+    """Devolve à fila mensagens travadas por processos mortos e apaga enviadas antigas"""
+    global _ultima_manutencao
+    with _lock:
+        if time.monotonic() - _ultima_manutencao < 60:
+            return
+        _ultima_manutencao = time.monotonic()
+    agora = now_brazil_naive()
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"UPDATE {OUTBOX_TABLE} SET status = '{STATUS_PENDENTE}', travado_em = NULL "
+                f"WHERE status = '{STATUS_ENVIANDO}' AND travado_em < :limite"
+            ),
+            {"limite": agora - timedelta(seconds=EMAIL_OUTBOX_STALE_SECONDS)},
+        )
+        conn.execute(
+            text(f"DELETE FROM {OUTBOX_TABLE} WHERE status = '{STATUS_ENVIADO}' AND enviado_em < :corte"),
+            {"corte": agora - timedelta(days=EMAIL_OUTBOX_RETENCAO_DIAS)},
+        )
+
+
+def _worker() -> None:
+    # Nenhuma exceção encerra a thread: sem workers vivos o processo para de enviar
+    while True:
+        lote = []
+        try:
+            _manutencao()
+            lote = _reivindicar()
+        except Exception as e:
+            print(f"[EMAIL-OUTBOX] Erro ao ler a fila: {type(e).__name__}: {e}")
+        if lote:
+            try:
+                _entregar(lote)
+            except Exception as e:
+                print(f"[EMAIL-OUTBOX] Erro ao entregar lote de {len(lote)}: {type(e).__name__}: {e}")
+        if len(lote) < EMAIL_OUTBOX_LOTE:
+            # Fila vazia (ou quase): espera novo enfileiramento ou o próximo poll
+            _acordar.wait(EMAIL_OUTBOX_POLL_SECONDS)
+            _acordar.clear()
+
+
+def start_workers() -> None:
+    """Inicia o pool de workers deste processo (idempotente)"""
+    with _lock:
+        if _workers:
+            return
+        for i in range(max(1, EMAIL_OUTBOX_WORKERS)):
+            t = threading.Thread(target=_worker, daemon=True, name=f"EmailOutbox-{i}")
+            t.start()
+            _workers.append(t)
+    print(f"[EMAIL-OUTBOX] {len(_workers)} worker(s) iniciados")
+
+
+def get_stats() -> dict[str, Any]:
+    with engine.connect() as conn:
+        por_status = dict(conn.execute(
+            text(f"SELECT status, COUNT(*) FROM {OUTBOX_TABLE} GROUP BY status")
+        ).fetchall())
+    with _lock:
+        return {"workers": len(_workers), "fila": por_status, **_stats}
@@ -0,0 +1,274 @@
+"""
+Templates HTML dos e-mails, compilados uma vez
+
+_build_chamado_table e build_email_* montavam o HTML a cada envio com
+dezenas de append/f-string e três replace() por campo para escapar. Aqui:
+
+- Cada template é um format string analisado uma única vez no import
+  (Template): os trechos estáticos viram literais prontos e o render só
+  intercala os valores com "".join
+- Valores são escapados automaticamente; fragmentos já montados entram por
+  campos {nome!s}, sem escapar de novo
+- Partes que não dependem do chamado (cabeçalho, rodapé, logo, portal) são
+  resolvidas na compilação; a tabela do chamado fica num cache LRU pela
+  tupla de campos, reaproveitada sempre que o mesmo chamado, no mesmo
+  estado, aparece em mais de uma mensagem
+- renderizar_lote() renderiza uma lista de mensagens de uma vez
+
+Ver ti/scripts/benchmark_email_templates.py.
+"""
+
+from __future__ import annotations
+import os
+import string
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+
+EMAIL_TEMPLATE_CACHE = int(os.getenv("EMAIL_TEMPLATE_CACHE", "2048"))
+
+LOGO_URL = "https://images.totalpass.com/public/1280x720/czM6Ly90cC1pbWFnZS1hZG1pbi1wcm9kL2d5bXMva2g2OHF6OWNuajloN2lkdnhzcHhhdWx4emFhbWEzYnc3MGx5cDRzZ3p5aTlpZGM0OHRvYnk0YW56azRk"
+PORTAL_URL = os.getenv("PORTAL_URL", "https://academiaevoque.com.br")
+
+
+def escape(valor: Any) -> str:
+    if valor is None:
+        return ""
+    return str(valor).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class Template:
+    """Format string compilado uma vez: literais estáticos + campos, em ordem.
+
+    {campo} é escapado; {campo!s} entra como está (HTML já montado/seguro).
+    Campos passados em `fixos` são resolvidos na compilação.
+    """
+
+    def __init__(self, fonte: str, **fixos: Any):
+        literais: list[str] = []
+        campos: list[tuple[str, bool]] = []
+        pendente = ""
+        for literal, campo, spec, conv in string.Formatter().parse(fonte):
+            pendente += literal
+            if campo is None:
+                continue
+            if spec or conv not in (None, "s"):
+                raise ValueError(f"Template não suporta formatação em '{{{campo}}}'")
+            if campo in fixos:
+                pendente += str(fixos[campo]) if conv == "s" else escape(fixos[campo])
+                continue
+            literais.append(pendente)
+            campos.append((campo, conv != "s"))
+            pendente = ""
+        self._inicio = literais[0] if literais else pendente
+        # (campo, escapar, literal que vem depois do campo)
+        self._passos = tuple((c, e, lit) for (c, e), lit in zip(campos, literais[1:] + [pendente]))
+        self.campos = frozenset(c for c, _ in campos)
+
+    def render(self, **valores: Any) -> str:
+        partes = [self._inicio]
+        for campo, escapar, literal in self._passos:
+            partes.append(escape(valores[campo]) if escapar else valores[campo])
+            partes.append(literal)
+        return "".join(partes)
+
+
+def _formatar_data(dt, formato: str) -> str:
+    if not dt:
+        return ""
+    try:
+        return dt.strftime(formato)
+    except Exception:
+        return str(dt)
+
+
+# Templates -----------------------------------------------------------------
+
+_LINHA_DETALHE = (
+    '<tr>'
+    '<td width="35%" style="background:#f8fafc;border:1px solid #eef2f7;border-radius:6px;font-weight:700;color:#000000;vertical-align:top">{rotulo}</td>'
+    '<td style="background:#ffffff;border:1px solid #eef2f7;border-radius:6px;color:#222222;vertical-align:top">{valor}</td>'
+    '</tr>'
+)
+
+# (rótulo, campo) na ordem em que aparecem na tabela
+_DETALHES = (
+    ("Código", "codigo"),
+    ("Protocolo", "protocolo"),
+    ("Status", "status"),
+    ("Prioridade", "prioridade"),
+    ("Solicitante", "solicitante"),
+    ("Cargo", "cargo"),
+    ("Telefone", "telefone"),
+    ("E-mail", "email"),
+    ("Unidade", "unidade"),
+    ("Problema", "problema"),
+    ("Item de Internet", "internet"),
+    ("Data de Visita", "visita"),
+    ("Aberto em", "abertura"),
+)
+
+_TABELA_CHAMADO = Template(
+    '<span style="display:none!important;visibility:hidden;mso-hide:all;font-size:1px;line-height:1px;max-height:0;max-width:0;opacity:0;overflow:hidden">{preheader}</span>'
+    '<table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="background-color:#f3f6fb;padding:24px 0">'
+    '<tr><td align="center">'
+    '<table role="presentation" width="680" cellpadding="0" cellspacing="0" style="background:#ffffff;border-collapse:collapse">'
+    '<tr><td style="background:linear-gradient(90deg,#ff7a00,#ff4500);padding:18px 24px;color:#fff;font-family:Arial,Helvetica,sans-serif">'
+    '<table role="presentation" width="100%"><tr><td valign="middle" style="width:56px">'
+    '<img src="{logo_url}" width="48" height="48" alt="Evoque" style="display:block;border:0;outline:none;text-decoration:none;border-radius:6px"/>'
+    '</td><td valign="middle" style="padding-left:12px">'
+    '<div style="font-size:16px;font-weight:700">Evoque Fitness</div>'
+    '<div style="font-size:13px;opacity:0.95">Chamado {codigo}</div>'
+    '</td></tr></table>'
+    '</td></tr>'
+    '<tr><td style="padding:20px 24px;font-family:Arial,Helvetica,sans-serif;color:#000000;font-size:14px;line-height:20px">'
+    '<p style="margin:0 0 12px">Olá <strong>{solicitante}</strong>,</p>'
+    '<p style="margin:0 0 14px;color:#222222">Recebemos seu chamado. Abaixo estão os detalhes registrados:</p>'
+    '<table role="presentation" width="100%" cellpadding="8" cellspacing="0" style="border-collapse:separate;border-spacing:8px 8px">'
+    + "".join(
+        _LINHA_DETALHE.replace("{rotulo}", rotulo).replace("{valor}", f"{{det_{campo}!s}}") for rotulo, campo in _DETALHES
+    )
+    + '</table>'
+    '{descricao!s}'
+    '{extra!s}'
+    '<div style="margin-top:18px;display:block">'
+    '<a href="{portal_url}" style="display:inline-block;padding:12px 18px;background:#000000;color:#ffffff;border-radius:6px;text-decoration:none;font-weight:700">Ver chamado</a>'
+    '<div style="display:inline-block;margin-left:10px;color:#555555;font-size:13px;vertical-align:middle">Se precisar, responda pelo portal ou contate ti@academiaevoque.com.br</div>'
+    '</div>'
+    '</td></tr>'
+    '<tr><td style="padding:14px 24px;background:#fbfdff;border-top:1px solid #eef3fb;font-family:Arial,Helvetica,sans-serif;font-size:12px;color:#94a3b8">'
+    'Este é um e‑mail automático enviado pelo sistema de chamados da Evoque Fitness.'
+    '</td></tr>'
+    '</table>'
+    '</td></tr>'
+    '</table>',
+    logo_url=LOGO_URL,
+    portal_url=PORTAL_URL,
+)
+
+_DESCRICAO = Template(
+    '<div style="margin-top:12px">'
+    '<div style="font-weight:700;color:#000000;margin-bottom:6px">Descrição</div>'
+    '<div style="color:#222222;padding:12px;background:#f1f5f9;border:1px solid #e2e8f0;border-radius:6px">{descricao!s}</div>'
+    '</div>'
+)
+
+_STATUS = Template(
+    '<table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="background-color:#f3f6fb;padding:24px 0">'
+    '<tr><td align="center">'
+    '<table role="presentation" width="680" cellpadding="0" cellspacing="0" style="background:#ffffff;border-collapse:collapse">'
+    '<tr><td style="background:linear-gradient(90deg,#ff7a00,#ff4500);padding:16px;color:#fff;border-radius:8px 8px 0 0;font-weight:700;font-family:Arial,Helvetica,sans-serif">'
+    'Atualização de status — Chamado {codigo}'
+    '</td></tr>'
+    '<tr><td style="background:#fff;padding:18px;border:1px solid #e6e9ef;border-top:none;color:#102a43;font-family:Arial,Helvetica,sans-serif">'
+    '<p style="margin:0 0 10px">Olá <strong>{solicitante}</strong>,</p>'
+    '<p style="margin:0 0 12px;color:#222222">O status do seu chamado foi atualizado de <strong>{anterior}</strong> para <strong>{atual}</strong>.</p>'
+    '{transicoes!s}'
+    '{tabela!s}'
+    '<div style="margin-top:14px;color:#555555;font-size:13px">Se desejar mais detalhes, acesse o portal.</div>'
+    '</td></tr>'
+    '</table>'
+    '</td></tr>'
+    '</table>'
+)
+
+_TRANSICOES = Template(
+    '<p style="margin:0 0 6px;color:#222222">Mudanças recentes ({quantidade}):</p>'
+    '<table role="presentation" width="100%" cellpadding="6" cellspacing="0" style="border-collapse:collapse;margin:0 0 14px;font-size:13px">'
+    '{linhas!s}'
+    '</table>'
+)
+
+_TRANSICAO = Template(
+    '<tr>'
+    '<td width="90" style="color:#555555;border-bottom:1px solid #eef2f7">{quando}</td>'
+    '<td style="color:#222222;border-bottom:1px solid #eef2f7">{de} → <strong>{para}</strong></td>'
+    '</tr>'
+)
+
+
+# Renderização --------------------------------------------------------------
+
+def _campos_chamado(ch) -> tuple:
+    """Valores que entram na tabela do chamado (chave do cache)"""
+    return (
+        ch.codigo, ch.protocolo, ch.status, ch.prioridade, ch.solicitante, ch.cargo,
+        ch.telefone, ch.email, ch.unidade, ch.problema,
+        getattr(ch, "internet_item", None) or "-",
+        _formatar_data(getattr(ch, "data_visita", None), "%d/%m/%Y") or "-",
+        _formatar_data(getattr(ch, "data_abertura", None), "%d/%m/%Y %H:%M"),
+        getattr(ch, "descricao", None) or "",
+    )
+
+
+@lru_cache(maxsize=EMAIL_TEMPLATE_CACHE)
+def _tabela_chamado(campos: tuple, extra: str = "") -> str:
+    *detalhes, descricao = campos
+    codigo, protocolo, solicitante = campos[0], campos[1], campos[4]
+    # Campo vazio vira "-" depois de escapado, como no HTML original
+    valores = {f"det_{campo}": escape(v) or "-" for (_, campo), v in zip(_DETALHES, detalhes)}
+    return _TABELA_CHAMADO.render(
+        preheader=f"Seu chamado {codigo} foi registrado — protocolo {protocolo}.",
+        codigo=codigo,
+        solicitante=solicitante,
+        descricao=_DESCRICAO.render(descricao=escape(descricao).replace("\n", "<br>")) if descricao else "",
+        extra=extra,
+        **valores,
+    )
+
+
+def tabela_chamado(ch, extra: str = "") -> str:
+    """Tabela do chamado; `extra` é HTML pronto inserido após a descrição"""
+    return _tabela_chamado(_campos_chamado(ch), extra)
+
+
+def _transicoes(transicoes: list[dict[str, Any]]) -> str:
+    linhas = []
+    for t in transicoes:
+        quando = t.get("em") or ""
+        try:
+            quando = datetime.fromisoformat(quando).strftime("%d/%m %H:%M")
+        except (TypeError, ValueError):
+            pass
+        linhas.append(_TRANSICAO.render(quando=quando, de=t.get("de"), para=t.get("para")))
+    return _TRANSICOES.render(quantidade=len(transicoes), linhas="".join(linhas))
+
+
+def chamado_aberto(ch, extra: str = "") -> tuple[str, str]:
+    subject = f"[Evoque TI] Chamado {ch.codigo} aberto (Protocolo {ch.protocolo})"
+    return subject, tabela_chamado(ch, extra)
+
+
+def status_atualizado(ch, status_anterior: str, transicoes: Optional[list[dict[str, Any]]] = None) -> tuple[str, str]:
+    if transicoes:
+        status_anterior = transicoes[0].get("de") or status_anterior
+    subject = f"[Evoque TI] Status do chamado {ch.codigo}: {status_anterior} → {ch.status}"
+    html = _STATUS.render(
+        codigo=ch.codigo,
+        solicitante=ch.solicitante,
+        anterior=status_anterior,
+        atual=ch.status,
+        transicoes=_transicoes(transicoes) if transicoes and len(transicoes) > 1 else "",
+        tabela=tabela_chamado(ch),
+    )
+    return subject, html
+
+
+_RENDERIZADORES = {
+    "chamado_aberto": chamado_aberto,
+    "status_atualizado": status_atualizado,
+}
+
+
+def renderizar_lote(itens: Iterable[tuple[str, tuple]]) -> list[tuple[str, str]]:
+    """Renderiza [(tipo, args)] -> [(assunto, html)] na mesma ordem.
+
+    Tipos: "chamado_aberto" (ch[, extra]) e "status_atualizado" (ch, anterior[, transicoes]).
+    """
+    return [_RENDERIZADORES[tipo](*args) for tipo, args in itens]
+
+
+def get_stats() -> dict[str, Any]:
+    info = _tabela_chamado.cache_info()
+    return {"tabela_hits": info.hits, "tabela_misses": info.misses, "tabela_tamanho": info.currsize}
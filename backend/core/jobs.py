@@ -0,0 +1,368 @@
+"""
+Jobs em background para operações pesadas de manutenção
+
+Endpoints de manutenção (sincronizar/recalcular SLA de todos os chamados,
+P90, limpeza de caches) faziam trabalho de tabela inteira dentro da
+requisição, segurando uma thread e uma conexão por minutos e estourando o
+timeout do proxy. Agora:
+
+1. submit(tipo) grava o job na tabela `jobs` e retorna o ID imediatamente
+2. Um executor limitado (JOBS_MAX_WORKERS threads, JOBS_MAX_PENDENTES na
+   fila) executa a função registrada com uma sessão própria
+3. A função reporta progresso e verifica cancelamento via JobContext
+4. Submissões concorrentes do mesmo tipo (em qualquer worker) são
+   deduplicadas pela coluna UNIQUE chave_ativa, preenchida só enquanto o
+   job está na fila/executando
+5. Resultado/erro ficam na tabela por JOBS_RETENCAO_DIAS
+
+Jobs de um processo que morreu param de renovar o heartbeat
+(atualizado_em); depois de JOBS_STALE_SECONDS são marcados como falha e a
+chave é liberada.
+"""
+
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Optional
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from core.db import SessionLocal, engine
+from core.utils import now_brazil_naive
+
+
+JOBS_TABLE = "jobs"
+JOBS_MAX_WORKERS = int(os.getenv("JOBS_MAX_WORKERS", "2"))
+JOBS_MAX_PENDENTES = int(os.getenv("JOBS_MAX_PENDENTES", "20"))
+JOBS_RETENCAO_DIAS = int(os.getenv("JOBS_RETENCAO_DIAS", "7"))
+JOBS_STALE_SECONDS = int(os.getenv("JOBS_STALE_SECONDS", "600"))
+HEARTBEAT_SECONDS = 30
+CANCEL_CHECK_SECONDS = 2.0
+
+STATUS_FILA = "queued"
+STATUS_EXECUTANDO = "running"
+STATUS_SUCESSO = "succeeded"
+STATUS_FALHA = "failed"
+STATUS_CANCELADO = "cancelled"
+STATUS_FINAIS = (STATUS_SUCESSO, STATUS_FALHA, STATUS_CANCELADO)
+
+_JOBS_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {JOBS_TABLE} (
+        id CHAR(32) NOT NULL PRIMARY KEY,
+        tipo VARCHAR(100) NOT NULL,
+        chave_ativa VARCHAR(150) NULL,
+        status VARCHAR(20) NOT NULL,
+        progresso INT NOT NULL DEFAULT 0,
+        mensagem VARCHAR(255) NULL,
+        parametros TEXT NULL,
+        resultado LONGTEXT NULL,
+        erro TEXT NULL,
+        cancelar TINYINT(1) NOT NULL DEFAULT 0,
+        criado_em DATETIME NOT NULL,
+        iniciado_em DATETIME NULL,
+        finalizado_em DATETIME NULL,
+        atualizado_em DATETIME NOT NULL,
+        UNIQUE KEY uq_jobs_chave_ativa (chave_ativa),
+        KEY idx_jobs_tipo_criado (tipo, criado_em),
+        KEY idx_jobs_status (status)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+class JobCancelado(Exception):
+    """Levantada por JobContext.checkpoint() quando o cancelamento foi pedido"""
+
+
+class FilaCheia(Exception):
+    """Executor com JOBS_MAX_PENDENTES jobs aguardando"""
+
+
+JobFn = Callable[..., Any]
+
+_registry: dict[str, tuple[JobFn, str]] = {}
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_pendentes = 0
+_locais: set[str] = set()
+_heartbeat: Optional[threading.Thread] = None
+_ultima_limpeza = 0.0
+
+
+def register(tipo: str, descricao: str = ""):
+    """Decorator: registra uma função fn(db, ctx, **params) como tipo de job"""
+    def _decorator(fn: JobFn) -> JobFn:
+        _registry[tipo] = (fn, descricao)
+        return fn
+    return _decorator
+
+
+def ensure_jobs_table() -> None:
+    """Cria a tabela jobs (migração 0013)"""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(_JOBS_DDL)
+
+
+def _exec(sql: str, params: dict) -> Any:
+    with engine.begin() as conn:
+        return conn.execute(text(sql), params)
+
+
+class JobContext:
+    """Canal entre a função do job e a tabela jobs"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self._ultimo_check = 0.0
+        self._cancelado = False
+
+    def progresso(self, percentual: float, mensagem: Optional[str] = None) -> None:
+        _exec(
+            f"UPDATE {JOBS_TABLE} SET progresso = :p, mensagem = COALESCE(:m, mensagem), "
+            "atualizado_em = :agora WHERE id = :id",
+            {"p": max(0, min(100, int(percentual))), "m": mensagem[:255] if mensagem else None,
+             "agora": now_brazil_naive(), "id": self.job_id},
+        )
+
+    def cancelado(self) -> bool:
+        agora = time.monotonic()
+        if not self._cancelado and agora - self._ultimo_check >= CANCEL_CHECK_SECONDS:
+            self._ultimo_check = agora
+            with engine.connect() as conn:
+                self._cancelado = bool(conn.execute(
+                    text(f"SELECT cancelar FROM {JOBS_TABLE} WHERE id = :id"), {"id": self.job_id}
+                ).scalar())
+        return self._cancelado
+
+    def checkpoint(self, percentual: Optional[float] = None, mensagem: Optional[str] = None) -> None:
+        """Reporta progresso (opcional) e interrompe o job se o cancelamento foi pedido"""
+        if percentual is not None:
+            self.progresso(percentual, mensagem)
+        if self.cancelado():
+            raise JobCancelado()
+
+
+def _finalizar(job_id: str, status: str, resultado: Any = None, erro: Optional[str] = None) -> None:
+    agora = now_brazil_naive()
+    _exec(
+        f"UPDATE {JOBS_TABLE} SET status = :s, chave_ativa = NULL, resultado = :r, erro = :e, "
+        "progresso = CASE WHEN :s = 'succeeded' THEN 100 ELSE progresso END, "
+        "finalizado_em = :agora, atualizado_em = :agora WHERE id = :id",
+        {"s": status, "r": json.dumps(resultado, default=str, ensure_ascii=False) if resultado is not None else None,
+         "e": erro, "agora": agora, "id": job_id},
+    )
+
+
+def _run(job_id: str, tipo: str, params: dict) -> None:
+    global _pendentes
+    fn, _ = _registry[tipo]
+    ctx = JobContext(job_id)
+    db = SessionLocal()
+    try:
+        res = _exec(
+            f"UPDATE {JOBS_TABLE} SET status = 'running', iniciado_em = :agora, atualizado_em = :agora "
+            "WHERE id = :id AND status = 'queued' AND cancelar = 0",
+            {"agora": now_brazil_naive(), "id": job_id},
+        )
+        if not res.rowcount:
+            _finalizar(job_id, STATUS_CANCELADO)
+            return
+        print(f"[JOBS] {tipo} ({job_id}) iniciado")
+        resultado = fn(db, ctx, **params)
+        db.commit()
+        _finalizar(job_id, STATUS_SUCESSO, resultado)
+        print(f"[JOBS] {tipo} ({job_id}) concluído")
+    except JobCancelado:
+        db.rollback()
+        _finalizar(job_id, STATUS_CANCELADO)
+        print(f"[JOBS] {tipo} ({job_id}) cancelado")
+    except Exception as e:
+        db.rollback()
+        print(f"[JOBS] {tipo} ({job_id}) falhou: {type(e).__name__}: {e}")
+        try:
+            _finalizar(job_id, STATUS_FALHA, erro=f"{type(e).__name__}: {e}")
+        except Exception as fe:
+            print(f"[JOBS] Erro ao registrar falha de {job_id}: {fe}")
+    finally:
+        db.close()
+        with _lock:
+            _pendentes -= 1
+            _locais.discard(job_id)
+
+
+def _heartbeat_loop() -> None:
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        with _lock:
+            ids = list(_locais)
+        if not ids:
+            continue
+        try:
+            with engine.begin() as conn:
+                for job_id in ids:
+                    conn.execute(
+                        text(f"UPDATE {JOBS_TABLE} SET atualizado_em = :agora WHERE id = :id"),
+                        {"agora": now_brazil_naive(), "id": job_id},
+                    )
+        except Exception as e:
+            print(f"[JOBS] Erro no heartbeat: {e}")
+
+
+def _ensure_executor() -> ThreadPoolExecutor:
+    global _executor, _heartbeat
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, JOBS_MAX_WORKERS), thread_name_prefix="Job")
+            _heartbeat = threading.Thread(target=_heartbeat_loop, daemon=True, name="JobHeartbeat")
+            _heartbeat.start()
+        return _executor
+
+
+def _liberar_orfaos(chave: str) -> None:
+    """Marca como falha o job ativo da chave se o heartbeat parou (processo morto)"""
+    limite = now_brazil_naive().timestamp() - JOBS_STALE_SECONDS
+    with engine.begin() as conn:
+        row = conn.execute(
+            text(f"SELECT id, atualizado_em FROM {JOBS_TABLE} WHERE chave_ativa = :c"), {"c": chave}
+        ).first()
+        if row and row[1] and row[1].timestamp() < limite:
+            conn.execute(
+                text(
+                    f"UPDATE {JOBS_TABLE} SET status = 'failed', chave_ativa = NULL, "
+                    "erro = 'Processo do job encerrado (heartbeat expirado)', finalizado_em = :agora "
+                    "WHERE id = :id"
+                ),
+                {"agora": now_brazil_naive(), "id": row[0]},
+            )
+
+
+def _limpar_antigos() -> None:
+    global _ultima_limpeza
+    if time.monotonic() - _ultima_limpeza < 3600:
+        return
+    _ultima_limpeza = time.monotonic()
+    try:
+        _exec(
+            f"DELETE FROM {JOBS_TABLE} WHERE status IN ('succeeded', 'failed', 'cancelled') "
+            "AND finalizado_em < :corte",
+            {"corte": now_brazil_naive() - timedelta(days=JOBS_RETENCAO_DIAS)},
+        )
+    except Exception as e:
+        print(f"[JOBS] Erro ao limpar jobs antigos: {e}")
+
+
+def _inserir(insert: str, valores: dict, chave: str) -> Optional[tuple]:
+    """Grava o job; retorna (id, status) do job ativo com a mesma chave, se houver"""
+    for tentativa in range(2):
+        try:
+            _exec(insert, valores)
+            return None
+        except IntegrityError:
+            if tentativa == 0:
+                _liberar_orfaos(chave)
+                continue
+            with engine.connect() as conn:
+                row = conn.execute(
+                    text(f"SELECT id, status FROM {JOBS_TABLE} WHERE chave_ativa = :c"), {"c": chave}
+                ).first()
+            if row is None:
+                raise RuntimeError("Conflito ao registrar job; tente novamente")
+            return tuple(row)
+    return None
+
+
+def submit(tipo: str, params: Optional[dict] = None, chave: Optional[str] = None) -> dict[str, Any]:
+    """Enfileira um job; se já houver um ativo com a mesma chave, retorna o existente.
+
+    Retorna {"job_id", "status", "deduplicado"}.
+    """
+    global _pendentes
+    if tipo not in _registry:
+        raise KeyError(f"Tipo de job desconhecido: {tipo}")
+    params = params or {}
+    chave = chave or tipo
+    _limpar_antigos()
+
+    job_id = uuid.uuid4().hex
+    agora = now_brazil_naive()
+    insert = (
+        f"INSERT INTO {JOBS_TABLE} (id, tipo, chave_ativa, status, parametros, criado_em, atualizado_em) "
+        "VALUES (:id, :tipo, :chave, 'queued', :params, :agora, :agora)"
+    )
+    valores = {"id": job_id, "tipo": tipo, "chave": chave,
+               "params": json.dumps(params, default=str), "agora": agora}
+
+    with _lock:
+        if _pendentes >= JOBS_MAX_PENDENTES:
+            raise FilaCheia(f"{_pendentes} jobs aguardando; tente novamente mais tarde")
+        _pendentes += 1
+    try:
+        existente = _inserir(insert, valores, chave)
+    except Exception:
+        with _lock:
+            _pendentes -= 1
+        raise
+    if existente is not None:
+        with _lock:
+            _pendentes -= 1
+        return {"job_id": existente[0], "status": existente[1], "deduplicado": True}
+
+    with _lock:
+        _locais.add(job_id)
+    _ensure_executor().submit(_run, job_id, tipo, params)
+    return {"job_id": job_id, "status": STATUS_FILA, "deduplicado": False}
+
+
+def _row_to_dict(row) -> dict[str, Any]:
+    d = dict(row)
+    for campo in ("resultado", "parametros"):
+        if d.get(campo):
+            try:
+                d[campo] = json.loads(d[campo])
+            except (TypeError, ValueError):
+                pass
+    d.pop("chave_ativa", None)
+    d["cancelar"] = bool(d.get("cancelar"))
+    return d
+
+
+def get(job_id: str) -> Optional[dict[str, Any]]:
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(f"SELECT * FROM {JOBS_TABLE} WHERE id = :id"), {"id": job_id}
+        ).mappings().first()
+    return _row_to_dict(row) if row else None
+
+
+def listar(tipo: Optional[str] = None, limite: int = 50) -> list[dict[str, Any]]:
+    sql = f"SELECT * FROM {JOBS_TABLE}"
+    params: dict[str, Any] = {"limite": max(1, min(limite, 200))}
+    if tipo:
+        sql += " WHERE tipo = :tipo"
+        params["tipo"] = tipo
+    sql += " ORDER BY criado_em DESC LIMIT :limite"
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql), params).mappings().all()
+    return [_row_to_dict(r) for r in rows]
+
+
+def cancel(job_id: str) -> bool:
+    """Pede cancelamento (cooperativo: o job para no próximo checkpoint)"""
+    res = _exec(
+        f"UPDATE {JOBS_TABLE} SET cancelar = 1, atualizado_em = :agora "
+        "WHERE id = :id AND status IN ('queued', 'running')",
+        {"agora": now_brazil_naive(), "id": job_id},
+    )
+    return bool(res.rowcount)
+
+
+def tipos() -> dict[str, str]:
+    return {t: d for t, (_, d) in _registry.items()}
+
+
+def get_stats() -> dict[str, Any]:
+    with _lock:
+        return {"pendentes": _pendentes, "locais": len(_locais), "max_workers": JOBS_MAX_WORKERS}
@@ -0,0 +1,195 @@
+"""
+Ledger de migrações versionadas
+
+Cada migração tem um ID ordenável (ex: "0003_migrate_historico_status") e um
+checksum do código-fonte que a implementa. A tabela schema_migrations
+registra o que já foi aplicado, então o boot faz uma leitura do ledger em vez
+de dezenas de consultas de reflexão (information_schema).
+
+- Migração pendente: ID ausente do ledger -> aplica e registra
+- Migração repetível (repetivel=True): reaplica quando o checksum muda
+  (ex: nova entrada na lista de índices)
+- Migração normal com checksum diferente: apenas avisa (não reaplica)
+"""
+
+from __future__ import annotations
+import hashlib
+import importlib
+import inspect as pyinspect
+import time
+from typing import Any, Callable, Iterable
+from sqlalchemy import text
+from core.db import engine
+from core.utils import now_brazil_naive
+
+
+LEDGER_TABLE = "schema_migrations"
+
+_LEDGER_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+        id VARCHAR(120) NOT NULL PRIMARY KEY,
+        checksum CHAR(64) NOT NULL,
+        descricao VARCHAR(255) NULL,
+        aplicado_em DATETIME NOT NULL,
+        duracao_ms INT NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+def _resolver(fonte: Any) -> Any:
+    """"pacote.modulo" ou "pacote.modulo:atributo" -> objeto (importado só ao calcular o checksum)"""
+    if not isinstance(fonte, str):
+        return fonte
+    modulo, _, atributo = fonte.partition(":")
+    obj = importlib.import_module(modulo)
+    return getattr(obj, atributo) if atributo else obj
+
+
+def _hash(objs: Iterable[Any]) -> str:
+    h = hashlib.sha256()
+    for obj in objs:
+        try:
+            h.update(pyinspect.getsource(_resolver(obj)).encode("utf-8"))
+        except (OSError, TypeError):
+            h.update(repr(obj).encode("utf-8"))
+    return h.hexdigest()
+
+
+class Migration:
+    """Passo de migração registrado no ledger.
+
+    `fontes` lista o que o wrapper chama (módulos ou "modulo:funcao"): o
+    checksum cobre o wrapper e essas fontes, então alterar o script legado
+    chamado também é detectado.
+    """
+
+    def __init__(
+        self,
+        id: str,
+        fn: Callable[[], Any],
+        descricao: str = "",
+        repetivel: bool = False,
+        fontes: Iterable[Any] | None = None,
+        checksums_anteriores: Iterable[str] | None = None,
+    ):
+        self.id = id
+        self.fn = fn
+        self.descricao = descricao
+        self.repetivel = repetivel
+        self._fontes = list(fontes) if fontes else []
+        # Checksums de versões anteriores equivalentes (refatoração sem mudança de efeito)
+        self.checksums_anteriores = set(checksums_anteriores or ())
+        self._checksum: str | None = None
+
+    @property
+    def checksum(self) -> str:
+        """SHA-256 do código-fonte do wrapper e das fontes que ele chama"""
+        if self._checksum is None:
+            self._checksum = _hash([self.fn] + self._fontes)
+        return self._checksum
+
+    @property
+    def checksum_anterior(self) -> str:
+        """Checksum do formato antigo (só o wrapper; só as fontes nas repetíveis)"""
+        return _hash(self._fontes if self.repetivel and self._fontes else [self.fn])
+
+    def apply(self) -> None:
+        result = self.fn()
+        # Scripts legados sinalizam falha retornando False em vez de levantar
+        if result is False:
+            raise RuntimeError(f"Migração {self.id} retornou falha")
+
+
+def read_ledger() -> dict[str, str]:
+    """Retorna {id: checksum} das migrações aplicadas"""
+    with engine.connect() as conn:
+        try:
+            rows = conn.execute(text(f"SELECT id, checksum FROM {LEDGER_TABLE}")).fetchall()
+        except Exception:
+            # Primeira execução: cria o ledger
+            conn.rollback()
+            conn.exec_driver_sql(_LEDGER_DDL)
+            conn.commit()
+            return {}
+    return {str(r[0]): str(r[1]) for r in rows}
+
+
+def pending(migrations: list[Migration], ledger: dict[str, str]) -> list[Migration]:
+    out = []
+    for m in sorted(migrations, key=lambda m: m.id):
+        aplicado = ledger.get(m.id)
+        if aplicado is None:
+            out.append(m)
+        elif aplicado != m.checksum:
+            if m.repetivel:
+                out.append(m)
+            else:
+                print(f"⚠️  [MIGRATIONS] {m.id} alterada após aplicação (checksum diferente); não será reaplicada")
+    return out
+
+
+def _record(m: Migration, duracao_ms: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"INSERT INTO {LEDGER_TABLE} (id, checksum, descricao, aplicado_em, duracao_ms) "
+                "VALUES (:id, :checksum, :descricao, :aplicado_em, :duracao_ms) "
+                "ON DUPLICATE KEY UPDATE checksum = VALUES(checksum), "
+                "aplicado_em = VALUES(aplicado_em), duracao_ms = VALUES(duracao_ms)"
+            ),
+            {
+                "id": m.id,
+                "checksum": m.checksum,
+                "descricao": m.descricao[:255] if m.descricao else None,
+                "aplicado_em": now_brazil_naive(),
+                "duracao_ms": duracao_ms,
+            },
+        )
+
+
+def _atualizar_checksums(migrations: list[Migration], ledger: dict[str, str]) -> None:
+    """Regrava no formato atual os checksums gravados no formato antigo.
+
+    Evita que toda migração já aplicada apareça como alterada só porque o
+    checksum passou a incluir as fontes chamadas.
+    """
+    for m in migrations:
+        aplicado = ledger.get(m.id)
+        if aplicado is None or aplicado == m.checksum:
+            continue
+        if aplicado == m.checksum_anterior or aplicado in m.checksums_anteriores:
+            with engine.begin() as conn:
+                conn.execute(
+                    text(f"UPDATE {LEDGER_TABLE} SET checksum = :c WHERE id = :id"),
+                    {"c": m.checksum, "id": m.id},
+                )
+            ledger[m.id] = m.checksum
+
+
+def apply_pending(migrations: list[Migration]) -> dict[str, Any]:
+    """Aplica, em ordem, as migrações pendentes. Para na primeira falha."""
+    ledger = read_ledger()
+    _atualizar_checksums(migrations, ledger)
+    todo = pending(migrations, ledger)
+    stats: dict[str, Any] = {"aplicadas": [], "falha": None, "total_ledger": len(ledger)}
+    if not todo:
+        print(f"✅ [MIGRATIONS] Nenhuma migração pendente ({len(ledger)} aplicadas)")
+        return stats
+
+    for m in todo:
+        inicio = time.perf_counter()
+        print(f"➜ [MIGRATIONS] Aplicando {m.id}...")
+        try:
+            m.apply()
+        except Exception as e:
+            print(f"❌ [MIGRATIONS] {m.id} falhou: {e}")
+            stats["falha"] = {"id": m.id, "erro": str(e)}
+            break
+        duracao_ms = int((time.perf_counter() - inicio) * 1000)
+        _record(m, duracao_ms)
+        stats["aplicadas"].append(m.id)
+        print(f"✅ [MIGRATIONS] {m.id} aplicada ({duracao_ms} ms)")
+
+    if stats["falha"]:
+        raise RuntimeError(f"Migração {stats['falha']['id']} falhou: {stats['falha']['erro']}")
+    return stats
@@ -0,0 +1,254 @@
+"""
+Cliente HTTP do Microsoft Graph (token, keep-alive e $batch)
+
+_post_graph abria uma conexão urllib nova (TCP + TLS) por mensagem e
+_get_graph_token não era thread-safe: workers concorrentes disparavam
+várias renovações de token ao mesmo tempo. GraphClient:
+
+- Mantém um pool de conexões HTTP/1.1 keep-alive por host (GRAPH_POOL),
+  reaproveitadas entre threads. Conexão reaproveitada que o servidor já
+  tinha fechado é descartada e a requisição repetida uma vez numa nova,
+  mas só quando a falha prova que a requisição não foi processada (erro
+  ao enviar, ou conexão fechada sem nenhuma resposta). sendMail e $batch
+  não são idempotentes: timeout ou erro depois do envio não é repetido
+  aqui, volta como falha retentável e a caixa de saída aplica o backoff
+- Renova o token sob lock, GRAPH_TOKEN_MARGEM_SECONDS antes de expirar;
+  401 invalida o token e repete uma vez
+- send_batch() envia até 20 requisições por chamada ao endpoint $batch
+  (limite do Graph) e devolve o resultado de cada uma
+
+GRAPH_BASE_URL e GRAPH_LOGIN_URL permitem apontar para um Graph falso
+local (ver ti/scripts/benchmark_email.py).
+
+Resultados são (ok, erro, retentável): 4xx (exceto 401/408/429) é
+permanente; 5xx, 429, timeouts e falhas de rede são retentáveis.
+"""
+
+from __future__ import annotations
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Optional
+from urllib import parse
+
+
+GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0").rstrip("/")
+GRAPH_LOGIN_URL = os.getenv("GRAPH_LOGIN_URL", "https://login.microsoftonline.com").rstrip("/")
+GRAPH_POOL = int(os.getenv("GRAPH_POOL", "8"))
+GRAPH_TIMEOUT = float(os.getenv("GRAPH_TIMEOUT", "20"))
+GRAPH_TOKEN_MARGEM_SECONDS = int(os.getenv("GRAPH_TOKEN_MARGEM_SECONDS", "300"))
+GRAPH_BATCH_MAX = 20
+
+Resultado = tuple[bool, Optional[str], bool]
+
+
+def _retentavel(status: int) -> bool:
+    return status >= 500 or status in (401, 408, 429)
+
+
+class _Pool:
+    """Conexões keep-alive para um host (LIFO: a mais recente tem menos chance de ter expirado)"""
+
+    def __init__(self, url: str, tamanho: int):
+        u = parse.urlsplit(url)
+        self.https = u.scheme == "https"
+        self.host = u.hostname
+        self.port = u.port
+        self.prefixo = u.path.rstrip("/")
+        self._livres: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=tamanho)
+        self.stats = {"criadas": 0, "reusadas": 0}
+
+    def _nova(self) -> http.client.HTTPConnection:
+        self.stats["criadas"] += 1
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=GRAPH_TIMEOUT)
+
+    def request(self, method: str, path: str, body: Optional[bytes], headers: dict) -> tuple[int, bytes]:
+        for tentativa in range(2):
+            try:
+                conn, reusada = self._livres.get_nowait(), True
+                self.stats["reusadas"] += 1
+            except queue.Empty:
+                conn, reusada = self._nova(), False
+            try:
+                conn.request(method, self.prefixo + path, body=body, headers=headers)
+            except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+                conn.close()
+                if reusada and tentativa == 0:
+                    continue  # servidor fechou a conexão ociosa antes do envio: tenta numa nova
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            try:
+                resp = conn.getresponse()
+            except http.client.RemoteDisconnected:
+                # Fechada sem nenhum byte de resposta: o keep-alive expirou e o
+                # servidor descartou a requisição sem processá-la
+                conn.close()
+                if reusada and tentativa == 0:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            try:
+                dados = resp.read()
+            except BaseException:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                try:
+                    self._livres.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+            return resp.status, dados
+        raise ConnectionError("Falha ao reutilizar conexão")
+
+
+class GraphClient:
+    def __init__(self, tenant_id: str, client_id: str, client_secret: str):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self._graph = _Pool(GRAPH_BASE_URL, GRAPH_POOL)
+        self._login = _Pool(GRAPH_LOGIN_URL, 2)
+        self._token: Optional[tuple[str, float]] = None
+        self._token_lock = threading.Lock()
+        self.stats = {"renovacoes_token": 0, "requisicoes": 0, "batches": 0}
+
+    # Token ---------------------------------------------------------------
+
+    def token(self) -> Optional[str]:
+        agora = time.time()
+        atual = self._token
+        if atual and agora < atual[1] - GRAPH_TOKEN_MARGEM_SECONDS:
+            return atual[0]
+        with self._token_lock:
+            atual = self._token
+            if atual and time.time() < atual[1] - GRAPH_TOKEN_MARGEM_SECONDS:
+                return atual[0]  # outra thread renovou enquanto esperávamos
+            return self._renovar()
+
+    def _renovar(self) -> Optional[str]:
+        print("[EMAIL] 🔄 Requesting new Graph token...")
+        corpo = parse.urlencode({
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "grant_type": "client_credentials",
+            "scope": "https://graph.microsoft.com/.default",
+        }).encode("utf-8")
+        try:
+            status, dados = self._login.request(
+                "POST", f"/{self.tenant_id}/oauth2/v2.0/token", corpo,
+                {"Content-Type": "application/x-www-form-urlencoded"},
+            )
+        except Exception as e:
+            print(f"[EMAIL] ❌ Graph token exception: {type(e).__name__}: {e}")
+            return None
+        if status != 200:
+            print(f"[EMAIL] ❌ Graph token HTTP error {status}: {dados[:500]!r}")
+            return None
+        payload = json.loads(dados.decode("utf-8"))
+        token = payload.get("access_token")
+        if not token:
+            print(f"[EMAIL] ❌ Graph token response missing 'access_token'")
+            return None
+        expires_in = int(payload.get("expires_in", 3600))
+        self._token = (token, time.time() + expires_in)
+        self.stats["renovacoes_token"] += 1
+        print(f"[EMAIL] ✅ Graph token obtained successfully (expires in {expires_in}s)")
+        return token
+
+    def invalidar_token(self) -> None:
+        with self._token_lock:
+            self._token = None
+
+    # Requisições ---------------------------------------------------------
+
+    def _chamar(self, method: str, path: str, payload: Any) -> tuple[int, bytes]:
+        corpo = json.dumps(payload).encode("utf-8")
+        for tentativa in range(2):
+            token = self.token()
+            if not token:
+                return 0, b"Token do Graph indisponivel"
+            status, dados = self._graph.request(method, path, corpo, {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json",
+            })
+            self.stats["requisicoes"] += 1
+            if status == 401 and tentativa == 0:
+                self.invalidar_token()
+                continue
+            return status, dados
+        return status, dados
+
+    def post(self, path: str, payload: dict) -> Resultado:
+        try:
+            status, dados = self._chamar("POST", path, payload)
+        except Exception as e:
+            return False, f"{type(e).__name__}: {e}", True
+        if status == 0:
+            return False, dados.decode("utf-8"), True
+        if 200 <= status < 300:
+            return True, None, False
+        return False, f"HTTP {status}: {dados[:1000].decode('utf-8', 'replace')}", _retentavel(status)
+
+    def send_batch(self, requisicoes: list[tuple[str, dict]]) -> list[Resultado]:
+        """POSTs (path, payload) via $batch, em grupos de GRAPH_BATCH_MAX; resultados na mesma ordem"""
+        resultados: list[Resultado] = []
+        for i in range(0, len(requisicoes), GRAPH_BATCH_MAX):
+            resultados.extend(self._batch(requisicoes[i:i + GRAPH_BATCH_MAX]))
+        return resultados
+
+    def _batch(self, grupo: list[tuple[str, dict]]) -> list[Resultado]:
+        if len(grupo) == 1:
+            return [self.post(*grupo[0])]
+        payload = {"requests": [
+            {"id": str(n), "method": "POST", "url": path, "headers": {"Content-Type": "application/json"}, "body": body}
+            for n, (path, body) in enumerate(grupo)
+        ]}
+        try:
+            status, dados = self._chamar("POST", "/$batch", payload)
+        except Exception as e:
+            return [(False, f"{type(e).__name__}: {e}", True)] * len(grupo)
+        self.stats["batches"] += 1
+        if status != 200:
+            erro = f"$batch HTTP {status}: {dados[:500].decode('utf-8', 'replace')}"
+            return [(False, erro, status == 0 or _retentavel(status))] * len(grupo)
+        respostas = {r.get("id"): r for r in json.loads(dados.decode("utf-8")).get("responses", [])}
+        resultados = []
+        for n in range(len(grupo)):
+            r = respostas.get(str(n))
+            if r is None:
+                resultados.append((False, "Sem resposta no $batch", True))
+                continue
+            st = int(r.get("status", 0))
+            if 200 <= st < 300:
+                resultados.append((True, None, False))
+            else:
+                detalhe = json.dumps(r.get("body"), ensure_ascii=False)[:1000]
+                resultados.append((False, f"HTTP {st}: {detalhe}", _retentavel(st)))
+        return resultados
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "conexoes_graph": dict(self._graph.stats)}
+
+
+_client: Optional[GraphClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client(tenant_id: str, client_id: str, client_secret: str) -> GraphClient:
+    """Instância única por processo (pool e token compartilhados entre threads)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GraphClient(tenant_id, client_id, client_secret)
+    return _client
@@ -0,0 +1,108 @@
+"""
+Fila de efeitos colaterais pós-commit
+
+Rotas de escrita registram efeitos colaterais (eventos Socket.IO, refresh de
+métricas, emails) na sessão com after_commit(db, fn, ...). Eles só entram na
+fila quando a transação é confirmada; em rollback são descartados. Um pool
+pequeno de threads processa a fila fora do caminho da requisição.
+
+- Fila limitada (POST_COMMIT_QUEUE_MAX): com a fila cheia, o efeito roda na
+  própria thread que fez o commit (backpressure em vez de perda)
+- Cada efeito roda isolado: exceção é registrada e não afeta os demais
+- Efeitos que acessam o banco devem abrir a própria sessão (SessionLocal);
+  a sessão da requisição não é thread-safe
+"""
+
+from __future__ import annotations
+import os
+import queue
+import threading
+from typing import Any, Callable
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+POST_COMMIT_WORKERS = int(os.getenv("POST_COMMIT_WORKERS", "2"))
+POST_COMMIT_QUEUE_MAX = int(os.getenv("POST_COMMIT_QUEUE_MAX", "1000"))
+
+_INFO_KEY = "post_commit_effects"
+
+Effect = tuple[Callable[..., Any], tuple, dict]
+
+_queue: "queue.Queue[Effect]" = queue.Queue(maxsize=POST_COMMIT_QUEUE_MAX)
+_lock = threading.Lock()
+_workers: list[threading.Thread] = []
+_stats = {"enfileirados": 0, "executados": 0, "erros": 0, "inline": 0}
+
+
+def _run(effect: Effect) -> None:
+    fn, args, kwargs = effect
+    try:
+        fn(*args, **kwargs)
+        with _lock:
+            _stats["executados"] += 1
+    except Exception as e:
+        with _lock:
+            _stats["erros"] += 1
+        print(f"[POST-COMMIT] Erro em {getattr(fn, '__name__', fn)}: {type(e).__name__}: {e}")
+
+
+def _worker() -> None:
+    while True:
+        effect = _queue.get()
+        try:
+            _run(effect)
+        finally:
+            _queue.task_done()
+
+
+def _ensure_workers() -> None:
+    with _lock:
+        if _workers:
+            return
+        for i in range(max(1, POST_COMMIT_WORKERS)):
+            t = threading.Thread(target=_worker, daemon=True, name=f"PostCommit-{i}")
+            t.start()
+            _workers.append(t)
+
+
+def enqueue(fn: Callable[..., Any], *args, **kwargs) -> None:
+    """Enfileira um efeito para execução imediata em background"""
+    _ensure_workers()
+    effect: Effect = (fn, args, kwargs)
+    try:
+        _queue.put_nowait(effect)
+        with _lock:
+            _stats["enfileirados"] += 1
+    except queue.Full:
+        with _lock:
+            _stats["inline"] += 1
+        print("[POST-COMMIT] Fila cheia, executando efeito na thread atual")
+        _run(effect)
+
+
+def after_commit(db: Session, fn: Callable[..., Any], *args, **kwargs) -> None:
+    """Registra um efeito para rodar após o próximo commit bem-sucedido de `db`"""
+    db.info.setdefault(_INFO_KEY, []).append((fn, args, kwargs))
+
+
+def discard(db: Session) -> None:
+    db.info.pop(_INFO_KEY, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _on_commit(session: Session) -> None:
+    effects = session.info.pop(_INFO_KEY, None)
+    for fn, args, kwargs in effects or ():
+        enqueue(fn, *args, **kwargs)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _on_rollback(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        discard(session)
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {**_stats, "pendentes": _queue.qsize(), "workers": len(_workers)}
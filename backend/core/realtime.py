@@ -98,7 +98,12 @@ def emit_refresh_sync(user_id: int):
         traceback.print_exc()
 
 
-def _emit_event_from_sync(event: str, data: dict, room: str):
+def emit_sync(event: str, data: dict, room: Optional[str] = None):
+    """Emit an event from a worker thread (broadcast when room is None)."""
+    _emit_event_from_sync(event, data, room)
+
+
+def _emit_event_from_sync(event: str, data: dict, room: Optional[str]):
     """Bridge to emit Socket.IO events from sync context."""
     global _event_loop
 
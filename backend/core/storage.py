@@ -1,9 +1,43 @@
+"""
+Armazenamento de arquivos em container (Azure Blob Storage ou emulador local)
+
+AzureBlobStorage criava um BlobServiceClient (e conferia o container) a
+cada get_storage(), e um blob client novo por chamada; uploads grandes
+iam num único upload_blob serial. Agora:
+
+- get_storage() devolve uma instância única por processo; o
+  BlobServiceClient usa uma sessão HTTP com pool de conexões
+  (AZURE_BLOB_POOL) e o container é conferido uma vez
+- Arquivos acima de AZURE_BLOB_PUT_UNICO_MB vão em blocos de
+  AZURE_BLOB_BLOCO_MB enviados em paralelo (AZURE_BLOB_CONCORRENCIA);
+  downloads grandes também são paralelizados
+- get_async_storage() devolve a variante assíncrona (azure.storage.blob.aio)
+  para uso direto no event loop. O cliente aio (e sua sessão aiohttp) fica
+  preso ao loop em que foi criado, então há um por event loop: o de um loop
+  já fechado é descartado, e close_async_storage() fecha o do loop
+  corrente: o shutdown da aplicação chama para o loop principal, e quem usa
+  um loop próprio (asyncio.run em thread/job) deve chamar antes de sair dele
+- STORAGE_BACKEND=local troca o Azure por LocalFileStorage, um emulador em
+  disco (STORAGE_LOCAL_DIR) com a mesma interface, para rodar e medir
+  localmente sem credenciais (ver ti/scripts/benchmark_storage.py)
+
+Interface comum: upload_bytes, upload_file, exists, download_bytes
+(com offset/length), size, delete_blob. download_bytes e size devolvem None
+só quando o blob não existe; qualquer outra falha (rede, credencial,
+throttling) sobe para o chamador.
+"""
+
 from __future__ import annotations
+import asyncio
 import os
 import pathlib
 import re
+import shutil
+import tempfile
+import threading
+import weakref
 from datetime import datetime
-from typing import Optional
+from typing import BinaryIO, Optional
 
 try:
     from azure.storage.blob import BlobServiceClient, ContentSettings
@@ -11,6 +45,27 @@ except Exception:  # pragma: no cover
     BlobServiceClient = None  # type: ignore
     ContentSettings = None  # type: ignore
 
+try:
+    from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+except Exception:  # pragma: no cover
+    AsyncBlobServiceClient = None  # type: ignore
+
+try:
+    from azure.core.exceptions import ResourceNotFoundError
+except Exception:  # pragma: no cover
+    class ResourceNotFoundError(Exception):  # type: ignore
+        pass
+
+
+_MB = 1024 * 1024
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "azure").strip().lower()
+STORAGE_LOCAL_DIR = os.getenv(
+    "STORAGE_LOCAL_DIR", str(pathlib.Path(__file__).resolve().parent.parent / "storage" / "emulador")
+)
+AZURE_BLOB_POOL = int(os.getenv("AZURE_BLOB_POOL", "32"))
+AZURE_BLOB_CONCORRENCIA = int(os.getenv("AZURE_BLOB_CONCORRENCIA", "4"))
+AZURE_BLOB_BLOCO = int(os.getenv("AZURE_BLOB_BLOCO_MB", "4")) * _MB
+AZURE_BLOB_PUT_UNICO = int(os.getenv("AZURE_BLOB_PUT_UNICO_MB", "8")) * _MB
 
 _filename_sanitize_re = re.compile(r"[^A-Za-z0-9._-]+")
 
@@ -28,44 +83,293 @@ def _safe_filename(name: str) -> str:
 class StorageError(RuntimeError):
     pass
 
+
+def _config_azure() -> tuple[str, str]:
+    cs = os.getenv("AZURE_STORAGE_CONNECTION_STRING") or os.getenv("AZURE_BLOB_CONNECTION_STRING")
+    container = os.getenv("AZURE_STORAGE_CONTAINER") or os.getenv("AZURE_BLOB_CONTAINER")
+    if not cs or not container:
+        raise StorageError("Defina AZURE_STORAGE_CONNECTION_STRING e AZURE_STORAGE_CONTAINER nas variáveis de ambiente")
+    return cs, container
+
+
+def _client_kwargs() -> dict:
+    return {
+        "max_single_put_size": AZURE_BLOB_PUT_UNICO,
+        "max_block_size": AZURE_BLOB_BLOCO,
+        "max_single_get_size": AZURE_BLOB_PUT_UNICO,
+        "max_chunk_get_size": AZURE_BLOB_BLOCO,
+    }
+
+
+def _content_settings(content_type: Optional[str]):
+    if content_type and ContentSettings is not None:
+        return ContentSettings(content_type=content_type)
+    return None
+
+
 class AzureBlobStorage:
     def __init__(self, connection_string: str, container: str):
         if BlobServiceClient is None:
             raise StorageError("azure-storage-blob não instalado")
         if not connection_string or not container:
             raise StorageError("Configuração do Azure Blob ausente")
-        self._svc = BlobServiceClient.from_connection_string(connection_string)
+        self._svc = BlobServiceClient.from_connection_string(
+            connection_string, session=self._sessao(), **_client_kwargs()
+        )
         self._container = container
+        self._container_client = self._svc.get_container_client(container)
         try:
-            container_client = self._svc.get_container_client(container)
-            if not container_client.exists():
-                container_client.create_container()
+            if not self._container_client.exists():
+                self._container_client.create_container()
         except Exception as e:  # pragma: no cover
             raise StorageError(f"Falha ao acessar/criar container: {e}")
 
+    @staticmethod
+    def _sessao():
+        """Sessão HTTP compartilhada: conexões TLS reaproveitadas entre chamadas e threads"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        sessao = requests.Session()
+        adapter = HTTPAdapter(pool_connections=AZURE_BLOB_POOL, pool_maxsize=AZURE_BLOB_POOL)
+        sessao.mount("https://", adapter)
+        sessao.mount("http://", adapter)
+        return sessao
+
+    def _blob(self, blob_path: str):
+        return self._container_client.get_blob_client(blob_path)
+
     def upload_bytes(self, blob_path: str, data: bytes, content_type: Optional[str] = None) -> str:
-        blob_client = self._svc.get_blob_client(container=self._container, blob=blob_path)
-        content_settings = None
-        if content_type and ContentSettings is not None:
-            content_settings = ContentSettings(content_type=content_type)
-        blob_client.upload_blob(data, overwrite=True, content_settings=content_settings)
+        blob_client = self._blob(blob_path)
+        blob_client.upload_blob(
+            data, overwrite=True, content_settings=_content_settings(content_type),
+            max_concurrency=AZURE_BLOB_CONCORRENCIA,
+        )
         return blob_client.url
 
+    def upload_file(self, blob_path: str, fileobj: BinaryIO, length: Optional[int] = None, content_type: Optional[str] = None) -> str:
+        """Acima de AZURE_BLOB_PUT_UNICO_MB o SDK divide em blocos enviados em paralelo"""
+        blob_client = self._blob(blob_path)
+        blob_client.upload_blob(
+            fileobj, length=length, overwrite=True, content_settings=_content_settings(content_type),
+            max_concurrency=AZURE_BLOB_CONCORRENCIA,
+        )
+        return blob_client.url
+
+    def exists(self, blob_path: str) -> bool:
+        return self._blob(blob_path).exists()
+
+    def download_bytes(self, blob_path: str, offset: Optional[int] = None, length: Optional[int] = None) -> Optional[bytes]:
+        try:
+            return self._blob(blob_path).download_blob(
+                offset=offset, length=length, max_concurrency=AZURE_BLOB_CONCORRENCIA
+            ).readall()
+        except ResourceNotFoundError:
+            return None
+
+    def size(self, blob_path: str) -> Optional[int]:
+        try:
+            return self._blob(blob_path).get_blob_properties().size
+        except ResourceNotFoundError:
+            return None
+
     def delete_blob(self, blob_path: str) -> None:
         try:
-            blob_client = self._svc.get_blob_client(container=self._container, blob=blob_path)
-            blob_client.delete_blob()
+            self._blob(blob_path).delete_blob()
         except Exception:
             # Best-effort delete; do not raise to avoid breaking workflows
             return
 
 
-def get_storage() -> AzureBlobStorage:
-    cs = os.getenv("AZURE_STORAGE_CONNECTION_STRING") or os.getenv("AZURE_BLOB_CONNECTION_STRING")
-    container = os.getenv("AZURE_STORAGE_CONTAINER") or os.getenv("AZURE_BLOB_CONTAINER")
-    if not cs or not container:
-        raise StorageError("Defina AZURE_STORAGE_CONNECTION_STRING e AZURE_STORAGE_CONTAINER nas variáveis de ambiente")
-    return AzureBlobStorage(cs, container)
+class AsyncAzureBlobStorage:
+    """Mesma interface de AzureBlobStorage com métodos async (azure.storage.blob.aio)"""
+
+    def __init__(self, connection_string: str, container: str):
+        if AsyncBlobServiceClient is None:
+            raise StorageError("azure-storage-blob[aio] (aiohttp) não instalado")
+        self._svc = AsyncBlobServiceClient.from_connection_string(connection_string, **_client_kwargs())
+        self._container_client = self._svc.get_container_client(container)
+        self._container_ok = False
+        self._lock = asyncio.Lock()
+
+    async def _blob(self, blob_path: str):
+        if not self._container_ok:
+            async with self._lock:
+                if not self._container_ok:
+                    try:
+                        if not await self._container_client.exists():
+                            await self._container_client.create_container()
+                    except Exception as e:  # pragma: no cover
+                        raise StorageError(f"Falha ao acessar/criar container: {e}")
+                    self._container_ok = True
+        return self._container_client.get_blob_client(blob_path)
+
+    async def upload_bytes(self, blob_path: str, data: bytes, content_type: Optional[str] = None) -> str:
+        blob_client = await self._blob(blob_path)
+        await blob_client.upload_blob(
+            data, overwrite=True, content_settings=_content_settings(content_type),
+            max_concurrency=AZURE_BLOB_CONCORRENCIA,
+        )
+        return blob_client.url
+
+    async def upload_file(self, blob_path: str, fileobj: BinaryIO, length: Optional[int] = None, content_type: Optional[str] = None) -> str:
+        blob_client = await self._blob(blob_path)
+        await blob_client.upload_blob(
+            fileobj, length=length, overwrite=True, content_settings=_content_settings(content_type),
+            max_concurrency=AZURE_BLOB_CONCORRENCIA,
+        )
+        return blob_client.url
+
+    async def exists(self, blob_path: str) -> bool:
+        return await (await self._blob(blob_path)).exists()
+
+    async def download_bytes(self, blob_path: str, offset: Optional[int] = None, length: Optional[int] = None) -> Optional[bytes]:
+        try:
+            stream = await (await self._blob(blob_path)).download_blob(
+                offset=offset, length=length, max_concurrency=AZURE_BLOB_CONCORRENCIA
+            )
+            return await stream.readall()
+        except ResourceNotFoundError:
+            return None
+
+    async def size(self, blob_path: str) -> Optional[int]:
+        try:
+            return (await (await self._blob(blob_path)).get_blob_properties()).size
+        except ResourceNotFoundError:
+            return None
+
+    async def delete_blob(self, blob_path: str) -> None:
+        try:
+            await (await self._blob(blob_path)).delete_blob()
+        except Exception:
+            return
+
+    async def close(self) -> None:
+        await self._svc.close()
+
+
+class LocalFileStorage:
+    """Emulador em disco com a interface de AzureBlobStorage (STORAGE_BACKEND=local)"""
+
+    def __init__(self, root: str):
+        self.root = pathlib.Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, blob_path: str) -> pathlib.Path:
+        p = (self.root / blob_path.lstrip("/")).resolve()
+        if self.root not in p.parents:
+            raise StorageError(f"Caminho de blob inválido: {blob_path!r}")
+        return p
+
+    def _gravar(self, blob_path: str, escrever) -> str:
+        destino = self._path(blob_path)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=destino.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                escrever(f)
+            os.replace(tmp, destino)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        return destino.as_uri()
+
+    def upload_bytes(self, blob_path: str, data: bytes, content_type: Optional[str] = None) -> str:
+        return self._gravar(blob_path, lambda f: f.write(data))
+
+    def upload_file(self, blob_path: str, fileobj: BinaryIO, length: Optional[int] = None, content_type: Optional[str] = None) -> str:
+        return self._gravar(blob_path, lambda f: shutil.copyfileobj(fileobj, f, AZURE_BLOB_BLOCO))
+
+    def exists(self, blob_path: str) -> bool:
+        return self._path(blob_path).is_file()
+
+    def download_bytes(self, blob_path: str, offset: Optional[int] = None, length: Optional[int] = None) -> Optional[bytes]:
+        try:
+            with open(self._path(blob_path), "rb") as f:
+                if offset:
+                    f.seek(offset)
+                return f.read() if length is None else f.read(length)
+        except FileNotFoundError:
+            return None
+
+    def size(self, blob_path: str) -> Optional[int]:
+        try:
+            return self._path(blob_path).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def delete_blob(self, blob_path: str) -> None:
+        try:
+            self._path(blob_path).unlink()
+        except OSError:
+            return
+
+
+class AsyncStorageAdapter:
+    """Interface async sobre um storage síncrono (emulador local), em threads"""
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def __getattr__(self, nome: str):
+        metodo = getattr(self._storage, nome)
+
+        async def _async(*args, **kwargs):
+            return await asyncio.to_thread(metodo, *args, **kwargs)
+
+        return _async
+
+    async def close(self) -> None:
+        return None
+
+
+_storage = None
+_storage_lock = threading.Lock()
+# Um cliente async por event loop; a entrada some junto com o loop
+_async_por_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+
+
+def get_storage():
+    """Instância única por processo (Azure ou emulador, conforme STORAGE_BACKEND)"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if STORAGE_BACKEND == "local":
+                    _storage = LocalFileStorage(STORAGE_LOCAL_DIR)
+                else:
+                    _storage = AzureBlobStorage(*_config_azure())
+    return _storage
+
+
+def get_async_storage():
+    """Variante async, ligada ao event loop em execução (um cliente por loop)"""
+    loop = asyncio.get_running_loop()
+    with _storage_lock:
+        storage = _async_por_loop.get(loop)
+        if storage is None:
+            # Clientes de loops já fechados não podem mais ser fechados (a
+            # sessão aiohttp pertence ao loop morto): só solta a referência
+            for antigo in [l for l in _async_por_loop if l.is_closed()]:
+                del _async_por_loop[antigo]
+            if STORAGE_BACKEND == "local":
+                storage = AsyncStorageAdapter(get_storage())
+            else:
+                storage = AsyncAzureBlobStorage(*_config_azure())
+            _async_por_loop[loop] = storage
+    return storage
+
+
+async def close_async_storage() -> None:
+    """Fecha o cliente async do loop corrente (shutdown da aplicação)"""
+    loop = asyncio.get_running_loop()
+    with _storage_lock:
+        storage = _async_por_loop.pop(loop, None)
+    if storage is not None:
+        await storage.close()
 
 
 def build_blob_name(kind: str, chamado_id: int, original_filename: str) -> str:
@@ -0,0 +1,69 @@
+"""
+Ingestão de uploads em streaming
+
+As rotas de upload faziam `await file.read()` e mantinham o arquivo inteiro
+em memória até o INSERT; uploads simultâneos multiplicavam o pico de RSS.
+ingerir() lê o UploadFile em blocos de BLOB_CHUNK, calcula SHA-256 e tamanho
+incrementalmente, rejeita ao passar do limite e grava direto no blob store
+(core/blobstore.py). A memória por upload fica limitada a um bloco.
+
+Limites (MB): UPLOAD_MAX_ANEXO_MB, UPLOAD_MAX_IMAGEM_MB, UPLOAD_MAX_MIDIA_MB.
+"""
+
+from __future__ import annotations
+import os
+from typing import Optional
+from fastapi import HTTPException, UploadFile
+from core.blobstore import ConteudoGrandeDemais, get_blob_store
+
+
+_MB = 1024 * 1024
+UPLOAD_MAX_ANEXO = int(os.getenv("UPLOAD_MAX_ANEXO_MB", "16")) * _MB
+UPLOAD_MAX_IMAGEM = int(os.getenv("UPLOAD_MAX_IMAGEM_MB", "10")) * _MB
+UPLOAD_MAX_MIDIA = int(os.getenv("UPLOAD_MAX_MIDIA_MB", "200")) * _MB
+
+
+class ArquivoRecebido:
+    """Resultado da ingestão: conteúdo já está no blob store"""
+
+    def __init__(self, sha256: str, tamanho: int, nome: str, content_type: Optional[str]):
+        self.sha256 = sha256
+        self.tamanho = tamanho
+        self.nome = nome
+        self.content_type = content_type
+
+    @property
+    def extensao(self) -> Optional[str]:
+        return self.nome.rsplit(".", 1)[-1].lower() if "." in self.nome else None
+
+
+def validar_tamanhos(uploads: list[UploadFile], max_bytes: int) -> None:
+    """Rejeita (413) antes de qualquer gravação quando o tamanho informado pelo
+    parser multipart já passa do limite"""
+    for upload in uploads or []:
+        tamanho = getattr(upload, "size", None)
+        if tamanho is not None and tamanho > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{upload.filename or 'arquivo'}: {ConteudoGrandeDemais(max_bytes)}",
+            )
+
+
+def ingerir(upload: UploadFile, max_bytes: int) -> ArquivoRecebido:
+    """Grava o UploadFile no blob store em blocos (síncrono: chamar fora do event loop).
+
+    Levanta HTTPException 413 ao passar de max_bytes.
+    """
+    validar_tamanhos([upload], max_bytes)
+    upload.file.seek(0)
+    try:
+        sha, tamanho = get_blob_store().put_stream(upload.file, max_bytes)
+    except ConteudoGrandeDemais as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return ArquivoRecebido(sha, tamanho, upload.filename or "arquivo", upload.content_type)
+
+
+async def ingerir_async(upload: UploadFile, max_bytes: int) -> ArquivoRecebido:
+    """ingerir() em thread, para rotas async"""
+    from starlette.concurrency import run_in_threadpool
+    return await run_in_threadpool(ingerir, upload, max_bytes)
@@ -6,12 +6,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request
-from fastapi.responses import StreamingResponse, Response, FileResponse
+from fastapi.responses import StreamingResponse, Response, FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from fastapi.middleware.cors import CORSMiddleware
 from io import BytesIO
-from ti.api import chamados_router, unidades_router, problemas_router, notifications_router, notification_settings_router, alerts_router, email_debug_router, sla_router, powerbi_router, metrics_router
+from ti.api import chamados_router, unidades_router, problemas_router, notifications_router, notification_settings_router, alerts_router, email_debug_router, sla_router, powerbi_router, metrics_router, jobs_router
 from ti.api.usuarios import router as usuarios_router
 from ti.api.dashboard_permissions import router as dashboard_permissions_router
 from auth0.routes import router as auth0_router
@@ -19,10 +19,14 @@ from core.realtime import mount_socketio
 import json
 from typing import Any, List, Dict
 import uuid
+from sqlalchemy import func, text
 from sqlalchemy.orm import Session
 from core.db import get_db, engine
 from ti.models.media import Media
-from ti.scripts.create_performance_indices import create_indices
+from core.downloads import CACHE_MIDIA, ConteudoIndisponivel, responder_blob
+from core.uploads import UPLOAD_MAX_MIDIA, ingerir_async
+from core.boot import FAST_BOOT, boot_state, is_failed, is_ready, start_boot
+from core.admission import AdmissionMiddleware, install_statement_timeouts, get_stats as admission_stats
 
 # Verificar configuração de email do Graph
 try:
@@ -43,52 +47,20 @@ except Exception as e:
 # Create the FastAPI application (HTTP)
 _http = FastAPI(title="Evoque API - TI", version="1.0.0")
 
-# Garantir que tabelas de SLA existem
-try:
-    from ti.scripts.ensure_sla_tables import ensure_sla_tables
-    ensure_sla_tables()
-except Exception as e:
-    print(f"⚠️  Erro ao garantir tabelas de SLA: {e}")
-
-# Criar índices de performance na inicialização
-try:
-    create_indices()
-except Exception as e:
-    print(f"⚠️  Erro ao criar índices de performance: {e}")
-
-# Criar tabela de cache de métricas na inicialização
-try:
-    from ti.scripts.create_metrics_cache_table import create_metrics_cache_table
-    create_metrics_cache_table()
-    print("✅ Tabela metrics_cache_db criada com sucesso")
-except Exception as e:
-    print(f"⚠️  Erro ao criar tabela metrics_cache_db: {e}")
+# Etapas de boot: migrações pendentes do ledger (sob GET_LOCK) e warmups,
+# executadas em background após o startup (ver core/boot.py e
+# ti/scripts/migrations.py). FAST_BOOT=0 executa tudo no import.
+def _boot_apply_migrations():
+    from ti.scripts.migrations import apply_all
+    apply_all()
 
-# Executar migração do historico_status na inicialização
-try:
-    from ti.scripts.migrate_historico_status import migrate_historico_status
-    migrate_historico_status()
-    print("✅ Migração historico_status executada com sucesso")
-except Exception as e:
-    print(f"⚠️  Erro ao migrar historico_status: {e}")
 
-# Criar tabela de configurações de notificações na inicialização
-try:
-    from ti.scripts.setup_notification_settings import create_notification_settings_table
-    create_notification_settings_table()
-except Exception as e:
-    print(f"⚠️  Erro ao criar tabela notification_settings: {e}")
-
-# Inicializar scheduler de recalculação automática de SLA
-try:
+def _boot_init_scheduler():
     from ti.services.sla_scheduler import init_scheduler
     init_scheduler()
-    print("✅ Scheduler de SLA iniciado com sucesso")
-except Exception as e:
-    print(f"⚠️  Erro ao inicializar scheduler de SLA: {e}")
 
-# Pré-carregar cache do banco na startup
-try:
+
+def _boot_warmup_sla_cache():
     from ti.services.sla_cache import SLACacheManager
     from core.db import SessionLocal
 
@@ -98,11 +70,9 @@ try:
         print(f"✅ Cache pré-carregado: {stats['carregados']} entradas carregadas, {stats['expirados']} expiradas, {stats['erros']} erros")
     finally:
         db_warmup.close()
-except Exception as e:
-    print(f"⚠️  Erro ao pré-carregar cache: {e}")
 
-# Pré-carregar métricas mensais na startup (warmup de métricas)
-try:
+
+def _boot_warmup_metrics():
     from ti.services.cache_manager_incremental import IncrementalMetricsCache
     from core.db import SessionLocal
 
@@ -110,12 +80,52 @@ try:
     try:
         metricas = IncrementalMetricsCache.get_metrics(db_warmup_metrics)
         print(f"✅ Métricas mensais pré-carregadas: Total={metricas.get('total', 0)}, Dentro_SLA={metricas.get('dentro_sla', 0)}")
-    except Exception as warmup_error:
-        print(f"⚠️  Aviso (não crítico): Warmup de métricas falhou: {warmup_error}")
     finally:
         db_warmup_metrics.close()
-except Exception as e:
-    print(f"⚠️  Erro ao pré-carregar métricas: {e}")
+
+
+def _boot_migrar_blobs():
+    """Move anexos ainda armazenados no MySQL para o blob store (job deduplicado)"""
+    if os.getenv("BLOB_MIGRACAO_AUTOMATICA", "1").strip().lower() in ("0", "false", "nao", "não"):
+        return
+    from core import jobs
+    from ti.services.blob_migracao import MIGRAR_BLOBS
+    print(f"[BOOT] Migração de anexos para o blob store: {jobs.submit(MIGRAR_BLOBS)}")
+
+
+def _boot_gerar_miniaturas():
+    """Miniaturas WebP de imagens de alerta que ainda não têm (job deduplicado)"""
+    from core import jobs
+    from ti.services.imagens import GERAR_MINIATURAS, disponivel
+    if disponivel():
+        print(f"[BOOT] Miniaturas de alertas: {jobs.submit(GERAR_MINIATURAS)}")
+
+
+def _boot_email_outbox():
+    """Workers da caixa de saída de e-mails (a tabela vem da migração 0017)"""
+    from core.email_outbox import start_workers
+    start_workers()
+
+
+_BOOT_MIGRATIONS = [
+    ("schema_migrations", _boot_apply_migrations),
+]
+
+# Workers essenciais: sobem mesmo se as migrações falharem (são tentadas de novo)
+_BOOT_WORKERS = [
+    ("email_outbox", _boot_email_outbox),
+    ("sla_scheduler", _boot_init_scheduler),
+]
+
+_BOOT_WARMUPS = [
+    ("sla_cache", _boot_warmup_sla_cache),
+    ("metrics", _boot_warmup_metrics),
+    ("blob_migracao", _boot_migrar_blobs),
+    ("miniaturas", _boot_gerar_miniaturas),
+]
+
+if not FAST_BOOT:
+    start_boot(_BOOT_MIGRATIONS, _BOOT_WARMUPS, _BOOT_WORKERS)
 
 # Static uploads mount
 _base_dir = Path(__file__).resolve().parent
@@ -144,6 +154,11 @@ if _prod_domain:
 if _financial_portal_url:
     _allowed_origins.append(_financial_portal_url)
 
+# Bulkheads por classe de rota (interactive/analytics/maintenance). Registrado
+# antes do CORS para que as respostas 503 também levem os headers de CORS.
+_http.add_middleware(AdmissionMiddleware)
+install_statement_timeouts(engine)
+
 _http.add_middleware(
     CORSMiddleware,
     allow_origins=_allowed_origins,
@@ -187,14 +202,32 @@ def ping():
 
 @_http.get("/api/health")
 def health_check(db: Session = Depends(get_db)):
+    state = boot_state()
+    boot = {k: state[k] for k in ("status", "erro", "tentativas", "proxima_tentativa_em")}
     try:
-        db.execute("SELECT 1")
-        return {"status": "ok", "database": "connected"}
+        db.execute(text("SELECT 1"))
     except Exception as e:
         print(f"Database health check failed: {e}")
         import traceback
         traceback.print_exc()
-        return {"status": "error", "database": str(e)}, 500
+        return JSONResponse(status_code=500, content={"status": "error", "database": str(e), "boot": boot})
+    # Boot com migração falhando: processo vivo (não reiniciar), mas sinalizado
+    return {"status": "degraded" if is_failed() else "ok", "database": "connected", "boot": boot}
+
+
+@_http.get("/api/ready")
+def readiness_check():
+    """Pronto para tráfego somente após as migrações do boot"""
+    state = boot_state()
+    if not is_ready():
+        return JSONResponse(status_code=503, content={"ready": False, **state})
+    return {"ready": True, **state}
+
+
+@_http.get("/api/admission/stats")
+def admission_stats_route():
+    """Ocupação e rejeições por classe de rota"""
+    return admission_stats()
 
 
 @_http.get("/api/test-backend")
@@ -238,17 +271,18 @@ async def upload_login_media(file: UploadFile = File(...), db: Session = Depends
     original_name = Path(file.filename or "arquivo").name
     titulo = Path(original_name).stem or "mídia"
 
-    data = await file.read()
-    print(f"[UPLOAD] Tamanho do arquivo: {len(data)} bytes")
+    arquivo = await ingerir_async(file, UPLOAD_MAX_MIDIA)
+    print(f"[UPLOAD] Tamanho do arquivo: {arquivo.tamanho} bytes")
 
     try:
         m = Media(
             tipo=kind,
             titulo=titulo,
             descricao=None,
-            arquivo_blob=data,
+            arquivo_blob=None,
+            arquivo_sha256=arquivo.sha256,
             mime_type=content_type,
-            tamanho_bytes=len(data),
+            tamanho_bytes=arquivo.tamanho,
             status="ativo",
         )
         db.add(m)
@@ -335,77 +369,33 @@ def login_media(db: Session = Depends(get_db)):
 
 @_http.get("/api/login-media/{item_id}/download")
 def download_login_media(item_id: int, request: Request, db: Session = Depends(get_db)):
-    print(f"\n[DL] ==== START ID:{item_id} ====")
     try:
-        m = db.query(Media).filter(Media.id == int(item_id)).first()
-        print(f"[DL] Query result: {m is not None}")
+        # Só metadados: revalidações (ETag) não leem arquivo_blob e seeks do
+        # player (Range) leem só o trecho da coluna legada até a migração
+        m = db.query(
+            Media.id, Media.titulo, Media.mime_type, Media.arquivo_sha256, Media.data_criacao,
+            func.length(Media.arquivo_blob).label("tamanho_blob"),
+        ).filter(Media.id == int(item_id)).first()
 
         if not m:
-            print(f"[DL] Not found")
             raise HTTPException(status_code=404, detail="Not found")
 
-        print(f"[DL] Type:{m.tipo} Status:{m.status} Title:{m.titulo}")
-
-        blob = m.arquivo_blob
-        print(f"[DL] Blob type: {type(blob).__name__} Size: {len(blob) if blob else 0}")
-
-        if not blob:
-            raise HTTPException(status_code=404, detail="No data")
-
-        mime = m.mime_type or "application/octet-stream"
-        # Sanitize filename: remove emojis and non-ASCII characters for HTTP headers
-        title_clean = (m.titulo or "media").encode("ascii", errors="ignore").decode("ascii")
-        name = title_clean.replace(" ", "_").replace("/", "_").replace("\\", "_")
-        if not name or name.strip() == "":
-            name = "media"
-        file_size = len(blob)
-
-        # Check for Range header (HTTP 206 Partial Content)
-        range_header = request.headers.get("range")
-
-        if range_header:
-            # Parse range header (e.g., "bytes=0-1023")
-            try:
-                range_value = range_header.replace("bytes=", "")
-                if "-" in range_value:
-                    start_str, end_str = range_value.split("-")
-                    start = int(start_str) if start_str else 0
-                    end = int(end_str) if end_str else file_size - 1
-
-                    # Validate range
-                    if start < 0 or end >= file_size or start > end:
-                        raise ValueError("Invalid range")
-
-                    chunk_size = end - start + 1
-                    print(f"[DL] Range request: bytes {start}-{end}/{file_size}")
-
-                    return Response(
-                        content=blob[start:end + 1],
-                        status_code=206,
-                        media_type=mime,
-                        headers={
-                            "Content-Disposition": f"inline; filename={name}",
-                            "Content-Range": f"bytes {start}-{end}/{file_size}",
-                            "Accept-Ranges": "bytes",
-                            "Content-Length": str(chunk_size),
-                        }
-                    )
-            except (ValueError, AttributeError) as e:
-                print(f"[DL] Invalid range header: {e}")
-                # Fall through to normal response if range is invalid
-
-        print(f"[DL] Returning: {len(blob)} bytes as {mime}")
-        print(f"[DL] ==== END ====\n")
-
-        return Response(
-            content=blob,
-            media_type=mime,
-            headers={
-                "Content-Disposition": f"inline; filename={name}",
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(file_size),
-            }
+        def _legado(inicio, tamanho):
+            coluna = Media.arquivo_blob if tamanho is None else func.substring(Media.arquivo_blob, inicio + 1, tamanho)
+            return db.query(coluna).filter(Media.id == m.id).scalar()
+
+        return responder_blob(
+            request,
+            sha=m.arquivo_sha256,
+            nome=(m.titulo or "media").replace(" ", "_").replace("/", "_").replace("\\", "_"),
+            mime=m.mime_type,
+            modificado_em=m.data_criacao,
+            carregar_legado=_legado if m.tamanho_blob is not None else None,
+            tamanho_legado=m.tamanho_blob,
+            cache_control=CACHE_MIDIA,
         )
+    except ConteudoIndisponivel:
+        raise HTTPException(status_code=404, detail="No data")
     except HTTPException:
         raise
     except Exception as e:
@@ -467,6 +457,7 @@ _http.include_router(email_debug_router, prefix="/api")
 _http.include_router(sla_router, prefix="/api")
 _http.include_router(powerbi_router, prefix="/api")
 _http.include_router(metrics_router, prefix="/api")
+_http.include_router(jobs_router, prefix="/api")
 _http.include_router(dashboard_permissions_router, prefix="")
 
 # Compatibility mount without prefix, in case the server is run without proxy
@@ -482,6 +473,7 @@ _http.include_router(email_debug_router)
 _http.include_router(sla_router)
 _http.include_router(powerbi_router)
 _http.include_router(metrics_router)
+_http.include_router(jobs_router)
 _http.include_router(dashboard_permissions_router)
 
 # Wrap with Socket.IO ASGI app (exports as 'app')
@@ -501,3 +493,16 @@ async def startup_event():
         print(f"[STARTUP] ✓ Event loop registered for Socket.IO: {loop}")
     except Exception as e:
         print(f"[STARTUP] ⚠️  Failed to register event loop: {e}")
+
+    # Migrações e warmups em background: o worker aceita conexões imediatamente
+    if FAST_BOOT:
+        start_boot(_BOOT_MIGRATIONS, _BOOT_WARMUPS, _BOOT_WORKERS)
+
+
+@_http.on_event("shutdown")
+async def shutdown_event():
+    from core.storage import close_async_storage
+    try:
+        await close_async_storage()
+    except Exception as e:
+        print(f"[SHUTDOWN] ⚠️  Falha ao fechar cliente de storage: {e}")
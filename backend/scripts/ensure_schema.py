@@ -91,18 +91,20 @@ def ensure_table_and_columns(table: str, cols: Dict[str, str]) -> list[str]:
 
 def main() -> int:
     total_actions: list[str] = []
+    errors = 0
     for table, cols in EXPECTED.items():
         try:
             actions = ensure_table_and_columns(table, cols)
             total_actions.extend(actions)
         except Exception as e:
+            errors += 1
             print(f"[error] {table}: {e}")
     if not total_actions:
-        print("OK: schema already up to date")
+        print("OK: schema already up to date" if not errors else f"{errors} table(s) failed")
     else:
         for a in total_actions:
             print(a)
-    return 0
+    return 1 if errors else 0
 
 
 if __name__ == "__main__":
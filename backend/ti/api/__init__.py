@@ -9,4 +9,5 @@ from .email_debug import router as email_debug_router
 from .sla import router as sla_router
 from .powerbi import router as powerbi_router
 from .metrics import router as metrics_router
-__all__ = ["chamados_router", "usuarios_router", "unidades_router", "problemas_router", "notifications_router", "notification_settings_router", "alerts_router", "email_debug_router", "sla_router", "powerbi_router", "metrics_router"]
+from .jobs import router as jobs_router
+__all__ = ["chamados_router", "usuarios_router", "unidades_router", "problemas_router", "notifications_router", "notification_settings_router", "alerts_router", "email_debug_router", "sla_router", "powerbi_router", "metrics_router", "jobs_router"]
@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
+from sqlalchemy import func
+from sqlalchemy.orm import Session, defer
 from typing import List, Optional, Dict, Any
-from io import BytesIO
 from datetime import datetime
 from pydantic import BaseModel
-import base64
 import json
 from core.db import get_db, engine
+from core.downloads import ConteudoIndisponivel, responder_blob
+from core.uploads import UPLOAD_MAX_IMAGEM, ingerir_async
+from ti.services.imagens import aplicar as aplicar_variantes, gerar_variantes_async
 
 # Imports com tratamento de erro
 try:
@@ -30,6 +31,38 @@ class AlertViewRequest(BaseModel):
 
 router = APIRouter(prefix="/alerts", tags=["TI - Alerts"]) 
 
+
+CACHE_IMAGEM = "public, max-age=31536000, immutable"
+
+
+def _imagem_payload(alert: Alert, tem_imagem: bool) -> Dict[str, Any]:
+    """Referências da imagem para o JSON (sem os bytes).
+
+    As URLs levam o hash (v=) para que o cache imutável do navegador seja
+    seguro; alertas ainda não migrados para o blob store usam o id. São
+    relativas à API (sem o /api): o frontend prefixa API_BASE, que pode
+    apontar para outra origem.
+    """
+    sha = alert.imagem_sha256
+    if not tem_imagem:
+        return {"imagem_url": None, "imagem_thumb_url": None, "imagem_sha256": None,
+                "imagem_largura": None, "imagem_altura": None, "imagem_variantes": []}
+    versao = (sha or str(alert.id))[:16]
+    base = f"/alerts/{alert.id}/imagem"
+    variantes = [
+        {"largura": v["largura"], "altura": v["altura"], "url": f"{base}?w={v['largura']}&v={versao}"}
+        for v in (alert.imagem_variantes or [])
+    ]
+    return {
+        "imagem_url": f"{base}?v={versao}",
+        "imagem_thumb_url": variantes[0]["url"] if variantes else f"{base}?v={versao}",
+        "imagem_sha256": sha,
+        "imagem_largura": alert.imagem_largura,
+        "imagem_altura": alert.imagem_altura,
+        "imagem_variantes": variantes,
+    }
+
+
 @router.get("")
 def list_alerts(db: Session = Depends(get_db)) -> List[Dict[str, Any]]:
     """
@@ -42,12 +75,17 @@ def list_alerts(db: Session = Depends(get_db)) -> List[Dict[str, Any]]:
         except Exception:
             pass
         
-        # Buscar todos os alertas ordenados por data de criação
-        alerts = db.query(Alert).order_by(Alert.created_at.desc()).all()
+        # Buscar todos os alertas ordenados por data de criação (sem ler imagem_blob)
+        alerts = (
+            db.query(Alert, Alert.imagem_blob.isnot(None).label("tem_blob"))
+            .options(defer(Alert.imagem_blob))
+            .order_by(Alert.created_at.desc())
+            .all()
+        )
         
-        # Converter para dicionário e processar blob
+        # Converter para dicionário; a imagem vai por URL
         result = []
-        for alert in alerts:
+        for alert, tem_blob in alerts:
             alert_dict = {
                 "id": alert.id,
                 "title": alert.title if alert.title else "",
@@ -62,17 +100,8 @@ def list_alerts(db: Session = Depends(get_db)) -> List[Dict[str, Any]]:
                 "created_at": alert.created_at.isoformat() if alert.created_at else None,
                 "updated_at": alert.updated_at.isoformat() if alert.updated_at else None,
                 "imagem_mime_type": alert.imagem_mime_type,
-                "imagem_blob": None
+                **_imagem_payload(alert, bool(tem_blob or alert.imagem_sha256)),
             }
-            
-            # Converter blob para base64 se existir
-            if alert.imagem_blob:
-                try:
-                    alert_dict["imagem_blob"] = base64.b64encode(alert.imagem_blob).decode('utf-8')
-                except Exception as e:
-                    print(f"[ALERTS] Erro ao converter imagem para base64: {e}")
-                    alert_dict["imagem_blob"] = None
-            
             result.append(alert_dict)
         
         return result
@@ -126,20 +155,25 @@ async def create_alert(
                 print(f"[ALERTS] Erro ao processar páginas JSON: {e}")
                 pages_list = None
 
-        # Processar imagem se fornecida
-        imagem_blob = None
+        # Processar imagem se fornecida (gravada em streaming no blob store)
+        imagem_sha256 = None
         imagem_mime_type = None
+        variantes = None
 
         if imagem:
             try:
                 print(f"[ALERTS] Processando imagem: {imagem.filename}")
-                imagem_blob = await imagem.read()
+                recebido = await ingerir_async(imagem, UPLOAD_MAX_IMAGEM)
+                imagem_sha256 = recebido.sha256
                 imagem_mime_type = imagem.content_type or "image/jpeg"
-                print(f"[ALERTS] Imagem processada: {len(imagem_blob)} bytes, tipo: {imagem_mime_type}")
+                print(f"[ALERTS] Imagem processada: {recebido.tamanho} bytes, tipo: {imagem_mime_type}")
+                variantes = await gerar_variantes_async(imagem_sha256)
+            except HTTPException:
+                raise
             except Exception as e:
                 print(f"[ALERTS] Erro ao processar imagem: {e}")
                 # Continua sem imagem se der erro
-                imagem_blob = None
+                imagem_sha256 = None
                 imagem_mime_type = None
 
         # Criar alerta com todos os campos
@@ -154,9 +188,10 @@ async def create_alert(
             show_on_home=show_on_home,
             created_by=created_by,
             ativo=True,
-            imagem_blob=imagem_blob,
+            imagem_sha256=imagem_sha256,
             imagem_mime_type=imagem_mime_type
         )
+        aplicar_variantes(new_alert, variantes)
         
         print(f"[ALERTS] Salvando no banco de dados...")
         db.add(new_alert)
@@ -179,18 +214,10 @@ async def create_alert(
             "usuarios_visualizaram": new_alert.usuarios_visualizaram,
             "created_at": new_alert.created_at.isoformat() if new_alert.created_at else None,
             "updated_at": new_alert.updated_at.isoformat() if new_alert.updated_at else None,
-            "imagem_mime_type": new_alert.imagem_mime_type
+            "imagem_mime_type": new_alert.imagem_mime_type,
+            **_imagem_payload(new_alert, bool(new_alert.imagem_sha256)),
         }
         
-        # Converter blob para base64 para resposta
-        if new_alert.imagem_blob:
-            try:
-                response["imagem_blob"] = base64.b64encode(new_alert.imagem_blob).decode('utf-8')
-            except:
-                response["imagem_blob"] = None
-        else:
-            response["imagem_blob"] = None
-        
         return response
         
     except Exception as e:
@@ -209,30 +236,47 @@ async def create_alert(
 
 
 @router.get("/{alert_id}/imagem")
-def get_alert_image(alert_id: int, db: Session = Depends(get_db)):
+def get_alert_image(
+    alert_id: int,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, description="Largura desejada (serve a menor miniatura WebP que a atenda)"),
+    db: Session = Depends(get_db),
+):
     """
-    Retorna a imagem de um alerta específico
+    Retorna a imagem de um alerta específico (ou uma miniatura), com cache imutável
     """
     try:
-        alert = db.query(Alert).filter(Alert.id == alert_id).first()
+        row = db.query(
+            Alert.id, Alert.imagem_sha256, Alert.imagem_mime_type, Alert.imagem_variantes, Alert.created_at,
+            func.length(Alert.imagem_blob).label("tamanho_blob"),
+        ).filter(Alert.id == alert_id).first()
         
-        if not alert:
+        if not row:
             raise HTTPException(status_code=404, detail="Alerta não encontrado")
-            
-        if not alert.imagem_blob:
-            raise HTTPException(status_code=404, detail="Este alerta não possui imagem")
 
-        mime_type = alert.imagem_mime_type or "image/jpeg"
-        
-        return StreamingResponse(
-            BytesIO(alert.imagem_blob),
-            media_type=mime_type,
-            headers={
-                "Content-Disposition": f"inline; filename=alerta_{alert_id}.jpg",
-                "Cache-Control": "public, max-age=3600"
-            }
+        sha, mime, nome = row.imagem_sha256, row.imagem_mime_type or "image/jpeg", f"alerta_{alert_id}"
+        variantes = row.imagem_variantes or []
+        if w and variantes:
+            escolhida = next((v for v in variantes if v["largura"] >= w), variantes[-1])
+            sha, mime, nome = escolhida["sha256"], "image/webp", f"alerta_{alert_id}_{escolhida['largura']}.webp"
+
+        def _legado(inicio, tamanho):
+            coluna = Alert.imagem_blob if tamanho is None else func.substring(Alert.imagem_blob, inicio + 1, tamanho)
+            return db.query(coluna).filter(Alert.id == alert_id).scalar()
+
+        return responder_blob(
+            request,
+            sha=sha,
+            nome=nome,
+            mime=mime,
+            modificado_em=row.created_at,
+            carregar_legado=_legado if row.tamanho_blob is not None and sha == row.imagem_sha256 else None,
+            tamanho_legado=row.tamanho_blob,
+            cache_control=CACHE_IMAGEM,
         )
         
+    except ConteudoIndisponivel:
+        raise HTTPException(status_code=404, detail="Este alerta não possui imagem")
     except HTTPException:
         raise
     except Exception as e:
@@ -415,7 +459,8 @@ def debug_test(db: Session = Depends(get_db)):
                 "id", "title", "message", "description",
                 "severity", "pages", "show_on_home", "created_by", "ativo",
                 "created_at", "updated_at",
-                "imagem_blob", "imagem_mime_type"
+                "imagem_blob", "imagem_mime_type", "imagem_sha256",
+                "imagem_largura", "imagem_altura", "imagem_variantes"
             ]
         }
     except Exception as e:
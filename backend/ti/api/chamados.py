@@ -1,31 +1,54 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Body
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Body, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
-from core.db import get_db, engine
+from core.db import get_db, engine, SessionLocal
+from core.downloads import ConteudoIndisponivel, responder_blob
+from core.uploads import UPLOAD_MAX_ANEXO, ingerir, validar_tamanhos
+from core.post_commit import after_commit
 from auth0.validator import get_current_user
 from ti.schemas.chamado import (
     ChamadoCreate,
     ChamadoOut,
+    ChamadoPage,
+    ChamadoBulkRequest,
+    ChamadoBulkResult,
+    ChamadoSearchPage,
     ChamadoStatusUpdate,
     ChamadoDeleteRequest,
     ALLOWED_STATUSES,
 )
 from ti.services.chamados import criar_chamado as service_criar
+from ti.services.chamados import listar_chamados_paginado
+from ti.services.chamados_search import buscar_chamados
+from ti.services.export import CHAMADOS as CHAMADOS_EXPORT, streaming_export
+from ti.services.importacao import IMPORTACAO_LOTE, IMPORTAR_CHAMADOS, salvar_upload, status_importacao
+from ti.api.jobs import submeter
+from ti.services.arquivamento import (
+    ARQUIVAR_CHAMADOS,
+    listar_arquivados,
+    obter_chamado_arquivado,
+    status_arquivamento,
+    tabela_arquivo,
+)
+from ti.services import historico_cache
 from ti.services.sla import SLACalculator
 from ti.services.sla_cache import SLACacheManager
 from ti.models.sla_config import HistoricoSLA
-from core.realtime import sio
+from core.realtime import sio, emit_sync
 from werkzeug.security import check_password_hash
 from ..models.notification import Notification
 import json
+import os
 from core.utils import now_brazil_naive
 from ..models import Chamado, User, TicketAnexo, ChamadoAnexo, HistoricoTicket, HistoricoStatus, HistoricoAnexo
 from ti.schemas.attachment import AnexoOut
 from ti.schemas.ticket import HistoricoItem, HistoricoResponse
 from sqlalchemy import inspect, text
-from core.email_msgraph import send_async, send_chamado_abertura, send_chamado_status
+from core.email_msgraph import enqueue_chamado_abertura, enqueue_chamado_status, enqueue_mail
+from core import email_anexos
 
 from fastapi.responses import Response
 
@@ -46,6 +69,77 @@ async def get_optional_user(credentials: HTTPAuthorizationCredentials = Depends(
         return None
 
 
+def _registrar_sla(
+    db: Session,
+    chamado: Chamado,
+    status_anterior: str | None = None,
+    historicos_cache: dict | None = None,
+    sla_configs: dict | None = None,
+    ultimos_sla: dict[int, HistoricoSLA] | None = None,
+) -> None:
+    """
+    Grava/atualiza o histórico de SLA do chamado na transação corrente (sem commit).
+    Em lote, recebe os prefetches (históricos, configurações e último
+    HistoricoSLA por chamado) para não consultar o banco por chamado.
+    """
+    sla_status = SLACalculator.get_sla_status(
+        db, chamado, historicos_cache=historicos_cache, sla_configs=sla_configs
+    )
+
+    # Extrai métricas de resposta e resolução
+    resposta_metric = sla_status.get("resposta_metric")
+    resolucao_metric = sla_status.get("resolucao_metric")
+
+    tempo_resposta_horas = resposta_metric.get("tempo_decorrido_horas") if resposta_metric else None
+    limite_sla_resposta_horas = resposta_metric.get("tempo_limite_horas") if resposta_metric else None
+    tempo_resolucao_horas = resolucao_metric.get("tempo_decorrido_horas") if resolucao_metric else None
+    limite_sla_horas = resolucao_metric.get("tempo_limite_horas") if resolucao_metric else None
+
+    # Procura por histórico existente
+    if ultimos_sla is not None:
+        existing = ultimos_sla.get(chamado.id)
+    else:
+        existing = db.query(HistoricoSLA).filter(
+            HistoricoSLA.chamado_id == chamado.id
+        ).order_by(HistoricoSLA.criado_em.desc()).first()
+
+    if existing:
+        # Atualiza o último histórico com novos cálculos
+        existing.status_novo = chamado.status
+        existing.status_anterior = status_anterior or existing.status_anterior
+        existing.tempo_resposta_horas = tempo_resposta_horas
+        existing.limite_sla_resposta_horas = limite_sla_resposta_horas
+        existing.tempo_resolucao_horas = tempo_resolucao_horas
+        existing.limite_sla_horas = limite_sla_horas
+        existing.status_sla = sla_status.get("status_geral")
+        db.add(existing)
+    else:
+        # Cria novo histórico
+        historico = HistoricoSLA(
+            chamado_id=chamado.id,
+            usuario_id=None,
+            acao="criacao" if not status_anterior else "atualizacao",
+            status_anterior=status_anterior,
+            status_novo=chamado.status,
+            tempo_resposta_horas=tempo_resposta_horas,
+            limite_sla_resposta_horas=limite_sla_resposta_horas,
+            tempo_resolucao_horas=tempo_resolucao_horas,
+            limite_sla_horas=limite_sla_horas,
+            status_sla=sla_status.get("status_geral"),
+            criado_em=chamado.data_abertura or now_brazil_naive(),
+        )
+        db.add(historico)
+
+
+def _atualizar_caches_sla(db: Session, chamado_id: int) -> None:
+    # INVALIDAÇÃO DE CACHE: Quando um chamado é atualizado, invalida caches relacionados
+    SLACacheManager.invalidate_by_chamado(db, chamado_id)
+
+    # ATUALIZAÇÃO INCREMENTAL DE MÉTRICAS: Recalcula apenas o chamado afetado
+    from ti.services.cache_manager_incremental import IncrementalMetricsCache
+    IncrementalMetricsCache.update_for_chamado(db, chamado_id)
+
+
 def _sincronizar_sla(db: Session, chamado: Chamado, status_anterior: str | None = None) -> None:
     """
     Função auxiliar para sincronizar um chamado com a tabela de histórico de SLA.
@@ -58,57 +152,9 @@ def _sincronizar_sla(db: Session, chamado: Chamado, status_anterior: str | None
         except Exception:
             pass
 
-        sla_status = SLACalculator.get_sla_status(db, chamado)
-
-        # Extrai métricas de resposta e resolução
-        resposta_metric = sla_status.get("resposta_metric")
-        resolucao_metric = sla_status.get("resolucao_metric")
-
-        tempo_resposta_horas = resposta_metric.get("tempo_decorrido_horas") if resposta_metric else None
-        limite_sla_resposta_horas = resposta_metric.get("tempo_limite_horas") if resposta_metric else None
-        tempo_resolucao_horas = resolucao_metric.get("tempo_decorrido_horas") if resolucao_metric else None
-        limite_sla_horas = resolucao_metric.get("tempo_limite_horas") if resolucao_metric else None
-
-        # Procura por histórico existente
-        existing = db.query(HistoricoSLA).filter(
-            HistoricoSLA.chamado_id == chamado.id
-        ).order_by(HistoricoSLA.criado_em.desc()).first()
-
-        if existing:
-            # Atualiza o último histórico com novos cálculos
-            existing.status_novo = chamado.status
-            existing.status_anterior = status_anterior or existing.status_anterior
-            existing.tempo_resposta_horas = tempo_resposta_horas
-            existing.limite_sla_resposta_horas = limite_sla_resposta_horas
-            existing.tempo_resolucao_horas = tempo_resolucao_horas
-            existing.limite_sla_horas = limite_sla_horas
-            existing.status_sla = sla_status.get("status_geral")
-            db.add(existing)
-        else:
-            # Cria novo histórico
-            historico = HistoricoSLA(
-                chamado_id=chamado.id,
-                usuario_id=None,
-                acao="criacao" if not status_anterior else "atualizacao",
-                status_anterior=status_anterior,
-                status_novo=chamado.status,
-                tempo_resposta_horas=tempo_resposta_horas,
-                limite_sla_resposta_horas=limite_sla_resposta_horas,
-                tempo_resolucao_horas=tempo_resolucao_horas,
-                limite_sla_horas=limite_sla_horas,
-                status_sla=sla_status.get("status_geral"),
-                criado_em=chamado.data_abertura or now_brazil_naive(),
-            )
-            db.add(historico)
-
+        _registrar_sla(db, chamado, status_anterior)
         db.commit()
-
-        # INVALIDA��ÃO DE CACHE: Quando um chamado é atualizado, invalida caches relacionados
-        SLACacheManager.invalidate_by_chamado(db, chamado.id)
-
-        # ATUALIZAÇÃO INCREMENTAL DE MÉTRICAS: Recalcula apenas o chamado afetado
-        from ti.services.cache_manager_incremental import IncrementalMetricsCache
-        IncrementalMetricsCache.update_for_chamado(db, chamado.id)
+        _atualizar_caches_sla(db, chamado.id)
 
     except Exception as e:
         db.rollback()
@@ -116,6 +162,50 @@ def _sincronizar_sla(db: Session, chamado: Chamado, status_anterior: str | None
         pass
 
 
+# ---------------------------------------------------------------------------
+# Efeitos pós-commit (core.post_commit): rodam em background com sessão própria
+# ---------------------------------------------------------------------------
+
+def _efeito_metricas_status(chamado_id: int, cancelado: bool) -> None:
+    """Atualiza contadores/caches de SLA do chamado e emite metrics:updated"""
+    from ti.services.cache_manager_incremental import ChamadosTodayCounter, IncrementalMetricsCache
+    db = SessionLocal()
+    try:
+        # DECREMENTAR CONTADOR DE HOJE SE CANCELADO
+        if cancelado:
+            ChamadosTodayCounter.decrement(db, 1)
+        _atualizar_caches_sla(db, chamado_id)
+
+        # EMITE ATUALIZAÇÃO DE MÉTRICAS EM TEMPO REAL (quando status muda)
+        metricas = IncrementalMetricsCache.get_metrics(db)
+        emit_sync("metrics:updated", {
+            "sla_metrics": metricas,
+            "timestamp": now_brazil_naive().isoformat(),
+        })
+    finally:
+        db.close()
+
+
+def _efeito_emitir(eventos: list[tuple[str, dict]]) -> None:
+    for nome, dados in eventos:
+        emit_sync(nome, dados)
+
+
+def _notification_payload(n: Notification) -> dict:
+    return {
+        "id": n.id,
+        "tipo": n.tipo,
+        "titulo": n.titulo,
+        "mensagem": n.mensagem,
+        "recurso": n.recurso,
+        "recurso_id": n.recurso_id,
+        "acao": n.acao,
+        "dados": n.dados,
+        "lido": n.lido,
+        "criado_em": n.criado_em.isoformat() if n.criado_em else None,
+    }
+
+
 def _normalize_status(s: str) -> str:
     """
     Normaliza o status para o formato padrão.
@@ -184,6 +274,144 @@ def listar_chamados(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erro ao listar chamados: {e}")
 
 
+@router.get("/paginado", response_model=ChamadoPage)
+def listar_chamados_pagina(
+    limit: int = 50,
+    cursor: str | None = None,
+    status: str = "",
+    prioridade: str = "",
+    unidade: str | None = None,
+    data_inicio: date | None = None,
+    data_fim: date | None = None,
+    atribuido_a: int | None = None,
+    fields: str | None = None,
+    include_total: bool = True,
+    db: Session = Depends(get_db),
+):
+    """
+    Lista chamados paginados por cursor.
+
+    Query params:
+    - limit: itens por página (máx. 200)
+    - cursor: valor de next_cursor da página anterior
+    - status, prioridade: listas separadas por vírgula
+    - unidade, atribuido_a, data_inicio, data_fim: filtros opcionais
+    - fields: projeção separada por vírgula (ex: id,codigo,status)
+    """
+    try:
+        return listar_chamados_paginado(
+            db,
+            limit=limit,
+            cursor=cursor,
+            status=status,
+            prioridade=prioridade,
+            unidade=unidade,
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            atribuido_a=atribuido_a,
+            fields=fields,
+            include_total=include_total,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao listar chamados: {e}")
+
+
+@router.get("/search", response_model=ChamadoSearchPage)
+def buscar(q: str, limit: int = 20, offset: int = 0, db: Session = Depends(get_db)):
+    """
+    Busca chamados por codigo/protocolo (prefixo) e por texto em
+    descrição, solicitante e problema, ordenados por relevância.
+    """
+    try:
+        return buscar_chamados(db, q, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar chamados: {e}")
+
+
+@router.get("/export")
+def exportar_chamados(
+    formato: str = "csv",
+    inicio: datetime | None = None,
+    fim: datetime | None = None,
+    desde: datetime | None = None,
+    incluir_deletados: bool = False,
+):
+    """
+    Exportação em streaming (CSV, NDJSON ou Parquet) com memória constante.
+
+    - inicio/fim: período de data_abertura
+    - desde: incremental por atualizado_em; use o header X-Export-Watermark
+      da exportação anterior. Inclui chamados excluídos (deletado_em)
+      para que o consumidor os remova
+    """
+    filtros = [] if (desde is not None or incluir_deletados) else ["deletado_em IS NULL"]
+    try:
+        return streaming_export(CHAMADOS_EXPORT, formato, inicio, fim, desde, filtros)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/import", status_code=202)
+def importar(
+    arquivo: UploadFile = File(...),
+    formato: str | None = Form(None),
+    calcular_sla: bool = Form(True),
+    lote: int = Form(IMPORTACAO_LOTE),
+):
+    """
+    Importação em lote de chamados históricos (CSV com cabeçalho ou NDJSON).
+    Sem notificações/emails por linha; SLA calculado numa passada no fim.
+    Roda como job: acompanhe em GET /api/jobs/{job_id} (resultado com
+    inseridos/ignorados/invalidos e erros por linha) ou GET /chamados/import/status.
+    """
+    nome = (arquivo.filename or "").lower()
+    fmt = (formato or ("ndjson" if nome.endswith((".ndjson", ".jsonl")) else "csv")).lower()
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Formato inválido (use csv ou ndjson)")
+    caminho = salvar_upload(arquivo.file)
+    try:
+        resposta = submeter(IMPORTAR_CHAMADOS, {
+            "caminho": caminho,
+            "formato": fmt,
+            "calcular_sla": calcular_sla,
+            "lote": max(1, min(lote, 5000)),
+        })
+    except HTTPException:
+        os.unlink(caminho)
+        raise
+    if json.loads(resposta.body).get("deduplicado"):
+        # Já há uma importação em andamento; este arquivo não será lido
+        os.unlink(caminho)
+    return resposta
+
+
+@router.get("/import/status")
+def obter_status_importacao():
+    return status_importacao()
+
+
+@router.post("/arquivamento", status_code=202)
+def executar_arquivamento(meses: int = 12, lote: int = 500, max_lotes: int | None = None):
+    """
+    Move chamados Concluídos/Cancelados há mais de `meses` meses (com históricos
+    e metadados de anexos) para as tabelas *_arquivo, em lotes transacionais.
+    Executa em background (job); acompanhe em GET /jobs/{job_id}.
+    Pode ser interrompido e executado novamente sem perda.
+    """
+    if meses < 1:
+        raise HTTPException(status_code=400, detail="meses deve ser >= 1")
+    return submeter(ARQUIVAR_CHAMADOS, {"meses": meses, "lote": max(1, lote), "max_lotes": max_lotes})
+
+
+@router.get("/arquivamento/status")
+def obter_status_arquivamento():
+    return status_arquivamento()
+
+
 @router.post("", response_model=ChamadoOut)
 def criar_chamado(payload: ChamadoCreate, db: Session = Depends(get_db), user: dict = None):
     try:
@@ -254,11 +482,10 @@ def criar_chamado(payload: ChamadoCreate, db: Session = Depends(get_db), user: d
             print(f"[WebSocket] Erro ao emitir eventos: {e}")
             pass
         try:
-            print(f"[CHAMADOS] 📧 Chamado {ch.codigo} criado. Disparando envio de email de abertura...")
-            send_async(send_chamado_abertura, ch)
-            print(f"[CHAMADOS] ✅ send_async() foi chamado com sucesso para send_chamado_abertura")
+            print(f"[CHAMADOS] 📧 Chamado {ch.codigo} criado. Enfileirando email de abertura...")
+            enqueue_chamado_abertura(ch)
         except Exception as e:
-            print(f"[CHAMADOS] ❌ ERRO ao chamar send_async para send_chamado_abertura: {type(e).__name__}: {e}")
+            print(f"[CHAMADOS] ❌ ERRO ao enfileirar email de abertura: {type(e).__name__}: {e}")
             import traceback
             traceback.print_exc()
         db.refresh(ch)
@@ -283,6 +510,7 @@ def _ensure_column(table: str, column: str, ddl: str) -> None:
         if column not in _cols(table):
             with engine.connect() as conn:
                 conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+            _anexo_sql.clear()
     except Exception:
         pass
 
@@ -315,8 +543,23 @@ def _update_path(db: Session, table: str, rid: int, path: str) -> None:
         db.execute(text(f"UPDATE {table} SET arquivo_caminho=:p WHERE id=:i"), {"p": path, "i": rid})
 
 
+# SELECTs de anexo por tabela, montados uma vez por processo (evita
+# refletir information_schema a cada requisição)
+_anexo_sql: dict[tuple[str, str], str] = {}
+
+
 def _select_anexo_query(table: str) -> str:
-    cols = _cols(table)
+    key = ("anexo", table)
+    sql = _anexo_sql.get(key)
+    if sql is None:
+        cols = _cols(table)
+        sql = _build_anexo_query(table, cols)
+        if cols:  # tabela ainda inexistente (ex: arquivo) não é memorizada
+            _anexo_sql[key] = sql
+    return sql
+
+
+def _build_anexo_query(table: str, cols: set[str]) -> str:
     name_expr = ("nome_original" if "nome_original" in cols else ("arquivo_nome" if "arquivo_nome" in cols else "NULL")) + " AS nome_original"
     path_expr = ("caminho_arquivo" if "caminho_arquivo" in cols else ("arquivo_caminho" if "arquivo_caminho" in cols else "NULL")) + " AS caminho_arquivo"
     mime_expr = ("tipo_mime" if "tipo_mime" in cols else ("mime_type" if "mime_type" in cols else "NULL")) + " AS tipo_mime"
@@ -326,12 +569,35 @@ def _select_anexo_query(table: str) -> str:
 
 
 def _select_download_query(table: str) -> str:
-    cols = _cols(table)
+    key = ("download", table)
+    sql = _anexo_sql.get(key)
+    if sql is None:
+        cols = _cols(table)
+        sql = _build_download_query(table, cols)
+        if cols:  # tabela ainda inexistente (ex: arquivo) não é memorizada
+            _anexo_sql[key] = sql
+    return sql
+
+
+def _build_download_query(table: str, cols: set[str]) -> str:
+    """Somente metadados: o conteúdo legado é lido à parte (_conteudo_legado)"""
     nome_arq = ("nome_arquivo" if "nome_arquivo" in cols else ("arquivo_nome" if "arquivo_nome" in cols else "NULL")) + " AS nome_arquivo"
     nome_orig = ("nome_original" if "nome_original" in cols else ("arquivo_nome" if "arquivo_nome" in cols else "NULL")) + " AS nome_original"
     mime_expr = ("tipo_mime" if "tipo_mime" in cols else ("mime_type" if "mime_type" in cols else "NULL")) + " AS tipo_mime"
-    conteudo = ("conteudo" if "conteudo" in cols else "NULL") + " AS conteudo"
-    return f"SELECT id, {nome_arq}, {nome_orig}, {mime_expr}, {conteudo} FROM {table} WHERE id=:i"
+    legado = ("LENGTH(conteudo)" if "conteudo" in cols else "NULL") + " AS tamanho_conteudo"
+    hash_expr = ("hash_arquivo" if "hash_arquivo" in cols else "NULL") + " AS hash_arquivo"
+    date_expr = ("data_upload" if "data_upload" in cols else ("criado_em" if "criado_em" in cols else "NULL")) + " AS data_upload"
+    return f"SELECT id, {nome_arq}, {nome_orig}, {mime_expr}, {legado}, {hash_expr}, {date_expr} FROM {table} WHERE id=:i"
+
+
+def _conteudo_legado(db: Session, table: str, anexo_id: int, inicio: int = 0, tamanho: int | None = None) -> bytes | None:
+    """Conteúdo legado inteiro ou só o trecho [inicio, inicio+tamanho) (SUBSTRING é 1-based)"""
+    if tamanho is None:
+        return db.execute(text(f"SELECT conteudo FROM {table} WHERE id=:i"), {"i": anexo_id}).scalar()
+    return db.execute(
+        text(f"SELECT SUBSTRING(conteudo, :ini, :n) FROM {table} WHERE id=:i"),
+        {"i": anexo_id, "ini": inicio + 1, "n": tamanho},
+    ).scalar()
 
 
 @router.post("/with-attachments", response_model=ChamadoOut)
@@ -356,6 +622,7 @@ def criar_chamado_com_anexos(
             _ensure_column("chamado_anexo", "conteudo", "MEDIUMBLOB NULL")
         except Exception:
             pass
+        validar_tamanhos(files, UPLOAD_MAX_ANEXO)
         payload = ChamadoCreate(
             solicitante=solicitante,
             cargo=cargo,
@@ -381,14 +648,12 @@ def criar_chamado_com_anexos(
         _sincronizar_sla(db, ch)
 
         if files:
-            import hashlib
             saved = 0
+            refs_email = []
             for f in files:
                 try:
                     safe_name = (f.filename or "arquivo")
-                    content = f.file.read()
-                    ext = safe_name.rsplit(".", 1)[-1].lower() if "." in safe_name else None
-                    sha = hashlib.sha256(content).hexdigest()
+                    arquivo = ingerir(f, UPLOAD_MAX_ANEXO)
                     now = now_brazil_naive()
                     rid = _insert_attachment(db, "chamado_anexo", {
                         "chamado_id": ch.id,
@@ -397,69 +662,44 @@ def criar_chamado_com_anexos(
                         "arquivo_nome": safe_name,
                         "caminho_arquivo": "pending",
                         "arquivo_caminho": "pending",
-                        "tamanho_bytes": len(content),
+                        "tamanho_bytes": arquivo.tamanho,
                         "tipo_mime": f.content_type or None,
-                        "extensao": ext or None,
-                        "hash_arquivo": sha,
+                        "extensao": arquivo.extensao,
+                        "hash_arquivo": arquivo.sha256,
                         "data_upload": now,
                         "criado_em": now,
                         "usuario_upload_id": user_id,
                         "descricao": None,
                         "ativo": True,
-                        "conteudo": content,
                     })
                     if rid:
                         _update_path(db, "chamado_anexo", rid, f"api/chamados/anexos/chamado/{rid}")
                         saved += 1
+                        refs_email.append(email_anexos.referencia(
+                            "chamado_anexo", rid, safe_name, f.content_type, arquivo.tamanho, arquivo.sha256,
+                        ))
+                except HTTPException:
+                    raise
                 except Exception:
                     continue
             db.commit()
             if files and saved == 0:
                 raise HTTPException(status_code=500, detail="Falha ao salvar anexos da abertura")
-            # Try to gather saved attachments and send them with the opening email
+            # e-mail de abertura só com referências: os bytes são lidos no envio (core/email_anexos)
             try:
-                attach_rows = db.execute(text("SELECT id, nome_original, tipo_mime FROM chamado_anexo WHERE chamado_id=:i"), {"i": ch.id}).fetchall()
-                attachments_payload = []
-                import base64
-                for ar in attach_rows:
-                    try:
-                        aid = int(ar[0])
-                        nome = ar[1] or f"anexo_{aid}"
-                        mime = ar[2] or "application/octet-stream"
-                        res = db.execute(text(_select_download_query("chamado_anexo")), {"i": aid}).fetchone()
-                        if res and res[4]:
-                            content = res[4]
-                            b64 = base64.b64encode(content).decode("ascii")
-                            attachments_payload.append({
-                                "name": nome,
-                                "contentType": mime,
-                                "contentBytes": b64,
-                            })
-                    except Exception:
-                        continue
-                # send async email with attachments
-                try:
-                    print(f"[CHAMADOS] 📧 Chamado {ch.codigo} criado com anexos. Disparando envio de email...")
-                    if attachments_payload:
-                        send_async(send_chamado_abertura, ch, attachments_payload)
-                        print(f"[CHAMADOS] ✅ send_async() chamado com {len(attachments_payload)} anexo(s)")
-                    else:
-                        send_async(send_chamado_abertura, ch)
-                        print(f"[CHAMADOS] ✅ send_async() chamado sem anexos")
-                except Exception as e:
-                    print(f"[CHAMADOS] ❌ ERRO ao chamar send_async: {type(e).__name__}: {e}")
-                    import traceback
-                    traceback.print_exc()
-            except Exception:
-                pass
+                print(f"[CHAMADOS] 📧 Chamado {ch.codigo} criado com {len(refs_email)} anexo(s). Enfileirando email...")
+                enqueue_chamado_abertura(ch, refs_email or None)
+            except Exception as e:
+                print(f"[CHAMADOS] ❌ ERRO ao enfileirar email de abertura: {type(e).__name__}: {e}")
+                import traceback
+                traceback.print_exc()
         else:
             # No files: still send the opening email
             try:
-                print(f"[CHAMADOS] 📧 Chamado {ch.codigo} criado sem anexos. Disparando envio de email...")
-                send_async(send_chamado_abertura, ch)
-                print(f"[CHAMADOS] ✅ send_async() foi chamado com sucesso")
+                print(f"[CHAMADOS] 📧 Chamado {ch.codigo} criado sem anexos. Enfileirando email...")
+                enqueue_chamado_abertura(ch)
             except Exception as e:
-                print(f"[CHAMADOS] ❌ ERRO ao chamar send_async: {type(e).__name__}: {e}")
+                print(f"[CHAMADOS] ❌ ERRO ao enfileirar email de abertura: {type(e).__name__}: {e}")
                 import traceback
                 traceback.print_exc()
 
@@ -487,6 +727,8 @@ def criar_chamado_com_anexos(
             pass
 
         return ch
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao criar chamado com anexos: {e}")
 
@@ -509,6 +751,8 @@ def enviar_ticket(
         if not chamado:
             raise HTTPException(status_code=404, detail="Chamado não encontrado")
 
+        validar_tamanhos(files, UPLOAD_MAX_ANEXO)
+
         # garantir tabelas necessárias para anexos de ticket
         TicketAnexo.__table__.create(bind=engine, checkfirst=True)
         _ensure_column("ticket_anexos", "conteudo", "MEDIUMBLOB NULL")
@@ -530,18 +774,16 @@ def enviar_ticket(
         )
         db.add(h)
         db.commit()
+        historico_cache.invalidate(chamado_id)
         db.refresh(h)
         h_id = h.id
         # salvar anexos em tickets_anexos com metadados e caminho
         if files:
-            import hashlib
             saved = 0
             for f in files:
                 try:
                     safe_name = (f.filename or "arquivo")
-                    content = f.file.read()
-                    ext = safe_name.rsplit(".", 1)[-1].lower() if "." in safe_name else None
-                    sha = hashlib.sha256(content).hexdigest()
+                    arquivo = ingerir(f, UPLOAD_MAX_ANEXO)
                     now = now_brazil_naive()
                     rid = _insert_attachment(db, "ticket_anexos", {
                         "chamado_id": chamado_id,
@@ -550,31 +792,32 @@ def enviar_ticket(
                         "arquivo_nome": safe_name,
                         "caminho_arquivo": "pending",
                         "arquivo_caminho": "pending",
-                        "tamanho_bytes": len(content),
+                        "tamanho_bytes": arquivo.tamanho,
                         "tipo_mime": f.content_type or None,
-                        "extensao": ext or None,
-                        "hash_arquivo": sha,
+                        "extensao": arquivo.extensao,
+                        "hash_arquivo": arquivo.sha256,
                         "data_upload": now,
                         "criado_em": now,
                         "usuario_upload_id": user_id,
                         "descricao": None,
                         "ativo": True,
                         "origem": "ticket",
-                        "conteudo": content,
                     })
                     if rid:
                         _update_path(db, "ticket_anexos", rid, f"api/chamados/anexos/ticket/{rid}")
                         saved += 1
+                except HTTPException:
+                    raise
                 except Exception:
                     continue
             db.commit()
+            historico_cache.invalidate(chamado_id)
             if files and saved == 0:
                 raise HTTPException(status_code=500, detail="Falha ao salvar anexos do ticket")
         # Enviar email de ticket enviado
         try:
             print(f"[CHAMADOS] 📧 Ticket #{h_id} enviado para chamado {chamado_id}. Disparando email...")
             # Construir e-mail de ticket enviado
-            from core.email_msgraph import send_mail
             subject = f"[Evoque TI] Novo ticket - Chamado {chamado.codigo}"
             html_body = f"""
             <p>Olá,</p>
@@ -587,74 +830,156 @@ def enviar_ticket(
             # Enviamos para os destinatários especificados e CC para TI
             to_emails = [e.strip() for e in destinatarios.split(';') if e.strip()] if destinatarios else []
             if to_emails:
-                send_async(send_mail, subject, html_body, to=to_emails)
+                enqueue_mail(subject, html_body, to=to_emails, origem="ticket")
                 print(f"[CHAMADOS] ✅ Email de ticket enviado para {len(to_emails)} destinatário(s)")
         except Exception as e:
             print(f"[CHAMADOS] ❌ ERRO ao enviar email de ticket: {type(e).__name__}: {e}")
             import traceback
             traceback.print_exc()
         return {"ok": True, "historico_id": h_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao enviar ticket: {e}")
 
 
-@router.get("/anexos/chamado/{anexo_id}")
-def baixar_anexo_chamado(anexo_id: int, db: Session = Depends(get_db)):
-    sql = _select_download_query("chamado_anexo")
-    res = db.execute(text(sql), {"i": anexo_id}).fetchone()
-    if not res or not res[4]:
+def _fetch_download(db: Session, table: str, anexo_id: int):
+    """(tabela de origem, linha de metadados) — a origem pode ser a tabela de arquivo"""
+    res = db.execute(text(_select_download_query(table)), {"i": anexo_id}).fetchone()
+    if not res and _table_exists(tabela_arquivo(table)):
+        # Leitura transparente de chamados arquivados
+        table = tabela_arquivo(table)
+        res = db.execute(text(_select_download_query(table)), {"i": anexo_id}).fetchone()
+    return table, res
+
+
+def _baixar_anexo(request: Request, db: Session, table: str, anexo_id: int) -> Response:
+    """Download com ETag (hash), Last-Modified e Range; 304 não lê a coluna legada e trechos leem só o intervalo"""
+    origem, res = _fetch_download(db, table, anexo_id)
+    if not res:
         raise HTTPException(status_code=404, detail="Anexo não encontrado")
-    nome = res[1] or res[2] or f"anexo_{anexo_id}"
-    mime = res[3] or "application/octet-stream"
-    headers = {"Content-Disposition": f"inline; filename={nome}"}
-    return Response(content=res[4], media_type=mime, headers=headers)
+    try:
+        return responder_blob(
+            request,
+            sha=res[5],
+            nome=res[1] or res[2] or f"anexo_{anexo_id}",
+            mime=res[3],
+            modificado_em=res[6] if isinstance(res[6], datetime) else None,
+            carregar_legado=(lambda ini, n: _conteudo_legado(db, origem, anexo_id, ini, n)) if res[4] is not None else None,
+            tamanho_legado=res[4],
+        )
+    except ConteudoIndisponivel:
+        raise HTTPException(status_code=404, detail="Anexo não encontrado")
+
+
+@router.get("/anexos/chamado/{anexo_id}")
+def baixar_anexo_chamado(anexo_id: int, request: Request, db: Session = Depends(get_db)):
+    return _baixar_anexo(request, db, "chamado_anexo", anexo_id)
 
 
 @router.get("/anexos/ticket/{anexo_id}")
-def baixar_anexo_ticket(anexo_id: int, db: Session = Depends(get_db)):
-    sql = _select_download_query("ticket_anexos")
-    res = db.execute(text(sql), {"i": anexo_id}).fetchone()
-    if not res or not res[4]:
-        raise HTTPException(status_code=404, detail="Anexo não encontrado")
-    nome = res[1] or res[2] or f"anexo_{anexo_id}"
-    mime = res[3] or "application/octet-stream"
-    headers = {"Content-Disposition": f"inline; filename={nome}"}
-    return Response(content=res[4], media_type=mime, headers=headers)
+def baixar_anexo_ticket(anexo_id: int, request: Request, db: Session = Depends(get_db)):
+    return _baixar_anexo(request, db, "ticket_anexos", anexo_id)
+
+
+class _AnexoRow:
+    def __init__(self, r):
+        self.id, self.nome_original, self.caminho_arquivo, self.mime_type, self.tamanho_bytes, self.data_upload = r
 
 
 @router.get("/{chamado_id}/historico", response_model=HistoricoResponse)
 def obter_historico(chamado_id: int, db: Session = Depends(get_db)):
+    """
+    Linha do tempo do chamado: uma consulta por fonte (anexos de abertura,
+    historico_status ou notificações, historicos_tickets, anexos de ticket)
+    e uma única consulta de usuários. Resposta em cache curto por chamado.
+    """
+    cached = historico_cache.get(chamado_id)
+    if cached is not None:
+        return cached
+
+    items: list[HistoricoItem] = []
     try:
-        items: list[HistoricoItem] = []
         ch = db.query(Chamado).filter(
             (Chamado.id == chamado_id) & (Chamado.deletado_em.is_(None))
         ).first()
+        arquivado = False
+        if not ch:
+            ch = obter_chamado_arquivado(db, chamado_id)
+            arquivado = ch is not None
         if not ch:
             raise HTTPException(status_code=404, detail="Chamado não encontrado")
-        # anexos enviados na abertura (chamado_anexo) e descrição do chamado
-        sql_an = _select_anexo_query("chamado_anexo") + " WHERE chamado_id=:i ORDER BY data_upload ASC"
-        rows = db.execute(text(sql_an), {"i": chamado_id}).fetchall()
+        anexo_table = tabela_arquivo("chamado_anexo") if arquivado else "chamado_anexo"
+        ticket_anexo_table = tabela_arquivo("ticket_anexos") if arquivado else "ticket_anexos"
+
+        # 1. Busca em lote de cada fonte
+        rows = db.execute(
+            text(_select_anexo_query(anexo_table) + " WHERE chamado_id=:i ORDER BY data_upload ASC"),
+            {"i": chamado_id},
+        ).fetchall()
+
+        hs_rows: list = []
+        notas: list = []
+        try:
+            # Priorize historico_status for status events
+            if arquivado:
+                hs_rows = listar_arquivados(db, HistoricoStatus, chamado_id, "criado_em")
+            else:
+                hs_rows = db.query(HistoricoStatus).filter(
+                    HistoricoStatus.chamado_id == chamado_id
+                ).order_by(HistoricoStatus.criado_em.asc()).all()
+            # Fallback somente se não houver historico_status
+            if not hs_rows:
+                notas = db.query(Notification).filter(
+                    Notification.recurso == "chamado",
+                    Notification.recurso_id == chamado_id,
+                    Notification.acao == "status",
+                ).order_by(Notification.criado_em.asc()).all()
+        except Exception:
+            db.rollback()
+
+        # histórico (historico_tickets via ORM) - ignora se tabela não existir
+        tickets: list = []
+        ticket_anexos: list = []
+        try:
+            if arquivado:
+                tickets = listar_arquivados(db, HistoricoTicket, chamado_id, "data_envio")
+            else:
+                tickets = db.query(HistoricoTicket).filter(
+                    HistoricoTicket.chamado_id == chamado_id
+                ).order_by(HistoricoTicket.data_envio.asc()).all()
+            if tickets:
+                ticket_anexos = db.execute(
+                    text(_select_anexo_query(ticket_anexo_table) + " WHERE chamado_id=:i"),
+                    {"i": chamado_id},
+                ).fetchall()
+        except Exception:
+            db.rollback()
+
+        # 2. Uma única consulta para todos os usuários citados
+        user_ids = {ch.usuario_id} if ch.usuario_id else set()
+        user_ids.update(r.usuario_id for r in (*hs_rows, *notas, *tickets) if r.usuario_id)
+        usuarios = {
+            u.id: u for u in db.query(User).filter(User.id.in_(user_ids)).all()
+        } if user_ids else {}
+
+        def _autor(uid):
+            u = usuarios.get(uid) if uid else None
+            return (f"{u.nome} {u.sobrenome}", u.email) if u else (None, None)
+
+        # 3. Montagem da linha do tempo
         anexos_abertura = None
         first_dt = ch.data_abertura or now_brazil_naive()
         if rows:
             first_dt = rows[0][5] or first_dt
-            class _CA:
-                def __init__(self, r):
-                    self.id, self.nome_original, self.caminho_arquivo, self.mime_type, self.tamanho_bytes, self.data_upload = r
-            anexos_abertura = [AnexoOut.model_validate(_CA(r)) for r in rows]
+            anexos_abertura = [AnexoOut.model_validate(_AnexoRow(r)) for r in rows]
+
         # Item 1: Aberto em
-        usuario_abertura = None
-        usuario_nome_abertura = None
-        usuario_email_abertura = None
         if ch.usuario_id:
-            usuario_abertura = db.query(User).filter(User.id == ch.usuario_id).first()
-            if usuario_abertura:
-                usuario_nome_abertura = f"{usuario_abertura.nome} {usuario_abertura.sobrenome}"
-                usuario_email_abertura = usuario_abertura.email
+            usuario_nome_abertura, usuario_email_abertura = _autor(ch.usuario_id)
         else:
             # Fallback: usar solicitante e email do chamado se não houver usuario_id
-            usuario_nome_abertura = ch.solicitante
-            usuario_email_abertura = ch.email
+            usuario_nome_abertura, usuario_email_abertura = ch.solicitante, ch.email
 
         items.append(HistoricoItem(
             t=first_dt,
@@ -678,84 +1003,54 @@ def obter_historico(chamado_id: int, db: Session = Depends(get_db)):
                 usuario_email=usuario_email_abertura,
                 action_type="aberto_por",
             ))
-        try:
-            Notification.__table__.create(bind=engine, checkfirst=True)
-            HistoricoStatus.__table__.create(bind=engine, checkfirst=True)
-            # Priorize historico_status for status events
-            hs_rows = db.query(HistoricoStatus).filter(HistoricoStatus.chamado_id == chamado_id).order_by(HistoricoStatus.criado_em.asc()).all()
-            for r in hs_rows:
-                usuario = None
-                if r.usuario_id:
-                    usuario = db.query(User).filter(User.id == r.usuario_id).first()
-                items.append(HistoricoItem(
-                    t=r.criado_em or now_brazil_naive(),
-                    tipo="status",
-                    label=f"{r.status_anterior or 'Aberto'} → {r.status_novo}",
-                    anexos=None,
-                    usuario_id=r.usuario_id,
-                    usuario_nome=f"{usuario.nome} {usuario.sobrenome}" if usuario else None,
-                    usuario_email=usuario.email if usuario else None,
-                    action_type="alterado_por",
-                ))
-            # Fallback somente se não houver historico_status
-            if not hs_rows:
-                notas = db.query(Notification).filter(
-                    Notification.recurso == "chamado",
-                    Notification.recurso_id == chamado_id,
-                ).order_by(Notification.criado_em.asc()).all()
-                for n in notas:
-                    if n.acao == "status":
-                        usuario = None
-                        if n.usuario_id:
-                            usuario = db.query(User).filter(User.id == n.usuario_id).first()
-                        items.append(HistoricoItem(
-                            t=n.criado_em or now_brazil_naive(),
-                            tipo="status",
-                            label=n.mensagem or "Status atualizado",
-                            anexos=None,
-                            usuario_id=n.usuario_id,
-                            usuario_nome=f"{usuario.nome} {usuario.sobrenome}" if usuario else None,
-                            usuario_email=usuario.email if usuario else None,
-                            action_type="alterado_por",
-                        ))
-        except Exception:
-            pass
-        # histórico (historico_tickets via ORM) - ignora se tabela não existir
-        try:
-            hs = db.query(HistoricoTicket).filter(HistoricoTicket.chamado_id == chamado_id).order_by(HistoricoTicket.data_envio.asc()).all()
-        except Exception:
-            hs = []
-        for h in hs:
-            anexos_ticket = []
-            try:
-                from datetime import timedelta
-                start = (h.data_envio or now_brazil_naive()) - timedelta(minutes=3)
-                end = (h.data_envio or now_brazil_naive()) + timedelta(minutes=3)
-                sql_ta = _select_anexo_query("ticket_anexos") + " WHERE chamado_id=:i"
-                tas = db.execute(text(sql_ta), {"i": chamado_id}).fetchall()
-                for ta in tas:
-                    dt = ta[5]
-                    if dt and start <= dt <= end:
-                        class _A:
-                            id, nome_original, caminho_arquivo, mime_type, tamanho_bytes, data_upload = ta
-                        anexos_ticket.append(_A())
-            except Exception:
-                pass
-            usuario = None
-            if h.usuario_id:
-                usuario = db.query(User).filter(User.id == h.usuario_id).first()
+
+        for r in hs_rows:
+            nome, email = _autor(r.usuario_id)
             items.append(HistoricoItem(
-                t=h.data_envio or now_brazil_naive(),
+                t=r.criado_em or now_brazil_naive(),
+                tipo="status",
+                label=f"{r.status_anterior or 'Aberto'} → {r.status_novo}",
+                anexos=None,
+                usuario_id=r.usuario_id,
+                usuario_nome=nome,
+                usuario_email=email,
+                action_type="alterado_por",
+            ))
+        for n in notas:
+            nome, email = _autor(n.usuario_id)
+            items.append(HistoricoItem(
+                t=n.criado_em or now_brazil_naive(),
+                tipo="status",
+                label=n.mensagem or "Status atualizado",
+                anexos=None,
+                usuario_id=n.usuario_id,
+                usuario_nome=nome,
+                usuario_email=email,
+                action_type="alterado_por",
+            ))
+
+        # Anexos de ticket: associados ao envio com data_upload a até 3 minutos
+        janela = timedelta(minutes=3)
+        for h in tickets:
+            enviado = h.data_envio or now_brazil_naive()
+            anexos_ticket = [
+                AnexoOut.model_validate(_AnexoRow(ta)) for ta in ticket_anexos
+                if ta[5] and enviado - janela <= ta[5] <= enviado + janela
+            ]
+            nome, email = _autor(h.usuario_id)
+            items.append(HistoricoItem(
+                t=enviado,
                 tipo="ticket",
                 label=f"{h.assunto}",
-                anexos=[AnexoOut.model_validate(a) for a in anexos_ticket] if anexos_ticket else None,
+                anexos=anexos_ticket or None,
                 usuario_id=h.usuario_id,
-                usuario_nome=f"{usuario.nome} {usuario.sobrenome}" if usuario else None,
-                usuario_email=usuario.email if usuario else None,
+                usuario_nome=nome,
+                usuario_email=email,
                 action_type="ticket",
             ))
-        items_sorted = sorted(items, key=lambda x: x.t)
-        return HistoricoResponse(items=items_sorted)
+        resposta = HistoricoResponse(items=sorted(items, key=lambda x: x.t))
+        historico_cache.put(chamado_id, resposta)
+        return resposta
     except HTTPException:
         raise
     except Exception:
@@ -769,6 +1064,12 @@ def obter_historico(chamado_id: int, db: Session = Depends(get_db)):
 
 @router.patch("/{chamado_id}/status", response_model=ChamadoOut)
 def atualizar_status(chamado_id: int, payload: ChamadoStatusUpdate, db: Session = Depends(get_db), user: dict | None = Depends(get_optional_user)):
+    """
+    Unidade de trabalho: status, histórico de SLA, fechamento do histórico
+    anterior, novo historico_status e notificação numa única transação.
+    Eventos em tempo real, métricas e email rodam após o commit
+    (core.post_commit), fora do caminho da requisição.
+    """
     try:
         novo = _normalize_status(payload.status)
         if novo not in ALLOWED_STATUSES:
@@ -788,135 +1089,81 @@ def atualizar_status(chamado_id: int, payload: ChamadoStatusUpdate, db: Session
             if db_user:
                 user_id = db_user.id
 
+        agora = now_brazil_naive()
         prev = ch.status or "Aberto"
         ch.status = novo
         if prev == "Aberto" and novo != "Aberto" and ch.data_primeira_resposta is None:
-            ch.data_primeira_resposta = now_brazil_naive()
+            ch.data_primeira_resposta = agora
         if novo == "Concluído":
-            ch.data_conclusao = now_brazil_naive()
+            ch.data_conclusao = agora
         db.add(ch)
-        db.commit()  # garante persistência do status antes dos logs
-        db.refresh(ch)
-
-        # DECREMENTAR CONTADOR DE HOJE SE CANCELADO
-        if novo == "Cancelado" and prev != "Cancelado":
-            from ti.services.cache_manager_incremental import ChamadosTodayCounter
-            ChamadosTodayCounter.decrement(db, 1)
+        db.flush()
 
+        # Sincroniza automaticamente com tabela de SLA (mesma transação)
         try:
-            # Sincroniza automaticamente com tabela de SLA
-            _sincronizar_sla(db, ch, status_anterior=prev)
+            with db.begin_nested():
+                _registrar_sla(db, ch, status_anterior=prev)
         except Exception as e:
             print(f"[SYNC SLA ERROR] {e}")
-            db.rollback()
 
-        try:
-            Notification.__table__.create(bind=engine, checkfirst=True)
-            HistoricoTicket.__table__.create(bind=engine, checkfirst=True)
-            HistoricoStatus.__table__.create(bind=engine, checkfirst=True)
-
-            # FECHAR HISTÓRICO ANTERIOR: Se o último status não tem data_fim, preencher
-            agora = now_brazil_naive()
-            try:
-                ultimo_historico = db.query(HistoricoStatus).filter(
-                    HistoricoStatus.chamado_id == ch.id
-                ).order_by(HistoricoStatus.data_inicio.desc()).first()
-
-                if ultimo_historico and not ultimo_historico.data_fim:
-                    ultimo_historico.data_fim = agora
-                    db.add(ultimo_historico)
-                    db.commit()
-            except Exception as e:
-                print(f"[HISTORICO - Fechar anterior ERROR] {e}")
-                import traceback
-                traceback.print_exc()
-                db.rollback()
-
-            dados = json.dumps({
-                "id": ch.id,
-                "codigo": ch.codigo,
-                "protocolo": ch.protocolo,
-                "status": ch.status,
-                "status_anterior": prev,
-                "usuario_id": user_id,
-                "usuario_nome": f"{db_user.nome} {db_user.sobrenome}" if db_user else None,
-            }, ensure_ascii=False)
-            n = Notification(
-                tipo="chamado",
-                titulo=f"Status atualizado: {ch.codigo}",
-                mensagem=f"{prev} → {ch.status}",
-                recurso="chamado",
-                recurso_id=ch.id,
-                acao="status",
-                dados=dados,
-                usuario_id=user_id,
-            )
-            db.add(n)
-            # registrar em historico_status (única fonte de verdade)
-            try:
-                hs = HistoricoStatus(
-                    chamado_id=ch.id,
-                    usuario_id=user_id,
-                    status=ch.status,
-                    status_anterior=prev,
-                    status_novo=ch.status,
-                    data_inicio=agora,
-                    descricao=f"{prev} → {ch.status}",
-                    criado_em=agora,
-                )
-                print(f"[HISTORICO STATUS] Criando novo: chamado_id={ch.id}, status={ch.status}, usuario_id={user_id}, data_inicio={agora}")
-                db.add(hs)
-                db.commit()
-                print(f"[HISTORICO STATUS] Sucesso ao salvar registro")
-            except Exception as e:
-                print(f"[HISTORICO STATUS - Novo registro ERROR] {e}")
-                import traceback
-                traceback.print_exc()
-                db.rollback()
-            db.refresh(n)
-
-            import anyio
-            anyio.from_thread.run(sio.emit, "chamado:status", {"id": ch.id, "status": ch.status})
-            anyio.from_thread.run(sio.emit, "notification:new", {
-                "id": n.id,
-                "tipo": n.tipo,
-                "titulo": n.titulo,
-                "mensagem": n.mensagem,
-                "recurso": n.recurso,
-                "recurso_id": n.recurso_id,
-                "acao": n.acao,
-                "dados": n.dados,
-                "lido": n.lido,
-                "criado_em": n.criado_em.isoformat() if n.criado_em else None,
-            })
-
-            # EMITE ATUALIZAÇÃO DE MÉTRICAS EM TEMPO REAL (quando status muda)
-            from ti.services.cache_manager_incremental import IncrementalMetricsCache
-            metricas = IncrementalMetricsCache.get_metrics(db)
-            anyio.from_thread.run(sio.emit, "metrics:updated", {
-                "sla_metrics": metricas,
-                "timestamp": now_brazil_naive().isoformat(),
-            })
-        except Exception:
-            db.rollback()
-            pass
+        # FECHAR HISTÓRICO ANTERIOR: Se o último status não tem data_fim, preencher
+        ultimo_historico = db.query(HistoricoStatus).filter(
+            HistoricoStatus.chamado_id == ch.id
+        ).order_by(HistoricoStatus.data_inicio.desc()).first()
+        if ultimo_historico and not ultimo_historico.data_fim:
+            ultimo_historico.data_fim = agora
+            db.add(ultimo_historico)
+
+        dados = json.dumps({
+            "id": ch.id,
+            "codigo": ch.codigo,
+            "protocolo": ch.protocolo,
+            "status": ch.status,
+            "status_anterior": prev,
+            "usuario_id": user_id,
+            "usuario_nome": f"{db_user.nome} {db_user.sobrenome}" if db_user else None,
+        }, ensure_ascii=False)
+        n = Notification(
+            tipo="chamado",
+            titulo=f"Status atualizado: {ch.codigo}",
+            mensagem=f"{prev} → {ch.status}",
+            recurso="chamado",
+            recurso_id=ch.id,
+            acao="status",
+            dados=dados,
+            usuario_id=user_id,
+        )
+        db.add(n)
+        # registrar em historico_status (única fonte de verdade)
+        db.add(HistoricoStatus(
+            chamado_id=ch.id,
+            usuario_id=user_id,
+            status=ch.status,
+            status_anterior=prev,
+            status_novo=ch.status,
+            data_inicio=agora,
+            descricao=f"{prev} → {ch.status}",
+            criado_em=agora,
+        ))
+        db.flush()
 
-        # Enviar email de notificação de status atualizado
-        try:
-            print(f"[CHAMADOS] 📧 Status do chamado {ch.codigo} atualizado ({prev} → {ch.status}). Disparando email...")
-            send_async(send_chamado_status, ch, prev)
-            print(f"[CHAMADOS] ✅ send_async() chamado para send_chamado_status")
-        except Exception as e:
-            print(f"[CHAMADOS] ❌ ERRO ao enviar email: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
+        after_commit(db, _efeito_emitir, [
+            ("chamado:status", {"id": ch.id, "status": ch.status}),
+            ("notification:new", _notification_payload(n)),
+        ])
+        after_commit(db, _efeito_metricas_status, ch.id, novo == "Cancelado" and prev != "Cancelado")
+        # Na mesma transação: o email existe se e somente se a mudança foi confirmada
+        enqueue_chamado_status(ch, prev, db=db)
 
+        db.commit()
+        historico_cache.invalidate(ch.id)
         db.refresh(ch)
         db.expunge(ch)
         return ch
     except HTTPException:
         raise
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao atualizar status: {e}")
 
 
@@ -953,6 +1200,7 @@ def atribuir_chamado(chamado_id: int, payload: dict = Body(...), db: Session = D
         ch.status_assumido_em = now_brazil_naive()
         db.add(ch)
         db.commit()
+        historico_cache.invalidate(ch.id)
         db.refresh(ch)
 
         # Criar notificação
@@ -997,6 +1245,7 @@ def atribuir_chamado(chamado_id: int, payload: dict = Body(...), db: Session = D
                 print(f"[ASSIGN HISTORICO ERROR] {e}")
 
             db.commit()
+            historico_cache.invalidate(ch.id)
             db.refresh(n)
         except Exception as e:
             print(f"[ASSIGN] Erro ao criar notificação: {e}")
@@ -1008,6 +1257,209 @@ def atribuir_chamado(chamado_id: int, payload: dict = Body(...), db: Session = D
         raise HTTPException(status_code=500, detail=f"Erro ao atribuir chamado: {e}")
 
 
+def _efeito_bulk_caches(chamado_ids: list[int], cancelados: int) -> None:
+    """Invalida caches de SLA uma vez para o lote e emite um único metrics:updated"""
+    from ti.services.cache_manager_incremental import ChamadosTodayCounter, IncrementalMetricsCache
+    db = SessionLocal()
+    try:
+        if cancelados:
+            ChamadosTodayCounter.decrement(db, cancelados)
+        chaves = [
+            "sla_compliance_24h",
+            "sla_compliance_mes",
+            "sla_distribution",
+            "tempo_resposta_24h",
+            "tempo_resposta_mes",
+            "metrics_basic",
+            IncrementalMetricsCache.get_cache_key_month(),
+        ] + [f"chamado_sla_status:{cid}" for cid in chamado_ids]
+        SLACacheManager.invalidate(db, chaves)
+
+        metricas = IncrementalMetricsCache.get_metrics(db)
+        emit_sync("metrics:updated", {
+            "sla_metrics": metricas,
+            "timestamp": now_brazil_naive().isoformat(),
+        })
+    finally:
+        db.close()
+
+
+@router.post("/bulk", response_model=ChamadoBulkResult)
+def operacoes_em_lote(payload: ChamadoBulkRequest, db: Session = Depends(get_db), user: dict | None = Depends(get_optional_user)):
+    """
+    Aplica várias operações (status, atribuição, prioridade) numa única transação.
+
+    Tudo ou nada: se alguma operação for inválida, nada é aplicado (400 com
+    a lista de erros). O SLA dos chamados alterados é recalculado com um
+    único prefetch de histórico; caches são invalidados uma vez e um único
+    evento chamados:bulk é emitido após o commit.
+    """
+    try:
+        ops = payload.operacoes
+        ids = sorted({op.chamado_id for op in ops})
+        chamados = {
+            c.id: c for c in db.query(Chamado).filter(
+                Chamado.id.in_(ids) & Chamado.deletado_em.is_(None)
+            ).with_for_update().all()
+        }
+        agent_ids = {op.agent_id for op in ops if op.agent_id is not None}
+        agentes = {u.id: u for u in db.query(User).filter(User.id.in_(agent_ids)).all()} if agent_ids else {}
+        sla_configs = SLACalculator.get_sla_configs(db)
+
+        erros = []
+        for i, op in enumerate(ops):
+            if op.status is None and op.agent_id is None and op.prioridade is None:
+                erros.append({"indice": i, "chamado_id": op.chamado_id, "erro": "Nenhuma alteração informada"})
+            if op.chamado_id not in chamados:
+                erros.append({"indice": i, "chamado_id": op.chamado_id, "erro": "Chamado não encontrado"})
+            if op.status is not None and _normalize_status(op.status) not in ALLOWED_STATUSES:
+                erros.append({"indice": i, "chamado_id": op.chamado_id, "erro": "Status inválido"})
+            if op.agent_id is not None and op.agent_id not in agentes:
+                erros.append({"indice": i, "chamado_id": op.chamado_id, "erro": "Agente não encontrado"})
+            if op.prioridade is not None and sla_configs and op.prioridade not in sla_configs:
+                erros.append({"indice": i, "chamado_id": op.chamado_id, "erro": "Prioridade sem configuração de SLA"})
+        if erros:
+            raise HTTPException(status_code=400, detail={"erros": erros})
+
+        user_email = user.get("email") if user else None
+        db_user = db.query(User).filter(User.email == user_email).first() if user_email else None
+        user_id = db_user.id if db_user else None
+
+        # Último historico_status por chamado (para fechar o período anterior)
+        abertos = {}
+        for h in db.query(HistoricoStatus).filter(
+            HistoricoStatus.chamado_id.in_(list(chamados)) & HistoricoStatus.data_fim.is_(None)
+        ).order_by(HistoricoStatus.data_inicio.asc()).all():
+            abertos[h.chamado_id] = h
+
+        agora = now_brazil_naive()
+        anteriores: dict[int, str] = {}
+        sla_alterado: set[int] = set()
+        cancelados = 0
+        for op in ops:
+            ch = chamados[op.chamado_id]
+            anteriores.setdefault(ch.id, ch.status or "Aberto")
+            descricoes = []
+
+            if op.status is not None:
+                prev = ch.status or "Aberto"
+                novo = _normalize_status(op.status)
+                if novo != prev:
+                    ch.status = novo
+                    if prev == "Aberto" and novo != "Aberto" and ch.data_primeira_resposta is None:
+                        ch.data_primeira_resposta = agora
+                    if novo == "Concluído":
+                        ch.data_conclusao = agora
+                    if novo == "Cancelado":
+                        cancelados += 1
+                    aberto = abertos.pop(ch.id, None)
+                    if aberto is not None:
+                        aberto.data_fim = agora
+                    # Pendente na sessão: uma próxima operação de status do
+                    # mesmo chamado neste lote fecha este período
+                    abertos[ch.id] = HistoricoStatus(
+                        chamado_id=ch.id,
+                        usuario_id=user_id,
+                        status=novo,
+                        status_anterior=prev,
+                        status_novo=novo,
+                        data_inicio=agora,
+                        descricao=f"{prev} → {novo}",
+                        criado_em=agora,
+                    )
+                    db.add(abertos[ch.id])
+                    sla_alterado.add(ch.id)
+
+            if op.agent_id is not None:
+                agent = agentes[op.agent_id]
+                ch.status_assumido_por_id = agent.id
+                ch.status_assumido_em = agora
+                descricoes.append(f"Atribuído para {agent.nome} {agent.sobrenome}")
+
+            if op.prioridade is not None and op.prioridade != ch.prioridade:
+                descricoes.append(f"Prioridade {ch.prioridade} → {op.prioridade}")
+                ch.prioridade = op.prioridade
+                sla_alterado.add(ch.id)
+
+            if descricoes:
+                db.add(HistoricoStatus(
+                    chamado_id=ch.id,
+                    usuario_id=user_id,
+                    status=ch.status,
+                    status_anterior=ch.status,
+                    status_novo=ch.status,
+                    data_inicio=agora,
+                    descricao="; ".join(descricoes),
+                    criado_em=agora,
+                ))
+        db.flush()
+
+        # Recalcula SLA dos chamados alterados com prefetch em lote
+        if sla_alterado:
+            alterados = sorted(sla_alterado)
+            historicos_cache = SLACalculator.get_historicos_cache(db, alterados)
+            ultimos_sla: dict[int, HistoricoSLA] = {}
+            for h in db.query(HistoricoSLA).filter(
+                HistoricoSLA.chamado_id.in_(alterados)
+            ).order_by(HistoricoSLA.criado_em.asc()).all():
+                ultimos_sla[h.chamado_id] = h
+            for cid in alterados:
+                try:
+                    with db.begin_nested():
+                        _registrar_sla(
+                            db, chamados[cid], status_anterior=anteriores.get(cid),
+                            historicos_cache=historicos_cache,
+                            sla_configs=sla_configs,
+                            ultimos_sla=ultimos_sla,
+                        )
+                except Exception as e:
+                    print(f"[BULK] Erro ao sincronizar SLA do chamado {cid}: {e}")
+
+        resumo = [
+            {
+                "id": ch.id,
+                "codigo": ch.codigo,
+                "status": ch.status,
+                "status_anterior": anteriores.get(ch.id),
+                "prioridade": ch.prioridade,
+                "atribuido_a": ch.status_assumido_por_id,
+            }
+            for ch in chamados.values()
+        ]
+        n = Notification(
+            tipo="chamado",
+            titulo=f"{len(resumo)} chamado(s) atualizado(s) em lote",
+            mensagem=", ".join(str(c["codigo"] or c["id"]) for c in resumo[:10]) + ("..." if len(resumo) > 10 else ""),
+            recurso="chamado",
+            recurso_id=None,
+            acao="bulk",
+            dados=json.dumps({"chamados": resumo, "usuario_id": user_id}, ensure_ascii=False),
+            usuario_id=user_id,
+        )
+        db.add(n)
+        db.flush()
+
+        after_commit(db, _efeito_emitir, [
+            ("chamados:bulk", {"chamados": resumo}),
+            ("notification:new", _notification_payload(n)),
+        ])
+        after_commit(db, _efeito_bulk_caches, list(chamados), cancelados)
+        for cid in sorted(sla_alterado):
+            ch = chamados[cid]
+            if ch.status != anteriores.get(cid):
+                enqueue_chamado_status(ch, anteriores[cid], db=db)
+
+        db.commit()
+        historico_cache.invalidate(list(chamados))
+        return ChamadoBulkResult(aplicadas=len(ops), chamados=resumo)
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao aplicar operações em lote: {e}")
+
+
 @router.delete("/{chamado_id}")
 def deletar_chamado(chamado_id: int, payload: ChamadoDeleteRequest = Body(...), db: Session = Depends(get_db)):
     try:
@@ -1041,6 +1493,7 @@ def deletar_chamado(chamado_id: int, payload: ChamadoDeleteRequest = Body(...),
         ch.deletado_em = agora
         db.add(ch)
         db.commit()
+        historico_cache.invalidate(ch.id)
         db.refresh(ch)
 
         print(f"[SOFT DELETE] Chamado {chamado_id} marcado como deletado")
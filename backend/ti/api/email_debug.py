@@ -15,3 +15,9 @@ def send_test_email(to: Optional[str] = None):
     body = "<p>Este é um e-mail de teste enviado pela API do Evoque TI.</p>"
     res = send_mail(subject, body, to=[to])
     return {"ok": bool(res)}
+
+
+@router.get("/email-outbox")
+def email_outbox_stats():
+    from core.email_outbox import get_stats
+    return get_stats()
@@ -0,0 +1,52 @@
+from __future__ import annotations
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from core import jobs
+
+router = APIRouter(prefix="/jobs", tags=["TI - Jobs"])
+
+
+def submeter(tipo: str, params: Optional[dict] = None) -> JSONResponse:
+    """Submete um job e responde 202 com o ID (deduplicado se já houver um ativo)"""
+    try:
+        info = jobs.submit(tipo, params)
+    except jobs.FilaCheia as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao submeter job {tipo}: {e}")
+    return JSONResponse(
+        status_code=202,
+        content={**info, "tipo": tipo, "status_url": f"/api/jobs/{info['job_id']}"},
+    )
+
+
+@router.get("")
+def listar_jobs(tipo: Optional[str] = None, limite: int = 50):
+    try:
+        return jobs.listar(tipo, limite)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao listar jobs: {e}")
+
+
+@router.get("/tipos")
+def listar_tipos():
+    return jobs.tipos()
+
+
+@router.get("/{job_id}")
+def obter_job(job_id: str):
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+
+@router.post("/{job_id}/cancel")
+def cancelar_job(job_id: str):
+    if not jobs.cancel(job_id):
+        job = jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job não encontrado")
+        raise HTTPException(status_code=409, detail=f"Job já finalizado ({job['status']})")
+    return {"ok": True, "job_id": job_id, "status": "cancelando"}
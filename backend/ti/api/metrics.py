@@ -405,39 +405,16 @@ def debug_tempo_resposta(periodo: str = "mes", db: Session = Depends(get_db)):
         }
 
 
-@router.post("/metrics/debug/recalculate-sla")
-def debug_recalculate_sla(db: Session = Depends(get_db)):
+@router.post("/metrics/debug/recalculate-sla", status_code=202)
+def debug_recalculate_sla():
     """
-    Debug: força recálculo de todas as métricas de SLA
+    Debug: força recálculo de todas as métricas de SLA (job em background)
     Útil para verificar se há problemas nos cálculos
     """
-    try:
-        from ti.services.sla_cache import SLACacheManager
-        from core.utils import now_brazil_naive
-
-        # Invalida todos os caches
-        SLACacheManager.invalidate_all_sla(db)
+    from ti.api.jobs import submeter
+    from ti.services import sla_jobs
 
-        # Recalcula
-        sla_24h = MetricsCalculator.get_sla_compliance_24h(db)
-        sla_mes = MetricsCalculator.get_sla_compliance_mes(db)
-        sla_dist = MetricsCalculator.get_sla_distribution(db)
-
-        return {
-            "status": "ok",
-            "sla_compliance_24h": sla_24h,
-            "sla_compliance_mes": sla_mes,
-            "sla_distribution": sla_dist,
-            "timestamp": now_brazil_naive().isoformat()
-        }
-    except Exception as e:
-        print(f"Erro ao recalcular SLA: {e}")
-        import traceback
-        traceback.print_exc()
-        return {
-            "status": "erro",
-            "erro": str(e)
-        }
+    return submeter(sla_jobs.DEBUG_RECALCULATE_SLA)
 
 
 @router.get("/metrics/debug/sla-data")
@@ -20,9 +20,11 @@ from ti.models.chamado import Chamado
 from ti.services.sla import SLACalculator
 from ti.services.sla_cache import SLACacheManager
 from ti.services.sla_validator import SLAValidator
+from ti.services.export import SLA as SLA_EXPORT, streaming_export
+from ti.services import sla_jobs
+from ti.api.jobs import submeter
 from core.utils import now_brazil_naive
-from core.realtime import sio
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/sla", tags=["TI - SLA"])
 
@@ -238,6 +240,23 @@ def obter_sla_status_chamado(chamado_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erro ao obter status de SLA: {e}")
 
 
+@router.get("/export")
+def exportar_historico_sla(
+    formato: str = "csv",
+    inicio: datetime | None = None,
+    fim: datetime | None = None,
+    desde: datetime | None = None,
+):
+    """
+    Exportação em streaming dos fatos de SLA (historico_sla).
+    inicio/fim filtram criado_em; desde é o watermark incremental (atualizado_em).
+    """
+    try:
+        return streaming_export(SLA_EXPORT, formato, inicio, fim, desde)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/historico/{chamado_id}", response_model=list[HistoricoSLAOut])
 def obter_historico_sla(chamado_id: int, db: Session = Depends(get_db)):
     try:
@@ -250,202 +269,22 @@ def obter_historico_sla(chamado_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erro ao obter histórico de SLA: {e}")
 
 
-@router.post("/sync/todos-chamados")
-def sincronizar_todos_chamados(db: Session = Depends(get_db)):
+@router.post("/sync/todos-chamados", status_code=202)
+def sincronizar_todos_chamados():
     """
     Sincroniza todos os chamados existentes com a tabela de histórico de SLA.
-    Operação atômica: ou sincroniza tudo ou não sincroniza nada.
+    Executa em background (job); acompanhe em GET /jobs/{job_id}.
     """
-    from ti.services.sla_transaction_manager import SLATransactionManager
-
-    try:
-        def _sincronizar_impl(db_session: Session) -> dict:
-            """Implementação da sincronização"""
-            stats = {
-                "total_chamados": 0,
-                "sincronizados": 0,
-                "atualizados": 0,
-                "erros": 0,
-            }
-
-            chamados = db_session.query(Chamado).all()
-            stats["total_chamados"] = len(chamados)
-
-            for chamado in chamados:
-                existing = db_session.query(HistoricoSLA).filter(
-                    HistoricoSLA.chamado_id == chamado.id
-                ).first()
-
-                sla_status = SLACalculator.get_sla_status(db_session, chamado)
-
-                resposta_metric = sla_status.get("resposta_metric")
-                resolucao_metric = sla_status.get("resolucao_metric")
-
-                tempo_resposta_horas = resposta_metric.get("tempo_decorrido_horas") if resposta_metric else None
-                limite_sla_resposta_horas = resposta_metric.get("tempo_limite_horas") if resposta_metric else None
-                tempo_resolucao_horas = resolucao_metric.get("tempo_decorrido_horas") if resolucao_metric else None
-                limite_sla_horas = resolucao_metric.get("tempo_limite_horas") if resolucao_metric else None
-
-                if existing:
-                    existing.status_novo = chamado.status
-                    existing.tempo_resposta_horas = tempo_resposta_horas
-                    existing.limite_sla_resposta_horas = limite_sla_resposta_horas
-                    existing.tempo_resolucao_horas = tempo_resolucao_horas
-                    existing.limite_sla_horas = limite_sla_horas
-                    existing.status_sla = sla_status.get("status_geral")
-                    db_session.add(existing)
-                    stats["atualizados"] += 1
-                else:
-                    historico = HistoricoSLA(
-                        chamado_id=chamado.id,
-                        usuario_id=None,
-                        acao="sincronizacao",
-                        status_anterior=None,
-                        status_novo=chamado.status,
-                        tempo_resposta_horas=tempo_resposta_horas,
-                        limite_sla_resposta_horas=limite_sla_resposta_horas,
-                        tempo_resolucao_horas=tempo_resolucao_horas,
-                        limite_sla_horas=limite_sla_horas,
-                        status_sla=sla_status.get("status_geral"),
-                        criado_em=chamado.data_abertura or now_brazil_naive(),
-                    )
-                    db_session.add(historico)
-                    stats["sincronizados"] += 1
+    return submeter(sla_jobs.SYNC_TODOS_CHAMADOS)
 
-            return stats
 
-        result = SLATransactionManager.execute_with_lock(
-            db,
-            "historico_sla",
-            _sincronizar_impl
-        )
-
-        if result.success:
-            return result.data
-        else:
-            raise HTTPException(status_code=500, detail=result.error)
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao sincronizar chamados: {e}")
-
-
-@router.post("/recalcular/painel")
-def recalcular_sla_painel(db: Session = Depends(get_db)):
+@router.post("/recalcular/painel", status_code=202)
+def recalcular_sla_painel():
     """
-    Recalcula todos os SLAs quando o painel administrativo é acessado.
-    Operação atômica: ou recalcula tudo ou não recalcula nada.
+    Recalcula o SLA dos chamados abertos quando o painel administrativo é acessado.
+    Executa em background (job); acessos simultâneos reaproveitam o job ativo.
     """
-    from ti.services.sla_transaction_manager import SLATransactionManager
-
-    try:
-        def _recalcular_impl(db_session: Session) -> dict:
-            """Implementação do recálculo"""
-            stats = {
-                "total_recalculados": 0,
-                "em_dia": 0,
-                "vencidos": 0,
-                "em_andamento": 0,
-                "congelados": 0,
-                "erros": 0,
-            }
-
-            chamados = db_session.query(Chamado).filter(
-                and_(
-                    Chamado.status != "Cancelado",
-                    Chamado.status != "Concluído"
-                )
-            ).all()
-
-            for chamado in chamados:
-                sla_status = SLACalculator.get_sla_status(db_session, chamado)
-
-                resposta_metric = sla_status.get("resposta_metric")
-                resolucao_metric = sla_status.get("resolucao_metric")
-
-                tempo_resposta_horas = resposta_metric.get("tempo_decorrido_horas") if resposta_metric else None
-                limite_sla_resposta_horas = resposta_metric.get("tempo_limite_horas") if resposta_metric else None
-                tempo_resolucao_horas = resolucao_metric.get("tempo_decorrido_horas") if resolucao_metric else None
-                limite_sla_horas = resolucao_metric.get("tempo_limite_horas") if resolucao_metric else None
-
-                existing = db_session.query(HistoricoSLA).filter(
-                    HistoricoSLA.chamado_id == chamado.id
-                ).order_by(HistoricoSLA.criado_em.desc()).first()
-
-                if existing:
-                    existing.tempo_resposta_horas = tempo_resposta_horas
-                    existing.limite_sla_resposta_horas = limite_sla_resposta_horas
-                    existing.tempo_resolucao_horas = tempo_resolucao_horas
-                    existing.limite_sla_horas = limite_sla_horas
-                    existing.status_sla = sla_status.get("status_geral")
-                    db_session.add(existing)
-                else:
-                    historico = HistoricoSLA(
-                        chamado_id=chamado.id,
-                        usuario_id=None,
-                        acao="recalculo_painel",
-                        status_novo=chamado.status,
-                        tempo_resposta_horas=tempo_resposta_horas,
-                        limite_sla_resposta_horas=limite_sla_resposta_horas,
-                        tempo_resolucao_horas=tempo_resolucao_horas,
-                        limite_sla_horas=limite_sla_horas,
-                        status_sla=sla_status.get("status_geral"),
-                        criado_em=now_brazil_naive(),
-                    )
-                    db_session.add(historico)
-
-                stats["total_recalculados"] += 1
-
-                status_sla = sla_status.get("status_geral", "sem_sla")
-                if status_sla in ["cumprido", "dentro_prazo"]:
-                    stats["em_dia"] += 1
-                elif status_sla in ["violado", "vencido_ativo"]:
-                    stats["vencidos"] += 1
-                elif status_sla == "proximo_vencer":
-                    stats["em_andamento"] += 1
-                elif status_sla == "pausado":
-                    stats["congelados"] += 1
-
-            return stats
-
-        result = SLATransactionManager.execute_with_lock(
-            db,
-            "historico_sla",
-            _recalcular_impl
-        )
-
-        if result.success:
-            print(f"[PAINEL RECALC] Invalidando cache de métricas...")
-            try:
-                from ti.services.cache_manager_incremental import IncrementalMetricsCache
-                IncrementalMetricsCache.invalidate_all()
-            except Exception as e:
-                print(f"[PAINEL RECALC] Aviso ao invalidar cache: {e}")
-
-            try:
-                import anyio
-                stats = result.data
-                anyio.from_thread.run(sio.emit, "metrics:updated", {
-                    "total_recalculados": stats.get("total_recalculados"),
-                    "em_dia": stats.get("em_dia"),
-                    "vencidos": stats.get("vencidos"),
-                    "em_andamento": stats.get("em_andamento"),
-                    "congelados": stats.get("congelados"),
-                    "timestamp": now_brazil_naive().isoformat(),
-                })
-                print(f"[PAINEL RECALC] ✅ Evento WebSocket emitido para frontend")
-            except Exception as e:
-                print(f"[PAINEL RECALC] ⚠️  Erro ao emitir evento WebSocket: {e}")
-
-            return result.data
-        else:
-            raise HTTPException(status_code=500, detail=result.error)
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao recalcular SLAs: {e}")
+    return submeter(sla_jobs.RECALCULAR_PAINEL)
 
 
 @router.post("/cache/invalidate-chamado/{chamado_id}")
@@ -554,81 +393,21 @@ def resetar_todo_cache(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erro ao resetar cache: {e}")
 
 
-@router.post("/reset-and-recalculate")
-def resetar_sla_completo(db: Session = Depends(get_db)):
+@router.post("/reset-and-recalculate", status_code=202)
+def resetar_sla_completo():
     """
-    Reseta COMPLETAMENTE o SLA:
+    Reseta COMPLETAMENTE o SLA (job em background):
     1. Limpa todo o cache de métricas (memória + banco)
     2. Registra a data de reset em cada configuração de SLA
-    3. Remove dados de cache P90 incremental
-    4. Próximos cálculos ignorarão dados anteriores ao reset
+    3. Próximos cálculos ignorarão dados anteriores ao reset
     """
-    try:
-        from ti.models.metrics_cache import MetricsCacheDB
+    return submeter(sla_jobs.RESET_AND_RECALCULATE)
 
-        agora = now_brazil_naive()
 
-        print(f"\n[SLA RESET] Iniciando reset completo do sistema SLA")
-
-        print(f"[SLA RESET] Invalidando cache em memória...")
-        SLACacheManager.invalidate_all_sla(db)
-
-        print(f"[SLA RESET] Limpando banco de dados...")
-        db.query(MetricsCacheDB).delete()
-
-        print(f"[SLA RESET] Registrando data de reset nas configurações...")
-        configs = db.query(SLAConfiguration).all()
-        for config in configs:
-            config.ultimo_reset_em = agora
-            config.atualizado_em = agora
-            print(f"  - {config.prioridade}: reset em {agora.isoformat()}")
-            db.add(config)
-
-        db.commit()
-
-        print(f"[SLA RESET] ✅ Reset concluído com sucesso!")
-
-        try:
-            import anyio
-            anyio.from_thread.run(sio.emit, "sla:reset", {
-                "reset_em": agora.isoformat(),
-                "configuracoes_atualizadas": len(configs),
-                "timestamp": agora.isoformat(),
-            })
-            print(f"[SLA RESET] ✅ Evento WebSocket emitido para frontend")
-        except Exception as e:
-            print(f"[SLA RESET] ⚠️  Erro ao emitir evento WebSocket: {e}")
-
-        return {
-            "ok": True,
-            "message": "Sistema de SLA foi completamente resetado",
-            "reset_em": agora.isoformat(),
-            "proximos_calculos": "Apenas chamados posteriores a este reset serão considerados",
-            "configuracoes_atualizadas": len(configs),
-            "cache_limpo": True,
-            "memoria_limpa": True
-        }
-    except Exception as e:
-        print(f"[SLA RESET] ❌ Erro ao resetar SLA: {e}")
-        import traceback
-        traceback.print_exc()
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao resetar SLA: {e}")
-
-
-@router.post("/recalcular/p90")
-def recalcular_sla_p90(db: Session = Depends(get_db)):
-    """Recalcula SLA baseado em P90 (90º percentil) dos últimos 30 dias."""
-    try:
-        from ti.services.sla_p90_calculator import SLAP90Calculator
-
-        resultado = SLAP90Calculator.recalcular_sla_por_prioridade(db)
-
-        return resultado
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Erro ao recalcular SLA com P90: {e}")
+@router.post("/recalcular/p90", status_code=202)
+def recalcular_sla_p90():
+    """Recalcula SLA baseado em P90 (90º percentil) dos últimos 30 dias (job em background)."""
+    return submeter(sla_jobs.RECALCULAR_P90)
 
 
 @router.post("/recalcular/p90-incremental")
@@ -874,26 +653,14 @@ def obter_tempo_medio_resolucao(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erro ao obter tempo médio de resolução: {e}")
 
 
-@router.post("/scheduler/recalcular-agora")
-def recalcular_sla_agora(db: Session = Depends(get_db)):
-    """Força a recalculação imediata de SLA de todos os chamados."""
-    try:
-        from ti.scripts.recalculate_sla_complete import SLARecalculator
-
-        recalculator = SLARecalculator(db)
-        stats = recalculator.recalculate_all(verbose=False)
-        db.commit()
-
-        return {
-            "ok": True,
-            "recalculados": stats["recalculados"],
-            "com_erro": stats["com_erro"],
-            "tempo_medio_resposta_horas": round(stats["tempo_medio_resposta_horas"], 2),
-            "tempo_medio_resolucao_horas": round(stats["tempo_medio_resolucao_horas"], 2),
-        }
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao recalcular SLA: {e}")
+@router.post("/scheduler/recalcular-agora", status_code=202)
+def recalcular_sla_agora(completo: bool = False):
+    """
+    Força o recálculo imediato de SLA (job em background). Incremental por
+    padrão (abertos + alterados desde a última execução); completo=true
+    recalcula todos os chamados.
+    """
+    return submeter(sla_jobs.RECALCULO_COMPLETO, {"completo": completo})
 
 
 @router.get("/recommendations/p90-analysis")
@@ -1012,79 +779,15 @@ def analisar_p90_recomendado(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erro ao analisar P90: {e}")
 
 
-@router.post("/maintenance/force-recalculate-all")
-def force_recalculate_all_metrics(db: Session = Depends(get_db)):
+@router.post("/maintenance/force-recalculate-all", status_code=202)
+def force_recalculate_all_metrics():
     """
     Force completo: Limpa TODOS os caches e força recalcular TODAS as métricas.
 
     Use este endpoint se as métricas estiverem congeladas ou inconsistentes.
-    Isso garante que os dados serão recalculados do zero na próxima requisição.
+    Executa em background (job); o resultado traz as métricas recalculadas.
     """
-    try:
-        from ti.services.sla_cache import SLACacheManager
-        from core.utils import now_brazil_naive
-
-        print("\n" + "="*60)
-        print("🔄 FORCE RECALCULATE: Limpando TODOS os caches...")
-        print("="*60)
-
-        # 1. Invalida TUDO do cache
-        SLACacheManager.invalidate_all_sla(db)
-        print("✓ Cache SLA invalidado")
-
-        # 2. Limpa tabela de cache do banco de dados
-        try:
-            from ti.models.metrics_cache import MetricsCacheDB
-            db.query(MetricsCacheDB).delete()
-            db.commit()
-            print("✓ Tabela de cache do banco de dados limpa")
-        except Exception as e:
-            print(f"⚠️ Erro ao limpar tabela de cache: {e}")
-
-        # 3. Força recalculamento das métricas principais
-        from ti.services.metrics import MetricsCalculator
-
-        print("\n🔄 Recalculando métricas...")
-        sla_24h = MetricsCalculator.get_sla_compliance_24h(db)
-        print(f"✓ SLA Compliance 24h: {sla_24h}%")
-
-        sla_mes = MetricsCalculator.get_sla_compliance_mes(db)
-        print(f"✓ SLA Compliance Mês: {sla_mes}%")
-
-        sla_dist = MetricsCalculator.get_sla_distribution(db)
-        print(f"✓ Distribuição SLA: {sla_dist['dentro_sla']} dentro, {sla_dist['fora_sla']} fora")
-
-        tempo_24h = MetricsCalculator.get_tempo_medio_resposta_24h(db)
-        print(f"✓ Tempo Resposta 24h: {tempo_24h}")
-
-        tempo_mes, total_mes = MetricsCalculator.get_tempo_medio_resposta_mes(db)
-        print(f"✓ Tempo Resposta Mês: {tempo_mes} ({total_mes} chamados)")
-
-        print("\n" + "="*60)
-        print("✅ Recalcul completo concluído com sucesso!")
-        print("="*60 + "\n")
-
-        return {
-            "ok": True,
-            "message": "Todos os caches foram limpos e métricas recalculadas",
-            "metrics": {
-                "sla_compliance_24h": sla_24h,
-                "sla_compliance_mes": sla_mes,
-                "sla_distribution": sla_dist,
-                "tempo_resposta_24h": tempo_24h,
-                "tempo_resposta_mes": tempo_mes,
-                "total_chamados_mes": total_mes,
-            },
-            "timestamp": now_brazil_naive().isoformat(),
-            "cache_status": "cleared"
-        }
-
-    except Exception as e:
-        import traceback
-        print(f"\n❌ ERRO ao fazer force recalculate: {e}")
-        traceback.print_exc()
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro ao forçar recalcul: {e}")
+    return submeter(sla_jobs.FORCE_RECALCULATE_ALL)
 
 
 @router.post("/maintenance/populate-primeira-resposta")
@@ -19,3 +19,7 @@ class Alert(Base):
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
     imagem_blob = Column(LargeBinary, nullable=True)
     imagem_mime_type = Column(String(100), nullable=True)
+    imagem_sha256 = Column(String(64), nullable=True)  # conteúdo no blob store
+    imagem_largura = Column(Integer, nullable=True)
+    imagem_altura = Column(Integer, nullable=True)
+    imagem_variantes = Column(JSON, nullable=True, default=None, comment='Miniaturas WebP: [{largura, altura, sha256}]')
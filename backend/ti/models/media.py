@@ -12,6 +12,7 @@ class Media(Base):
     descricao: Mapped[str | None] = mapped_column(Text, nullable=True)
     url: Mapped[str | None] = mapped_column(String(500), nullable=True)
     arquivo_blob: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    arquivo_sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)  # conteúdo no blob store
     mime_type: Mapped[str | None] = mapped_column(String(100), nullable=True)
     tamanho_bytes: Mapped[int | None] = mapped_column(Integer, nullable=True)
     ordem: Mapped[int | None] = mapped_column(Integer, nullable=True)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 from datetime import date, datetime
+from typing import Any
 from pydantic import BaseModel, EmailStr, Field
 
 ALLOWED_STATUSES = {"Aberto", "Em andamento", "Em análise", "Concluído", "Cancelado"}
@@ -36,9 +37,37 @@ class ChamadoOut(BaseModel):
     class Config:
         from_attributes = True
 
+class ChamadoPage(BaseModel):
+    items: list[dict[str, Any]]
+    next_cursor: str | None = None
+    limit: int
+    total: int | None = Field(default=None, description="Total aproximado (cache curto por filtro)")
+
+class ChamadoSearchPage(BaseModel):
+    items: list[dict[str, Any]]
+    total: int
+    limit: int
+    offset: int
+    modo: str = Field(..., description="fulltext ou like (índice FULLTEXT ausente)")
+
 class ChamadoStatusUpdate(BaseModel):
     status: str = Field(..., description="Novo status do chamado")
 
+BULK_MAX_OPERACOES = 500
+
+class ChamadoBulkOperacao(BaseModel):
+    chamado_id: int
+    status: str | None = Field(default=None, description="Novo status")
+    agent_id: int | None = Field(default=None, description="Usuário a quem atribuir")
+    prioridade: str | None = Field(default=None, description="Nova prioridade")
+
+class ChamadoBulkRequest(BaseModel):
+    operacoes: list[ChamadoBulkOperacao] = Field(..., min_length=1, max_length=BULK_MAX_OPERACOES)
+
+class ChamadoBulkResult(BaseModel):
+    aplicadas: int
+    chamados: list[dict[str, Any]]
+
 class ChamadoDeleteRequest(BaseModel):
     email: EmailStr = Field(..., description="E-mail do usuário autenticado")
     senha: str = Field(..., min_length=6, description="Senha do usuário para confirmar exclusão")
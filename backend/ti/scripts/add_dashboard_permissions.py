@@ -5,54 +5,45 @@ Este script adiciona suporte para controlar permissões de acesso aos dashboards
 por usuário e por função (role).
 """
 
-from sqlalchemy import text
-from sqlalchemy.pool import StaticPool
-from sqlalchemy import create_engine
-import json
-import os
+from sqlalchemy import inspect, text
+from core.db import engine
 
 def add_permissions_columns():
-    """Adiciona colunas de permissões à tabela powerbi_dashboard"""
-    
-    # Configurar conexão com o banco
-    db_url = os.getenv("DATABASE_URL", "mysql+pymysql://root:@localhost/infra")
-    engine = create_engine(db_url, poolclass=StaticPool)
-    
-    migrations = [
-        # Adicionar coluna para armazenar permissões em JSON
+    """Adiciona colunas de permissões à tabela powerbi_dashboard (migração 0020)"""
+    insp = inspect(engine)
+    if not insp.has_table("powerbi_dashboard"):
+        print("⚠ Tabela 'powerbi_dashboard' não existe, nada a fazer")
+        return
+    colunas = {c["name"] for c in insp.get_columns("powerbi_dashboard")}
+    indices = {i["name"] for i in insp.get_indexes("powerbi_dashboard")}
+
+    migrations = []
+    if "permissoes" not in colunas:
         # Formato: {"roles": ["Administrador", "Gerente"], "users": [1, 2, 3], "public": false}
-        """
+        migrations.append("""
         ALTER TABLE powerbi_dashboard 
         ADD COLUMN permissoes JSON DEFAULT NULL COMMENT 'Armazena permissões de acesso (roles e users)';
-        """,
-        
-        # Adicionar índice para melhorar performance em buscas por categoria
-        """
+        """)
+    if "idx_category" not in indices:
+        # Índice para melhorar performance em buscas por categoria
+        migrations.append("""
         ALTER TABLE powerbi_dashboard 
         ADD KEY idx_category (category);
-        """,
-        
-        # Adicionar coluna para rastrear última atualização de permissões
-        """
+        """)
+    if "permissoes_atualizadas_em" not in colunas:
+        # Última atualização de permissões
+        migrations.append("""
         ALTER TABLE powerbi_dashboard 
         ADD COLUMN permissoes_atualizadas_em DATETIME DEFAULT CURRENT_TIMESTAMP 
         ON UPDATE CURRENT_TIMESTAMP COMMENT 'Última atualização das permissões';
-        """,
-    ]
-    
-    with engine.connect() as connection:
+        """)
+
+    with engine.begin() as connection:
         for migration in migrations:
-            try:
-                connection.execute(text(migration))
-                connection.commit()
-                print(f"✓ Executado: {migration.strip()[:60]}...")
-            except Exception as e:
-                # Ignorar se a coluna já existe
-                if "already exists" in str(e) or "Duplicate column" in str(e):
-                    print(f"⚠ Coluna já existe (ignorado): {migration.strip()[:60]}...")
-                else:
-                    print(f"✗ Erro: {e}")
-                    raise
+            connection.execute(text(migration))
+            print(f"✓ Executado: {migration.strip()[:60]}...")
+    if not migrations:
+        print("✓ Colunas de permissões já existem")
 
 def create_permissions_table():
     """
@@ -60,9 +51,6 @@ def create_permissions_table():
     Útil para queries mais complexas e auditoria detalhada.
     """
     
-    db_url = os.getenv("DATABASE_URL", "mysql+pymysql://root:@localhost/infra")
-    engine = create_engine(db_url, poolclass=StaticPool)
-    
     create_table_sql = """
     CREATE TABLE IF NOT EXISTS dashboard_permission (
         id INT AUTO_INCREMENT PRIMARY KEY,
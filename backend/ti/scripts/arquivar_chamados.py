@@ -0,0 +1,24 @@
+"""
+Script para arquivar chamados encerrados antigos.
+
+Uso:
+    python -m ti.scripts.arquivar_chamados [meses] [lote]
+
+Move chamados Concluídos/Cancelados há mais de N meses (padrão: 12) e seus
+históricos para as tabelas *_arquivo. Cada lote é uma transação; se o
+processo for interrompido, basta executar novamente.
+"""
+import sys
+from ti.services.arquivamento import arquivar_chamados, ARQUIVAMENTO_MESES, ARQUIVAMENTO_LOTE
+
+
+if __name__ == "__main__":
+    meses = int(sys.argv[1]) if len(sys.argv) > 1 else ARQUIVAMENTO_MESES
+    lote = int(sys.argv[2]) if len(sys.argv) > 2 else ARQUIVAMENTO_LOTE
+    print(f"🗄️  Arquivando chamados encerrados há mais de {meses} meses (lotes de {lote})...")
+    print("-" * 60)
+    stats = arquivar_chamados(meses=meses, lote=lote)
+    print("-" * 60)
+    print(f"✅ {stats['chamados']} chamados arquivados em {stats['lotes']} lotes ({stats['erros']} erros)")
+    for tabela, n in stats["linhas"].items():
+        print(f"   {tabela}: {n} linhas")
@@ -0,0 +1,100 @@
+"""
+Benchmark de envio de e-mail contra um Graph falso local.
+
+Uso:
+    python -m ti.scripts.benchmark_email [mensagens] [latencia_ms] [threads]
+
+Sobe um servidor HTTP/1.1 que imita o endpoint de token, sendMail e $batch
+do Microsoft Graph (cada chamada custa `latencia_ms`) e mede mensagens/s:
+
+1. urllib: conexão nova por mensagem (como o _post_graph antigo)
+2. GraphClient.post: conexões keep-alive do pool
+3. GraphClient.send_batch: 20 mensagens por chamada $batch
+
+Não precisa de credenciais nem de banco.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import request
+
+
+class _FakeGraph(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latencia = 0.0
+    conexoes = 0
+
+    def setup(self):
+        super().setup()
+        type(self).conexoes += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status: int, corpo: dict | None = None) -> None:
+        dados = json.dumps(corpo).encode("utf-8") if corpo is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latencia)
+        if self.path.endswith("/oauth2/v2.0/token"):
+            return self._responder(200, {"access_token": "fake", "expires_in": 3600})
+        if self.path.endswith("/$batch"):
+            reqs = json.loads(corpo)["requests"]
+            return self._responder(200, {"responses": [{"id": r["id"], "status": 202, "body": None} for r in reqs]})
+        if self.path.endswith("/sendMail"):
+            return self._responder(202)
+        self._responder(404, {"error": self.path})
+
+
+def _medir(rotulo: str, fn, n: int) -> None:
+    _FakeGraph.conexoes = 0
+    inicio = time.perf_counter()
+    fn()
+    dur = time.perf_counter() - inicio
+    print(f"   {rotulo:<22} {dur:7.2f}s  {n / dur:8.1f} msg/s  {_FakeGraph.conexoes:4d} conexões")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    _FakeGraph.latencia = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _FakeGraph)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_port}"
+    os.environ["GRAPH_BASE_URL"] = f"{base}/v1.0"
+    os.environ["GRAPH_LOGIN_URL"] = base
+    from core.msgraph_client import GraphClient
+
+    payload = {"message": {"subject": "teste", "body": {"contentType": "HTML", "content": "<p>x</p>"},
+                           "toRecipients": [{"emailAddress": {"address": "a@b.c"}}]}}
+    path = "/users/fake/sendMail"
+
+    def _urllib(_):
+        req = request.Request(f"{base}/v1.0{path}", data=json.dumps(payload).encode(), method="POST")
+        req.add_header("Content-Type", "application/json")
+        with request.urlopen(req, timeout=20) as resp:
+            resp.read()
+
+    client = GraphClient("tenant", "id", "secret")
+    client.token()
+
+    print(f"📧 {n} mensagens, latência {_FakeGraph.latencia * 1000:.0f} ms, {threads} thread(s)")
+    print("-" * 70)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        _medir("urllib por mensagem", lambda: list(pool.map(_urllib, range(n))), n)
+        _medir("keep-alive por msg", lambda: list(pool.map(lambda _: client.post(path, payload), range(n))), n)
+        lotes = [[(path, payload)] * 20 for _ in range(0, n, 20)]
+        _medir("$batch (20/chamada)", lambda: list(pool.map(client.send_batch, lotes)), n)
+    print("-" * 70)
+    servidor.shutdown()
@@ -0,0 +1,62 @@
+"""
+Benchmark da renderização dos e-mails (core/email_templates.py).
+
+Uso:
+    python -m ti.scripts.benchmark_email_templates [mensagens] [chamados]
+
+Renderiza `mensagens` e-mails de abertura/status/resumo para `chamados`
+chamados fictícios com renderizar_lote() e mede mensagens/s: primeiro com
+todos os chamados distintos (cache frio), depois repetindo os mesmos
+chamados (tabela do chamado vinda do cache). Não precisa de banco.
+"""
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from core import email_templates
+
+
+def _chamado(i: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=i, codigo=f"EVQ-{i:05d}", protocolo=f"2026{i:08d}", status="Em andamento",
+        prioridade="Normal", solicitante=f"Solicitante {i} & Cia", cargo="Gerente",
+        telefone="(11) 99999-0000", email=f"pessoa{i}@exemplo.com", unidade="Unidade <Centro>",
+        problema="Internet", internet_item="Fibra", data_visita=None,
+        data_abertura=datetime(2026, 1, 1, 8, 30), descricao="Sem conexão\ndesde ontem",
+    )
+
+
+def _itens(chamados: list, n: int) -> list:
+    transicoes = [
+        {"de": "Aberto", "para": "Em análise", "em": "2026-01-01T09:00:00"},
+        {"de": "Em análise", "para": "Em andamento", "em": "2026-01-01T09:03:00"},
+    ]
+    tipos = (
+        lambda ch: ("chamado_aberto", (ch,)),
+        lambda ch: ("status_atualizado", (ch, "Aberto")),
+        lambda ch: ("status_atualizado", (ch, "Aberto", transicoes)),
+    )
+    return [tipos[i % 3](chamados[i % len(chamados)]) for i in range(n)]
+
+
+def _medir(rotulo: str, itens: list) -> None:
+    inicio = time.perf_counter()
+    resultado = email_templates.renderizar_lote(itens)
+    dur = time.perf_counter() - inicio
+    kb = sum(len(html) for _, html in resultado) / len(resultado) / 1024
+    print(f"   {rotulo:<16} {dur:7.3f}s  {len(itens) / dur:10.0f} msg/s  ({kb:.1f} KB/msg)")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    print(f"📨 {n} mensagens")
+    print("-" * 60)
+    _medir("cache frio", _itens([_chamado(i) for i in range(n)], n))
+    email_templates._tabela_chamado.cache_clear()
+    repetidos = [_chamado(i) for i in range(k)]
+    email_templates.renderizar_lote(_itens(repetidos, k))  # aquece o cache
+    _medir(f"{k} chamados", _itens(repetidos, n))
+    print("-" * 60)
+    print(f"   {email_templates.get_stats()}")
@@ -0,0 +1,46 @@
+"""
+Benchmark do storage de arquivos (core/storage.py).
+
+Uso:
+    python -m ti.scripts.benchmark_storage [tamanho_mb] [quantidade] [threads]
+
+Envia `quantidade` arquivos de `tamanho_mb` MB a partir de `threads` threads,
+baixa de volta e remove, medindo MB/s. Usa o backend de STORAGE_BACKEND:
+com STORAGE_BACKEND=local roda contra o emulador em disco, sem Azure.
+Parâmetros de bloco/concorrência: AZURE_BLOB_BLOCO_MB, AZURE_BLOB_PUT_UNICO_MB,
+AZURE_BLOB_CONCORRENCIA.
+"""
+import io
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from core.storage import STORAGE_BACKEND, get_storage
+
+
+def _medir(rotulo: str, fn, itens, threads: int, total_mb: float = 0) -> None:
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(fn, itens))
+    dur = time.perf_counter() - inicio
+    vazao = f"  {total_mb / dur:8.1f} MB/s" if total_mb else ""
+    print(f"   {rotulo:<10} {dur:7.2f}s  {len(itens) / dur:8.1f} op/s{vazao}")
+
+
+if __name__ == "__main__":
+    tamanho_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 16
+    quantidade = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    storage = get_storage()
+    dados = os.urandom(int(tamanho_mb * 1024 * 1024))
+    nomes = [f"benchmark/{uuid.uuid4().hex}" for _ in range(quantidade)]
+    total_mb = tamanho_mb * quantidade
+
+    print(f"📦 Storage '{STORAGE_BACKEND}': {quantidade} x {tamanho_mb} MB, {threads} thread(s)")
+    print("-" * 60)
+    _medir("upload", lambda n: storage.upload_file(n, io.BytesIO(dados), len(dados)), nomes, threads, total_mb)
+    _medir("download", lambda n: storage.download_bytes(n), nomes, threads, total_mb)
+    _medir("remoção", storage.delete_blob, nomes, threads)
+    print("-" * 60)
@@ -2,6 +2,7 @@
 Script para criar índices de performance nas tabelas principais.
 Esses índices melhoram a velocidade das queries de métricas e SLA.
 """
+import sys
 from sqlalchemy import text, inspect
 from core.db import engine
 
@@ -12,18 +13,34 @@ INDICES = [
     ("idx_chamado_status_data", "chamado", ["status", "data_abertura"]),
     ("idx_chamado_data_conclusao", "chamado", ["data_conclusao"]),
     ("idx_chamado_primeira_resposta", "chamado", ["data_primeira_resposta"]),
+    # Consulta principal de SLA (antes em scripts/add_sla_indexes.py)
+    ("idx_chamado_composite_sla", "chamado", ["data_abertura", "status", "prioridade"]),
+    # Listagem paginada (keyset em id DESC, sempre com deletado_em IS NULL)
+    ("idx_chamado_lista_id", "chamado", ["deletado_em", "id"]),
+    ("idx_chamado_lista_status", "chamado", ["deletado_em", "status", "id"]),
+    ("idx_chamado_lista_prioridade", "chamado", ["deletado_em", "prioridade", "id"]),
+    ("idx_chamado_lista_unidade", "chamado", ["deletado_em", "unidade", "id"]),
+    ("idx_chamado_lista_atribuido", "chamado", ["deletado_em", "status_assumido_por_id", "id"]),
+    ("idx_chamado_lista_abertura", "chamado", ["deletado_em", "data_abertura", "id"]),
     ("idx_historico_chamado_created", "historico_status", ["chamado_id", "created_at"]),
     ("idx_historico_status", "historico_status", ["status", "created_at"]),
     ("idx_sla_config_prioridade", "sla_configuration", ["prioridade"]),
     ("idx_sla_config_ativo", "sla_configuration", ["ativo"]),
 ]
 
-def create_indices():
-    """Cria índices se não existirem"""
+# Índices FULLTEXT (busca textual de chamados em /chamados/search)
+FULLTEXT_INDICES = [
+    ("ft_chamado_busca", "chamado", ["descricao", "solicitante", "problema"]),
+]
+
+def create_indices() -> bool:
+    """Cria índices se não existirem; retorna False se algum falhar"""
     inspector = inspect(engine)
+    erros = 0
     
     with engine.connect() as conn:
-        for index_name, table_name, columns in INDICES:
+        todos = [(n, t, c, "") for n, t, c in INDICES] + [(n, t, c, "FULLTEXT ") for n, t, c in FULLTEXT_INDICES]
+        for index_name, table_name, columns, kind in todos:
             try:
                 # Verifica se a tabela existe
                 if not inspector.has_table(table_name):
@@ -39,22 +56,25 @@ def create_indices():
                 
                 # Cria o índice
                 columns_str = ", ".join(columns)
-                sql = f"CREATE INDEX {index_name} ON {table_name} ({columns_str});"
+                sql = f"CREATE {kind}INDEX {index_name} ON {table_name} ({columns_str});"
                 
                 conn.execute(text(sql))
                 conn.commit()
                 print(f"✅ Índice '{index_name}' criado em '{table_name}'")
                 
             except Exception as e:
+                erros += 1
                 print(f"❌ Erro ao criar índice '{index_name}': {e}")
                 try:
                     conn.rollback()
                 except:
                     pass
+    return erros == 0
 
 if __name__ == "__main__":
     print("🔧 Criando índices de performance...")
     print("-" * 60)
-    create_indices()
+    ok = create_indices()
     print("-" * 60)
-    print("✅ Processo concluído!")
+    print("✅ Processo concluído!" if ok else "❌ Processo concluído com erros")
+    sys.exit(0 if ok else 1)
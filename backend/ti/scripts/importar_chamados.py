@@ -0,0 +1,60 @@
+"""
+Script para importar chamados históricos em lote.
+
+Uso:
+    python -m ti.scripts.importar_chamados arquivo.csv|arquivo.ndjson [lote] [--sem-sla]
+
+CSV precisa de cabeçalho com os nomes das colunas de chamado (solicitante,
+cargo, email, telefone, unidade, problema obrigatórios). Linhas sem codigo
+recebem EVQ-XXXX alocados em bloco e precisam de data_abertura. Reexecutar é
+seguro: codigos já existentes são ignorados, e linhas sem codigo são
+reconhecidas por email, solicitante, unidade, problema e data_abertura.
+Linhas mal formadas são listadas no fim, sem interromper a importação.
+"""
+import sys
+import time
+from ti.services.importacao import IMPORTACAO_LOTE, importar_chamados, iter_registros
+
+
+def _progresso(inicio: float):
+    ultimo = {"t": 0.0}
+
+    def _print(st: dict) -> None:
+        agora = time.perf_counter()
+        if agora - ultimo["t"] < 2 and not st.get("concluido"):
+            return
+        ultimo["t"] = agora
+        taxa = st.get("lidos", 0) / max(agora - inicio, 0.001)
+        print(
+            f"   [{st.get('fase')}] lidos={st.get('lidos', 0)} inseridos={st.get('inseridos', 0)} "
+            f"ignorados={st.get('ignorados', 0)} invalidos={st.get('invalidos', 0)} "
+            f"sla={st.get('sla_calculados', 0)} ({taxa:.0f} linhas/s)"
+        )
+    return _print
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    caminho = args[0]
+    lote = int(args[1]) if len(args) > 1 else IMPORTACAO_LOTE
+    formato = "ndjson" if caminho.lower().endswith((".ndjson", ".jsonl")) else "csv"
+    calcular_sla = "--sem-sla" not in sys.argv
+
+    print(f"📥 Importando {caminho} ({formato}, lotes de {lote})...")
+    print("-" * 60)
+    inicio = time.perf_counter()
+    with open(caminho, "rb") as f:
+        stats = importar_chamados(
+            iter_registros(f, formato), lote=lote, calcular_sla=calcular_sla,
+            progresso=_progresso(inicio),
+        )
+    print("-" * 60)
+    print(
+        f"✅ {stats['inseridos']} chamados importados em {time.perf_counter() - inicio:.1f}s "
+        f"({stats['ignorados']} já existentes, {stats['invalidos']} inválidos)"
+    )
+    for erro in stats.get("erros", [])[:20]:
+        print(f"   linha {erro['linha']}: {erro['erro']}")
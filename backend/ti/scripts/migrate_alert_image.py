@@ -10,8 +10,9 @@ from core.db import engine
 import sys
 
 def migrate_alert_image():
-    """Adiciona colunas de imagem à tabela alert se não existirem."""
-    
+    """Adiciona colunas de imagem à tabela alert se não existirem (False se algo falhar)."""
+    erros = 0
+
     with engine.connect() as conn:
         inspector = inspect(engine)
         
@@ -36,6 +37,7 @@ def migrate_alert_image():
                 print("[MIGRATE] Coluna 'imagem_blob' adicionada com sucesso.")
             except Exception as e:
                 print(f"[MIGRATE] Erro ao adicionar coluna 'imagem_blob': {e}")
+                erros += 1
                 conn.rollback()
         else:
             print("[MIGRATE] Coluna 'imagem_blob' já existe.")
@@ -51,10 +53,14 @@ def migrate_alert_image():
                 print("[MIGRATE] Coluna 'imagem_mime_type' adicionada com sucesso.")
             except Exception as e:
                 print(f"[MIGRATE] Erro ao adicionar coluna 'imagem_mime_type': {e}")
+                erros += 1
                 conn.rollback()
         else:
             print("[MIGRATE] Coluna 'imagem_mime_type' já existe.")
     
+    if erros:
+        print(f"[MIGRATE] Migração concluída com {erros} erro(s)")
+        return False
     print("[MIGRATE] Migração concluída!")
     return True
 
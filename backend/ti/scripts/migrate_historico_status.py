@@ -9,16 +9,17 @@ This handles both:
 from sqlalchemy import inspect
 from core.db import engine
 
-def migrate_historico_status():
-    """Migrate historico_status table to new schema"""
+def migrate_historico_status() -> bool:
+    """Migrate historico_status table to new schema; returns False on any error"""
     
+    errors = 0
     try:
         insp = inspect(engine)
         
         # Check if table exists
         if not insp.has_table("historico_status"):
             print("[migration] Table historico_status does not exist. Skipping migration.")
-            return
+            return True
         
         # Get existing columns
         existing_cols = {c.get("name"): c for c in insp.get_columns("historico_status")}
@@ -114,6 +115,7 @@ def migrate_historico_status():
                                 )
                                 print(f"[migration] Added column: {col}")
                             except Exception as e:
+                                errors += 1
                                 print(f"[migration] Error adding column {col}: {e}")
                 
                 # Ensure indices exist
@@ -131,7 +133,11 @@ def migrate_historico_status():
         print(f"[migration] Error during migration: {e}")
         import traceback
         traceback.print_exc()
+        return False
+    return errors == 0
 
 if __name__ == "__main__":
-    migrate_historico_status()
-    print("Migration finished successfully!")
+    import sys
+    ok = migrate_historico_status()
+    print("Migration finished successfully!" if ok else "Migration finished with errors")
+    sys.exit(0 if ok else 1)
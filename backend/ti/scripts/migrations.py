@@ -0,0 +1,219 @@
+"""
+Migrações versionadas do schema, em ordem de aplicação.
+
+Os scripts avulsos de ti/scripts e scripts/ continuam executáveis
+individualmente; aqui eles são registrados no ledger (core/migrations.py)
+para que o boot aplique apenas o que estiver pendente.
+
+Fora do ledger, de propósito:
+- scripts/add_sla_indexes.py: os índices dele estão em
+  create_performance_indices (0010) ou já vêm dos modelos (metrics_cache_db)
+- Arquivos .sql: azure_schema.sql e create_sla_tables.sql criam do zero o
+  que os modelos e 0001 já criam; create_notification_settings_table.sql
+  equivale a 0005; add_dashboard_permissions.sql equivale a 0020 (a tabela
+  dashboard_permission, alternativa ao JSON, não é usada pela aplicação);
+  add_business_hours_holidays.sql é carga de dados (feriados por ano) feita
+  pelo administrador, não schema
+
+Uso:
+    python -m ti.scripts.migrations           # aplica pendentes
+    python -m ti.scripts.migrations --status  # lista aplicadas/pendentes
+"""
+import sys
+from core.db import engine
+from core.migrations import Migration, apply_pending, pending, read_ledger
+
+
+def _ensure_sla_tables():
+    from ti.scripts.ensure_sla_tables import ensure_sla_tables
+    ensure_sla_tables()
+
+
+def _create_metrics_cache_table():
+    from ti.scripts.create_metrics_cache_table import create_metrics_cache_table
+    create_metrics_cache_table()
+
+
+def _ensure_attachment_schema():
+    from scripts.ensure_schema import main
+    if main() != 0:
+        raise RuntimeError("scripts/ensure_schema reportou erros")
+
+
+def _migrate_historico_status():
+    from ti.scripts.migrate_historico_status import migrate_historico_status
+    return migrate_historico_status()
+
+
+def _create_notification_settings_table():
+    from ti.scripts.setup_notification_settings import create_notification_settings_table
+    return create_notification_settings_table()
+
+
+def _add_sla_reset_column():
+    from ti.scripts.add_sla_reset_column import add_reset_column
+    add_reset_column()
+
+
+def _add_auth0_user_columns():
+    from ti.scripts.add_auth0_user_columns import add_auth0_columns
+    add_auth0_columns()
+
+
+def _create_media_alert_notification_tables():
+    from ti.models.media import Media
+    from ti.models.alert import Alert
+    from ti.models.notification import Notification
+    for model in (Media, Alert, Notification):
+        model.__table__.create(bind=engine, checkfirst=True)
+
+
+def _migrate_alert_image():
+    from ti.scripts.migrate_alert_image import migrate_alert_image
+    return migrate_alert_image()
+
+
+def _create_performance_indices():
+    from ti.scripts.create_performance_indices import create_indices
+    # Índices só aceleram consultas (a busca cai para LIKE sem o FULLTEXT):
+    # falha aqui é aviso, não impede o boot
+    if not create_indices():
+        print("⚠️  [MIGRATIONS] Alguns índices de performance não foram criados (ver log acima)")
+
+
+def _create_chamado_sequencia():
+    from ti.services.chamados import ensure_sequencia_table
+    with engine.begin() as conn:
+        ensure_sequencia_table(conn)
+
+
+def _add_export_watermarks():
+    from ti.services.export import ensure_watermark_columns
+    ensure_watermark_columns()
+
+
+def _create_jobs_table():
+    from core.jobs import ensure_jobs_table
+    ensure_jobs_table()
+
+
+def _create_sla_recalculo_checkpoints():
+    from ti.scripts.recalculate_sla_complete import ensure_checkpoint_tables
+    ensure_checkpoint_tables()
+
+
+def _add_blob_hash_columns():
+    from ti.services.blob_migracao import ensure_hash_columns
+    ensure_hash_columns()
+
+
+def _add_alert_imagem_metadados():
+    from ti.services.imagens import ensure_metadados_columns
+    ensure_metadados_columns()
+
+
+def _create_email_outbox_table():
+    from core.email_outbox import ensure_outbox_table
+    ensure_outbox_table()
+
+
+def _add_email_outbox_agrupamento():
+    from core.email_outbox import ensure_agrupamento_columns
+    ensure_agrupamento_columns()
+
+
+def _add_email_outbox_chave_aberta():
+    from core.email_outbox import ensure_chave_aberta_column
+    ensure_chave_aberta_column()
+
+
+def _add_dashboard_permissions():
+    from ti.scripts.add_dashboard_permissions import add_permissions_columns
+    add_permissions_columns()
+
+
+MIGRATIONS = [
+    Migration("0001_ensure_sla_tables", _ensure_sla_tables,
+              "Tabelas de SLA (configuração, horário comercial, feriados, histórico)",
+              fontes=["ti.scripts.ensure_sla_tables"]),
+    Migration("0002_create_metrics_cache_table", _create_metrics_cache_table,
+              "Tabela metrics_cache_db",
+              fontes=["ti.scripts.create_metrics_cache_table", "ti.models.metrics_cache:MetricsCacheDB"]),
+    Migration("0003_ensure_attachment_schema", _ensure_attachment_schema,
+              "Colunas esperadas de anexos, históricos e cache (scripts/ensure_schema)",
+              repetivel=True, fontes=["scripts.ensure_schema"]),
+    Migration("0004_migrate_historico_status", _migrate_historico_status,
+              "Estrutura nova de historico_status",
+              fontes=["ti.scripts.migrate_historico_status"]),
+    Migration("0005_create_notification_settings_table", _create_notification_settings_table,
+              "Tabela notification_settings com configuração padrão",
+              fontes=["ti.scripts.setup_notification_settings"]),
+    Migration("0006_add_sla_reset_column", _add_sla_reset_column,
+              "Coluna sla_configuration.ultimo_reset_em",
+              fontes=["ti.scripts.add_sla_reset_column"]),
+    Migration("0007_add_auth0_user_columns", _add_auth0_user_columns,
+              "Colunas user.email_verified e user.auth0_id",
+              fontes=["ti.scripts.add_auth0_user_columns"]),
+    Migration("0008_create_media_alert_notification_tables", _create_media_alert_notification_tables,
+              "Tabelas media, alert e notification",
+              fontes=["ti.models.media:Media", "ti.models.alert:Alert", "ti.models.notification:Notification"]),
+    Migration("0009_migrate_alert_image", _migrate_alert_image,
+              "Colunas de imagem em alert",
+              fontes=["ti.scripts.migrate_alert_image"]),
+    Migration("0010_create_performance_indices", _create_performance_indices,
+              "Índices de performance (reaplicada quando a lista de índices muda)",
+              repetivel=True, fontes=["ti.scripts.create_performance_indices"]),
+    Migration("0011_create_chamado_sequencia", _create_chamado_sequencia,
+              "Contadores atômicos de codigo/protocolo semeados pelo maior EVQ existente",
+              fontes=["ti.services.chamados:ensure_sequencia_table"]),
+    Migration("0012_add_export_watermarks", _add_export_watermarks,
+              "Coluna atualizado_em (ON UPDATE) e índice em chamado e historico_sla",
+              fontes=["ti.services.export:ensure_watermark_columns"]),
+    Migration("0013_create_jobs_table", _create_jobs_table,
+              "Tabela jobs (operações de manutenção em background)",
+              fontes=["core.jobs:ensure_jobs_table"]),
+    Migration("0014_create_sla_recalculo_checkpoints", _create_sla_recalculo_checkpoints,
+              "Tabelas de checkpoint do recálculo paralelo de SLA",
+              fontes=["ti.scripts.recalculate_sla_complete:ensure_checkpoint_tables"]),
+    Migration("0015_add_blob_hash_columns", _add_blob_hash_columns,
+              "Colunas media.arquivo_sha256 e alert.imagem_sha256 (conteúdo no blob store)",
+              fontes=["ti.services.blob_migracao:ensure_hash_columns"],
+              # Versão com o ALTER dentro do wrapper (mesmo efeito)
+              checksums_anteriores=["9ef3bcf9e29a64ea447d0199edbac76babce2cf7045b0b069bbfa6f37a134924"]),
+    Migration("0016_add_alert_imagem_metadados", _add_alert_imagem_metadados,
+              "Dimensões e miniaturas WebP das imagens de alerta",
+              fontes=["ti.services.imagens:ensure_metadados_columns"],
+              checksums_anteriores=["375fcb36b9aff5fe41c5194849471071baac598d16799a9e742f361b6af424cf"]),
+    Migration("0017_create_email_outbox_table", _create_email_outbox_table,
+              "Tabela email_outbox (caixa de saída de e-mails)",
+              fontes=["core.email_outbox:ensure_outbox_table"]),
+    Migration("0018_add_email_outbox_agrupamento", _add_email_outbox_agrupamento,
+              "Colunas de agrupamento (resumo de mudanças de status) na email_outbox",
+              fontes=["core.email_outbox:ensure_agrupamento_columns"]),
+    Migration("0019_add_email_outbox_chave_aberta", _add_email_outbox_chave_aberta,
+              "Chave UNIQUE do resumo de e-mail ainda aberto na email_outbox",
+              fontes=["core.email_outbox:ensure_chave_aberta_column"]),
+    Migration("0020_add_dashboard_permissions", _add_dashboard_permissions,
+              "Colunas powerbi_dashboard.permissoes/permissoes_atualizadas_em e índice por categoria",
+              fontes=["ti.scripts.add_dashboard_permissions:add_permissions_columns"]),
+]
+
+
+def apply_all():
+    """Aplica as migrações pendentes (usado no boot)"""
+    return apply_pending(MIGRATIONS)
+
+
+if __name__ == "__main__":
+    if "--status" in sys.argv:
+        ledger = read_ledger()
+        pendentes = {m.id for m in pending(MIGRATIONS, ledger)}
+        for m in MIGRATIONS:
+            marca = "pendente" if m.id in pendentes else "aplicada"
+            print(f"{m.id:50} {marca}")
+        sys.exit(0)
+    print("🔧 Aplicando migrações pendentes...")
+    print("-" * 60)
+    stats = apply_all()
+    print("-" * 60)
+    print(f"✅ {len(stats['aplicadas'])} migração(ões) aplicada(s)")
@@ -3,36 +3,280 @@
 Script para recalcular SLA de TODOS os chamados do sistema de forma robusta.
 
 Este script:
-1. Recalcula o SLA para todos os chamados existentes
-2. Atualiza a tabela de histórico de SLA
+1. Recalcula o SLA dos chamados abertos ou alterados desde a última execução
+   (--completo recalcula todos)
+2. Atualiza a tabela de histórico de SLA em lote
 3. Computa estatísticas agregadas (tempo médio de resposta/resolução)
 4. Pode ser executado periodicamente (recomendado: diariamente às 00:00)
 
+Execução:
+- Os chamados são divididos em faixas de ID (SLA_RECALC_SHARD ids) processadas
+  em paralelo por um pool de processos (SLA_RECALC_WORKERS), cada processo com
+  a própria sessão; dentro da faixa, blocos de SLA_RECALC_CHUNK chamados com
+  prefetch de configurações e historico_status
+- Cada faixa concluída é registrada em sla_recalculo_shard. Uma execução
+  interrompida (processo encerrado, deploy) é retomada na próxima chamada,
+  pulando as faixas já concluídas. As faixas seguem uma grade fixa de
+  múltiplos de SLA_RECALC_SHARD (não o MIN(id) atual, que muda quando o
+  arquivamento remove ids baixos) e, na retomada, só o que nenhuma faixa
+  concluída cobre ([id_inicio, id_fim)) é reprocessado
+- Incremental por padrão: chamados abertos + chamados com atualizado_em
+  posterior ao início da última execução concluída. Alteração em
+  sla_configuration desde então força execução completa. As médias e
+  contagens retornadas consideram os chamados reprocessados
+- GET_LOCK impede duas execuções simultâneas (um scheduler por worker)
+
 Uso:
-    python -m ti.scripts.recalculate_sla_complete
+    python -m ti.scripts.recalculate_sla_complete [--completo] [--workers N]
 """
 
+import multiprocessing
+import os
 import sys
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import inspect, text
 
 sys.path.insert(0, "/app/backend")
 
 from core.db import SessionLocal, engine
 from ti.models.chamado import Chamado
 from ti.models.sla_config import HistoricoSLA, SLAConfiguration
-from ti.models.historico_status import HistoricoStatus
 from ti.services.sla import SLACalculator
 from ti.services.sla_cache import SLACacheManager
 from core.utils import now_brazil_naive
 
 
+SLA_RECALC_WORKERS = int(os.getenv("SLA_RECALC_WORKERS", str(min(4, os.cpu_count() or 1))))
+SLA_RECALC_SHARD = int(os.getenv("SLA_RECALC_SHARD", "5000"))
+SLA_RECALC_CHUNK = int(os.getenv("SLA_RECALC_CHUNK", "500"))
+SLA_RECALC_LOCK = "evoque_sla_recalculo"
+
+STATUS_FECHADOS = ("Concluido", "Concluído", "Cancelado")
+MAX_DETALHES = 50
+
+_CHECKPOINT_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS sla_recalculo_execucao (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        modo VARCHAR(20) NOT NULL,
+        desde DATETIME NULL,
+        status VARCHAR(20) NOT NULL,
+        total_shards INT NOT NULL DEFAULT 0,
+        iniciado_em DATETIME NOT NULL,
+        finalizado_em DATETIME NULL,
+        KEY idx_sla_recalculo_status (status, iniciado_em)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sla_recalculo_shard (
+        execucao_id INT NOT NULL,
+        id_inicio INT NOT NULL,
+        id_fim INT NOT NULL,
+        stats TEXT NULL,
+        concluido_em DATETIME NOT NULL,
+        PRIMARY KEY (execucao_id, id_inicio)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+)
+
+
+def ensure_checkpoint_tables() -> None:
+    """Tabelas de checkpoint do recálculo (migração 0014)"""
+    with engine.begin() as conn:
+        for ddl in _CHECKPOINT_DDL:
+            conn.exec_driver_sql(ddl)
+
+
+def _stats_vazias() -> dict:
+    return {
+        "total_chamados": 0,
+        "recalculados": 0,
+        "com_erro": 0,
+        "chamados_dentro_sla_resposta": 0,
+        "chamados_dentro_sla_resolucao": 0,
+        "soma_resposta": 0.0,
+        "n_resposta": 0,
+        "soma_resolucao": 0.0,
+        "n_resolucao": 0,
+        "detalhes": [],
+    }
+
+
+def _somar(total: dict, parcial: dict) -> None:
+    for chave, valor in parcial.items():
+        if chave == "detalhes":
+            total["detalhes"].extend(valor[: max(0, MAX_DETALHES - len(total["detalhes"]))])
+        else:
+            total[chave] += valor
+
+
+def _filtro_candidatos(desde: Optional[datetime]) -> tuple[str, dict]:
+    if desde is None:
+        return "", {}
+    fechados = ", ".join(f"'{s}'" for s in STATUS_FECHADOS)
+    return f" AND (status NOT IN ({fechados}) OR atualizado_em >= :desde)", {"desde": desde}
+
+
+def _upsert_historicos(db: Session, chamados: list[Chamado], resultados: dict[int, dict]) -> None:
+    """Atualiza o registro mais recente de cada chamado ou insere um novo, em lote"""
+    if not resultados:
+        return
+    ids = list(resultados)
+    ultimos: dict[int, tuple[int, Optional[datetime]]] = {}
+    for hid, cid, criado in db.query(HistoricoSLA.id, HistoricoSLA.chamado_id, HistoricoSLA.criado_em).filter(
+        HistoricoSLA.chamado_id.in_(ids)
+    ):
+        atual = ultimos.get(cid)
+        if atual is None or (criado or datetime.min) >= (atual[1] or datetime.min):
+            ultimos[cid] = (hid, criado)
+
+    por_id = {c.id: c for c in chamados}
+    atualizacoes, novos = [], []
+    for cid, valores in resultados.items():
+        if cid in ultimos:
+            atualizacoes.append({"id": ultimos[cid][0], **valores})
+        else:
+            chamado = por_id[cid]
+            novos.append({
+                "chamado_id": cid,
+                "usuario_id": None,
+                "acao": "recalculo_automatico",
+                "criado_em": chamado.data_abertura or now_brazil_naive(),
+                **valores,
+            })
+    if atualizacoes:
+        db.bulk_update_mappings(HistoricoSLA, atualizacoes)
+    if novos:
+        db.bulk_insert_mappings(HistoricoSLA, novos)
+
+
+def _processar_bloco(db: Session, chamados: list[Chamado], sla_configs: dict, stats: dict) -> None:
+    historicos = SLACalculator.get_historicos_cache(db, [c.id for c in chamados])
+    resultados: dict[int, dict] = {}
+
+    for chamado in chamados:
+        try:
+            sla_status = SLACalculator.get_sla_status(
+                db, chamado, historicos_cache=historicos, sla_configs=sla_configs
+            )
+            if sla_status.get("status_geral") == "sem_sla":
+                continue
+
+            resposta_metric = sla_status.get("resposta_metric") or {}
+            resolucao_metric = sla_status.get("resolucao_metric") or {}
+            tempo_resposta = resposta_metric.get("tempo_decorrido_horas", 0.0) or 0.0
+            tempo_resolucao = resolucao_metric.get("tempo_decorrido_horas", 0.0) or 0.0
+
+            # Médias apenas com chamados fechados (tempos definitivos)
+            if chamado.status in STATUS_FECHADOS:
+                if tempo_resposta > 0:
+                    stats["soma_resposta"] += tempo_resposta
+                    stats["n_resposta"] += 1
+                if tempo_resolucao > 0:
+                    stats["soma_resolucao"] += tempo_resolucao
+                    stats["n_resolucao"] += 1
+
+            sla_config = sla_configs.get(chamado.prioridade)
+            if sla_config:
+                if tempo_resposta <= sla_config.tempo_resposta_horas:
+                    stats["chamados_dentro_sla_resposta"] += 1
+                if tempo_resolucao <= sla_config.tempo_resolucao_horas:
+                    stats["chamados_dentro_sla_resolucao"] += 1
+
+            resultados[chamado.id] = {
+                "tempo_resposta_horas": tempo_resposta,
+                "tempo_resolucao_horas": tempo_resolucao,
+                "status_novo": chamado.status,
+                "status_sla": sla_status.get("status_geral"),
+            }
+            stats["recalculados"] += 1
+        except Exception as e:
+            stats["com_erro"] += 1
+            if len(stats["detalhes"]) < MAX_DETALHES:
+                stats["detalhes"].append({
+                    "chamado_id": chamado.id,
+                    "codigo": getattr(chamado, "codigo", "?"),
+                    "erro": str(e),
+                })
+
+    _upsert_historicos(db, chamados, resultados)
+
+
+def _descontar(shards: list[tuple[int, int]], concluidas: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Partes das faixas planejadas que nenhuma faixa concluída cobre.
+
+    Na retomada as faixas já gravadas contam como estão; mesmo que a grade
+    mude (outro SLA_RECALC_SHARD), nenhum id é processado nem somado duas vezes.
+    """
+    restantes = []
+    for ini, fim in shards:
+        atual = ini
+        for c_ini, c_fim in concluidas:
+            if c_fim <= atual or c_ini >= fim:
+                continue
+            if c_ini > atual:
+                restantes.append((atual, c_ini))
+            atual = max(atual, c_fim)
+            if atual >= fim:
+                break
+        if atual < fim:
+            restantes.append((atual, fim))
+    return restantes
+
+
+def _processar_shard(execucao_id: int, id_inicio: int, id_fim: int, desde: Optional[datetime]) -> dict:
+    """Recalcula a faixa [id_inicio, id_fim) e grava o checkpoint na mesma transação.
+
+    Executado nos processos do pool: abre a própria sessão.
+    """
+    import json
+
+    db = SessionLocal()
+    stats = _stats_vazias()
+    try:
+        sla_configs = SLACalculator.get_sla_configs(db)
+        filtro, params = _filtro_candidatos(desde)
+        ids = [
+            r[0] for r in db.execute(
+                text(f"SELECT id FROM chamado WHERE id >= :ini AND id < :fim{filtro} ORDER BY id"),
+                {"ini": id_inicio, "fim": id_fim, **params},
+            )
+        ]
+        stats["total_chamados"] = len(ids)
+
+        for i in range(0, len(ids), SLA_RECALC_CHUNK):
+            bloco = db.query(Chamado).filter(Chamado.id.in_(ids[i:i + SLA_RECALC_CHUNK])).all()
+            _processar_bloco(db, bloco, sla_configs, stats)
+            db.flush()
+            db.expunge_all()
+
+        db.execute(
+            text(
+                "INSERT INTO sla_recalculo_shard (execucao_id, id_inicio, id_fim, stats, concluido_em) "
+                "VALUES (:e, :ini, :fim, :s, :agora)"
+            ),
+            {"e": execucao_id, "ini": id_inicio, "fim": id_fim,
+             "s": json.dumps(stats, default=str), "agora": now_brazil_naive()},
+        )
+        db.commit()
+        return stats
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 class SLARecalculator:
-    """Recalcula SLA de forma robusta e eficiente"""
+    """Recalcula SLA em paralelo, por faixas de ID, com checkpoints"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, workers: Optional[int] = None, completo: bool = False):
         self.db = db
+        self.workers = SLA_RECALC_WORKERS if workers is None else workers
+        self.completo = completo
         self.stats = {
             "total_chamados": 0,
             "recalculados": 0,
@@ -44,149 +288,167 @@ class SLARecalculator:
             "detalhes": [],
         }
 
-    def recalculate_all(self, verbose: bool = True) -> dict:
-        """Recalcula SLA de todos os chamados"""
+    def recalculate_all(self, verbose: bool = True, progresso=None, levantar: bool = False) -> dict:
+        """Recalcula SLA dos chamados (incremental por padrão; retoma execução interrompida)
+
+        progresso: callable opcional (shards_concluidos, total_shards)
+        levantar: propaga o erro em vez de devolver as estatísticas zeradas
+        (jobs precisam falhar, não reportar sucesso com 0 recalculados)
+        """
         if verbose:
             print("\n" + "=" * 80)
-            print("RECALCULANDO SLA DE TODOS OS CHAMADOS")
+            print("RECALCULANDO SLA DOS CHAMADOS")
             print("=" * 80 + "\n")
 
-        try:
-            # Carrega configurações de SLA uma vez (otimização)
-            sla_configs = {
-                config.prioridade: config
-                for config in self.db.query(SLAConfiguration).filter(
-                    SLAConfiguration.ativo == True
-                ).all()
-            }
-
-            if not sla_configs:
-                if verbose:
-                    print("⚠️  AVISO: Nenhuma configuração de SLA encontrada!")
-                return self.stats
-
-            # Carrega todos os chamados
-            chamados = self.db.query(Chamado).all()
-            self.stats["total_chamados"] = len(chamados)
-
-            if verbose:
-                print(f"📊 Total de chamados para recalcular: {len(chamados)}")
-                print(f"⚙️  Configurações de SLA encontradas: {len(sla_configs)}")
-                print("-" * 80 + "\n")
-
-            # Coleta tempos para calcular média
-            tempos_resposta = []
-            tempos_resolucao = []
-
-            # Processa cada chamado
-            for idx, chamado in enumerate(chamados, 1):
-                try:
-                    # Mostra progresso a cada 10 chamados
-                    if verbose and idx % 10 == 0:
-                        print(f"⏳ Processando: {idx}/{len(chamados)}...")
-
-                    # Calcula SLA atual
-                    sla_status = SLACalculator.get_sla_status(self.db, chamado)
-
-                    if sla_status.get("status_geral") == "sem_sla":
-                        continue
-
-                    # Extrai métricas
-                    resposta_metric = sla_status.get("resposta_metric", {})
-                    resolucao_metric = sla_status.get("resolucao_metric", {})
-
-                    tempo_resposta = resposta_metric.get("tempo_decorrido_horas", 0.0)
-                    tempo_resolucao = resolucao_metric.get("tempo_decorrido_horas", 0.0)
-
-                    # Coleta para média (apenas fechados para tempo de resposta/resolução definitivos)
-                    if chamado.status in ["Concluido", "Concluído", "Cancelado"]:
-                        if tempo_resposta > 0:
-                            tempos_resposta.append(tempo_resposta)
-                        if tempo_resolucao > 0:
-                            tempos_resolucao.append(tempo_resolucao)
-
-                    # Verifica se estão dentro do SLA
-                    sla_config = sla_configs.get(chamado.prioridade)
-                    if sla_config:
-                        if tempo_resposta <= sla_config.tempo_resposta_horas:
-                            self.stats["chamados_dentro_sla_resposta"] += 1
-                        if tempo_resolucao <= sla_config.tempo_resolucao_horas:
-                            self.stats["chamados_dentro_sla_resolucao"] += 1
-
-                    # Atualiza ou cria histórico de SLA
-                    self._update_sla_history(chamado, sla_status, sla_configs)
-
-                    self.stats["recalculados"] += 1
-
-                except Exception as e:
-                    self.stats["com_erro"] += 1
-                    self.stats["detalhes"].append({
-                        "chamado_id": chamado.id,
-                        "codigo": getattr(chamado, "codigo", "?"),
-                        "erro": str(e),
-                    })
-
-            # Calcula médias
-            if tempos_resposta:
-                self.stats["tempo_medio_resposta_horas"] = sum(tempos_resposta) / len(tempos_resposta)
-            if tempos_resolucao:
-                self.stats["tempo_medio_resolucao_horas"] = sum(tempos_resolucao) / len(tempos_resolucao)
-
-            # Invalida cache de métricas
-            SLACacheManager.invalidate_all_sla(self.db)
-
+        if not SLACalculator.get_sla_configs(self.db):
             if verbose:
-                self._print_stats()
-
+                print("⚠️  AVISO: Nenhuma configuração de SLA encontrada!")
             return self.stats
 
-        except Exception as e:
-            print(f"❌ Erro crítico durante recalculação: {e}")
-            import traceback
-            traceback.print_exc()
-            return self.stats
+        with engine.connect() as lock_conn:
+            if not lock_conn.execute(text("SELECT GET_LOCK(:n, 0)"), {"n": SLA_RECALC_LOCK}).scalar():
+                print("[SLA RECALC] Outra execução em andamento; ignorando")
+                self.stats["ignorado"] = True
+                return self.stats
+            try:
+                return self._executar(verbose, progresso)
+            except Exception as e:
+                print(f"❌ Erro crítico durante recalculação: {e}")
+                import traceback
+                traceback.print_exc()
+                if levantar:
+                    raise
+                return self.stats
+            finally:
+                lock_conn.execute(text("SELECT RELEASE_LOCK(:n)"), {"n": SLA_RECALC_LOCK})
+
+    def _executar(self, verbose: bool, progresso) -> dict:
+        import json
+
+        ensure_checkpoint_tables()
+        execucao = self._retomar_ou_criar()
+        execucao_id, desde = execucao["id"], execucao["desde"]
+
+        concluidos: dict[tuple[int, int], dict] = {
+            (r[0], r[1]): json.loads(r[2] or "{}")
+            for r in self.db.execute(
+                text("SELECT id_inicio, id_fim, stats FROM sla_recalculo_shard WHERE execucao_id = :e"),
+                {"e": execucao_id},
+            )
+        }
+        pendentes = _descontar(self._planejar_shards(), sorted(concluidos))
+        shards = pendentes + sorted(concluidos)
+        self.db.execute(
+            text("UPDATE sla_recalculo_execucao SET total_shards = :t WHERE id = :e"),
+            {"t": len(shards), "e": execucao_id},
+        )
+        self.db.commit()
 
-    def _update_sla_history(self, chamado: Chamado, sla_status: dict, sla_configs: dict):
-        """Atualiza ou cria registro de histórico de SLA"""
-        try:
-            # Busca histórico existente
-            existing = self.db.query(HistoricoSLA).filter(
-                HistoricoSLA.chamado_id == chamado.id
-            ).order_by(HistoricoSLA.criado_em.desc()).first()
-
-            resposta_metric = sla_status.get("resposta_metric", {})
-            resolucao_metric = sla_status.get("resolucao_metric", {})
-
-            tempo_resposta = resposta_metric.get("tempo_decorrido_horas", 0.0)
-            tempo_resolucao = resolucao_metric.get("tempo_decorrido_horas", 0.0)
-
-            if existing:
-                # Atualiza registro existente
-                existing.tempo_resposta_horas = tempo_resposta
-                existing.tempo_resolucao_horas = tempo_resolucao
-                existing.status_novo = chamado.status
-                existing.status_sla = sla_status.get("status_geral")
-                existing.atualizado_em = now_brazil_naive()
-                self.db.add(existing)
-            else:
-                # Cria novo registro
-                historico = HistoricoSLA(
-                    chamado_id=chamado.id,
-                    usuario_id=None,
-                    acao="recalculo_automatico",
-                    status_novo=chamado.status,
-                    tempo_resposta_horas=tempo_resposta,
-                    tempo_resolucao_horas=tempo_resolucao,
-                    status_sla=sla_status.get("status_geral"),
-                    criado_em=chamado.data_abertura or now_brazil_naive(),
-                )
-                self.db.add(historico)
-
-            self.db.flush()
+        if verbose:
+            modo = "completo" if desde is None else f"incremental desde {desde}"
+            print(f"📊 Execução {execucao_id} ({modo}): {len(shards)} faixas, "
+                  f"{len(concluidos)} já concluídas, {self.workers} processo(s)")
+
+        total = _stats_vazias()
+        for parcial in concluidos.values():
+            _somar(total, {**_stats_vazias(), **parcial})
+
+        feitos = len(shards) - len(pendentes)
+        if self.workers > 1 and len(pendentes) > 1:
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx) as pool:
+                futuros = [pool.submit(_processar_shard, execucao_id, ini, fim, desde) for ini, fim in pendentes]
+                for futuro in as_completed(futuros):
+                    _somar(total, futuro.result())
+                    feitos += 1
+                    self._reportar(verbose, progresso, feitos, len(shards))
+        else:
+            for ini, fim in pendentes:
+                _somar(total, _processar_shard(execucao_id, ini, fim, desde))
+                feitos += 1
+                self._reportar(verbose, progresso, feitos, len(shards))
+
+        self.db.execute(
+            text("UPDATE sla_recalculo_execucao SET status = 'concluido', finalizado_em = :agora WHERE id = :e"),
+            {"agora": now_brazil_naive(), "e": execucao_id},
+        )
+        self.db.commit()
+
+        self._consolidar(total, execucao_id, desde, len(concluidos))
+        SLACacheManager.invalidate_all_sla(self.db)
 
-        except Exception as e:
-            print(f"⚠️  Erro ao atualizar histórico do chamado {chamado.id}: {e}")
-            raise
+        if verbose:
+            self._print_stats()
+        return self.stats
+
+    def _retomar_ou_criar(self) -> dict:
+        """Execução interrompida (status em_andamento) é retomada; senão cria uma nova"""
+        row = self.db.execute(text(
+            "SELECT id, modo, desde FROM sla_recalculo_execucao "
+            "WHERE status = 'em_andamento' ORDER BY id DESC LIMIT 1"
+        )).first()
+        if row and (not self.completo or row[1] == "completo"):
+            print(f"[SLA RECALC] Retomando execução {row[0]} interrompida")
+            return {"id": row[0], "desde": row[2]}
+        if row:
+            self.db.execute(
+                text("UPDATE sla_recalculo_execucao SET status = 'abandonado' WHERE id = :e"), {"e": row[0]}
+            )
+
+        desde = None if self.completo else self._desde_ultima_execucao()
+        agora = self.db.execute(text("SELECT NOW()")).scalar()
+        result = self.db.execute(
+            text(
+                "INSERT INTO sla_recalculo_execucao (modo, desde, status, iniciado_em) "
+                "VALUES (:modo, :desde, 'em_andamento', :agora)"
+            ),
+            {"modo": "completo" if desde is None else "incremental", "desde": desde, "agora": agora},
+        )
+        self.db.commit()
+        return {"id": result.lastrowid, "desde": desde}
+
+    def _desde_ultima_execucao(self) -> Optional[datetime]:
+        """Início da última execução concluída, ou None (completo) quando não há
+        watermark confiável: sem execução anterior, sem coluna atualizado_em ou
+        com configuração de SLA alterada depois dela"""
+        ultima = self.db.execute(text(
+            "SELECT MAX(iniciado_em) FROM sla_recalculo_execucao WHERE status = 'concluido'"
+        )).scalar()
+        if ultima is None:
+            return None
+        if "atualizado_em" not in {c["name"] for c in inspect(engine).get_columns("chamado")}:
+            return None
+        config_alterada = self.db.query(SLAConfiguration.id).filter(
+            SLAConfiguration.atualizado_em >= ultima
+        ).first()
+        return None if config_alterada else ultima
+
+    def _planejar_shards(self) -> list[tuple[int, int]]:
+        """Faixas [ini, ini + SLA_RECALC_SHARD) alinhadas à grade fixa de ids"""
+        minimo, maximo = self.db.execute(text("SELECT MIN(id), MAX(id) FROM chamado")).first()
+        if minimo is None:
+            return []
+        inicio = (minimo // SLA_RECALC_SHARD) * SLA_RECALC_SHARD
+        return [(ini, ini + SLA_RECALC_SHARD) for ini in range(inicio, maximo + 1, SLA_RECALC_SHARD)]
+
+    def _reportar(self, verbose: bool, progresso, feitos: int, total: int) -> None:
+        if verbose:
+            print(f"⏳ Faixas concluídas: {feitos}/{total}")
+        if progresso:
+            progresso(feitos, total)
+
+    def _consolidar(self, total: dict, execucao_id: int, desde: Optional[datetime], retomados: int) -> None:
+        for chave in ("total_chamados", "recalculados", "com_erro",
+                      "chamados_dentro_sla_resposta", "chamados_dentro_sla_resolucao"):
+            self.stats[chave] = total[chave]
+        self.stats["detalhes"] = total["detalhes"]
+        if total["n_resposta"]:
+            self.stats["tempo_medio_resposta_horas"] = total["soma_resposta"] / total["n_resposta"]
+        if total["n_resolucao"]:
+            self.stats["tempo_medio_resolucao_horas"] = total["soma_resolucao"] / total["n_resolucao"]
+        self.stats["execucao_id"] = execucao_id
+        self.stats["modo"] = "completo" if desde is None else "incremental"
+        self.stats["shards_retomados"] = retomados
 
     def _print_stats(self):
         """Imprime estatísticas da recalculação"""
@@ -207,10 +469,14 @@ class SLARecalculator:
 
 def main():
     """Executa a recalculação"""
+    args = sys.argv[1:]
+    workers: Any = None
+    if "--workers" in args:
+        workers = int(args[args.index("--workers") + 1])
     db = SessionLocal()
     try:
-        recalculator = SLARecalculator(db)
-        stats = recalculator.recalculate_all(verbose=True)
+        recalculator = SLARecalculator(db, workers=workers, completo="--completo" in args)
+        recalculator.recalculate_all(verbose=True)
         db.commit()
         return 0
     except Exception as e:
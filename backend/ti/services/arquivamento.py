@@ -0,0 +1,368 @@
+"""
+Arquivamento quente/frio de chamados encerrados
+
+Chamados Concluídos/Cancelados há mais de N meses são movidos, junto com
+historico_status, historicos_tickets, historico_anexos, historico_sla e os
+metadados de anexos, para tabelas <tabela>_arquivo com o mesmo layout.
+
+Estratégia:
+1. Lotes por id crescente; cada lote é uma transação que revalida os
+   candidatos com FOR UPDATE, copia para o arquivo (INSERT simples) e
+   apaga da tabela quente só se as contagens baterem; qualquer conflito
+   reverte o lote inteiro, então uma execução interrompida é retomada
+   simplesmente executando de novo
+2. Leitura transparente: obter_historico e os downloads de anexos
+   consultam o arquivo quando o chamado não está na tabela quente
+3. Métricas por período somam as contagens do arquivo quando o período
+   começa antes do horizonte arquivado; a distribuição de SLA por período
+   (UnifiedSLAMetricsCalculator) classifica também os chamados arquivados
+   (iter_chamados_arquivados)
+4. O corte nunca passa do início do mês corrente nem dos últimos 30 dias:
+   as métricas de janela fixa (24h, mês, 30 dias — P90, performance,
+   compliance) só veem chamados que nunca são arquivados
+"""
+
+from __future__ import annotations
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.orm import Session
+from core import jobs
+from core.db import engine
+from core.jobs import JobContext
+from core.utils import now_brazil_naive
+
+
+ARQUIVAR_CHAMADOS = "chamados.arquivar"
+ARQUIVO_SUFIXO = "_arquivo"
+ARQUIVAMENTO_MESES = int(os.getenv("ARQUIVAMENTO_MESES", "12"))
+ARQUIVAMENTO_LOTE = int(os.getenv("ARQUIVAMENTO_LOTE", "500"))
+STATUS_ARQUIVAVEIS = ("Concluído", "Cancelado")
+
+# Tabelas filhas (por chamado_id) antes da tabela chamado, por causa das FKs
+TABELAS_FILHAS = [
+    "historico_status",
+    "historicos_tickets",
+    "historico_anexos",
+    "historico_sla",
+    "chamado_anexo",
+    "ticket_anexos",
+]
+
+_lock = threading.Lock()
+_horizonte: Optional[datetime] = None
+_horizonte_em: Optional[datetime] = None
+_HORIZONTE_TTL_SECONDS = 600
+_ultima_execucao: dict[str, Any] = {}
+
+
+def tabela_arquivo(tabela: str) -> str:
+    return f"{tabela}{ARQUIVO_SUFIXO}"
+
+
+def _sincronizar_colunas(tabela: str) -> list[str]:
+    """Garante que o arquivo tem todas as colunas da tabela quente.
+
+    As tabelas quentes recebem colunas via ALTER TABLE ao longo do tempo
+    (_ensure_column), então CREATE TABLE ... LIKE não basta.
+    Retorna a lista de colunas a copiar, na ordem da tabela quente.
+    """
+    insp = inspect(engine)
+    quentes = insp.get_columns(tabela)
+    frias = {c["name"] for c in insp.get_columns(tabela_arquivo(tabela))}
+    with engine.begin() as conn:
+        for col in quentes:
+            if col["name"] not in frias:
+                tipo = col["type"].compile(dialect=engine.dialect)
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {tabela_arquivo(tabela)} ADD COLUMN `{col['name']}` {tipo} NULL"
+                )
+    return [c["name"] for c in quentes]
+
+
+def ensure_archive_tables() -> dict[str, list[str]]:
+    """Cria as tabelas de arquivo (LIKE a tabela quente) e retorna as colunas por tabela"""
+    insp = inspect(engine)
+    colunas: dict[str, list[str]] = {}
+    for tabela in TABELAS_FILHAS + ["chamado"]:
+        if not insp.has_table(tabela):
+            continue
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                f"CREATE TABLE IF NOT EXISTS {tabela_arquivo(tabela)} LIKE {tabela}"
+            )
+        colunas[tabela] = _sincronizar_colunas(tabela)
+    return colunas
+
+
+_FILTRO_ARQUIVAVEL = (
+    "status IN :statuses "
+    "AND COALESCE(data_conclusao, concluido_em, cancelado_em, data_abertura) < :corte"
+)
+
+
+def _candidatos(conn, corte: datetime, apos_id: int, limite: int) -> list[int]:
+    rows = conn.execute(
+        text(
+            f"SELECT id FROM chamado WHERE {_FILTRO_ARQUIVAVEL} "
+            "AND id > :apos ORDER BY id LIMIT :limite"
+        ).bindparams(bindparam("statuses", expanding=True)),
+        {"statuses": list(STATUS_ARQUIVAVEIS), "corte": corte, "apos": apos_id, "limite": limite},
+    ).fetchall()
+    return [int(r[0]) for r in rows]
+
+
+def _confirmar_lote(conn, corte: datetime, ids: list[int]) -> list[int]:
+    """Revalida e trava (FOR UPDATE) os candidatos dentro da transação do lote.
+
+    Um chamado reaberto ou editado entre a seleção e o lote não passa mais no
+    filtro e fica na tabela quente.
+    """
+    rows = conn.execute(
+        text(
+            f"SELECT id FROM chamado WHERE id IN :ids AND {_FILTRO_ARQUIVAVEL} ORDER BY id FOR UPDATE"
+        ).bindparams(bindparam("ids", expanding=True), bindparam("statuses", expanding=True)),
+        {"ids": ids, "statuses": list(STATUS_ARQUIVAVEIS), "corte": corte},
+    ).fetchall()
+    return [int(r[0]) for r in rows]
+
+
+class LoteInconsistente(RuntimeError):
+    pass
+
+
+def _mover_lote(conn, colunas: dict[str, list[str]], ids: list[int]) -> dict[str, int]:
+    """Copia e remove as linhas do lote; qualquer divergência reverte a transação.
+
+    INSERT sem IGNORE: chave duplicada no arquivo ou valor truncado abortam o
+    lote em vez de a linha ser apagada sem ter sido copiada.
+    """
+    movidos: dict[str, int] = {}
+    for tabela in TABELAS_FILHAS + ["chamado"]:
+        cols = colunas.get(tabela)
+        if not cols:
+            continue
+        chave = "id" if tabela == "chamado" else "chamado_id"
+        cols_sql = ", ".join(f"`{c}`" for c in cols)
+        copiados = conn.execute(
+            text(
+                f"INSERT INTO {tabela_arquivo(tabela)} ({cols_sql}) "
+                f"SELECT {cols_sql} FROM {tabela} WHERE {chave} IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)),
+            {"ids": ids},
+        ).rowcount
+        res = conn.execute(
+            text(f"DELETE FROM {tabela} WHERE {chave} IN :ids").bindparams(
+                bindparam("ids", expanding=True)
+            ),
+            {"ids": ids},
+        )
+        removidos = int(res.rowcount or 0)
+        if removidos != int(copiados or 0):
+            raise LoteInconsistente(
+                f"{tabela}: {copiados} linhas copiadas e {removidos} removidas"
+            )
+        movidos[tabela] = removidos
+    return movidos
+
+
+def arquivar_chamados(
+    meses: int = ARQUIVAMENTO_MESES,
+    lote: int = ARQUIVAMENTO_LOTE,
+    max_lotes: Optional[int] = None,
+    ctx: Optional[JobContext] = None,
+) -> dict[str, Any]:
+    """Move chamados encerrados há mais de `meses` meses para as tabelas de arquivo"""
+    global _horizonte, _horizonte_em
+    if meses < 1:
+        raise ValueError("meses deve ser >= 1")
+
+    agora = now_brazil_naive()
+    # Nunca arquiva chamados das janelas fixas das métricas (mês corrente)
+    corte = min(
+        agora - timedelta(days=30 * meses),
+        agora.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+    )
+    stats: dict[str, Any] = {
+        "corte": corte.isoformat(),
+        "lotes": 0,
+        "chamados": 0,
+        "linhas": {},
+        "erros": 0,
+        "iniciado_em": now_brazil_naive().isoformat(),
+        "concluido": False,
+    }
+    _ultima_execucao.clear()
+    _ultima_execucao.update(stats)
+
+    colunas = ensure_archive_tables()
+    if "chamado" not in colunas:
+        stats["concluido"] = True
+        return stats
+
+    apos_id = 0
+    while max_lotes is None or stats["lotes"] < max_lotes:
+        with engine.connect() as conn:
+            ids = _candidatos(conn, corte, apos_id, lote)
+        if not ids:
+            stats["concluido"] = True
+            break
+        apos_id = ids[-1]
+        try:
+            with engine.begin() as conn:
+                ids = _confirmar_lote(conn, corte, ids)
+                movidos = _mover_lote(conn, colunas, ids) if ids else {}
+            stats["lotes"] += 1
+            stats["chamados"] += movidos.get("chamado", 0)
+            for tabela, n in movidos.items():
+                stats["linhas"][tabela] = stats["linhas"].get(tabela, 0) + n
+            print(f"[ARQUIVO] Lote {stats['lotes']}: {len(ids)} chamados (até id {apos_id})")
+        except Exception as e:
+            # Lote revertido por inteiro; segue para o próximo
+            stats["erros"] += 1
+            print(f"[ARQUIVO] Erro no lote até id {apos_id}: {e}")
+        _ultima_execucao.update(stats)
+        if ctx:
+            ctx.checkpoint(mensagem=f"{stats['chamados']} chamados arquivados em {stats['lotes']} lote(s)")
+
+    stats["finalizado_em"] = now_brazil_naive().isoformat()
+    _ultima_execucao.update(stats)
+    with _lock:
+        _horizonte = None
+        _horizonte_em = None
+    return stats
+
+
+@jobs.register(ARQUIVAR_CHAMADOS, "Move chamados encerrados antigos para as tabelas de arquivo")
+def job_arquivar_chamados(
+    db: Session,
+    ctx: JobContext,
+    meses: int = ARQUIVAMENTO_MESES,
+    lote: int = ARQUIVAMENTO_LOTE,
+    max_lotes: Optional[int] = None,
+) -> dict[str, Any]:
+    return arquivar_chamados(meses=meses, lote=lote, max_lotes=max_lotes, ctx=ctx)
+
+
+def status_arquivamento() -> dict[str, Any]:
+    """Progresso da última execução neste processo"""
+    return dict(_ultima_execucao)
+
+
+def _archive_exists(db: Session, tabela: str) -> bool:
+    try:
+        return inspect(db.get_bind()).has_table(tabela_arquivo(tabela))
+    except Exception:
+        return False
+
+
+def horizonte_arquivo(db: Session) -> Optional[datetime]:
+    """Maior data_abertura arquivada (memorizada); None se o arquivo estiver vazio"""
+    global _horizonte, _horizonte_em
+    with _lock:
+        if _horizonte_em and (datetime.now() - _horizonte_em).total_seconds() < _HORIZONTE_TTL_SECONDS:
+            return _horizonte
+    valor = None
+    if _archive_exists(db, "chamado"):
+        try:
+            valor = db.execute(
+                text(f"SELECT MAX(data_abertura) FROM {tabela_arquivo('chamado')}")
+            ).scalar()
+        except Exception as e:
+            print(f"[ARQUIVO] Erro ao obter horizonte: {e}")
+    with _lock:
+        _horizonte = valor
+        _horizonte_em = datetime.now()
+    return valor
+
+
+def contar_arquivados_por_status(
+    db: Session, inicio: datetime, fim: datetime, statuses: list[str]
+) -> dict[str, int]:
+    """Contagem de chamados arquivados abertos em [inicio, fim), por status"""
+    horizonte = horizonte_arquivo(db)
+    if horizonte is None or inicio > horizonte:
+        return {}
+    alvo = [s for s in statuses if s in STATUS_ARQUIVAVEIS]
+    if not alvo:
+        return {}
+    rows = db.execute(
+        text(
+            f"SELECT status, COUNT(*) FROM {tabela_arquivo('chamado')} "
+            "WHERE data_abertura >= :inicio AND data_abertura < :fim AND status IN :statuses "
+            "GROUP BY status"
+        ).bindparams(bindparam("statuses", expanding=True)),
+        {"inicio": inicio, "fim": fim, "statuses": alvo},
+    ).fetchall()
+    return {str(r[0]): int(r[1]) for r in rows}
+
+
+def iter_chamados_arquivados(db: Session, inicio: datetime, fim: datetime, lote: int = 500):
+    """Blocos (chamados, históricos de status por chamado) dos chamados arquivados
+    abertos em [inicio, fim], como instâncias transientes (somente leitura)"""
+    from ti.models import Chamado, HistoricoStatus
+    horizonte = horizonte_arquivo(db)
+    if horizonte is None or inicio > horizonte:
+        return
+    com_historico = _archive_exists(db, "historico_status")
+    cols_chamado = Chamado.__table__.columns
+    cols_historico = HistoricoStatus.__table__.columns
+    apos_id = 0
+    while True:
+        rows = db.execute(
+            text(
+                f"SELECT * FROM {tabela_arquivo('chamado')} "
+                "WHERE data_abertura >= :inicio AND data_abertura <= :fim AND id > :apos "
+                "ORDER BY id LIMIT :lote"
+            ),
+            {"inicio": inicio, "fim": fim, "apos": apos_id, "lote": lote},
+        ).mappings().all()
+        if not rows:
+            return
+        chamados = [Chamado(**{k: v for k, v in r.items() if k in cols_chamado}) for r in rows]
+        ids = [c.id for c in chamados]
+        historicos: dict[int, list] = {i: [] for i in ids}
+        if com_historico:
+            hist_rows = db.execute(
+                text(
+                    f"SELECT * FROM {tabela_arquivo('historico_status')} "
+                    "WHERE chamado_id IN :ids ORDER BY id"
+                ).bindparams(bindparam("ids", expanding=True)),
+                {"ids": ids},
+            ).mappings().all()
+            for r in hist_rows:
+                historicos[r["chamado_id"]].append(
+                    HistoricoStatus(**{k: v for k, v in r.items() if k in cols_historico})
+                )
+        yield chamados, historicos
+        apos_id = ids[-1]
+
+
+def obter_chamado_arquivado(db: Session, chamado_id: int):
+    """Carrega um chamado arquivado como instância transiente de Chamado (somente leitura)"""
+    from ti.models import Chamado
+    if not _archive_exists(db, "chamado"):
+        return None
+    row = db.execute(
+        text(f"SELECT * FROM {tabela_arquivo('chamado')} WHERE id = :i AND deletado_em IS NULL"),
+        {"i": chamado_id},
+    ).mappings().first()
+    if not row:
+        return None
+    attrs = {k: v for k, v in row.items() if k in Chamado.__table__.columns}
+    return Chamado(**attrs)
+
+
+def listar_arquivados(db: Session, model, chamado_id: int, order_by: str) -> list:
+    """Carrega linhas arquivadas de uma tabela filha como instâncias transientes de `model`"""
+    tabela = model.__tablename__
+    if not _archive_exists(db, tabela):
+        return []
+    rows = db.execute(
+        text(f"SELECT * FROM {tabela_arquivo(tabela)} WHERE chamado_id = :i ORDER BY {order_by} ASC"),
+        {"i": chamado_id},
+    ).mappings().all()
+    cols = model.__table__.columns
+    return [model(**{k: v for k, v in r.items() if k in cols}) for r in rows]
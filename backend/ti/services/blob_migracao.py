@@ -0,0 +1,116 @@
+"""
+Migração em background de conteúdo binário do MySQL para o blob store
+
+Percorre chamado_anexo, ticket_anexos (e as tabelas *_arquivo), media e
+alert por id crescente; para cada linha com conteúdo grava os bytes no blob
+store (core/blobstore.py), grava o hash e zera a coluna binária na mesma
+linha.
+Lê uma linha por vez (memória limitada ao maior anexo) e confirma a cada
+BLOB_MIGRACAO_LOTE linhas, então pode ser interrompida e retomada.
+
+Executada como job (core/jobs.py): o boot submete uma vez por processo e a
+deduplicação do job garante uma única execução entre os workers.
+"""
+
+from __future__ import annotations
+import os
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from core import jobs
+from core.blobstore import get_blob_store
+from core.db import engine
+from core.jobs import JobContext
+from ti.services.arquivamento import tabela_arquivo
+
+
+MIGRAR_BLOBS = "anexos.migrar_blobs"
+BLOB_MIGRACAO_LOTE = int(os.getenv("BLOB_MIGRACAO_LOTE", "50"))
+TABELAS_ANEXO = ("chamado_anexo", "ticket_anexos")
+# (tabela, coluna binária, coluna do hash)
+ORIGENS = [
+    *[(t, "conteudo", "hash_arquivo") for base in TABELAS_ANEXO for t in (base, tabela_arquivo(base))],
+    ("media", "arquivo_blob", "arquivo_sha256"),
+    ("alert", "imagem_blob", "imagem_sha256"),
+]
+
+
+def ensure_hash_columns() -> None:
+    """Colunas media.arquivo_sha256 e alert.imagem_sha256 (migração 0015)"""
+    insp = inspect(engine)
+    for tabela, coluna in (("media", "arquivo_sha256"), ("alert", "imagem_sha256")):
+        if not insp.has_table(tabela):
+            continue
+        if coluna not in {c["name"] for c in insp.get_columns(tabela)}:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f"ALTER TABLE {tabela} ADD COLUMN {coluna} VARCHAR(64) NULL")
+
+
+def _origens() -> list[tuple[str, str, str]]:
+    insp = inspect(engine)
+    existentes = []
+    for tabela, coluna, coluna_hash in ORIGENS:
+        if insp.has_table(tabela) and {coluna, coluna_hash} <= {c["name"] for c in insp.get_columns(tabela)}:
+            existentes.append((tabela, coluna, coluna_hash))
+    return existentes
+
+
+def _pendentes(db: Session, tabela: str, coluna: str) -> int:
+    return db.execute(text(f"SELECT COUNT(*) FROM {tabela} WHERE {coluna} IS NOT NULL")).scalar() or 0
+
+
+def migrar_tabela(
+    db: Session,
+    tabela: str,
+    coluna: str = "conteudo",
+    coluna_hash: str = "hash_arquivo",
+    ctx: JobContext | None = None,
+) -> dict:
+    store = get_blob_store()
+    stats = {"linhas": 0, "bytes": 0}
+    ultimo_id = 0
+    while True:
+        ids = [
+            r[0] for r in db.execute(
+                text(f"SELECT id FROM {tabela} WHERE id > :u AND {coluna} IS NOT NULL ORDER BY id LIMIT :n"),
+                {"u": ultimo_id, "n": BLOB_MIGRACAO_LOTE},
+            )
+        ]
+        if not ids:
+            return stats
+        for rid in ids:
+            conteudo = db.execute(
+                text(f"SELECT {coluna} FROM {tabela} WHERE id = :i"), {"i": rid}
+            ).scalar()
+            if conteudo:
+                sha = store.put_bytes(conteudo)
+                db.execute(
+                    text(f"UPDATE {tabela} SET {coluna_hash} = :h, {coluna} = NULL WHERE id = :i"),
+                    {"h": sha, "i": rid},
+                )
+                stats["linhas"] += 1
+                stats["bytes"] += len(conteudo)
+        db.commit()
+        ultimo_id = ids[-1]
+        if ctx:
+            ctx.checkpoint(mensagem=f"{tabela}: {stats['linhas']} registros migrados")
+
+
+@jobs.register(MIGRAR_BLOBS, "Move conteúdo binário (anexos, mídias, imagens) do MySQL para o blob store")
+def migrar_anexos(db: Session, ctx: JobContext) -> dict:
+    origens = _origens()
+    resultado = {}
+    for i, (tabela, coluna, coluna_hash) in enumerate(origens):
+        if not _pendentes(db, tabela, coluna):
+            continue
+        ctx.progresso(i * 100 / len(origens), f"Migrando {tabela}")
+        resultado[tabela] = migrar_tabela(db, tabela, coluna, coluna_hash, ctx)
+        print(f"[BLOBS] {tabela}: {resultado[tabela]['linhas']} registros migrados "
+              f"({resultado[tabela]['bytes'] / 1024 / 1024:.1f} MB)")
+    if resultado.get("alert", {}).get("linhas"):
+        # Imagens de alerta recém-migradas ainda não têm miniaturas
+        from ti.services.imagens import GERAR_MINIATURAS
+        try:
+            jobs.submit(GERAR_MINIATURAS)
+        except jobs.FilaCheia:
+            print("[BLOBS] Fila de jobs cheia; miniaturas ficam para o próximo boot")
+    return resultado
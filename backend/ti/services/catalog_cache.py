@@ -0,0 +1,156 @@
+"""
+Catálogo em memória para listas de referência (unidades, problemas)
+
+As tabelas de catálogo existem em vários dialetos legados (singular/plural,
+com ou sem colunas opcionais). Antes, cada listagem testava todas as variantes
+de SQL a cada requisição, pagando um round trip por falha.
+
+Estratégia:
+1. Descoberta: a primeira listagem testa as variantes em ordem e memoriza a
+   que funciona (uma vez por processo)
+2. Se a variante memorizada falhar depois (mudança de schema), a descoberta
+   roda novamente
+3. O resultado da listagem fica em memória até ser invalidado pelo CRUD
+   correspondente ou expirar (TTL cobre escritas de outros workers)
+"""
+
+from __future__ import annotations
+import threading
+from datetime import datetime
+from typing import Any, Callable, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+RowMapper = Callable[[Any], dict]
+Fallback = Callable[[Session], list]
+
+
+class CatalogCache:
+    """
+    Cache de uma lista de catálogo com dialeto SQL resolvido.
+
+    Uso:
+        cache = CatalogCache(
+            name="unidades",
+            variants=["SELECT id, nome, cidade FROM unidade ORDER BY nome", ...],
+            row_mapper=lambda r: {"id": r[0], "nome": r[1]},
+            fallback=lambda db: [],
+        )
+        itens = cache.get(db)
+        cache.invalidate()  # após criar/deletar
+    """
+
+    def __init__(
+        self,
+        name: str,
+        variants: list[str],
+        row_mapper: RowMapper,
+        fallback: Optional[Fallback] = None,
+        prepare: Optional[Callable[[], None]] = None,
+        ttl_seconds: int = 300,
+    ):
+        self.name = name
+        self.variants = variants
+        self.row_mapper = row_mapper
+        self.fallback = fallback
+        self.prepare = prepare
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.RLock()
+        self._prepared = False
+        self._resolved_sql: Optional[str] = None
+        self._items: Optional[list[dict]] = None
+        self._loaded_at: Optional[datetime] = None
+
+    def _is_fresh(self) -> bool:
+        if self._items is None or self._loaded_at is None:
+            return False
+        age = (datetime.now() - self._loaded_at).total_seconds()
+        return age < self.ttl_seconds
+
+    def _run(self, db: Session, sql: str) -> list:
+        return db.execute(text(sql)).fetchall()
+
+    def _resolve(self, db: Session) -> Optional[list]:
+        """Testa as variantes em ordem e memoriza a primeira que retorna linhas"""
+        for sql in self.variants:
+            try:
+                fetched = self._run(db, sql)
+            except Exception as e:
+                print(f"[CATALOG] {self.name}: variante falhou: {sql[:80]} - {e}")
+                try:
+                    db.rollback()
+                except Exception:
+                    pass
+                continue
+            if fetched:
+                print(f"[CATALOG] {self.name}: variante resolvida: {sql[:80]}")
+                self._resolved_sql = sql
+                return fetched
+        self._resolved_sql = None
+        return None
+
+    def _load(self, db: Session) -> list[dict]:
+        if not self._prepared and self.prepare is not None:
+            try:
+                self.prepare()
+            except Exception:
+                pass
+            self._prepared = True
+
+        fetched = None
+        if self._resolved_sql is not None:
+            try:
+                fetched = self._run(db, self._resolved_sql)
+            except Exception as e:
+                # Schema mudou: descarta o dialeto e redescobre
+                print(f"[CATALOG] {self.name}: variante resolvida falhou, redescobrindo: {e}")
+                try:
+                    db.rollback()
+                except Exception:
+                    pass
+                self._resolved_sql = None
+
+        if not fetched:
+            fetched = self._resolve(db)
+
+        if fetched:
+            return [self.row_mapper(r) for r in fetched]
+
+        if self.fallback is not None:
+            try:
+                return list(self.fallback(db) or [])
+            except Exception as e:
+                print(f"[CATALOG] {self.name}: fallback falhou: {e}")
+        return []
+
+    def get(self, db: Session) -> list[dict]:
+        """Retorna a lista do catálogo (memória -> banco de dados)"""
+        with self._lock:
+            if self._is_fresh():
+                return list(self._items or [])
+
+            items = self._load(db)
+            self._items = items
+            self._loaded_at = datetime.now()
+            return list(items)
+
+    def invalidate(self, reset_dialect: bool = False) -> None:
+        """Descarta a lista em memória (e opcionalmente o dialeto resolvido)"""
+        with self._lock:
+            self._items = None
+            self._loaded_at = None
+            if reset_dialect:
+                self._resolved_sql = None
+                self._prepared = False
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "resolved_sql": self._resolved_sql,
+                "cached_items": len(self._items) if self._items is not None else None,
+                "loaded_at": self._loaded_at.isoformat() if self._loaded_at else None,
+            }
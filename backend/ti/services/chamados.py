@@ -1,7 +1,9 @@
 from __future__ import annotations
-import random
-import string
-from datetime import date
+import base64
+import json
+from datetime import date, datetime, timedelta
+from typing import Any
+from sqlalchemy import func, text
 from sqlalchemy.orm import Session
 from core.utils import now_brazil_naive
 from ti.models import Chamado
@@ -9,50 +11,105 @@ from core.db import engine
 from ti.schemas.chamado import ChamadoCreate
 
 
-def _next_codigo(db: Session) -> str:
-    """Gera código sequencial no formato EVQ-XXXX (4 dígitos), iniciando em EVQ-0081.
-    Apenas considera a tabela atual 'chamado'.
-    """
-    from ti.models import Chamado
-    max_n = 80  # garante mínimo EVQ-0081
-    try:
-        rows = db.query(Chamado.codigo).filter(Chamado.codigo.like("EVQ-%")).all()
-        for (cod,) in rows:
-            try:
-                suf = str(cod).split("-", 1)[1]
-                n = int("".join(ch for ch in suf if ch.isdigit()))
-                if n > max_n:
-                    max_n = n
-            except Exception:
-                continue
-    except Exception:
-        pass
-    return f"EVQ-{max_n + 1:04d}"
+SEQUENCIA_TABLE = "chamado_sequencia"
+CODIGO_MINIMO = 80  # garante mínimo EVQ-0081
 
+# Permutação afim sobre 10^8: mesma sequência -> protocolos distintos,
+# sem parecer sequencial (multiplicador coprimo com 10)
+_PROTOCOLO_MOD = 10 ** 8
+_PROTOCOLO_MULT = 48271013
+_PROTOCOLO_ADD = 19088743
 
-def _next_protocolo(db: Session) -> str:
-    """Gera protocolo ALEATÓRIO no formato XXXXXXXX-X (8 dígitos + hífen + 1 dígito).
-    Garante unicidade consultando apenas a tabela atual 'chamado'.
-    """
-    from ti.models import Chamado
 
-    def gen() -> str:
-        base = "".join(str(random.randint(0, 9)) for _ in range(8))
-        dv = str(random.randint(0, 9))
-        return f"{base}-{dv}"
+def ensure_sequencia_table(conn) -> None:
+    """Cria a tabela de contadores e semeia a partir dos chamados existentes.
 
-    for _ in range(50):
-        p = gen()
+    O valor inicial de 'codigo' considera a tabela quente e o arquivo, para
+    que códigos de chamados arquivados nunca sejam reutilizados.
+    """
+    conn.exec_driver_sql(f"""
+        CREATE TABLE IF NOT EXISTS {SEQUENCIA_TABLE} (
+            nome VARCHAR(50) NOT NULL PRIMARY KEY,
+            valor BIGINT NOT NULL
+        ) ENGINE=InnoDB
+    """)
+    max_n = CODIGO_MINIMO
+    for tabela in ("chamado", "chamado_arquivo"):
         try:
-            exists = db.query(Chamado).filter(Chamado.protocolo == p).first()
+            v = conn.execute(text(
+                f"SELECT MAX(CAST(SUBSTRING(codigo, 5) AS UNSIGNED)) FROM {tabela} WHERE codigo LIKE 'EVQ-%'"
+            )).scalar()
+            if v and int(v) > max_n:
+                max_n = int(v)
         except Exception:
-            exists = None
-        if not exists:
+            continue
+    conn.execute(
+        text(f"INSERT IGNORE INTO {SEQUENCIA_TABLE} (nome, valor) VALUES ('codigo', :v), ('protocolo', 0)"),
+        {"v": max_n},
+    )
+
+
+def _allocate_block(nome: str, n: int) -> int:
+    """Reserva n valores consecutivos do contador e retorna o primeiro.
+
+    Usa uma conexão própria com commit imediato, então o lock da linha dura
+    só o UPDATE (não a transação do chamado). Rollbacks deixam lacunas, nunca
+    duplicatas.
+    """
+    if n < 1:
+        raise ValueError("n deve ser >= 1")
+    sql = text(f"UPDATE {SEQUENCIA_TABLE} SET valor = LAST_INSERT_ID(valor + :n) WHERE nome = :nome")
+    with engine.connect() as conn:
+        res = conn.execute(sql, {"nome": nome, "n": n})
+        if not res.rowcount:
+            conn.rollback()
+            ensure_sequencia_table(conn)
+            conn.commit()
+            res = conn.execute(sql, {"nome": nome, "n": n})
+        valor = conn.execute(text("SELECT LAST_INSERT_ID()")).scalar()
+        conn.commit()
+    return int(valor) - n + 1
+
+
+def _allocate(nome: str) -> int:
+    """Incrementa o contador atomicamente e retorna o novo valor"""
+    return _allocate_block(nome, 1)
+
+
+def _luhn_dv(digits: str) -> str:
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = int(ch)
+        if i % 2 == 0:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return str((10 - total % 10) % 10)
+
+
+def protocolo_from_seq(n: int) -> str:
+    """Protocolo XXXXXXXX-X derivado do contador (bijetivo em 10^8, DV Luhn)"""
+    base = f"{(n * _PROTOCOLO_MULT + _PROTOCOLO_ADD) % _PROTOCOLO_MOD:08d}"
+    return f"{base}-{_luhn_dv(base)}"
+
+
+def _next_codigo(db: Session) -> str:
+    """Gera código sequencial no formato EVQ-XXXX (4 dígitos), iniciando em EVQ-0081."""
+    return f"EVQ-{_allocate('codigo'):04d}"
+
+
+def _next_protocolo(db: Session) -> str:
+    """Gera protocolo no formato XXXXXXXX-X a partir do contador 'protocolo'.
+
+    Protocolos derivados nunca colidem entre si; a consulta pelo índice
+    UNIQUE só protege contra protocolos aleatórios gerados antes do contador.
+    """
+    for _ in range(5):
+        p = protocolo_from_seq(_allocate("protocolo"))
+        if db.query(Chamado.id).filter(Chamado.protocolo == p).first() is None:
             return p
-    # Fallback muito improvável: usa timestamp truncado + rand
-    from time import time
-    fallback = f"{int(time())%100000000:08d}-{random.randint(0,9)}"
-    return fallback
+    raise RuntimeError("Falha ao gerar protocolo do chamado")
 
 
 def criar_chamado(db: Session, payload: ChamadoCreate, user_id: int | None = None) -> Chamado:
@@ -60,14 +117,8 @@ def criar_chamado(db: Session, payload: ChamadoCreate, user_id: int | None = Non
         Chamado.__table__.create(bind=engine, checkfirst=True)
     except Exception:
         pass
-    for _ in range(10):
-        codigo = _next_codigo(db)
-        protocolo = _next_protocolo(db)
-        existe = db.query(Chamado).filter((Chamado.codigo == codigo) | (Chamado.protocolo == protocolo)).first()
-        if not existe:
-            break
-    else:
-        raise RuntimeError("Falha ao gerar identificadores do chamado")
+    codigo = _next_codigo(db)
+    protocolo = _next_protocolo(db)
 
     data_visita = None
     if payload.visita:
@@ -94,3 +145,120 @@ def criar_chamado(db: Session, payload: ChamadoCreate, user_id: int | None = Non
     db.commit()
     db.refresh(novo)
     return novo
+
+
+# Campos projetáveis via ?fields= (mesmos de ChamadoOut)
+CHAMADO_LIST_FIELDS = (
+    "id", "codigo", "protocolo", "solicitante", "cargo", "email", "telefone",
+    "unidade", "problema", "internet_item", "descricao", "data_visita",
+    "data_abertura", "status", "prioridade",
+)
+
+PAGE_MAX_LIMIT = 200
+COUNT_TTL_SECONDS = 60
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": int(last_id)}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return int(data["id"])
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def _parse_fields(fields: str | None) -> list[str]:
+    if not fields:
+        return list(CHAMADO_LIST_FIELDS)
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    invalid = [f for f in wanted if f not in CHAMADO_LIST_FIELDS]
+    if invalid:
+        raise ValueError(f"Campos inválidos: {', '.join(invalid)}")
+    # id é sempre retornado (necessário para o cursor)
+    return ["id"] + [f for f in wanted if f != "id"]
+
+
+def _split_csv(value: str | None) -> list[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def listar_chamados_paginado(
+    db: Session,
+    limit: int = 50,
+    cursor: str | None = None,
+    status: str | None = None,
+    prioridade: str | None = None,
+    unidade: str | None = None,
+    data_inicio: date | None = None,
+    data_fim: date | None = None,
+    atribuido_a: int | None = None,
+    fields: str | None = None,
+    include_total: bool = True,
+) -> dict[str, Any]:
+    """Lista chamados com paginação por cursor (keyset em id DESC).
+
+    Filtros vão para o WHERE e casam com os índices compostos
+    (deletado_em, <filtro>, id) de create_performance_indices. O total é
+    um COUNT no mesmo índice, memorizado por COUNT_TTL_SECONDS por filtro.
+    """
+    limit = max(1, min(int(limit or 50), PAGE_MAX_LIMIT))
+    columns = _parse_fields(fields)
+
+    filters = [Chamado.deletado_em.is_(None)]
+    statuses = _split_csv(status)
+    if statuses:
+        filters.append(Chamado.status.in_(statuses))
+    prioridades = _split_csv(prioridade)
+    if prioridades:
+        filters.append(Chamado.prioridade.in_(prioridades))
+    if unidade:
+        filters.append(Chamado.unidade == unidade)
+    if atribuido_a is not None:
+        filters.append(Chamado.status_assumido_por_id == atribuido_a)
+    if data_inicio:
+        filters.append(Chamado.data_abertura >= datetime.combine(data_inicio, datetime.min.time()))
+    if data_fim:
+        filters.append(Chamado.data_abertura < datetime.combine(data_fim + timedelta(days=1), datetime.min.time()))
+
+    page_filters = list(filters)
+    if cursor:
+        page_filters.append(Chamado.id < decode_cursor(cursor))
+
+    rows = (
+        db.query(*[getattr(Chamado, c) for c in columns])
+        .filter(*page_filters)
+        .order_by(Chamado.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = [dict(zip(columns, r)) for r in rows]
+    next_cursor = encode_cursor(items[-1]["id"]) if has_more and items else None
+
+    total = None
+    if include_total:
+        from ti.services.cache_debouncer import get_debouncer
+        count_key = "chamados_count:" + json.dumps(
+            [statuses, prioridades, unidade, atribuido_a,
+             data_inicio.isoformat() if data_inicio else None,
+             data_fim.isoformat() if data_fim else None],
+            ensure_ascii=False,
+        )
+        total = get_debouncer().debounce(
+            key=count_key,
+            func=lambda: int(db.query(func.count(Chamado.id)).filter(*filters).scalar() or 0),
+            ttl=COUNT_TTL_SECONDS,
+        )
+
+    return {
+        "items": items,
+        "next_cursor": next_cursor,
+        "limit": limit,
+        "total": total,
+    }
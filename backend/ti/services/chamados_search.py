@@ -0,0 +1,157 @@
+"""
+Busca textual de chamados
+
+Estratégia:
+1. Prefixo de codigo/protocolo (EVQ-00..., 1234...) usa os índices UNIQUE
+   com LIKE 'termo%' e recebe a maior relevância
+2. Texto livre usa o índice FULLTEXT ft_chamado_busca
+   (descricao, solicitante, problema) em BOOLEAN MODE, com prefixo por termo
+3. Se o índice FULLTEXT não existir, cai para LIKE '%termo%' (lento, mas correto)
+   e memoriza isso até a próxima verificação
+"""
+
+from __future__ import annotations
+import re
+import threading
+import time
+from typing import Any
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+SEARCH_MAX_LIMIT = 100
+PREFIX_SCORE = 1000.0
+FULLTEXT_RETRY_SECONDS = 600
+
+_RESULT_COLUMNS = (
+    "id", "codigo", "protocolo", "solicitante", "unidade", "problema",
+    "status", "prioridade", "data_abertura",
+)
+
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+
+_state_lock = threading.Lock()
+_fulltext_unavailable_since: float | None = None
+
+
+def _boolean_query(q: str) -> str:
+    """Converte a busca em consulta BOOLEAN MODE: todos os termos, com prefixo"""
+    tokens = [t for t in _BOOLEAN_OPERATORS.sub(" ", q).split() if len(t) >= 2]
+    return " ".join(f"+{t}*" for t in tokens)
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _fulltext_enabled() -> bool:
+    with _state_lock:
+        if _fulltext_unavailable_since is None:
+            return True
+        return time.time() - _fulltext_unavailable_since > FULLTEXT_RETRY_SECONDS
+
+
+def _mark_fulltext_unavailable() -> None:
+    global _fulltext_unavailable_since
+    with _state_lock:
+        _fulltext_unavailable_since = time.time()
+
+
+def _mark_fulltext_available() -> None:
+    global _fulltext_unavailable_since
+    with _state_lock:
+        _fulltext_unavailable_since = None
+
+
+def _ranked_ids_sql(use_fulltext: bool, has_text: bool) -> str:
+    parts = [
+        f"SELECT id, {PREFIX_SCORE} AS score FROM chamado "
+        "WHERE deletado_em IS NULL AND (codigo LIKE :prefix OR protocolo LIKE :prefix)"
+    ]
+    if has_text:
+        if use_fulltext:
+            parts.append(
+                "SELECT id, MATCH(descricao, solicitante, problema) AGAINST (:bq IN BOOLEAN MODE) AS score "
+                "FROM chamado WHERE deletado_em IS NULL "
+                "AND MATCH(descricao, solicitante, problema) AGAINST (:bq IN BOOLEAN MODE)"
+            )
+        else:
+            parts.append(
+                "SELECT id, 1.0 AS score FROM chamado WHERE deletado_em IS NULL "
+                "AND (descricao LIKE :contains OR solicitante LIKE :contains OR problema LIKE :contains)"
+            )
+    return " UNION ALL ".join(parts)
+
+
+def _run_search(db: Session, params: dict, limit: int, offset: int, use_fulltext: bool, has_text: bool) -> tuple[list[dict], int]:
+    ranked = _ranked_ids_sql(use_fulltext, has_text)
+    total = db.execute(
+        text(f"SELECT COUNT(DISTINCT id) FROM ({ranked}) r"), params
+    ).scalar() or 0
+
+    page = db.execute(
+        text(
+            f"SELECT id, MAX(score) AS score FROM ({ranked}) r "
+            "GROUP BY id ORDER BY score DESC, id DESC LIMIT :limit OFFSET :offset"
+        ),
+        {**params, "limit": limit, "offset": offset},
+    ).fetchall()
+    if not page:
+        return [], int(total)
+
+    scores = {int(r[0]): float(r[1] or 0) for r in page}
+    cols = ", ".join(_RESULT_COLUMNS)
+    id_params = {f"id{i}": cid for i, cid in enumerate(scores)}
+    id_list = ", ".join(f":{k}" for k in id_params)
+    rows = db.execute(
+        text(f"SELECT {cols} FROM chamado WHERE id IN ({id_list})"), id_params
+    ).fetchall()
+    by_id = {int(r[0]): dict(zip(_RESULT_COLUMNS, r)) for r in rows}
+
+    items = []
+    for cid, score in scores.items():
+        item = by_id.get(cid)
+        if item is not None:
+            item["score"] = round(score, 4)
+            items.append(item)
+    return items, int(total)
+
+
+def buscar_chamados(db: Session, q: str, limit: int = 20, offset: int = 0) -> dict[str, Any]:
+    """Busca chamados por codigo/protocolo (prefixo) e texto livre (FULLTEXT)"""
+    termo = (q or "").strip()
+    if len(termo) < 2:
+        raise ValueError("Informe ao menos 2 caracteres para buscar")
+    limit = max(1, min(int(limit or 20), SEARCH_MAX_LIMIT))
+    offset = max(0, int(offset or 0))
+
+    bq = _boolean_query(termo)
+    params = {
+        "prefix": _like_escape(termo.upper()) + "%",
+        "bq": bq,
+        "contains": "%" + _like_escape(termo) + "%",
+    }
+    has_text = bool(bq)
+
+    use_fulltext = _fulltext_enabled()
+    try:
+        items, total = _run_search(db, params, limit, offset, use_fulltext, has_text)
+        if use_fulltext and has_text:
+            _mark_fulltext_available()
+    except Exception as e:
+        if not (use_fulltext and has_text):
+            raise
+        # Índice FULLTEXT ausente (ex: erro 1191): usa LIKE até nova verificação
+        print(f"[SEARCH] FULLTEXT indisponível, usando LIKE: {e}")
+        db.rollback()
+        _mark_fulltext_unavailable()
+        use_fulltext = False
+        items, total = _run_search(db, params, limit, offset, use_fulltext, has_text)
+
+    return {
+        "items": items,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "modo": "fulltext" if use_fulltext else "like",
+    }
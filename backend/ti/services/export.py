@@ -0,0 +1,312 @@
+"""
+Exportação em streaming de chamados e fatos de SLA (CSV / NDJSON / Parquet)
+
+GET /chamados materializa a tabela inteira em memória. Aqui as linhas são
+lidas com cursor no servidor (yield_per) e escritas em blocos, então
+exportar milhões de linhas usa memória constante.
+
+- Filtro por período (inicio/fim) na data natural da tabela
+  (data_abertura / criado_em)
+- Exportação incremental: `desde` filtra por atualizado_em (mantido pelo
+  MySQL com ON UPDATE CURRENT_TIMESTAMP). A resposta traz o header
+  X-Export-Watermark com o NOW() do banco no início da exportação, que é o
+  `desde` da próxima execução. Linhas são reenviadas na fronteira do
+  watermark (>=); o consumidor faz upsert por id
+- Parquet (opcional, requer pyarrow): um row group por bloco lido
+"""
+
+from __future__ import annotations
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterator, Optional
+from sqlalchemy import inspect, text
+from core.db import engine
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet é opcional
+    pa = None
+    pq = None
+
+
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "2000"))
+WATERMARK_COLUMN = "atualizado_em"
+WATERMARK_TABLES = ("chamado", "historico_sla")
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# (coluna, tipo) — tipos: int, float, str, datetime, date
+CHAMADO_COLUNAS: list[tuple[str, str]] = [
+    ("id", "int"),
+    ("codigo", "str"),
+    ("protocolo", "str"),
+    ("solicitante", "str"),
+    ("cargo", "str"),
+    ("email", "str"),
+    ("telefone", "str"),
+    ("unidade", "str"),
+    ("problema", "str"),
+    ("internet_item", "str"),
+    ("descricao", "str"),
+    ("data_visita", "date"),
+    ("data_abertura", "datetime"),
+    ("data_primeira_resposta", "datetime"),
+    ("data_conclusao", "datetime"),
+    ("status", "str"),
+    ("prioridade", "str"),
+    ("status_assumido_por_id", "int"),
+    ("status_assumido_em", "datetime"),
+    ("concluido_em", "datetime"),
+    ("cancelado_em", "datetime"),
+    ("usuario_id", "int"),
+    ("deletado_em", "datetime"),
+    ("atualizado_em", "datetime"),
+]
+
+SLA_COLUNAS: list[tuple[str, str]] = [
+    ("id", "int"),
+    ("chamado_id", "int"),
+    ("usuario_id", "int"),
+    ("acao", "str"),
+    ("status_anterior", "str"),
+    ("status_novo", "str"),
+    ("tempo_resposta_horas", "float"),
+    ("limite_sla_resposta_horas", "float"),
+    ("tempo_resolucao_horas", "float"),
+    ("limite_sla_horas", "float"),
+    ("status_sla", "str"),
+    ("criado_em", "datetime"),
+    ("atualizado_em", "datetime"),
+]
+
+
+class ExportSpec:
+    """Tabela exportável: colunas, coluna de período e filtros fixos"""
+
+    def __init__(self, tabela: str, colunas: list[tuple[str, str]], coluna_data: str, filtro_base: str = ""):
+        self.tabela = tabela
+        self.colunas = colunas
+        self.coluna_data = coluna_data
+        self.filtro_base = filtro_base
+
+
+CHAMADOS = ExportSpec("chamado", CHAMADO_COLUNAS, "data_abertura")
+SLA = ExportSpec("historico_sla", SLA_COLUNAS, "criado_em")
+
+
+def ensure_watermark_columns() -> None:
+    """Coluna atualizado_em (ON UPDATE CURRENT_TIMESTAMP) + índice nas tabelas exportáveis"""
+    insp = inspect(engine)
+    for tabela in WATERMARK_TABLES:
+        if not insp.has_table(tabela):
+            continue
+        cols = {c["name"] for c in insp.get_columns(tabela)}
+        idx = {i["name"] for i in insp.get_indexes(tabela)}
+        with engine.begin() as conn:
+            if WATERMARK_COLUMN not in cols:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {tabela} ADD COLUMN {WATERMARK_COLUMN} DATETIME NULL "
+                    "DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+                )
+            nome_idx = f"idx_{tabela}_{WATERMARK_COLUMN}"
+            if nome_idx not in idx:
+                conn.exec_driver_sql(f"CREATE INDEX {nome_idx} ON {tabela} ({WATERMARK_COLUMN})")
+
+
+def db_watermark() -> datetime:
+    """NOW() do banco: mesmo relógio que alimenta atualizado_em"""
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT NOW()")).scalar()
+
+
+def _colunas_existentes(spec: ExportSpec) -> list[tuple[str, str]]:
+    existentes = {c["name"] for c in inspect(engine).get_columns(spec.tabela)}
+    return [(c, t) for c, t in spec.colunas if c in existentes]
+
+
+def _consulta(spec: ExportSpec, colunas: list[tuple[str, str]], inicio, fim, desde, filtros_extra: list[str]) -> tuple[str, dict]:
+    where = [spec.filtro_base] if spec.filtro_base else []
+    where += filtros_extra
+    params: dict[str, Any] = {}
+    if inicio is not None:
+        where.append(f"{spec.coluna_data} >= :inicio")
+        params["inicio"] = inicio
+    if fim is not None:
+        where.append(f"{spec.coluna_data} < :fim")
+        params["fim"] = fim
+    if desde is not None:
+        where.append(f"{WATERMARK_COLUMN} >= :desde")
+        params["desde"] = desde
+    cols_sql = ", ".join(f"`{c}`" for c, _ in colunas)
+    # O cursor fica aberto durante todo o streaming: sem limite de tempo de
+    # execução (sobrepõe o hint da classe analytics em core/admission.py)
+    sql = f"SELECT /*+ MAX_EXECUTION_TIME(0) */ {cols_sql} FROM {spec.tabela}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY id", params
+
+
+def iter_lotes(
+    spec: ExportSpec,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    desde: Optional[datetime] = None,
+    filtros_extra: Optional[list[str]] = None,
+    yield_per: int = EXPORT_YIELD_PER,
+) -> tuple[list[tuple[str, str]], Iterator[list[tuple]]]:
+    """Retorna (colunas, gerador de lotes de linhas) lidos com cursor no servidor"""
+    colunas = _colunas_existentes(spec)
+    if desde is not None and WATERMARK_COLUMN not in {c for c, _ in colunas}:
+        raise ValueError("Exportação incremental indisponível: execute as migrações (atualizado_em)")
+    sql, params = _consulta(spec, colunas, inicio, fim, desde, filtros_extra or [])
+
+    def _gen() -> Iterator[list[tuple]]:
+        with engine.connect() as conn:
+            result = conn.execution_options(yield_per=yield_per).execute(text(sql), params)
+            for parte in result.partitions():
+                yield [tuple(r) for r in parte]
+
+    return colunas, _gen()
+
+
+def _valor_texto(v: Any) -> Any:
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, bytes):
+        return v.decode("utf-8", errors="replace")
+    return v
+
+
+def _csv(colunas, lotes) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([c for c, _ in colunas])
+    for lote in lotes:
+        for row in lote:
+            writer.writerow(["" if v is None else _valor_texto(v) for v in row])
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate(0)
+    resto = buf.getvalue()
+    if resto:
+        yield resto.encode("utf-8")
+
+
+def _ndjson(colunas, lotes) -> Iterator[bytes]:
+    nomes = [c for c, _ in colunas]
+    for lote in lotes:
+        linhas = [
+            json.dumps({k: _valor_texto(v) for k, v in zip(nomes, row)}, ensure_ascii=False)
+            for row in lote
+        ]
+        yield ("\n".join(linhas) + "\n").encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino do ParquetWriter que acumula bytes para serem drenados a cada row group"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_ARROW_TIPOS = {
+    "int": lambda: pa.int64(),
+    "float": lambda: pa.float64(),
+    "str": lambda: pa.string(),
+    "datetime": lambda: pa.timestamp("s"),
+    "date": lambda: pa.date32(),
+}
+
+
+def _parquet(colunas, lotes) -> Iterator[bytes]:
+    schema = pa.schema([(c, _ARROW_TIPOS[t]()) for c, t in colunas])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for lote in lotes:
+            cols = list(zip(*lote)) if lote else [[] for _ in colunas]
+            arrays = [
+                pa.array([float(v) if isinstance(v, Decimal) else v for v in valores], type=schema.field(i).type)
+                for i, valores in enumerate(cols)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def parquet_disponivel() -> bool:
+    return pa is not None
+
+
+def encode(formato: str, colunas: list[tuple[str, str]], lotes: Iterator[list[tuple]]) -> Iterator[bytes]:
+    if formato == "csv":
+        return _csv(colunas, lotes)
+    if formato == "ndjson":
+        return _ndjson(colunas, lotes)
+    if formato == "parquet":
+        if pa is None:
+            raise ValueError("Formato parquet requer o pacote pyarrow")
+        return _parquet(colunas, lotes)
+    raise ValueError(f"Formato inválido: {formato} (use {', '.join(FORMATOS)})")
+
+
+def streaming_export(
+    spec: ExportSpec,
+    formato: str,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    desde: Optional[datetime] = None,
+    filtros_extra: Optional[list[str]] = None,
+):
+    """Monta a StreamingResponse da exportação (valida tudo antes do primeiro byte)"""
+    from fastapi.responses import StreamingResponse
+
+    formato = (formato or "csv").lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato} (use {', '.join(FORMATOS)})")
+    watermark = db_watermark()
+    colunas, lotes = iter_lotes(spec, inicio, fim, desde, filtros_extra)
+    corpo = encode(formato, colunas, lotes)
+    nome = f"{spec.tabela}_{watermark:%Y%m%d%H%M%S}.{formato}"
+    return StreamingResponse(
+        corpo,
+        media_type=FORMATOS[formato],
+        headers={
+            "Content-Disposition": f'attachment; filename="{nome}"',
+            "X-Export-Watermark": watermark.isoformat(),
+            "Cache-Control": "no-store",
+        },
+    )
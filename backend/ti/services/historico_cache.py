@@ -0,0 +1,59 @@
+"""
+Cache curto da linha do tempo (GET /chamados/{id}/historico)
+
+O painel reconsulta o histórico do chamado aberto a cada poucos segundos.
+A resposta fica em memória por HISTORICO_CACHE_TTL segundos e é invalidada
+pelas rotas que escrevem no chamado (status, atribuição, ticket, lote,
+exclusão). O TTL cobre escritas feitas em outros workers.
+"""
+
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+
+HISTORICO_CACHE_TTL = float(os.getenv("HISTORICO_CACHE_TTL", "15"))
+HISTORICO_CACHE_MAX = int(os.getenv("HISTORICO_CACHE_MAX", "500"))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[int, tuple[float, Any]]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "invalidacoes": 0}
+
+
+def get(chamado_id: int) -> Optional[Any]:
+    with _lock:
+        entry = _entries.get(chamado_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del _entries[chamado_id]
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(chamado_id)
+        _stats["hits"] += 1
+        return entry[1]
+
+
+def put(chamado_id: int, value: Any) -> None:
+    if HISTORICO_CACHE_TTL <= 0:
+        return
+    with _lock:
+        _entries[chamado_id] = (time.monotonic() + HISTORICO_CACHE_TTL, value)
+        _entries.move_to_end(chamado_id)
+        while len(_entries) > HISTORICO_CACHE_MAX:
+            _entries.popitem(last=False)
+
+
+def invalidate(chamado_ids: int | Iterable[int]) -> None:
+    ids = [chamado_ids] if isinstance(chamado_ids, int) else list(chamado_ids)
+    with _lock:
+        for cid in ids:
+            _entries.pop(cid, None)
+        _stats["invalidacoes"] += len(ids)
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {**_stats, "entradas": len(_entries), "ttl_segundos": HISTORICO_CACHE_TTL}
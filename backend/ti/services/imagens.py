@@ -0,0 +1,161 @@
+"""
+Derivados de imagem (miniaturas WebP) para alertas
+
+A listagem de alertas mandava cada imagem em base64 no JSON; agora ela
+traz só URL, dimensões e hash, e o navegador baixa a imagem (ou uma
+miniatura) de /alerts/{id}/imagem com cache imutável.
+
+gerar_variantes() abre o original do blob store e gera versões WebP
+redimensionadas para as larguras de IMAGEM_MINIATURAS (sem ampliar). O
+trabalho de CPU (decodificar, redimensionar, codificar) roda em um pool de
+processos (IMAGEM_WORKERS) para não competir com o event loop nem com o
+GIL das threads da API. As variantes vão para o blob store; a linha do
+alerta guarda dimensões e a lista {largura, altura, sha256}.
+
+Pillow é opcional: sem ele o alerta é criado sem variantes e a rota de
+imagem serve o original.
+"""
+
+from __future__ import annotations
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from sqlalchemy.orm import Session
+from core import jobs
+from core.blobstore import BlobNaoEncontrado, get_blob_store
+from core.jobs import JobContext
+
+try:
+    from PIL import Image, ImageOps
+except Exception:  # pragma: no cover
+    Image = None  # type: ignore
+    ImageOps = None  # type: ignore
+
+
+GERAR_MINIATURAS = "alertas.gerar_miniaturas"
+IMAGEM_MINIATURAS = tuple(
+    sorted({int(w) for w in os.getenv("IMAGEM_MINIATURAS", "480,960").split(",") if w.strip()})
+)
+IMAGEM_QUALIDADE = int(os.getenv("IMAGEM_QUALIDADE", "80"))
+IMAGEM_WORKERS = int(os.getenv("IMAGEM_WORKERS", "2"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def ensure_metadados_columns() -> None:
+    """Dimensões e variantes da imagem em alert (migração 0016)"""
+    from sqlalchemy import inspect
+    from core.db import engine
+
+    insp = inspect(engine)
+    if not insp.has_table("alert"):
+        return
+    existentes = {c["name"] for c in insp.get_columns("alert")}
+    for coluna, tipo in (("imagem_largura", "INT"), ("imagem_altura", "INT"), ("imagem_variantes", "JSON")):
+        if coluna not in existentes:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f"ALTER TABLE alert ADD COLUMN {coluna} {tipo} NULL")
+
+
+def disponivel() -> bool:
+    return Image is not None
+
+
+def _redimensionar(data: bytes, larguras: tuple[int, ...], qualidade: int) -> tuple[int, int, list[tuple[int, int, bytes]]]:
+    """Executado no processo do pool: (largura, altura, [(largura, altura, webp)])"""
+    with Image.open(io.BytesIO(data)) as original:
+        img = ImageOps.exif_transpose(original)
+        largura, altura = img.size
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        saidas = []
+        for alvo in sorted({min(w, largura) for w in larguras}):
+            alvo_altura = max(1, round(altura * alvo / largura))
+            redimensionada = img if alvo == largura else img.resize((alvo, alvo_altura), Image.LANCZOS)
+            buf = io.BytesIO()
+            redimensionada.save(buf, "WEBP", quality=qualidade, method=4)
+            saidas.append((alvo, alvo_altura, buf.getvalue()))
+    return largura, altura, saidas
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                ctx = multiprocessing.get_context("spawn")
+                _pool = ProcessPoolExecutor(max_workers=IMAGEM_WORKERS, mp_context=ctx)
+    return _pool
+
+
+def gerar_variantes(sha: str) -> Optional[dict]:
+    """Gera as miniaturas do blob `sha`; None se Pillow faltar ou a imagem for inválida.
+
+    Retorna {"largura", "altura", "variantes": [{"largura", "altura", "sha256"}]}.
+    """
+    global _pool
+    if not disponivel():
+        return None
+    store = get_blob_store()
+    try:
+        data = store.read(sha)
+    except (BlobNaoEncontrado, ValueError):
+        return None
+    try:
+        largura, altura, saidas = _get_pool().submit(
+            _redimensionar, data, IMAGEM_MINIATURAS, IMAGEM_QUALIDADE
+        ).result()
+    except Exception as e:
+        print(f"[IMAGENS] Falha ao gerar miniaturas de {sha[:12]}: {type(e).__name__}: {e}")
+        if isinstance(e, BrokenProcessPool):
+            with _pool_lock:
+                _pool = None
+        return None
+    return {
+        "largura": largura,
+        "altura": altura,
+        "variantes": [
+            {"largura": w, "altura": h, "sha256": store.put_bytes(webp)}
+            for w, h, webp in saidas
+        ],
+    }
+
+
+async def gerar_variantes_async(sha: str) -> Optional[dict]:
+    return await asyncio.get_running_loop().run_in_executor(None, gerar_variantes, sha)
+
+
+def aplicar(alert, info: Optional[dict]) -> None:
+    if not info:
+        return
+    alert.imagem_largura = info["largura"]
+    alert.imagem_altura = info["altura"]
+    alert.imagem_variantes = info["variantes"]
+
+
+@jobs.register(GERAR_MINIATURAS, "Gera miniaturas WebP das imagens de alertas que ainda não têm")
+def gerar_miniaturas_alertas(db: Session, ctx: JobContext) -> dict:
+    from ti.models.alert import Alert
+
+    if not disponivel():
+        return {"ok": False, "motivo": "Pillow não instalado"}
+    pendentes = db.query(Alert).filter(
+        Alert.imagem_sha256.isnot(None), Alert.imagem_largura.is_(None)
+    ).all()
+    stats = {"total": len(pendentes), "geradas": 0, "falhas": 0}
+    for i, alert in enumerate(pendentes, 1):
+        info = gerar_variantes(alert.imagem_sha256)
+        if info:
+            aplicar(alert, info)
+            db.commit()
+            stats["geradas"] += 1
+        else:
+            stats["falhas"] += 1
+        ctx.checkpoint(i * 100 / len(pendentes), f"{i}/{len(pendentes)} alertas")
+    return stats
@@ -0,0 +1,526 @@
+"""
+Importação em lote de chamados históricos (CSV / NDJSON)
+
+Antes, carregar chamados legados exigia um POST /chamados por linha, cada um
+com alocação de código, sincronização de SLA, contador do dia, notificação e
+email. Aqui:
+
+1. O arquivo é lido em streaming (linha a linha), nunca inteiro em memória
+2. Cada lote de IMPORTACAO_LOTE linhas vira um INSERT via executemany numa
+   transação; codigo/protocolo ausentes são alocados em bloco (um UPDATE no
+   contador por lote) e o contador de códigos avança até o maior EVQ-NNNN
+   importado, na mesma transação
+3. Sem efeitos por linha: nada de notificação, email ou evento em tempo real
+4. No fim, o SLA dos chamados importados é calculado numa única passada
+   (configurações e históricos pré-carregados por bloco) e gravado com
+   executemany; os caches de métricas são invalidados uma vez
+
+Reexecutar a mesma importação é seguro: linhas com codigo já existente são
+ignoradas, e linhas sem codigo são reconhecidas pelo conteúdo (email,
+solicitante, unidade, problema e data_abertura, que passa a ser obrigatória
+nelas). Linha mal formada (JSON/CSV inválido, texto fora de UTF-8),
+protocolo repetido ou valor que não cabe na coluna é reportada por linha em
+`erros` e a importação segue com as demais.
+
+POST /chamados/import grava o arquivo num spool local e roda a importação
+como job (core.jobs, tipo chamados.importar), respondendo 202.
+"""
+
+from __future__ import annotations
+import codecs
+import csv
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, Optional
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from core import jobs
+from core.db import SessionLocal, engine
+from core.jobs import JobContext
+from core.utils import now_brazil_naive
+from ti.schemas.chamado import ALLOWED_STATUSES
+from ti.services.chamados import SEQUENCIA_TABLE, _allocate_block, protocolo_from_seq
+
+
+IMPORTAR_CHAMADOS = "chamados.importar"
+IMPORTACAO_LOTE = int(os.getenv("IMPORTACAO_LOTE", "1000"))
+IMPORTACAO_SPOOL_DIR = os.getenv("IMPORTACAO_SPOOL_DIR", tempfile.gettempdir())
+SLA_LOTE = 500
+MAX_ERROS_REPORTADOS = 100
+
+CAMPOS_OBRIGATORIOS = ("solicitante", "cargo", "email", "telefone", "unidade", "problema")
+CAMPOS_TEXTO = CAMPOS_OBRIGATORIOS + (
+    "codigo", "protocolo", "internet_item", "descricao", "status", "prioridade",
+)
+CAMPOS_DATA_HORA = (
+    "data_abertura", "data_primeira_resposta", "data_conclusao",
+    "concluido_em", "cancelado_em",
+)
+CAMPOS_INT = ("usuario_id", "status_assumido_por_id")
+COLUNAS_INSERT = (
+    CAMPOS_TEXTO + ("data_visita",) + CAMPOS_DATA_HORA + CAMPOS_INT
+)
+
+# Apelidos aceitos no arquivo (ex: exportações antigas / payload da API)
+APELIDOS = {"internetItem": "internet_item", "visita": "data_visita"}
+
+_CODIGO_RE = re.compile(r"^EVQ-(\d+)$")
+_FORMATOS_DATA = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y")
+
+Progresso = Callable[[dict], None]
+
+_ultima_execucao: dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+class LinhaInvalida(ValueError):
+    pass
+
+
+def _data_hora(valor: Any) -> Optional[datetime]:
+    if valor in (None, ""):
+        return None
+    if isinstance(valor, datetime):
+        return valor
+    s = str(valor).strip()
+    try:
+        return datetime.fromisoformat(s.replace("Z", ""))
+    except ValueError:
+        pass
+    for fmt in _FORMATOS_DATA:
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            continue
+    raise LinhaInvalida(f"data inválida: {s}")
+
+
+def _normalizar(raw: dict) -> dict:
+    """Converte uma linha do arquivo nos valores das colunas de chamado"""
+    r = {APELIDOS.get(k, k): v for k, v in raw.items() if k}
+    out: dict[str, Any] = {}
+    for campo in CAMPOS_TEXTO:
+        v = r.get(campo)
+        out[campo] = str(v).strip() if v not in (None, "") else None
+    faltando = [c for c in CAMPOS_OBRIGATORIOS if not out[c]]
+    if faltando:
+        raise LinhaInvalida(f"campos obrigatórios ausentes: {', '.join(faltando)}")
+
+    out["status"] = out["status"] or "Concluído"
+    if out["status"] not in ALLOWED_STATUSES:
+        raise LinhaInvalida(f"status inválido: {out['status']}")
+    out["prioridade"] = out["prioridade"] or "Normal"
+
+    for campo in CAMPOS_DATA_HORA:
+        out[campo] = _data_hora(r.get(campo))
+    if out["data_abertura"] is None:
+        if not out["codigo"]:
+            # Sem codigo, a data de abertura faz parte da chave de reimportação
+            raise LinhaInvalida("linha sem codigo precisa de data_abertura")
+        out["data_abertura"] = now_brazil_naive()
+    # DATETIME sem fração: a chave de reimportação compara com o valor gravado
+    out["data_abertura"] = out["data_abertura"].replace(microsecond=0)
+    if out["status"] == "Concluído" and out["data_conclusao"] is None:
+        out["data_conclusao"] = out["concluido_em"] or out["data_abertura"]
+
+    visita = _data_hora(r.get("data_visita"))
+    out["data_visita"] = visita.date() if visita else None
+
+    for campo in CAMPOS_INT:
+        v = r.get(campo)
+        try:
+            out[campo] = int(v) if v not in (None, "") else None
+        except (TypeError, ValueError):
+            raise LinhaInvalida(f"{campo} inválido: {v}")
+    return out
+
+
+def _linhas_texto(arquivo) -> Iterator[str]:
+    """Linhas decodificadas; bytes fora de UTF-8 viram U+FFFD (a linha é rejeitada depois)"""
+    primeira = True
+    for bruta in arquivo:
+        if primeira:
+            bruta = bruta.removeprefix(codecs.BOM_UTF8)
+            primeira = False
+        yield bruta.decode("utf-8", errors="replace")
+
+
+def iter_registros(arquivo, formato: str) -> Iterator[dict | LinhaInvalida]:
+    """Lê um arquivo binário (CSV com cabeçalho ou NDJSON) linha a linha.
+
+    Linha mal formada não interrompe a leitura: vem como LinhaInvalida no
+    lugar do dict, para ser contada em `invalidos` por importar_chamados.
+    """
+    if formato not in ("csv", "ndjson"):
+        raise ValueError(f"Formato inválido: {formato} (use csv ou ndjson)")
+    texto = _linhas_texto(arquivo)
+    if formato == "ndjson":
+        for linha in texto:
+            linha = linha.strip()
+            if not linha:
+                continue
+            if "\ufffd" in linha:
+                yield LinhaInvalida("texto fora de UTF-8")
+                continue
+            try:
+                registro = json.loads(linha)
+            except ValueError as e:
+                yield LinhaInvalida(f"JSON inválido: {e}")
+                continue
+            yield registro if isinstance(registro, dict) else LinhaInvalida("linha não é um objeto JSON")
+        return
+
+    leitor = csv.DictReader(texto)
+    while True:
+        try:
+            registro = next(leitor)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield LinhaInvalida(f"CSV inválido: {e}")
+            continue
+        if None in registro:
+            yield LinhaInvalida("mais colunas que o cabeçalho")
+        elif any("\ufffd" in v for v in registro.values() if isinstance(v, str)):
+            yield LinhaInvalida("texto fora de UTF-8")
+        else:
+            yield registro
+
+
+def _lotes(registros: Iterable[dict | LinhaInvalida], tamanho: int) -> Iterator[list[dict | LinhaInvalida]]:
+    lote: list[dict | LinhaInvalida] = []
+    for r in registros:
+        lote.append(r)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _atribuir_codigos(conn, linhas: list[dict]) -> None:
+    """Aloca codigo/protocolo em bloco para as linhas que não os trazem"""
+    sem_codigo = [r for r in linhas if not r["codigo"]]
+    if sem_codigo:
+        inicio = _allocate_block("codigo", len(sem_codigo))
+        for i, r in enumerate(sem_codigo):
+            r["codigo"] = f"EVQ-{inicio + i:04d}"
+
+    sem_protocolo = [r for r in linhas if not r["protocolo"]]
+    while sem_protocolo:
+        inicio = _allocate_block("protocolo", len(sem_protocolo))
+        for i, r in enumerate(sem_protocolo):
+            r["protocolo"] = protocolo_from_seq(inicio + i)
+        # Protocolos aleatórios anteriores ao contador podem colidir: realoca só esses
+        existentes = {
+            row[0] for row in conn.execute(
+                text("SELECT protocolo FROM chamado WHERE protocolo IN :p").bindparams(
+                    bindparam("p", expanding=True)
+                ),
+                {"p": [r["protocolo"] for r in sem_protocolo]},
+            )
+        }
+        sem_protocolo = [r for r in sem_protocolo if r["protocolo"] in existentes]
+        for r in sem_protocolo:
+            r["protocolo"] = None
+
+
+def _avancar_contador_codigo(conn, linhas: list[dict]) -> None:
+    """Leva o contador 'codigo' até o maior EVQ-NNNN importado.
+
+    Sem isso, um EVQ-5000 importado com o contador em 300 seria gerado de
+    novo por _next_codigo e a abertura do chamado falharia no UNIQUE.
+    """
+    numeros = [int(m.group(1)) for r in linhas if (m := _CODIGO_RE.match(r["codigo"] or ""))]
+    if numeros:
+        conn.execute(
+            text(f"UPDATE {SEQUENCIA_TABLE} SET valor = GREATEST(valor, :v) WHERE nome = 'codigo'"),
+            {"v": max(numeros)},
+        )
+
+
+def _chave_conteudo(r: dict) -> tuple:
+    return (r["email"], r["solicitante"], r["unidade"], r["problema"], r["data_abertura"])
+
+
+def _conteudos_existentes(conn, linhas: list[dict]) -> set[tuple]:
+    """Chaves de conteúdo já gravadas das linhas sem codigo (busca pelo índice de data_abertura)"""
+    datas = list({r["data_abertura"] for r in linhas if not r["codigo"]})
+    if not datas:
+        return set()
+    rows = conn.execute(
+        text(
+            "SELECT email, solicitante, unidade, problema, data_abertura FROM chamado "
+            "WHERE data_abertura IN :d"
+        ).bindparams(bindparam("d", expanding=True)),
+        {"d": datas},
+    )
+    return {tuple(row) for row in rows}
+
+
+def _duplicados(conn, coluna: str, linhas: list[dict]) -> set:
+    valores = [r[coluna] for r in linhas if r[coluna]]
+    if not valores:
+        return set()
+    return {
+        row[0] for row in conn.execute(
+            text(f"SELECT {coluna} FROM chamado WHERE {coluna} IN :v").bindparams(
+                bindparam("v", expanding=True)
+            ),
+            {"v": valores},
+        )
+    }
+
+
+def _inserir_lote(linhas: list[dict]) -> tuple[list[int], int, list[tuple[int, str]]]:
+    """INSERT via executemany numa transação.
+
+    Retorna (ids inseridos, ignorados, erros por linha). Linha cujo codigo já
+    existe, ou sem codigo com o mesmo conteúdo de um chamado existente, é
+    ignorada (reimportação); protocolo repetido vira erro da linha.
+    Se o INSERT do lote falhar (ex.: valor maior que a coluna), o lote é
+    refeito linha a linha com savepoints para apontar quais linhas falharam.
+    """
+    cols_sql = ", ".join(COLUNAS_INSERT)
+    params_sql = ", ".join(f":{c}" for c in COLUNAS_INSERT)
+    insert = text(f"INSERT INTO chamado ({cols_sql}) VALUES ({params_sql})")
+    erros: list[tuple[int, str]] = []
+
+    with engine.begin() as conn:
+        # Linhas sem codigo já importadas: descartadas antes de alocar codigos
+        conteudos = _conteudos_existentes(conn, linhas)
+        candidatas = []
+        for r in linhas:
+            if not r["codigo"]:
+                chave = _chave_conteudo(r)
+                if chave in conteudos:
+                    continue
+                conteudos.add(chave)
+            candidatas.append(r)
+        _atribuir_codigos(conn, candidatas)
+        existentes = _duplicados(conn, "codigo", candidatas)
+        protocolos = _duplicados(conn, "protocolo", linhas)
+        novas, vistos_codigo, vistos_protocolo = [], set(), set()
+        for r in candidatas:
+            if r["codigo"] in existentes:
+                continue
+            if r["codigo"] in vistos_codigo:
+                erros.append((r["_linha"], f"codigo repetido no arquivo: {r['codigo']}"))
+            elif r["protocolo"] in protocolos or r["protocolo"] in vistos_protocolo:
+                erros.append((r["_linha"], f"protocolo já existente: {r['protocolo']}"))
+            else:
+                vistos_codigo.add(r["codigo"])
+                vistos_protocolo.add(r["protocolo"])
+                novas.append(r)
+        ignorados = len(linhas) - len(novas) - len(erros)
+        if not novas:
+            return [], ignorados, erros
+        params = [{c: r[c] for c in COLUNAS_INSERT} for r in novas]
+        try:
+            with conn.begin_nested():
+                conn.execute(insert, params)
+            inseridas = novas
+        except DBAPIError:
+            inseridas = []
+            for r, p in zip(novas, params):
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert, p)
+                    inseridas.append(r)
+                except DBAPIError as e:
+                    erros.append((r["_linha"], str(e.orig) if e.orig else str(e)))
+        if not inseridas:
+            return [], ignorados, erros
+        _avancar_contador_codigo(conn, inseridas)
+        ids = conn.execute(
+            text("SELECT id FROM chamado WHERE codigo IN :c").bindparams(bindparam("c", expanding=True)),
+            {"c": [r["codigo"] for r in inseridas]},
+        ).fetchall()
+    return [int(r[0]) for r in ids], ignorados, erros
+
+
+def calcular_sla_em_lote(chamado_ids: list[int], progresso: Optional[Progresso] = None) -> int:
+    """Calcula e grava o HistoricoSLA dos chamados numa passada, em blocos.
+
+    Configurações de SLA são carregadas uma vez; historico_status de cada
+    bloco é pré-carregado numa consulta. Grava com executemany.
+    """
+    from ti.models.sla_config import HistoricoSLA
+    from ti.services.sla import SLACalculator
+
+    gravados = 0
+    db = SessionLocal()
+    try:
+        for bloco in SLACalculator.iter_sla_status_em_blocos(db, chamado_ids, SLA_LOTE):
+            linhas = []
+            for ch, st in bloco:
+                if st is None:
+                    continue
+                resp = st.get("resposta_metric") or {}
+                resol = st.get("resolucao_metric") or {}
+                linhas.append({
+                    "chamado_id": ch.id,
+                    "usuario_id": None,
+                    "acao": "importacao",
+                    "status_anterior": None,
+                    "status_novo": ch.status,
+                    "tempo_resposta_horas": resp.get("tempo_decorrido_horas"),
+                    "limite_sla_resposta_horas": resp.get("tempo_limite_horas"),
+                    "tempo_resolucao_horas": resol.get("tempo_decorrido_horas"),
+                    "limite_sla_horas": resol.get("tempo_limite_horas"),
+                    "status_sla": st.get("status_geral"),
+                    "criado_em": ch.data_abertura or now_brazil_naive(),
+                })
+            if linhas:
+                db.execute(HistoricoSLA.__table__.insert(), linhas)
+                db.commit()
+                gravados += len(linhas)
+            if progresso:
+                progresso({"fase": "sla", "sla_calculados": gravados, "total": len(chamado_ids)})
+    finally:
+        db.close()
+    return gravados
+
+
+def _invalidar_caches() -> None:
+    from ti.services.cache_manager_incremental import ChamadosTodayCounter, IncrementalMetricsCache
+    from ti.services.sla_cache import SLACacheManager
+
+    db = SessionLocal()
+    try:
+        SLACacheManager.invalidate_all_sla(db)
+        SLACacheManager.invalidate(db, [IncrementalMetricsCache.get_cache_key_month()])
+        ChamadosTodayCounter._recalculate(db)
+    finally:
+        db.close()
+
+
+def importar_chamados(
+    registros: Iterable[dict],
+    lote: int = IMPORTACAO_LOTE,
+    calcular_sla: bool = True,
+    progresso: Optional[Progresso] = None,
+) -> dict[str, Any]:
+    """Importa chamados a partir de um iterável de dicts (ver iter_registros)"""
+    stats: dict[str, Any] = {
+        "lidos": 0,
+        "inseridos": 0,
+        "ignorados": 0,
+        "invalidos": 0,
+        "erros": [],
+        "sla_calculados": 0,
+        "fase": "inserindo",
+        "iniciado_em": now_brazil_naive().isoformat(),
+        "concluido": False,
+    }
+
+    def _publicar(extra: Optional[dict] = None) -> None:
+        if extra:
+            stats.update(extra)
+        with _lock:
+            _ultima_execucao.clear()
+            _ultima_execucao.update({k: v for k, v in stats.items() if k != "erros"})
+            _ultima_execucao["erros"] = list(stats["erros"])
+        if progresso:
+            progresso(dict(_ultima_execucao))
+
+    _publicar()
+    importados: list[int] = []
+    numero = 0
+    for brutos in _lotes(registros, max(1, lote)):
+        linhas = []
+        for raw in brutos:
+            numero += 1
+            try:
+                if isinstance(raw, LinhaInvalida):
+                    raise raw
+                linha = _normalizar(raw)
+                linha["_linha"] = numero
+                linhas.append(linha)
+            except LinhaInvalida as e:
+                stats["invalidos"] += 1
+                if len(stats["erros"]) < MAX_ERROS_REPORTADOS:
+                    stats["erros"].append({"linha": numero, "erro": str(e)})
+        stats["lidos"] += len(brutos)
+        if linhas:
+            ids, ignorados, erros = _inserir_lote(linhas)
+            importados.extend(ids)
+            stats["inseridos"] += len(ids)
+            stats["ignorados"] += ignorados
+            stats["invalidos"] += len(erros)
+            for linha, erro in erros:
+                if len(stats["erros"]) < MAX_ERROS_REPORTADOS:
+                    stats["erros"].append({"linha": linha, "erro": erro})
+        _publicar()
+
+    if calcular_sla and importados:
+        _publicar({"fase": "sla"})
+        stats["sla_calculados"] = calcular_sla_em_lote(
+            importados, progresso=lambda p: _publicar({"sla_calculados": p["sla_calculados"]})
+        )
+    if importados:
+        _invalidar_caches()
+
+    _publicar({
+        "fase": "concluido",
+        "concluido": True,
+        "finalizado_em": now_brazil_naive().isoformat(),
+    })
+    return dict(_ultima_execucao)
+
+
+def salvar_upload(origem) -> str:
+    """Copia o upload para um arquivo em IMPORTACAO_SPOOL_DIR (lido depois pelo job)"""
+    fd, caminho = tempfile.mkstemp(dir=IMPORTACAO_SPOOL_DIR, prefix="importacao-")
+    try:
+        with os.fdopen(fd, "wb") as destino:
+            while True:
+                bloco = origem.read(1024 * 1024)
+                if not bloco:
+                    break
+                destino.write(bloco)
+    except Exception:
+        os.unlink(caminho)
+        raise
+    return caminho
+
+
+@jobs.register(IMPORTAR_CHAMADOS, "Importa chamados históricos de um arquivo CSV/NDJSON")
+def job_importar_chamados(
+    db: Session,
+    ctx: JobContext,
+    caminho: str,
+    formato: str,
+    calcular_sla: bool = True,
+    lote: int = IMPORTACAO_LOTE,
+) -> dict[str, Any]:
+    """Importa o arquivo gravado por salvar_upload e o remove no fim"""
+    try:
+        tamanho = max(os.path.getsize(caminho), 1)
+        with open(caminho, "rb") as f:
+            def _progresso(st: dict) -> None:
+                if st.get("fase") == "inserindo":
+                    ctx.progresso(f.tell() * 90 / tamanho, f"{st['lidos']} linhas lidas")
+                elif st.get("fase") == "sla":
+                    ctx.progresso(90, f"SLA: {st['sla_calculados']}/{st['inseridos']}")
+
+            stats = importar_chamados(
+                iter_registros(f, formato), lote=lote, calcular_sla=calcular_sla, progresso=_progresso
+            )
+    finally:
+        try:
+            os.unlink(caminho)
+        except OSError:
+            pass
+    return stats
+
+
+def status_importacao() -> dict[str, Any]:
+    """Progresso da última importação neste processo"""
+    with _lock:
+        return dict(_ultima_execucao)
@@ -5,6 +5,7 @@ from ti.models.chamado import Chamado
 from ti.models.historico_status import HistoricoStatus
 from ti.models.sla_config import HistoricoSLA, SLAConfiguration
 from ti.services.sla_cache import SLACacheManager
+from ti.services.arquivamento import contar_arquivados_por_status
 from core.utils import now_brazil_naive
 import threading
 
@@ -474,6 +475,7 @@ class MetricsCalculator:
             }
 
             # Contar por status
+            arquivados = contar_arquivados_por_status(db, dia_inicio, dia_fim, statuses_para_usar)
             for status in statuses_para_usar:
                 count = db.query(Chamado).filter(
                     and_(
@@ -481,7 +483,7 @@ class MetricsCalculator:
                         Chamado.data_abertura < dia_fim,
                         Chamado.status == status
                     )
-                ).count()
+                ).count() + arquivados.get(status, 0)
 
                 status_key = status.lower().replace(" ", "_").replace("á", "a")
                 dados_dia[status_key] = count
@@ -519,6 +521,7 @@ class MetricsCalculator:
             }
 
             # Contar por status
+            arquivados = contar_arquivados_por_status(db, semana_inicio, semana_fim, statuses_para_usar)
             for status in statuses_para_usar:
                 count = db.query(Chamado).filter(
                     and_(
@@ -526,7 +529,7 @@ class MetricsCalculator:
                         Chamado.data_abertura < semana_fim,
                         Chamado.status == status
                     )
-                ).count()
+                ).count() + arquivados.get(status, 0)
 
                 status_key = status.lower().replace(" ", "_").replace("á", "a")
                 dados_semana[status_key] = count
@@ -572,6 +575,7 @@ class MetricsCalculator:
                 "data_iso": mes_inicio.strftime("%Y-%m"),
             }
 
+            arquivados = contar_arquivados_por_status(db, mes_inicio, mes_fim, statuses_para_usar)
             for status in statuses_para_usar:
                 count = db.query(Chamado).filter(
                     and_(
@@ -579,7 +583,7 @@ class MetricsCalculator:
                         Chamado.data_abertura < mes_fim,
                         Chamado.status == status
                     )
-                ).count()
+                ).count() + arquivados.get(status, 0)
 
                 # Normaliza nome do status para key segura (remova espaços e caracteres especiais)
                 status_key = status.lower().replace(" ", "_").replace("á", "a")
@@ -1,12 +1,72 @@
 from __future__ import annotations
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from core.db import engine
 from ti.models import Problema
 from ti.schemas.problema import ProblemaCreate, ProblemaUpdate
+from ti.services.catalog_cache import CatalogCache
 
 
 VALID_PRIORIDADES = {"Crítica", "Alta", "Normal", "Baixa"}
 
+# Ordem de descoberta: tabela legada "problema_reportado" (estrutura principal:
+# id, nome, prioridade_padrao, requer_item_internet, ativo, tempo_resolucao_horas),
+# tabela ORM "problema" e por fim a tabela plural "problemas"
+_PROBLEMAS_VARIANTS = [
+    "SELECT id, nome, COALESCE(prioridade_padrao, 'Normal') as prioridade, COALESCE(requer_item_internet, 0) as requer_internet, tempo_resolucao_horas FROM problema_reportado ORDER BY nome",
+    "SELECT id, nome, COALESCE(prioridade_padrao, 'Normal') as prioridade, COALESCE(requer_item_internet, 0) as requer_internet, tempo_resolucao_horas FROM problema_reportado WHERE ativo = 1 ORDER BY nome",
+    "SELECT id, nome, prioridade_padrao, requer_item_internet, tempo_resolucao_horas FROM problema_reportado",
+    "SELECT id, nome, prioridade_padrao, requer_item_internet, tempo_resolucao_horas FROM problema_reportado WHERE ativo = 1 OR ativo IS NULL",
+    "SELECT id, nome, prioridade, requer_internet, tempo_resolucao_horas FROM problema ORDER BY nome",
+    "SELECT id, nome, prioridade, requer_internet, tempo_resolucao_horas FROM problemas",
+    "SELECT id, nome, prioridade_padrao, requer_item_internet, tempo_resolucao_horas FROM problemas",
+    "SELECT id, problema AS nome, prioridade, requer_internet, tempo_resolucao_horas FROM problemas",
+]
+
+
+def _map_problema_row(r) -> dict:
+    return {
+        "id": int(r[0]) if r[0] is not None else 0,
+        "nome": str(r[1]).strip() if r[1] else "Sem nome",
+        "prioridade": str(r[2] or "Normal").strip(),
+        "requer_internet": bool(r[3]) if len(r) > 3 else False,
+        "tempo_resolucao_horas": int(r[4]) if len(r) > 4 and r[4] else None,
+    }
+
+
+def _problemas_fallback(db: Session) -> list[dict]:
+    """Último recurso: extrai problemas dos chamados existentes"""
+    from ti.models import Chamado
+    existing_names = {r[0] for r in db.query(Chamado.problema).distinct().all() if r[0]}
+    return [
+        {
+            "id": idx,
+            "nome": nome,
+            "prioridade": "Normal",
+            "requer_internet": nome.lower() == "internet",
+            "tempo_resolucao_horas": None,
+        }
+        for idx, nome in enumerate(sorted(existing_names), 1)
+    ]
+
+
+def _ensure_problema_table() -> None:
+    Problema.__table__.create(bind=engine, checkfirst=True)
+
+
+problemas_catalog = CatalogCache(
+    name="problemas",
+    variants=_PROBLEMAS_VARIANTS,
+    row_mapper=_map_problema_row,
+    fallback=_problemas_fallback,
+    prepare=_ensure_problema_table,
+)
+
+
+def listar_problemas(db: Session) -> list[dict]:
+    """Lista problemas a partir do catálogo em memória"""
+    return problemas_catalog.get(db)
+
 def deletar_problema(db: Session, problema_id: int) -> dict:
     """
     Deleta um problema do banco de dados.
@@ -20,6 +80,7 @@ def deletar_problema(db: Session, problema_id: int) -> dict:
         )
         db.commit()
         if res.rowcount and res.rowcount > 0:
+            problemas_catalog.invalidate()
             return {"sucesso": True, "mensagem": f"Problema {problema_id} deletado com sucesso"}
     except Exception as e:
         print(f"⚠️  Erro ao deletar da tabela legada: {e}")
@@ -32,6 +93,7 @@ def deletar_problema(db: Session, problema_id: int) -> dict:
             raise ValueError(f"Problema com ID {problema_id} não encontrado")
         db.delete(problema)
         db.commit()
+        problemas_catalog.invalidate()
         return {"sucesso": True, "mensagem": f"Problema {problema_id} deletado com sucesso"}
     except Exception as e:
         db.rollback()
@@ -75,6 +137,7 @@ def criar_problema(db: Session, payload: ProblemaCreate) -> Problema:
             },
         )
         db.commit()
+        problemas_catalog.invalidate()
         inserted_id = getattr(res, "lastrowid", None)
         if not inserted_id:
             try:
@@ -104,6 +167,7 @@ def criar_problema(db: Session, payload: ProblemaCreate) -> Problema:
         db.add(novo)
         db.commit()
         db.refresh(novo)
+        problemas_catalog.invalidate()
         return novo
 
 
@@ -138,6 +202,7 @@ def atualizar_problema(db: Session, problema_id: int, payload: ProblemaUpdate) -
             sql = f"UPDATE problema_reportado SET {', '.join(update_fields)} WHERE id = :id"
             res = db.execute(text(sql), params)
             db.commit()
+            problemas_catalog.invalidate()
 
             # Fetch updated record (whether rowcount > 0 or not)
             row = db.execute(
@@ -175,6 +240,7 @@ def atualizar_problema(db: Session, problema_id: int, payload: ProblemaUpdate) -
         db.add(problema)
         db.commit()
         db.refresh(problema)
+        problemas_catalog.invalidate()
         return problema
     except Exception as e:
         db.rollback()
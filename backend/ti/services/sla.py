@@ -1,5 +1,6 @@
 from __future__ import annotations
 from datetime import datetime, time, timedelta
+from typing import Iterator
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 from ti.models.sla_config import SLAConfiguration, SLABusinessHours, HistoricoSLA
@@ -76,6 +77,66 @@ class SLACalculator:
         except Exception:
             return None
 
+    @staticmethod
+    def get_sla_configs(db: Session) -> dict[str, SLAConfiguration]:
+        """Configurações ativas por prioridade (uma consulta, para operações em lote)"""
+        try:
+            configs = db.query(SLAConfiguration).filter(SLAConfiguration.ativo == True).all()
+        except Exception:
+            return {}
+        return {c.prioridade: c for c in configs}
+
+    @staticmethod
+    def get_historicos_cache(db: Session, chamado_ids: list[int]) -> dict[int, list[HistoricoStatus]]:
+        """
+        Prefetch de historico_status para vários chamados numa única consulta.
+        Todo id solicitado tem entrada (lista vazia se não houver histórico),
+        para que o cálculo não volte a consultar o banco por chamado.
+        """
+        cache: dict[int, list[HistoricoStatus]] = {cid: [] for cid in chamado_ids}
+        if not chamado_ids:
+            return cache
+        historicos = db.query(HistoricoStatus).filter(
+            HistoricoStatus.chamado_id.in_(chamado_ids)
+        ).order_by(HistoricoStatus.data_inicio.asc()).all()
+        for hist in historicos:
+            cache.setdefault(hist.chamado_id, []).append(hist)
+        return cache
+
+    @staticmethod
+    def iter_sla_status_em_blocos(
+        db: Session, chamado_ids: list[int], tamanho: int = 500
+    ) -> Iterator[list[tuple[Chamado, dict | None]]]:
+        """
+        Status de SLA de muitos chamados, bloco a bloco.
+
+        Configurações são carregadas uma vez; chamados e historico_status de
+        cada bloco vêm em uma consulta cada. Cada bloco é uma lista de
+        (chamado, sla_status), com sla_status None quando o cálculo falhou.
+        Chamados e históricos do bloco são desanexados da sessão antes do
+        próximo, então o chamador pode dar commit entre blocos.
+        """
+        sla_configs = SLACalculator.get_sla_configs(db)
+        for i in range(0, len(chamado_ids), tamanho):
+            bloco = chamado_ids[i:i + tamanho]
+            chamados = db.query(Chamado).filter(Chamado.id.in_(bloco)).order_by(Chamado.id).all()
+            historicos = SLACalculator.get_historicos_cache(db, bloco)
+            resultado: list[tuple[Chamado, dict | None]] = []
+            for ch in chamados:
+                try:
+                    st = SLACalculator.get_sla_status(
+                        db, ch, historicos_cache=historicos, sla_configs=sla_configs
+                    )
+                except Exception as e:
+                    print(f"[SLA] Erro no SLA do chamado {ch.id}: {e}")
+                    st = None
+                resultado.append((ch, st))
+            yield resultado
+            # Só os objetos do bloco: as configurações continuam na sessão
+            for obj in chamados + [h for hs in historicos.values() for h in hs]:
+                if obj in db:
+                    db.expunge(obj)
+
     @staticmethod
     def get_first_response_date(db: Session, chamado_id: int) -> datetime | None:
         """
@@ -147,7 +208,12 @@ class SLACalculator:
         return False
 
     @staticmethod
-    def get_sla_status(db: Session, chamado: Chamado) -> dict:
+    def get_sla_status(
+        db: Session,
+        chamado: Chamado,
+        historicos_cache: dict | None = None,
+        sla_configs: dict[str, SLAConfiguration] | None = None,
+    ) -> dict:
         """
         Calcula o status de SLA de um chamado com estados claros e mutuamente exclusivos.
 
@@ -157,10 +223,16 @@ class SLACalculator:
         - Histórico de status para verificar se está pausado
 
         Retorna status com novo sistema de estados.
+
+        historicos_cache/sla_configs: prefetch opcional para operações em lote
+        (ver get_historicos_cache e get_sla_configs).
         """
         from ti.services.sla_status import SLAStatus, SLAStatusDeterminer, SLAResponseMetric, SLAResolutionMetric
 
-        sla_config = SLACalculator.get_sla_config_by_priority(db, chamado.prioridade)
+        if sla_configs is not None:
+            sla_config = sla_configs.get(chamado.prioridade)
+        else:
+            sla_config = SLACalculator.get_sla_config_by_priority(db, chamado.prioridade)
 
         if not sla_config:
             return {
@@ -221,12 +293,12 @@ class SLACalculator:
         if chamado.status not in SLAStatusDeterminer.PAUSED_STATUSES:
             data_final = data_conclusao if data_conclusao else agora
             tempo_resolucao_horas = SLACalculator.calculate_business_hours_excluding_paused(
-                chamado.id, data_abertura, data_final, db
+                chamado.id, data_abertura, data_final, db, historicos_cache
             )
         else:
             # Pausado: não conta tempo desde abertura até agora
             tempo_resolucao_horas = SLACalculator.calculate_business_hours_excluding_paused(
-                chamado.id, data_abertura, agora, db
+                chamado.id, data_abertura, agora, db, historicos_cache
             )
 
         resolucao_status = SLAStatusDeterminer.determine_status(
@@ -0,0 +1,336 @@
+"""
+Jobs de manutenção de SLA/métricas (executados por core.jobs)
+
+Cada função recebe (db, ctx) — sessão própria do job e JobContext para
+progresso/cancelamento — e retorna o mesmo dicionário que a rota síncrona
+retornava. As rotas apenas submetem o job (ver ti/api/sla.py e
+ti/api/metrics.py).
+"""
+
+from __future__ import annotations
+from typing import Any
+from sqlalchemy import and_, text
+from sqlalchemy.orm import Session
+from core import jobs
+from core.jobs import JobCancelado, JobContext
+from core.realtime import emit_sync
+from core.utils import now_brazil_naive
+from ti.models.chamado import Chamado
+from ti.models.sla_config import HistoricoSLA, SLAConfiguration
+from ti.services.sla import SLACalculator
+from ti.services.sla_cache import SLACacheManager
+
+
+PROGRESSO_A_CADA = 100
+SYNC_LOTE = 500
+
+SYNC_TODOS_CHAMADOS = "sla.sync_todos_chamados"
+RECALCULAR_PAINEL = "sla.recalcular_painel"
+RESET_AND_RECALCULATE = "sla.reset_and_recalculate"
+RECALCULAR_P90 = "sla.recalcular_p90"
+FORCE_RECALCULATE_ALL = "sla.force_recalculate_all"
+DEBUG_RECALCULATE_SLA = "metrics.debug_recalculate_sla"
+RECALCULO_COMPLETO = "sla.recalculo_completo"
+
+
+def _metricas_sla(sla_status: dict) -> dict[str, Any]:
+    resposta_metric = sla_status.get("resposta_metric")
+    resolucao_metric = sla_status.get("resolucao_metric")
+    return {
+        "tempo_resposta_horas": resposta_metric.get("tempo_decorrido_horas") if resposta_metric else None,
+        "limite_sla_resposta_horas": resposta_metric.get("tempo_limite_horas") if resposta_metric else None,
+        "tempo_resolucao_horas": resolucao_metric.get("tempo_decorrido_horas") if resolucao_metric else None,
+        "limite_sla_horas": resolucao_metric.get("tempo_limite_horas") if resolucao_metric else None,
+        "status_sla": sla_status.get("status_geral"),
+    }
+
+
+def _com_lock(db: Session, ctx: JobContext, operacao) -> dict:
+    """Executa a operação atômica em historico_sla, propagando cancelamento"""
+    from ti.services.sla_transaction_manager import SLATransactionManager
+
+    result = SLATransactionManager.execute_with_lock(db, "historico_sla", operacao, ctx)
+    if result.success:
+        return result.data
+    if ctx.cancelado():
+        raise JobCancelado()
+    raise RuntimeError(result.error)
+
+
+_ATUALIZAR_HISTORICO_SLA = text("""
+    UPDATE historico_sla
+    SET status_novo = :status_novo,
+        tempo_resposta_horas = :tempo_resposta_horas,
+        limite_sla_resposta_horas = :limite_sla_resposta_horas,
+        tempo_resolucao_horas = :tempo_resolucao_horas,
+        limite_sla_horas = :limite_sla_horas,
+        status_sla = :status_sla
+    WHERE id = :id
+""")
+
+
+def _historicos_sla_existentes(db: Session, chamado_ids: list[int]) -> dict[int, int]:
+    """chamado_id -> id do registro mais recente (criado_em) de historico_sla, o mesmo
+    que _registrar_sla atualiza (uma consulta por bloco)"""
+    existentes: dict[int, int] = {}
+    for hid, chamado_id, _ in db.query(HistoricoSLA.id, HistoricoSLA.chamado_id, HistoricoSLA.criado_em).filter(
+        HistoricoSLA.chamado_id.in_(chamado_ids)
+    ).order_by(HistoricoSLA.criado_em.asc(), HistoricoSLA.id.asc()):
+        existentes[chamado_id] = hid
+    return existentes
+
+
+@jobs.register(SYNC_TODOS_CHAMADOS, "Sincroniza todos os chamados com historico_sla")
+def sincronizar_todos_chamados(db: Session, ctx: JobContext) -> dict:
+    def _impl(db_session: Session, ctx: JobContext) -> dict:
+        stats = {
+            "total_chamados": 0,
+            "sincronizados": 0,
+            "atualizados": 0,
+            "erros": 0,
+        }
+
+        # Só os ids; chamados e históricos vêm por bloco (SLACalculator.iter_sla_status_em_blocos)
+        ids = [cid for (cid,) in db_session.query(Chamado.id).order_by(Chamado.id).all()]
+        total = stats["total_chamados"] = len(ids)
+        feitos = 0
+
+        for bloco in SLACalculator.iter_sla_status_em_blocos(db_session, ids, SYNC_LOTE):
+            existentes = _historicos_sla_existentes(db_session, [ch.id for ch, _ in bloco])
+            atualizar, inserir = [], []
+            for chamado, sla_status in bloco:
+                if sla_status is None:
+                    stats["erros"] += 1
+                    continue
+                valores = _metricas_sla(sla_status)
+                if chamado.id in existentes:
+                    atualizar.append({"id": existentes[chamado.id], "status_novo": chamado.status, **valores})
+                else:
+                    inserir.append({
+                        "chamado_id": chamado.id,
+                        "usuario_id": None,
+                        "acao": "sincronizacao",
+                        "status_anterior": None,
+                        "status_novo": chamado.status,
+                        "criado_em": chamado.data_abertura or now_brazil_naive(),
+                        **valores,
+                    })
+
+            if atualizar:
+                db_session.execute(_ATUALIZAR_HISTORICO_SLA, atualizar)
+            if inserir:
+                db_session.execute(HistoricoSLA.__table__.insert(), inserir)
+            stats["atualizados"] += len(atualizar)
+            stats["sincronizados"] += len(inserir)
+
+            feitos += len(bloco)
+            ctx.checkpoint(feitos * 100 / total, f"{feitos}/{total} chamados")
+
+        return stats
+
+    return _com_lock(db, ctx, _impl)
+
+
+@jobs.register(RECALCULAR_PAINEL, "Recalcula o SLA dos chamados abertos")
+def recalcular_sla_painel(db: Session, ctx: JobContext) -> dict:
+    def _impl(db_session: Session, ctx: JobContext) -> dict:
+        stats = {
+            "total_recalculados": 0,
+            "em_dia": 0,
+            "vencidos": 0,
+            "em_andamento": 0,
+            "congelados": 0,
+            "erros": 0,
+        }
+
+        chamados = db_session.query(Chamado).filter(
+            and_(
+                Chamado.status != "Cancelado",
+                Chamado.status != "Concluído"
+            )
+        ).all()
+        total = len(chamados)
+        historicos = SLACalculator.get_historicos_cache(db_session, [c.id for c in chamados])
+        sla_configs = SLACalculator.get_sla_configs(db_session)
+
+        for i, chamado in enumerate(chamados, 1):
+            if i % PROGRESSO_A_CADA == 0:
+                ctx.checkpoint(i * 100 / total, f"{i}/{total} chamados")
+
+            sla_status = SLACalculator.get_sla_status(
+                db_session, chamado, historicos_cache=historicos, sla_configs=sla_configs
+            )
+            valores = _metricas_sla(sla_status)
+
+            existing = db_session.query(HistoricoSLA).filter(
+                HistoricoSLA.chamado_id == chamado.id
+            ).order_by(HistoricoSLA.criado_em.desc()).first()
+
+            if existing:
+                for campo, valor in valores.items():
+                    setattr(existing, campo, valor)
+                db_session.add(existing)
+            else:
+                db_session.add(HistoricoSLA(
+                    chamado_id=chamado.id,
+                    usuario_id=None,
+                    acao="recalculo_painel",
+                    status_novo=chamado.status,
+                    criado_em=now_brazil_naive(),
+                    **valores,
+                ))
+
+            stats["total_recalculados"] += 1
+
+            status_sla = sla_status.get("status_geral", "sem_sla")
+            if status_sla in ["cumprido", "dentro_prazo"]:
+                stats["em_dia"] += 1
+            elif status_sla in ["violado", "vencido_ativo"]:
+                stats["vencidos"] += 1
+            elif status_sla == "proximo_vencer":
+                stats["em_andamento"] += 1
+            elif status_sla == "pausado":
+                stats["congelados"] += 1
+
+        return stats
+
+    stats = _com_lock(db, ctx, _impl)
+
+    try:
+        from ti.services.cache_manager_incremental import IncrementalMetricsCache
+        IncrementalMetricsCache.invalidate_all()
+    except Exception as e:
+        print(f"[PAINEL RECALC] Aviso ao invalidar cache: {e}")
+
+    emit_sync("metrics:updated", {
+        "total_recalculados": stats.get("total_recalculados"),
+        "em_dia": stats.get("em_dia"),
+        "vencidos": stats.get("vencidos"),
+        "em_andamento": stats.get("em_andamento"),
+        "congelados": stats.get("congelados"),
+        "timestamp": now_brazil_naive().isoformat(),
+    })
+    return stats
+
+
+@jobs.register(RESET_AND_RECALCULATE, "Reseta caches de SLA e registra a data de reset")
+def resetar_sla_completo(db: Session, ctx: JobContext) -> dict:
+    from ti.models.metrics_cache import MetricsCacheDB
+
+    agora = now_brazil_naive()
+    print("\n[SLA RESET] Iniciando reset completo do sistema SLA")
+
+    SLACacheManager.invalidate_all_sla(db)
+    ctx.checkpoint(30, "Cache em memória invalidado")
+
+    db.query(MetricsCacheDB).delete()
+    ctx.checkpoint(60, "Cache do banco limpo")
+
+    configs = db.query(SLAConfiguration).all()
+    for config in configs:
+        config.ultimo_reset_em = agora
+        config.atualizado_em = agora
+        db.add(config)
+    db.commit()
+    print(f"[SLA RESET] ✅ Reset concluído ({len(configs)} configurações)")
+
+    emit_sync("sla:reset", {
+        "reset_em": agora.isoformat(),
+        "configuracoes_atualizadas": len(configs),
+        "timestamp": agora.isoformat(),
+    })
+
+    return {
+        "ok": True,
+        "message": "Sistema de SLA foi completamente resetado",
+        "reset_em": agora.isoformat(),
+        "proximos_calculos": "Apenas chamados posteriores a este reset serão considerados",
+        "configuracoes_atualizadas": len(configs),
+        "cache_limpo": True,
+        "memoria_limpa": True
+    }
+
+
+@jobs.register(RECALCULAR_P90, "Recalcula limites de SLA pelo P90 dos últimos 30 dias")
+def recalcular_sla_p90(db: Session, ctx: JobContext) -> dict:
+    from ti.services.sla_p90_calculator import SLAP90Calculator
+
+    return SLAP90Calculator.recalcular_sla_por_prioridade(db)
+
+
+def _recalcular_metricas_sla(db: Session, ctx: JobContext) -> dict:
+    from ti.services.metrics import MetricsCalculator
+
+    SLACacheManager.invalidate_all_sla(db)
+    ctx.checkpoint(20, "Cache SLA invalidado")
+    sla_24h = MetricsCalculator.get_sla_compliance_24h(db)
+    ctx.checkpoint(40, "SLA 24h")
+    sla_mes = MetricsCalculator.get_sla_compliance_mes(db)
+    ctx.checkpoint(60, "SLA do mês")
+    sla_dist = MetricsCalculator.get_sla_distribution(db)
+    return {
+        "sla_compliance_24h": sla_24h,
+        "sla_compliance_mes": sla_mes,
+        "sla_distribution": sla_dist,
+    }
+
+
+@jobs.register(FORCE_RECALCULATE_ALL, "Limpa todos os caches e recalcula as métricas principais")
+def force_recalculate_all(db: Session, ctx: JobContext) -> dict:
+    from ti.models.metrics_cache import MetricsCacheDB
+    from ti.services.metrics import MetricsCalculator
+
+    print("🔄 FORCE RECALCULATE: Limpando TODOS os caches...")
+    try:
+        db.query(MetricsCacheDB).delete()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Erro ao limpar tabela de cache: {e}")
+
+    metricas = _recalcular_metricas_sla(db, ctx)
+    ctx.checkpoint(80, "Tempo de resposta")
+    tempo_24h = MetricsCalculator.get_tempo_medio_resposta_24h(db)
+    tempo_mes, total_mes = MetricsCalculator.get_tempo_medio_resposta_mes(db)
+    print("✅ Recalculo completo concluído com sucesso!")
+
+    return {
+        "ok": True,
+        "message": "Todos os caches foram limpos e métricas recalculadas",
+        "metrics": {
+            **metricas,
+            "tempo_resposta_24h": tempo_24h,
+            "tempo_resposta_mes": tempo_mes,
+            "total_chamados_mes": total_mes,
+        },
+        "timestamp": now_brazil_naive().isoformat(),
+        "cache_status": "cleared"
+    }
+
+
+@jobs.register(DEBUG_RECALCULATE_SLA, "Invalida caches de SLA e recalcula conformidade")
+def debug_recalculate_sla(db: Session, ctx: JobContext) -> dict:
+    return {
+        "status": "ok",
+        **_recalcular_metricas_sla(db, ctx),
+        "timestamp": now_brazil_naive().isoformat()
+    }
+
+
+@jobs.register(RECALCULO_COMPLETO, "Recálculo paralelo do SLA (SLARecalculator), retomável")
+def recalculo_completo(db: Session, ctx: JobContext, completo: bool = False) -> dict:
+    from ti.scripts.recalculate_sla_complete import SLARecalculator
+
+    def _progresso(feitos: int, total: int) -> None:
+        ctx.progresso(feitos * 100 / max(total, 1), f"{feitos}/{total} faixas")
+
+    stats = SLARecalculator(db, completo=completo).recalculate_all(verbose=False, progresso=_progresso, levantar=True)
+    return {
+        "ok": not stats.get("ignorado", False),
+        "recalculados": stats["recalculados"],
+        "com_erro": stats["com_erro"],
+        "tempo_medio_resposta_horas": round(stats["tempo_medio_resposta_horas"], 2),
+        "tempo_medio_resolucao_horas": round(stats["tempo_medio_resolucao_horas"], 2),
+        "modo": stats.get("modo"),
+        "execucao_id": stats.get("execucao_id"),
+    }
@@ -17,6 +17,7 @@ from ti.models.sla_config import SLAConfiguration
 from ti.models.historico_status import HistoricoStatus
 from ti.services.sla import SLACalculator
 from ti.services.sla_status import SLAStatus
+from ti.services.arquivamento import iter_chamados_arquivados
 from core.utils import now_brazil_naive
 
 
@@ -93,40 +94,13 @@ class UnifiedSLAMetricsCalculator:
 
             total_count = query.count()
 
-            if total_count == 0:
-                return {
-                    "total": 0,
-                    "dentro_sla": 0,
-                    "fora_sla": 0,
-                    "percentual_dentro": 0,
-                    "percentual_fora": 0,
-                    "data_inicio": start_date,
-                    "data_fim": end_date,
-                    "timestamp_calculo": now_brazil_naive()
-                }
-
             # Classifica em chunks para otimizar memória e conexão
             dentro_sla = 0
             fora_sla = 0
             chunk_size = 500
 
-            for offset in range(0, total_count, chunk_size):
-                # Carrega chunk de chamados
-                chamados_chunk = query.offset(offset).limit(chunk_size).all()
-
-                # PRÉ-CARREGA históricos APENAS para este chunk
-                chamado_ids = [c.id for c in chamados_chunk]
-                historicos_bulk = db.query(HistoricoStatus).filter(
-                    HistoricoStatus.chamado_id.in_(chamado_ids)
-                ).all()
-
-                historicos_cache = {}
-                for hist in historicos_bulk:
-                    if hist.chamado_id not in historicos_cache:
-                        historicos_cache[hist.chamado_id] = []
-                    historicos_cache[hist.chamado_id].append(hist)
-
-                # Processa chamados deste chunk
+            def classificar(chamados_chunk, historicos_cache):
+                nonlocal dentro_sla, fora_sla
                 for chamado in chamados_chunk:
                     try:
                         sla_config = sla_configs.get(chamado.prioridade)
@@ -156,8 +130,37 @@ class UnifiedSLAMetricsCalculator:
                         print(f"Erro ao processar chamado {chamado.id}: {e}")
                         continue
 
+            for offset in range(0, total_count, chunk_size):
+                # Carrega chunk de chamados
+                chamados_chunk = query.offset(offset).limit(chunk_size).all()
+
+                # PRÉ-CARREGA históricos APENAS para este chunk
+                chamado_ids = [c.id for c in chamados_chunk]
+                historicos_bulk = db.query(HistoricoStatus).filter(
+                    HistoricoStatus.chamado_id.in_(chamado_ids)
+                ).all()
+
+                historicos_cache = {}
+                for hist in historicos_bulk:
+                    if hist.chamado_id not in historicos_cache:
+                        historicos_cache[hist.chamado_id] = []
+                    historicos_cache[hist.chamado_id].append(hist)
+
+                # Processa chamados deste chunk
+                classificar(chamados_chunk, historicos_cache)
+
                 # Limpa sessão entre chunks para liberar memória
                 db.expunge_all()
+
+            # Leitura transparente: chamados do período já movidos para o arquivo
+            for chamados_chunk, historicos_cache in iter_chamados_arquivados(db, start_date, end_date, chunk_size):
+                classificar(
+                    [
+                        c for c in chamados_chunk
+                        if c.status != "Cancelado" and c.data_primeira_resposta is not None
+                    ],
+                    historicos_cache,
+                )
             
             total = dentro_sla + fora_sla
             
@@ -15,6 +15,7 @@ Uso:
     scheduler.start()
 """
 
+import os
 import threading
 import logging
 from datetime import datetime, time
@@ -113,12 +114,27 @@ class SLAScheduler:
 
             db.commit()
 
+            self._arquivar_chamados()
+
         except Exception as e:
             logger.error(f"Erro durante recalculação automática de SLA: {e}", exc_info=True)
             db.rollback()
         finally:
             db.close()
 
+    def _arquivar_chamados(self):
+        """Arquiva chamados encerrados antigos (se ARQUIVAMENTO_AUTOMATICO=1)"""
+        if os.getenv("ARQUIVAMENTO_AUTOMATICO", "0").strip().lower() not in ("1", "true", "sim"):
+            return
+        try:
+            from core import jobs
+            from ti.services.arquivamento import ARQUIVAR_CHAMADOS
+            # Job deduplicado: não roda junto com um arquivamento disparado pela API
+            info = jobs.submit(ARQUIVAR_CHAMADOS)
+            logger.info(f"✅ Arquivamento submetido: job {info['job_id']} (deduplicado={info['deduplicado']})")
+        except Exception as e:
+            logger.error(f"Erro durante arquivamento automático: {e}", exc_info=True)
+
     def _warmup_cache(self, db: Session):
         """Pré-aquece o cache com métricas principais"""
         try:
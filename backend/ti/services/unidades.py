@@ -2,7 +2,70 @@ from __future__ import annotations
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from typing import Any, Dict
+from core.db import engine
 from ti.schemas.unidade import UnidadeCreate
+from ti.services.catalog_cache import CatalogCache
+
+
+# Tenta esquemas legados/plurais com e sem coluna cidade
+_UNIDADES_VARIANTS = [
+    "SELECT id, nome, cidade FROM unidade ORDER BY nome",
+    "SELECT id, nome FROM unidade ORDER BY nome",
+    "SELECT id, unidade AS nome, cidade FROM unidade ORDER BY nome",
+    "SELECT id, unidade AS nome FROM unidade ORDER BY nome",
+    "SELECT id, nome, cidade FROM unidades ORDER BY nome",
+    "SELECT id, nome FROM unidades ORDER BY nome",
+    "SELECT id, unidade AS nome, cidade FROM unidades ORDER BY nome",
+    "SELECT id, unidade AS nome FROM unidades ORDER BY nome",
+]
+
+
+def _map_unidade_row(r) -> Dict[str, Any]:
+    return {
+        "id": r[0] or 0,
+        "nome": str(r[1]).strip() if r[1] else "Sem nome",
+        "cidade": str(r[2]).strip() if len(r) >= 3 and r[2] else "",
+    }
+
+
+def _unidades_fallback(db: Session) -> list[Dict[str, Any]]:
+    """Sem linhas nas tabelas de unidade: tenta ORM e depois deriva de chamados"""
+    from ..models import Unidade, Chamado
+    try:
+        rows_orm = db.query(Unidade).order_by(Unidade.nome.asc()).all()
+        if rows_orm:
+            return [
+                {"id": r.id, "nome": r.nome, "cidade": getattr(r, "cidade", "") or ""}
+                for r in rows_orm
+            ]
+    except Exception as e:
+        print(f"⚠️  ORM query failed: {e}")
+        db.rollback()
+
+    distinct = [r[0] for r in db.query(Chamado.unidade).distinct().all() if r[0]]
+    return [
+        {"id": idx, "nome": str(nome).strip(), "cidade": ""}
+        for idx, nome in enumerate(sorted(distinct), 1)
+    ]
+
+
+def _ensure_unidade_table() -> None:
+    from ..models import Unidade
+    Unidade.__table__.create(bind=engine, checkfirst=True)
+
+
+unidades_catalog = CatalogCache(
+    name="unidades",
+    variants=_UNIDADES_VARIANTS,
+    row_mapper=_map_unidade_row,
+    fallback=_unidades_fallback,
+    prepare=_ensure_unidade_table,
+)
+
+
+def listar_unidades(db: Session) -> list[Dict[str, Any]]:
+    """Lista unidades a partir do catálogo em memória"""
+    return unidades_catalog.get(db)
 
 
 def deletar_unidade(db: Session, unidade_id: int) -> Dict[str, Any]:
@@ -18,6 +81,7 @@ def deletar_unidade(db: Session, unidade_id: int) -> Dict[str, Any]:
         )
         db.commit()
         if res.rowcount and res.rowcount > 0:
+            unidades_catalog.invalidate()
             return {"sucesso": True, "mensagem": f"Unidade {unidade_id} deletada com sucesso"}
     except Exception as e:
         print(f"⚠️  Erro ao deletar da tabela legada: {e}")
@@ -31,6 +95,7 @@ def deletar_unidade(db: Session, unidade_id: int) -> Dict[str, Any]:
             raise ValueError(f"Unidade com ID {unidade_id} não encontrada")
         db.delete(unidade)
         db.commit()
+        unidades_catalog.invalidate()
         return {"sucesso": True, "mensagem": f"Unidade {unidade_id} deletada com sucesso"}
     except Exception as e:
         db.rollback()
@@ -110,6 +175,7 @@ def criar_unidade(db: Session, payload: UnidadeCreate) -> Dict[str, Any]:
                 except Exception:
                     inserted_id = 0
         db.commit()
+        unidades_catalog.invalidate()
         return {"id": int(inserted_id or 0), "nome": nome, "cidade": ""}
     except Exception as e:
         db.rollback()
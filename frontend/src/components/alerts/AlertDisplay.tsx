@@ -1,6 +1,6 @@
 import { useEffect, useState, useRef } from "react";
 import { useLocation } from "react-router-dom";
-import { apiFetch } from "@/lib/api";
+import { apiFetch, apiUrl } from "@/lib/api";
 import { shouldShowAlertOnPage } from "@/config/alert-pages";
 import { useAuthContext } from "@/lib/auth-context";
 
@@ -180,10 +180,16 @@ export default function AlertDisplay() {
     <div className="fixed inset-0 z-50 flex items-center justify-center bg-black/80 backdrop-blur-sm p-4">
       <div className="relative w-full max-w-[400px] aspect-[9/16] animate-in zoom-in-95 fade-in duration-300">
         <div className="relative w-full h-full rounded-3xl overflow-hidden shadow-2xl">
-          {currentAlert.imagem_blob ? (
+          {currentAlert.imagem_url ? (
             <div className="absolute inset-0">
               <img
-                src={`data:${currentAlert.imagem_mime_type || "image/jpeg"};base64,${currentAlert.imagem_blob}`}
+                src={apiUrl(currentAlert.imagem_url)}
+                srcSet={(currentAlert.imagem_variantes || [])
+                  .map((v: any) => `${apiUrl(v.url)} ${v.largura}w`)
+                  .join(", ") || undefined}
+                sizes="400px"
+                width={currentAlert.imagem_largura || undefined}
+                height={currentAlert.imagem_altura || undefined}
                 alt="Alerta"
                 className="w-full h-full object-cover"
               />
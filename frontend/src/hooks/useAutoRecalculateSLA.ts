@@ -33,7 +33,7 @@ export function useAutoRecalculateSLA() {
       } catch (warmupError) {
         console.log("[SLA] Warmup falhou, forçando recálculo...");
         // Se warmup falha, força recalcular completo
-        const response = await api.post("/sla/recalcular/painel");
+        const response = await api.postJob("/sla/recalcular/painel");
         return response.data as RecalculateStats;
       }
 
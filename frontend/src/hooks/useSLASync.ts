@@ -24,7 +24,7 @@ export function useSLASync() {
     data: stats,
   } = useMutation({
     mutationFn: async () => {
-      const response = await api.post("/sla/recalcular/painel");
+      const response = await api.postJob("/sla/recalcular/painel");
       return response.data as SLASyncStats;
     },
     onSuccess: () => {
@@ -56,7 +56,7 @@ export function useSLASyncAll() {
     data: stats,
   } = useMutation({
     mutationFn: async () => {
-      const response = await api.post("/sla/sync/todos-chamados");
+      const response = await api.postJob("/sla/sync/todos-chamados");
       return response.data;
     },
     onSuccess: () => {
@@ -10,10 +10,13 @@ export const API_BASE: string = (() => {
   return "/api";
 })();
 
-export function apiFetch(path: string, init?: RequestInit) {
+export function apiUrl(path: string): string {
   const p = path.startsWith("/") ? path : `/${path}`;
-  const url = `${API_BASE}${p}`;
-  return fetch(url, init);
+  return `${API_BASE}${p}`;
+}
+
+export function apiFetch(path: string, init?: RequestInit) {
+  return fetch(apiUrl(path), init);
 }
 
 interface ApiResponse<T> {
@@ -21,6 +24,18 @@ interface ApiResponse<T> {
   status: number;
 }
 
+interface JobInfo {
+  job_id: string;
+  status: "queued" | "running" | "succeeded" | "failed" | "cancelled";
+  progresso?: number;
+  mensagem?: string | null;
+  resultado?: any;
+  erro?: string | null;
+}
+
+const JOB_FINAL = ["succeeded", "failed", "cancelled"];
+const sleep = (ms: number) => new Promise((r) => setTimeout(r, ms));
+
 export const api = {
   async get<T = any>(path: string): Promise<ApiResponse<T>> {
     const response = await apiFetch(path);
@@ -90,4 +105,42 @@ export const api = {
       status: response.status,
     };
   },
+
+  /**
+   * POST em rota que responde 202 com um job (manutenção pesada):
+   * acompanha /jobs/{id} até o fim e devolve o resultado do job.
+   */
+  async postJob<T = any>(
+    path: string,
+    body?: any,
+    opts: { intervalMs?: number; onProgress?: (job: JobInfo) => void } = {},
+  ): Promise<ApiResponse<T>> {
+    const submit = await api.post<JobInfo>(path, body);
+    if (submit.status !== 202 || !submit.data?.job_id) {
+      return submit as unknown as ApiResponse<T>;
+    }
+    const intervalMs = opts.intervalMs ?? 1500;
+    for (;;) {
+      const { data: job } = await api.get<JobInfo>(
+        `/jobs/${submit.data.job_id}`,
+      );
+      opts.onProgress?.(job);
+      if (JOB_FINAL.includes(job.status)) {
+        if (job.status !== "succeeded") {
+          const error = new Error("Job Error") as any;
+          error.response = {
+            status: 500,
+            data: {
+              detail:
+                job.erro ||
+                (job.status === "cancelled" ? "Job cancelado" : "Job falhou"),
+            },
+          };
+          throw error;
+        }
+        return { data: job.resultado as T, status: 200 };
+      }
+      await sleep(intervalMs);
+    }
+  },
 };
@@ -393,7 +393,7 @@ export default function Overview() {
 
   const atualizarMetricasMutation = useMutation({
     mutationFn: async () => {
-      const response = await api.post("/sla/recalcular/painel");
+      const response = await api.postJob("/sla/recalcular/painel");
       return response.data;
     },
     onSuccess: (data: any) => {
@@ -441,12 +441,14 @@ export default function ChamadosPage() {
           toast({ title: n.titulo, description: n.mensagem || "" });
         },
       );
-      socket.on("chamado:created", () => {
+      const reload = () => {
         apiFetch("/chamados")
           .then((r) => (r.ok ? r.json() : Promise.reject(new Error("fail"))))
           .then((data) => setItems(Array.isArray(data) ? data.map(adapt) : []))
           .catch(() => {});
-      });
+      };
+      socket.on("chamado:created", reload);
+      socket.on("chamados:bulk", reload);
       socket.on("chamado:status", (data: { id: number; status: string }) => {
         setItems((prev) =>
           prev.map((it) =>
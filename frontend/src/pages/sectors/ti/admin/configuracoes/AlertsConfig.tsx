@@ -1,5 +1,5 @@
 import { useEffect, useState, useRef } from "react";
-import { apiFetch } from "@/lib/api";
+import { apiFetch, apiUrl } from "@/lib/api";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import {
@@ -538,10 +538,11 @@ export default function AlertsConfig() {
                         </div>
 
                         {/* Imagem */}
-                        {alert.imagem_blob && (
+                        {alert.imagem_url && (
                           <div className="rounded-lg overflow-hidden border max-w-md">
                             <img
-                              src={`data:${alert.imagem_mime_type || "image/jpeg"};base64,${alert.imagem_blob}`}
+                              src={apiUrl(alert.imagem_thumb_url || alert.imagem_url)}
+                              loading="lazy"
                               alt="Alerta"
                               className="w-full h-48 object-cover"
                             />
@@ -402,7 +402,7 @@ export function SLA() {
 
   const zerarCacheMutation = useMutation({
     mutationFn: async () => {
-      const response = await api.post("/sla/reset-and-recalculate");
+      const response = await api.postJob("/sla/reset-and-recalculate");
       return response.data;
     },
     onSuccess: (data: any) => {
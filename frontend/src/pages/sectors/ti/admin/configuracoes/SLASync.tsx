@@ -43,7 +43,7 @@ export function SLASync() {
   const handleSyncAll = async () => {
     setLoading(true);
     try {
-      const response = await api.post("/sla/sync/todos-chamados");
+      const response = await api.postJob("/sla/sync/todos-chamados");
       setStats(response.data);
       toast.success("Sincronização concluída com sucesso!");
     } catch (error: any) {
@@ -58,7 +58,7 @@ export function SLASync() {
   const handleRecalculate = async () => {
     setLoading(true);
     try {
-      const response = await api.post("/sla/recalcular/painel");
+      const response = await api.postJob("/sla/recalcular/painel");
       setStats(response.data);
       toast.success("Recálculo de SLAs concluído com sucesso!");
     } catch (error: any) {
@@ -91,7 +91,7 @@ export function SLASync() {
   const handleForceRecalculate = async () => {
     setLoading(true);
     try {
-      const response = await api.post("/sla/maintenance/force-recalculate-all");
+      const response = await api.postJob("/sla/maintenance/force-recalculate-all");
       setStats(response.data.metrics);
       toast.success(
         "✓ Recalcul forçado! Todos os caches foram limpos e métricas recalculadas.",